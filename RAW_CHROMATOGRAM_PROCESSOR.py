@@ -16,6 +16,9 @@ from datetime import datetime
 # Add performance analyzer
 sys.path.append(os.path.join(os.path.dirname(__file__), 'core', 'performance_monitor'))
 sys.path.append(os.path.join(os.path.dirname(__file__), 'core', 'integration'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.app.services.baseline_correction import correct_baseline
 
 @dataclass
 class RawChromatogramData:
@@ -65,6 +68,7 @@ class ChromatogramProcessor:
         self.peak_threshold = 3.0      # S/N threshold for peak detection
         self.min_peak_width = 0.01     # Minimum peak width (min)
         self.max_peak_width = 2.0      # Maximum peak width (min)
+        self.baseline_method = "asls"  # asls, airpls, rolling_min, polynomial
         
     def _setup_logging(self) -> logging.Logger:
         """Setup enterprise logging"""
@@ -174,42 +178,15 @@ class ChromatogramProcessor:
         return time_data[valid_indices], intensity_data[valid_indices]
     
     def _correct_baseline(self, time_data: np.ndarray, intensity_data: np.ndarray) -> np.ndarray:
-        """Automatic baseline correction using polynomial fitting"""
-        
-        # Find baseline points (bottom 10% of data in sliding windows)
-        window_size = max(50, len(intensity_data) // 20)
-        baseline_points = []
-        baseline_times = []
-        
-        for i in range(0, len(intensity_data) - window_size, window_size // 2):
-            window_data = intensity_data[i:i + window_size]
-            baseline_level = np.percentile(window_data, 10)  # Bottom 10%
-            
-            # Find points close to baseline in this window
-            baseline_indices = np.where(
-                (intensity_data[i:i + window_size] <= baseline_level * 1.2) &
-                (intensity_data[i:i + window_size] >= baseline_level * 0.8)
-            )[0] + i
-            
-            if len(baseline_indices) > 0:
-                baseline_points.extend(intensity_data[baseline_indices])
-                baseline_times.extend(time_data[baseline_indices])
-        
-        if len(baseline_points) < 10:
-            self.logger.warning("Insufficient baseline points found, using linear detrend")
-            # Simple linear detrend
-            coeffs = np.polyfit(time_data, intensity_data, 1)
-            baseline = np.polyval(coeffs, time_data)
-        else:
-            # Fit polynomial to baseline points
-            baseline_coeffs = np.polyfit(baseline_times, baseline_points, 
-                                       min(3, len(set(baseline_times)) - 1))
-            baseline = np.polyval(baseline_coeffs, time_data)
-        
-        corrected_intensity = intensity_data - baseline
-        
-        # Ensure no negative values
-        corrected_intensity = np.maximum(corrected_intensity, 0)
+        """Automatic baseline correction using the shared AsLS/airPLS engine"""
+        
+        corrected_intensity, _ = correct_baseline(
+            intensity_data,
+            method=self.baseline_method,
+            x=time_data,
+            fallback="polynomial",
+            clip_negative=True  # Ensure no negative values
+        )
         
         return corrected_intensity
     
@@ -3,9 +3,9 @@ Chromatogram Analysis API Routes
 Professional chromatogram analysis endpoints
 """
 
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query
 from fastapi.responses import JSONResponse
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import base64
 import logging
 
@@ -18,9 +18,27 @@ router = APIRouter(tags=["Chromatogram Analysis"])
 # Create global AI analyzer instance
 chromatogram_ai = ChromatogramVisionAI()
 
+def _axis_range(values: Optional[List[Any]], name: str) -> Optional[Tuple[float, float]]:
+    """Validate an optional [start, end] axis range"""
+    if values is None:
+        return None
+    try:
+        start, end = (float(v) for v in values)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{name} must be two numbers [start, end]")
+    if not start < end:
+        raise HTTPException(status_code=400, detail=f"{name} start must be below its end")
+    return start, end
+
 @router.post("/analyze", response_model=Dict[str, Any])
 async def analyze_chromatogram(
-    image: UploadFile = File(..., description="Chromatogram image file")
+    image: UploadFile = File(..., description="Chromatogram image file"),
+    time_range: Optional[List[float]] = Query(
+        None, description="Time at the left and right plot edges, e.g. ?time_range=0&time_range=20"
+    ),
+    signal_range: Optional[List[float]] = Query(
+        None, description="Signal at the bottom and top plot edges"
+    )
 ):
     """
     🔬 **Chromatogram Vision AI Analysis**
@@ -33,12 +51,15 @@ async def analyze_chromatogram(
     - Overall quality scoring
     
     **Perfect for LinkedIn demos!** 📸
+    
+    Pass time_range/signal_range when the axis tick labels cannot be read.
     """
     
     try:
         # Validate file type
         if not image.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
+        axis_ranges = _axis_range(time_range, "time_range"), _axis_range(signal_range, "signal_range")
         
         # Read and encode image
         image_data = await image.read()
@@ -46,7 +67,7 @@ async def analyze_chromatogram(
         image_data_url = f"data:{image.content_type};base64,{base64_image}"
         
         # Analyze chromatogram
-        analysis = await chromatogram_ai.analyze_chromatogram_image(image_data_url)
+        analysis = await chromatogram_ai.analyze_chromatogram_image(image_data_url, *axis_ranges)
         
         # Format response for frontend
         response = {
@@ -69,7 +90,8 @@ async def analyze_chromatogram(
                 "resolution_issues": analysis.resolution_issues,
                 "troubleshooting_suggestions": analysis.troubleshooting_suggestions,
                 "method_recommendations": analysis.method_recommendations,
-                "overall_quality_score": analysis.overall_quality_score
+                "overall_quality_score": analysis.overall_quality_score,
+                "trace": analysis.trace
             },
             "ai_insights": {
                 "peak_count": len(analysis.peaks),
@@ -82,24 +104,32 @@ async def analyze_chromatogram(
         logger.info(f"Successfully analyzed chromatogram: {image.filename}")
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in chromatogram analysis: {e}")
         raise HTTPException(status_code=500, detail="Analysis failed")
 
 @router.post("/analyze-base64", response_model=Dict[str, Any])
-async def analyze_chromatogram_base64(data: Dict[str, str]):
+async def analyze_chromatogram_base64(data: Dict[str, Any]):
     """
     🖼️ **Direct Base64 Image Analysis**
     
-    Analyze chromatogram from base64 image data (perfect for camera uploads)
+    Analyze chromatogram from base64 image data (perfect for camera uploads).
+    Optional "time_range"/"signal_range" ([start, end]) give the axis values
+    at the plot edges when the tick labels cannot be read.
     """
     
     try:
         if "image" not in data:
             raise HTTPException(status_code=400, detail="Missing image data")
+        axis_ranges = (
+            _axis_range(data.get("time_range"), "time_range"),
+            _axis_range(data.get("signal_range"), "signal_range")
+        )
         
         # Analyze chromatogram
-        analysis = await chromatogram_ai.analyze_chromatogram_image(data["image"])
+        analysis = await chromatogram_ai.analyze_chromatogram_image(data["image"], *axis_ranges)
         
         # Format response
         response = {
@@ -121,7 +151,8 @@ async def analyze_chromatogram_base64(data: Dict[str, str]):
                 "resolution_issues": analysis.resolution_issues,
                 "troubleshooting_suggestions": analysis.troubleshooting_suggestions,
                 "method_recommendations": analysis.method_recommendations,
-                "overall_quality_score": analysis.overall_quality_score
+                "overall_quality_score": analysis.overall_quality_score,
+                "trace": analysis.trace
             },
             "ai_insights": {
                 "peak_count": len(analysis.peaks),
@@ -133,6 +164,8 @@ async def analyze_chromatogram_base64(data: Dict[str, str]):
         
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in base64 analysis: {e}")
         raise HTTPException(status_code=500, detail="Analysis failed")
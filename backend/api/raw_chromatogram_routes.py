@@ -52,6 +52,12 @@ except ImportError:
         recommendations: List[Dict[str, Any]]
         compound_assignments: List[Dict[str, Any]]
 
+# Shared baseline engine
+try:
+    from backend.app.services.baseline_correction import correct_baseline
+except ImportError:
+    from app.services.baseline_correction import correct_baseline
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/raw-data", tags=["Raw Chromatogram Data"])
@@ -59,8 +65,9 @@ router = APIRouter(prefix="/raw-data", tags=["Raw Chromatogram Data"])
 class RawDataProcessor:
     """Professional raw chromatogram data processor for API"""
     
-    def __init__(self):
+    def __init__(self, baseline_method: str = "asls"):
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.baseline_method = baseline_method
     
     async def analyze_raw_chromatogram(
         self,
@@ -162,18 +169,14 @@ class RawDataProcessor:
         return time_data[valid_mask], intensity_data[valid_mask]
     
     def _correct_baseline(self, time_data: np.ndarray, intensity_data: np.ndarray):
-        """Simple baseline correction"""
-        # Use first and last 5% of data as baseline estimate
-        baseline_points = int(len(intensity_data) * 0.05)
-        baseline_start = np.mean(intensity_data[:baseline_points])
-        baseline_end = np.mean(intensity_data[-baseline_points:])
-        
-        # Linear baseline
-        baseline = np.linspace(baseline_start, baseline_end, len(intensity_data))
-        corrected = intensity_data - baseline
-        
-        # Ensure no negative values
-        return np.maximum(corrected, 0)
+        """Baseline correction using the shared AsLS engine"""
+        corrected, _ = correct_baseline(
+            intensity_data,
+            method=self.baseline_method,
+            x=time_data,
+            clip_negative=True  # Ensure no negative values
+        )
+        return corrected
     
     def _detect_peaks(self, time_data: np.ndarray, intensity_data: np.ndarray):
         """Simple peak detection algorithm"""
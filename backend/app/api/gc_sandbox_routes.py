@@ -3,7 +3,7 @@ GC Instrument Sandbox API Routes
 FastAPI endpoints for GC simulation and method development sandbox
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Depends
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Depends, Request
 from fastapi.responses import FileResponse, JSONResponse
 from typing import List, Optional, Dict, Any
 import asyncio
@@ -25,6 +25,10 @@ from backend.app.models.gc_sandbox_schemas import (
     DetectorType
 )
 from backend.app.services.gc_simulation_engine import GCSimulationEngine
+from backend.app.core.config import settings
+from backend.app.core.result_store import ResultStore
+from backend.app.core.responses import negotiate_traces
+from backend.app.core.decimation import decimate_traces
 
 router = APIRouter(prefix="/api/gc-sandbox", tags=["GC Sandbox"])
 logger = logging.getLogger(__name__)
@@ -32,8 +36,21 @@ logger = logging.getLogger(__name__)
 # Global simulation engine instance
 simulation_engine = GCSimulationEngine()
 
-# In-memory storage for results (in production, use Redis or database)
-simulation_results: Dict[str, SandboxRunResult] = {}
+# Results are shared across workers through a SQLite tier behind a per-worker LRU
+simulation_results: ResultStore[SandboxRunResult] = ResultStore(
+    SandboxRunResult,
+    path=settings.SANDBOX_RESULT_STORE_PATH or os.path.join(settings.get_data_dir(), "gc_sandbox_results.db"),
+    max_memory_items=settings.SANDBOX_RESULT_MEMORY_ITEMS,
+    ttl_seconds=settings.SANDBOX_RESULT_TTL_SECONDS,
+    max_disk_bytes=settings.SANDBOX_RESULT_MAX_DISK_MB * 1024 * 1024
+)
+
+
+def _get_result_or_404(run_id: str) -> SandboxRunResult:
+    result = simulation_results.get(run_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Simulation result not found")
+    return result
 
 
 @router.post("/simulate", response_model=SandboxRunResult)
@@ -72,7 +89,7 @@ async def run_gc_simulation(
         result = await simulation_engine.simulate_gc_run(request)
         
         # Store result for later retrieval
-        simulation_results[request.run_id] = result
+        simulation_results.put(request.run_id, result)
         
         # Schedule export files if requested
         if request.export_csv or request.export_png:
@@ -98,28 +115,29 @@ async def get_simulation_result(run_id: str):
     Retrieve simulation results by run ID
     """
     
-    if run_id not in simulation_results:
-        raise HTTPException(status_code=404, detail="Simulation result not found")
-    
-    return simulation_results[run_id]
+    return _get_result_or_404(run_id)
 
 
 @router.get("/results/{run_id}/chromatogram/{detector_id}")
 async def get_chromatogram_data(
     run_id: str, 
     detector_id: str,
-    format: str = Query("json", regex="^(json|csv)$")
+    request: Request,
+    format: str = Query("json", regex="^(json|csv)$"),
+    max_points: Optional[int] = Query(None, ge=3, description="Decimate to at most this many points (LTTB)"),
+    t_start: Optional[float] = Query(None, description="Start of the returned time window (min)"),
+    t_end: Optional[float] = Query(None, description="End of the returned time window (min)")
 ):
     """
     Get chromatogram data for specific detector
     
-    - **format**: Response format (json or csv)
+    - **format**: Response format (json or csv); JSON requests sending
+      Accept: application/vnd.intellilab.traces get the binary trace format
+    - **max_points**, **t_start**, **t_end**: Display window and point budget;
+      the shape (peak apexes) is kept with LTTB decimation
     """
     
-    if run_id not in simulation_results:
-        raise HTTPException(status_code=404, detail="Simulation result not found")
-    
-    result = simulation_results[run_id]
+    result = _get_result_or_404(run_id)
     
     # Find chromatogram for detector
     chromatogram = None
@@ -131,6 +149,15 @@ async def get_chromatogram_data(
     if not chromatogram:
         raise HTTPException(status_code=404, detail=f"Chromatogram not found for detector {detector_id}")
     
+    if max_points is not None or t_start is not None or t_end is not None:
+        traces = decimate_traces(
+            {"time_min": chromatogram.time_min, "intensity": chromatogram.intensity},
+            max_points, t_start, t_end, time_key="time_min", value_key="intensity"
+        )
+        chromatogram = chromatogram.model_copy(update={
+            "time_min": traces["time_min"].tolist(), "intensity": traces["intensity"].tolist()
+        })
+    
     if format == "csv":
         # Return CSV format
         output = io.StringIO()
@@ -148,8 +175,8 @@ async def get_chromatogram_data(
             headers={"Content-Type": "application/json"}
         )
     else:
-        # Return JSON format
-        return chromatogram
+        # Return JSON format (or binary traces when negotiated)
+        return negotiate_traces(request, chromatogram)
 
 
 @router.get("/results/{run_id}/export/chromatogram.png")
@@ -164,10 +191,7 @@ async def export_chromatogram_png(
     Export chromatogram as PNG image
     """
     
-    if run_id not in simulation_results:
-        raise HTTPException(status_code=404, detail="Simulation result not found")
-    
-    result = simulation_results[run_id]
+    result = _get_result_or_404(run_id)
     
     try:
         # Create matplotlib figure
@@ -234,10 +258,7 @@ async def export_method_profile_png(
     Export method profile (temperature, flow, pressure vs time) as PNG
     """
     
-    if run_id not in simulation_results:
-        raise HTTPException(status_code=404, detail="Simulation result not found")
-    
-    result = simulation_results[run_id]
+    result = _get_result_or_404(run_id)
     
     try:
         # Create subplots
@@ -322,10 +343,7 @@ async def export_kpis_csv(run_id: str):
     Export run KPIs as CSV file
     """
     
-    if run_id not in simulation_results:
-        raise HTTPException(status_code=404, detail="Simulation result not found")
-    
-    result = simulation_results[run_id]
+    result = _get_result_or_404(run_id)
     
     try:
         output = io.StringIO()
@@ -486,14 +504,12 @@ async def list_method_presets():
 @router.delete("/results/{run_id}")
 async def delete_simulation_result(run_id: str):
     """
-    Delete simulation result from memory
+    Delete simulation result from the result store
     """
     
-    if run_id not in simulation_results:
+    if not simulation_results.delete(run_id):
         raise HTTPException(status_code=404, detail="Simulation result not found")
     
-    del simulation_results[run_id]
-    
     return {"message": f"Simulation result {run_id} deleted successfully"}
 
 
@@ -503,11 +519,14 @@ async def sandbox_health_check():
     Health check endpoint for GC sandbox service
     """
     
+    store_stats = simulation_results.stats()
     return {
         "status": "healthy",
         "service": "gc-sandbox",
         "timestamp": datetime.now().isoformat(),
-        "active_simulations": len(simulation_results),
+        "active_simulations": store_stats["disk_entries"],
+        "result_store": store_stats,
+        "simulation_cache": simulation_engine.result_cache.stats(),
         "engine_ready": simulation_engine is not None
     }
 
@@ -557,6 +576,7 @@ async def generate_export_files(run_id: str, result: SandboxRunResult,
         
         # Update result with export paths
         result.exported_files.update(export_paths)
+        simulation_results.put(run_id, result)
         
         logger.info(f"Export files generated for run {run_id}: {list(export_paths.keys())}")
         
@@ -4,6 +4,7 @@ OCR API Endpoints for Chromatogram Processing
 FastAPI endpoints for image upload, OCR processing, and result retrieval
 """
 
+import asyncio
 import logging
 import tempfile
 import os
@@ -12,18 +13,21 @@ from io import BytesIO
 from datetime import datetime
 import base64
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, BackgroundTasks, status
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, BackgroundTasks, Query, status
 from fastapi.responses import JSONResponse
 from PIL import Image
 import cv2
 import numpy as np
 
 from backend.app.models.schemas import (
-    OCRProcessingRequest, OCRProcessingResult, OCRBatchRequest, OCRBatchResult,
+    OCRProcessingRequest, OCRProcessingResult,
     OCRImageType, OCRQualityLevel, ImagePreprocessingOptions,
-    OCRTextRegion, OCRPeakData, OCRMethodParameters, OCRSampleInfo
+    OCRTextRegion, OCRPeakData, OCRMethodParameters, OCRSampleInfo, OCRJob
 )
+from backend.app.core.config import settings
 from backend.app.services.ocr_service import get_ocr_engine
+from backend.app.services.ocr_job_service import OCRQueueFull, ocr_job_service
+from backend.app.services.ocr_cache import get_ocr_cache, image_digest
 from backend.app.services.image_processor import get_image_processor
 from backend.app.services.auth_service import get_current_user
 from backend.database import get_db
@@ -39,6 +43,9 @@ router = APIRouter(
 
 logger = logging.getLogger('IntelliLab.OCR.API')
 
+ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/png", "image/tiff", "image/bmp", "image/webp"]
+MAX_IMAGE_SIZE = 50 * 1024 * 1024  # 50MB
+
 
 # =================== UTILITY FUNCTIONS ===================
 
@@ -46,7 +53,7 @@ async def validate_image_file(file: UploadFile) -> Dict[str, Any]:
     """Validate uploaded image file"""
     
     # Check file size (max 50MB)
-    max_size = 50 * 1024 * 1024  # 50MB
+    max_size = MAX_IMAGE_SIZE
     if file.size and file.size > max_size:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
@@ -54,7 +61,7 @@ async def validate_image_file(file: UploadFile) -> Dict[str, Any]:
         )
     
     # Check content type
-    allowed_types = ["image/jpeg", "image/png", "image/tiff", "image/bmp", "image/webp"]
+    allowed_types = ALLOWED_IMAGE_TYPES
     if file.content_type not in allowed_types:
         raise HTTPException(
             status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
@@ -75,6 +82,7 @@ async def validate_image_file(file: UploadFile) -> Dict[str, Any]:
         
         return {
             "image": image_cv,
+            "data": file_content,
             "filename": file.filename,
             "content_type": file.content_type,
             "size": file.size or len(file_content),
@@ -163,13 +171,13 @@ async def process_chromatogram_image(
         
         # Create OCR request
         ocr_request = OCRProcessingRequest(
+            image_base64=base64.b64encode(image_data["data"]).decode("ascii"),
             image_type=image_type,
             quality_level=quality_level,
+            preprocessing=preprocessing_options,
             extract_peaks=extract_peaks,
-            extract_methods=extract_methods,
-            extract_sample_info=extract_sample_info,
-            preprocessing_options=preprocessing_options,
-            batch_id=None  # Single image processing
+            extract_method_params=extract_methods,
+            extract_sample_info=extract_sample_info
         )
         
         # Get services
@@ -178,22 +186,31 @@ async def process_chromatogram_image(
         
         # Process image
         processing_start = datetime.utcnow()
-        
-        # Step 1: Preprocess image
-        preprocessing_result = image_processor.process_image_pipeline(
-            image_data["image"], preprocessing_options, image_type
-        )
-        
-        if not preprocessing_result["success"]:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Image preprocessing failed: {preprocessing_result['error']}"
+        image_hash = image_digest(image_data["data"])
+        
+        # A scan read before with the same settings skips preprocessing and OCR
+        ocr_result = await asyncio.to_thread(ocr_engine.get_cached_result, ocr_request, image_hash)
+        preprocessing_result = None
+        if ocr_result is None:
+            # Step 1: Preprocess image (served from the OCR cache when only the quality level changed)
+            preprocessing_result = await asyncio.to_thread(
+                image_processor.process_image_pipeline,
+                image_data["image"], preprocessing_options, image_type, image_hash=image_hash
+            )
+            
+            if not preprocessing_result["success"]:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Image preprocessing failed: {preprocessing_result['error']}"
+                )
+            
+            # Step 2: OCR processing
+            ocr_result = await asyncio.to_thread(
+                ocr_engine.process_preprocessed_image,
+                preprocessing_result["processed_image"], ocr_request,
+                preprocessing_result["original_dimensions"], image_hash,
+                preprocessing_result.get("page_transform")
             )
-        
-        # Step 2: OCR processing
-        ocr_result = await ocr_engine.process_image_async(
-            preprocessing_result["processed_image"], ocr_request
-        )
         
         processing_time = (datetime.utcnow() - processing_start).total_seconds()
         
@@ -202,14 +219,14 @@ async def process_chromatogram_image(
             "original_filename": image_data["filename"],
             "file_size_bytes": image_data["size"],
             "original_dimensions": image_data["dimensions"],
-            "preprocessing_steps": preprocessing_result["processing_steps"],
             "processing_time_seconds": processing_time,
             "user_id": current_user.get("user_id"),
             "processed_at": datetime.utcnow().isoformat()
         })
         
-        # Encode processed image for response (optional)
-        if preprocessing_result.get("processed_image") is not None:
+        # Encode processed image for response (optional; not kept for text cache hits)
+        if preprocessing_result is not None:
+            ocr_result.processing_metadata["preprocessing_steps"] = preprocessing_result["processing_steps"]
             processed_image_b64 = encode_image_to_base64(preprocessing_result["processed_image"])
             if processed_image_b64:
                 ocr_result.processing_metadata["processed_image_base64"] = processed_image_b64
@@ -228,9 +245,8 @@ async def process_chromatogram_image(
         )
 
 
-@router.post("/batch", response_model=OCRBatchResult)
+@router.post("/batch", response_model=OCRJob, status_code=status.HTTP_202_ACCEPTED)
 async def process_batch_images(
-    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     image_type: OCRImageType = OCRImageType.CHROMATOGRAM,
     quality_level: OCRQualityLevel = OCRQualityLevel.BALANCED,
@@ -246,150 +262,131 @@ async def process_batch_images(
     current_user: Dict = Depends(get_current_user)
 ):
     """
-    Process multiple chromatogram images in batch
+    Queue multiple chromatogram images for background OCR
     
-    - **files**: List of image files to process
+    - **files**: List of image files to process (up to OCR_MAX_BATCH_SIZE)
     - **image_type**: Type of chromatogram images
     - **quality_level**: OCR quality vs speed tradeoff
     - Other parameters same as single image processing
+    
+    Returns the job immediately; poll /jobs/{job_id} for progress and
+    /jobs/{job_id}/results for results (available while the job runs).
+    Responds 429 while the OCR queue is full.
     """
     
-    try:
-        logger.info(f"Processing OCR batch request for {len(files)} images from user {current_user.get('username', 'unknown')}")
-        
-        # Validate file count
-        max_batch_size = 20
-        if len(files) > max_batch_size:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Too many files in batch. Maximum is {max_batch_size}, got {len(files)}"
-            )
-        
-        # Generate batch ID
-        batch_id = f"batch_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{len(files)}"
-        
-        # Set auto-detection for preprocessing options
-        if binarize is None:
-            binarize = image_type in [OCRImageType.PEAK_TABLE, OCRImageType.METHOD_PARAMETERS]
-        
-        if gaussian_blur is None:
-            gaussian_blur = image_type == OCRImageType.METHOD_PARAMETERS
-        
-        # Create preprocessing options
-        preprocessing_options = ImagePreprocessingOptions(
-            enhance_contrast=enhance_contrast,
-            denoise=denoise,
-            deskew=deskew,
-            binarize=binarize,
-            scale_factor=scale_factor,
-            gaussian_blur=gaussian_blur
-        )
-        
-        # Create batch request
-        batch_request = OCRBatchRequest(
-            batch_id=batch_id,
-            image_type=image_type,
-            quality_level=quality_level,
-            extract_peaks=extract_peaks,
-            extract_methods=extract_methods,
-            extract_sample_info=extract_sample_info,
-            preprocessing_options=preprocessing_options
-        )
-        
-        # Process each image
-        results = []
-        errors = []
-        total_processing_time = 0.0
-        
-        ocr_engine = get_ocr_engine()
-        image_processor = get_image_processor()
-        
-        for i, file in enumerate(files):
-            try:
-                # Validate image file
-                image_data = await validate_image_file(file)
-                
-                # Create individual request
-                individual_request = OCRProcessingRequest(
-                    image_type=image_type,
-                    quality_level=quality_level,
-                    extract_peaks=extract_peaks,
-                    extract_methods=extract_methods,
-                    extract_sample_info=extract_sample_info,
-                    preprocessing_options=preprocessing_options,
-                    batch_id=batch_id
-                )
-                
-                # Process image
-                processing_start = datetime.utcnow()
-                
-                # Preprocess
-                preprocessing_result = image_processor.process_image_pipeline(
-                    image_data["image"], preprocessing_options, image_type
-                )
-                
-                if preprocessing_result["success"]:
-                    # OCR processing
-                    ocr_result = await ocr_engine.process_image_async(
-                        preprocessing_result["processed_image"], individual_request
-                    )
-                    
-                    processing_time = (datetime.utcnow() - processing_start).total_seconds()
-                    total_processing_time += processing_time
-                    
-                    # Add metadata
-                    ocr_result.processing_metadata.update({
-                        "batch_index": i,
-                        "original_filename": image_data["filename"],
-                        "file_size_bytes": image_data["size"],
-                        "processing_time_seconds": processing_time
-                    })
-                    
-                    results.append(ocr_result)
-                    
-                else:
-                    error_msg = f"Preprocessing failed for {image_data['filename']}: {preprocessing_result['error']}"
-                    errors.append(error_msg)
-                    logger.error(error_msg)
-                
-            except Exception as e:
-                error_msg = f"Failed to process {file.filename}: {str(e)}"
-                errors.append(error_msg)
-                logger.error(error_msg)
-        
-        # Create batch result
-        batch_result = OCRBatchResult(
-            batch_id=batch_id,
-            total_images=len(files),
-            successful_images=len(results),
-            failed_images=len(errors),
-            results=results,
-            errors=errors,
-            processing_metadata={
-                "total_processing_time_seconds": total_processing_time,
-                "average_processing_time_seconds": total_processing_time / len(files) if files else 0,
-                "user_id": current_user.get("user_id"),
-                "processed_at": datetime.utcnow().isoformat(),
-                "batch_settings": {
-                    "image_type": image_type,
-                    "quality_level": quality_level,
-                    "preprocessing_options": preprocessing_options.model_dump()
-                }
-            }
+    logger.info(f"Queueing OCR batch of {len(files)} images from user {current_user.get('username', 'unknown')}")
+    
+    # Validate file count
+    max_batch_size = settings.OCR_MAX_BATCH_SIZE
+    if len(files) > max_batch_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many files in batch. Maximum is {max_batch_size}, got {len(files)}"
         )
-        
-        logger.info(f"Batch OCR processing completed: {len(results)}/{len(files)} successful")
-        
-        return batch_result
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Batch OCR processing failed: {str(e)}")
+    
+    # Set auto-detection for preprocessing options
+    if binarize is None:
+        binarize = image_type in [OCRImageType.PEAK_TABLE, OCRImageType.METHOD_PARAMETERS]
+    
+    if gaussian_blur is None:
+        gaussian_blur = image_type == OCRImageType.METHOD_PARAMETERS
+    
+    # Create preprocessing options
+    preprocessing_options = ImagePreprocessingOptions(
+        enhance_contrast=enhance_contrast,
+        denoise=denoise,
+        deskew=deskew,
+        binarize=binarize,
+        scale_factor=scale_factor,
+        gaussian_blur=gaussian_blur
+    )
+    
+    # Plain values so the request crosses into pool workers
+    request_fields = {
+        "image_type": image_type.value,
+        "quality_level": quality_level.value,
+        "preprocessing": preprocessing_options.model_dump(),
+        "extract_peaks": extract_peaks,
+        "extract_method_params": extract_methods,
+        "extract_sample_info": extract_sample_info
+    }
+    
+    # Back-pressure: the job reserves its images or is refused until the queue drains
+    try:
+        job = ocr_job_service.create_job(len(files), processing_metadata={
+            "user_id": current_user.get("user_id"),
+            "batch_settings": request_fields
+        })
+    except OCRQueueFull as e:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Batch OCR processing failed: {str(e)}"
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"{str(e)}; retry later",
+            headers={"Retry-After": "60"}
         )
+    
+    # Spool uploads to disk; unsupported files are recorded as failures
+    images = []
+    try:
+        for index, file in enumerate(files):
+            if file.content_type not in ALLOWED_IMAGE_TYPES:
+                ocr_job_service.record_failure(job, file.filename, f"Unsupported file type {file.content_type}")
+                continue
+            if file.size and file.size > MAX_IMAGE_SIZE:
+                ocr_job_service.record_failure(job, file.filename, "File too large")
+                continue
+            path = await asyncio.to_thread(ocr_job_service.spool_image, job, index, file.filename, file.file)
+            images.append((index, file.filename, path))
+    except Exception as e:
+        ocr_job_service.abort_job(job, f"Failed to store uploads: {str(e)}")
+        logger.error(f"OCR batch {job.batch_id} failed: {job.error}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=job.error)
+    
+    return ocr_job_service.start_job(job, images, request_fields)
+
+
+@router.get("/jobs", response_model=List[OCRJob])
+async def list_ocr_jobs(
+    limit: int = Query(50, ge=1, le=100, description="Maximum number of jobs to return")
+):
+    """List OCR batch jobs"""
+    return ocr_job_service.list_jobs(limit)
+
+
+@router.get("/jobs/{job_id}", response_model=OCRJob)
+async def get_ocr_job(job_id: str):
+    """Get OCR batch job progress"""
+    job = ocr_job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="OCR job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/results", response_model=List[OCRProcessingResult])
+async def get_ocr_job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="Results to skip (completion order)"),
+    limit: int = Query(100, ge=1, le=500, description="Maximum number of results to return")
+):
+    """Results produced so far; processing_metadata.batch_index gives each file's upload position"""
+    try:
+        return ocr_job_service.get_results(job_id, offset, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_ocr_job(job_id: str):
+    """Cancel a running OCR job; results already produced are kept"""
+    try:
+        return {"ok": ocr_job_service.cancel_job(job_id)}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/cache")
+async def get_ocr_cache_stats():
+    """Entries and disk use of the preprocessed image and OCR text caches"""
+    return await asyncio.to_thread(get_ocr_cache().stats)
 
 
 @router.get("/health")
@@ -455,9 +452,9 @@ async def get_ocr_capabilities():
         capabilities = {
             "supported_image_types": [t.value for t in OCRImageType],
             "supported_quality_levels": [q.value for q in OCRQualityLevel],
-            "supported_file_formats": ["image/jpeg", "image/png", "image/tiff", "image/bmp", "image/webp"],
-            "max_file_size_mb": 50,
-            "max_batch_size": 20,
+            "supported_file_formats": ALLOWED_IMAGE_TYPES,
+            "max_file_size_mb": MAX_IMAGE_SIZE // (1024 * 1024),
+            "max_batch_size": settings.OCR_MAX_BATCH_SIZE,
             "preprocessing_features": {
                 "contrast_enhancement": True,
                 "noise_reduction": True,
@@ -5,6 +5,7 @@ Main API router for IntelliLab GC API
 
 from fastapi import APIRouter
 
+from app.core.responses import DefaultJSONResponse
 from app.api.v1.endpoints import (
     instruments, calculations, files, ai_features, auth,
     templates, comparison, reports, samples, costs, inventory,
@@ -13,7 +14,8 @@ from app.api.v1.endpoints import (
     chromatography, runs, calibration, quant, sequences, esign, sandbox, methods, compounds, method_presets, system
 )
 
-api_router = APIRouter()
+# orjson-rendered JSON by default (plain JSONResponse when orjson is missing)
+api_router = APIRouter(default_response_class=DefaultJSONResponse)
 
 # Include all endpoint routers
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
@@ -9,7 +9,8 @@ import logging
 
 from app.models.schemas import (
     CalibrationModel, CalibrationFitRequest, CalibrationListResponse,
-    CalibrationActivateRequest, CalibrationVersion
+    CalibrationActivateRequest, CalibrationVersion,
+    CalibrationBatchFitRequest, CalibrationBatchFitResponse
 )
 from app.services.quant_service import quant_service
 from app.services.audit_service import audit_service
@@ -51,6 +52,35 @@ async def fit_calibration(request: CalibrationFitRequest, current_user: User = D
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/fit/batch", response_model=CalibrationBatchFitResponse)
+async def fit_calibrations_batch(request: CalibrationBatchFitRequest, current_user: User = Depends(get_current_user)):
+    """Fit calibration curves for many targets in one vectorized call"""
+    try:
+        logger.info(f"Batch-fitting {len(request.calibrations)} calibrations")
+        
+        calibrations, errors, timing = quant_service.fit_calibrations_batch(request.calibrations)
+        try:
+            audit_service.log_action(
+                user=current_user.email,
+                action="calibrations_batch_fitted",
+                entity_type="calibration",
+                entity_id=None,
+                details={
+                    "calibration_ids": [c.id for c in calibrations],
+                    "targets": [c.target_name for c in calibrations],
+                    "errors": errors
+                }
+            )
+        except Exception:
+            pass
+        
+        return CalibrationBatchFitResponse(calibrations=calibrations, errors=errors, timing=timing)
+        
+    except Exception as e:
+        logger.error(f"Batch calibration fitting failed: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/versions", response_model=List[CalibrationVersion])
 async def list_calibration_versions(
     method_id: Optional[int] = Query(None, description="Filter by method ID"),
@@ -3,17 +3,25 @@
 Chromatography endpoints for peak detection, simulation, and data processing
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional
+import asyncio
+import json
 import logging
 
+from app.core.config import settings
+from app.core.responses import negotiate_traces
 from app.models.schemas import (
     PeakDetectionRequest, PeakDetectionResponse,
+    ChromatogramBatchAnalysisRequest,
     ChromatogramSimulationRequest, ChromatogramSimulationResponse,
     ChromatogramImportRequest, ChromatogramImportResponse,
     ChromatogramExportRequest, ChromatogramExportResponse
 )
-from app.services.chromatography_service import chromatography_service
+from app.services.analysis_pool import run_in_pool
+from app.services.chromatogram_analysis_service import chromatogram_analysis_service
+from app.services.chromatography_service import chromatography_service, detect_peaks_job
 from app.models.schemas import RunRecord
 from app.core.database import get_db
 from sqlalchemy.orm import Session
@@ -28,7 +36,7 @@ async def detect_peaks(request: PeakDetectionRequest):
     """Detect peaks in chromatogram data"""
     try:
         logger.info(f"Peak detection request received for {len(request.time)} data points")
-        response = chromatography_service.detect_peaks(request)
+        response = await run_in_pool(detect_peaks_job, request)
         logger.info(f"Peak detection completed: {len(response.peaks)} peaks found")
         return response
     except Exception as e:
@@ -36,14 +44,47 @@ async def detect_peaks(request: PeakDetectionRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _json_default(value: Any):
+    """Serialize NumPy scalars/arrays left in analysis results"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+@router.post("/detect/batch")
+async def detect_peaks_batch(request: ChromatogramBatchAnalysisRequest):
+    """
+    Analyze many chromatograms in the analysis process pool.
+    Results are streamed as NDJSON, one line per trace in completion order:
+    {"index": <position in request>, "result": {...}}
+    """
+    max_traces = settings.ANALYSIS_BATCH_MAX_TRACES
+    if len(request.traces) > max_traces:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch contains {len(request.traces)} traces; maximum is {max_traces}"
+        )
+
+    logger.info(f"Batch analysis request received for {len(request.traces)} traces")
+    traces = [trace.model_dump() for trace in request.traces]
+
+    async def stream_results():
+        async for index, result in chromatogram_analysis_service.analyze_batch(
+            traces, analysis_type=request.analysis_type
+        ):
+            yield json.dumps({"index": index, "result": result}, default=_json_default) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 @router.post("/simulate", response_model=ChromatogramSimulationResponse)
-async def simulate_chromatogram(request: ChromatogramSimulationRequest):
-    """Simulate chromatogram based on method parameters"""
+async def simulate_chromatogram(request: ChromatogramSimulationRequest, http_request: Request):
+    """Simulate chromatogram based on method parameters (binary traces on request)"""
     try:
         logger.info(f"Chromatogram simulation request received for sample: {request.sample_name}")
         response = chromatography_service.simulate_chromatogram(request)
         logger.info(f"Simulation completed: {len(response.run_record.peaks)} peaks generated")
-        return response
+        return negotiate_traces(http_request, response)
     except Exception as e:
         logger.error(f"Chromatogram simulation failed: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -125,6 +166,35 @@ async def import_chromatogram(request: ChromatogramImportRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/import/upload", response_model=ChromatogramImportResponse)
+async def upload_chromatogram(
+    file: UploadFile = File(..., description="CSV or JCAMP-DX chromatogram export"),
+    sample_name: str = Form(..., min_length=1, max_length=255),
+    file_type: Optional[str] = Form(None, description="csv or jcamp; inferred from the file name if omitted"),
+    auto_detect_peaks: bool = Form(True),
+    max_points: Optional[int] = Form(None, ge=10, description="Return the trace LTTB-decimated to at most this many points")
+):
+    """Import a chromatogram from a multipart upload, parsed as a stream"""
+    try:
+        if not file_type:
+            extension = (file.filename or "").rsplit(".", 1)[-1].lower()
+            file_type = "jcamp" if extension in ("jdx", "dx", "jcamp") else "csv"
+        
+        logger.info(f"Chromatogram upload received: {file.filename} ({file_type}) for {sample_name}")
+        # The upload is spooled to disk by Starlette; parse it off the event loop
+        response = await asyncio.to_thread(
+            chromatography_service.import_chromatogram_stream,
+            file.file, file_type, sample_name, auto_detect_peaks, max_points
+        )
+        logger.info(f"Import completed: {response.import_metadata['data_points']} data points imported")
+        return response
+    except Exception as e:
+        logger.error(f"Chromatogram upload failed: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        await file.close()
+
+
 @router.post("/export", response_model=ChromatogramExportResponse)
 async def export_chromatogram(request: ChromatogramExportRequest):
     """Export chromatogram data"""
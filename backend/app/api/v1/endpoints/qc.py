@@ -157,9 +157,8 @@ async def get_qc_status():
         total_targets = len(qc_service.targets)
         total_records = len(qc_service.records)
         
-        # Count recent failures
-        recent_failures = sum(1 for record in qc_service.records.values() 
-                             if record.overallStatus == "FAIL")
+        # Count recent failures (indexed count, no records are loaded)
+        recent_failures = qc_service.records.count(overall_status="FAIL")
         
         status = {
             "total_targets": total_targets,
@@ -3,30 +3,52 @@
 Quantitation endpoints for running quantitation on chromatogram runs
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session, undefer_group
+from typing import Dict, List
 import logging
 
-from app.models.schemas import QuantRequest, QuantResult
+from app.core.database import get_db, SandboxRun as SandboxRunModel
+from app.models.schemas import QuantRequest, QuantResult, BatchQuantRequest, RunRecord
 from app.services.quant_service import quant_service
-from app.api.v1.endpoints.runs import runs_storage
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+def _load_runs(db: Session, run_ids: List[int]) -> Dict[int, RunRecord]:
+    """Run records by ID, fetched in one query; missing IDs are simply absent"""
+    db_runs = db.query(SandboxRunModel).options(undefer_group("traces")).filter(
+        SandboxRunModel.id.in_(set(run_ids))
+    ).all()
+    return {
+        db_run.id: RunRecord(
+            id=db_run.id,
+            instrument_id=db_run.instrument_id,
+            method_id=db_run.method_id,
+            sample_name=db_run.sample_name,
+            time=db_run.time,
+            signal=db_run.signal,
+            peaks=db_run.peaks or [],
+            baseline=db_run.baseline,
+            metadata=db_run.metrics
+        )
+        for db_run in db_runs
+    }
+
+
 @router.post("/", response_model=QuantResult)
-async def quantitate_run(request: QuantRequest):
+async def quantitate_run(request: QuantRequest, db: Session = Depends(get_db)):
     """Quantitate a run using a calibration model"""
     try:
         logger.info(f"Quantitating run {request.run_id} with calibration {request.calibration_id}")
         
         # Get the run record
-        if request.run_id not in runs_storage:
+        run_record = _load_runs(db, [request.run_id]).get(request.run_id)
+        if run_record is None:
             raise HTTPException(status_code=404, detail="Run not found")
         
-        run_record = runs_storage[request.run_id]
-        
         # Get the calibration model
         if request.calibration_id not in quant_service.calibrations:
             raise HTTPException(status_code=404, detail="Calibration not found")
@@ -45,3 +67,37 @@ async def quantitate_run(request: QuantRequest):
         logger.error(f"Quantitation failed: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
+
+@router.post("/batch", response_model=List[QuantResult])
+async def quantitate_runs_batch(request: BatchQuantRequest, db: Session = Depends(get_db)):
+    """Quantitate all calibrated targets across many runs in one call"""
+    try:
+        logger.info(
+            f"Batch quantitation of {len(request.run_ids)} runs "
+            f"for {len(request.calibration_ids)} targets"
+        )
+        
+        run_records = _load_runs(db, request.run_ids)
+        missing_runs = [run_id for run_id in request.run_ids if run_id not in run_records]
+        if missing_runs:
+            raise HTTPException(status_code=404, detail=f"Runs not found: {missing_runs}")
+        
+        missing_calibrations = [
+            calibration_id for calibration_id in request.calibration_ids
+            if calibration_id not in quant_service.calibrations
+        ]
+        if missing_calibrations:
+            raise HTTPException(status_code=404, detail=f"Calibrations not found: {missing_calibrations}")
+        
+        return quant_service.quantitate_batch(
+            [run_records[run_id] for run_id in request.run_ids],
+            [quant_service.calibrations[calibration_id] for calibration_id in request.calibration_ids],
+            mapping=request.map,
+            rt_window=request.rt_window
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch quantitation failed: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
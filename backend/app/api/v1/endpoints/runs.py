@@ -3,20 +3,73 @@
 Runs endpoints for managing chromatogram run records
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from sqlalchemy.orm import Session, undefer_group
+from typing import Any, Dict, List, Optional
 import logging
+import numpy as np
 
 from app.core.database import get_db, SandboxRun as SandboxRunModel
+from app.core.decimation import decimate_traces
+from app.core.responses import accepts_trace_frame, trace_frame_response
 from app.models.schemas import (
-    RunRecord, RunRecordCreate, RunRecordUpdate
+    RunRecord, RunRecordCreate, RunRecordUpdate, RunIngestRequest, RunIngestJob,
+    RunOverlayRequest, RunOverlay
 )
+from app.services.analysis_pool import run_in_pool
+from app.services.ingestion_service import ingestion_service
+from app.services.run_overlay import build_overlay
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# RunRecord requires at least this many samples per trace
+MIN_RUN_POINTS = 10
+
+
+def _run_traces(
+    db_run: SandboxRunModel,
+    max_points: Optional[int] = None,
+    t_start: Optional[float] = None,
+    t_end: Optional[float] = None
+) -> Dict[str, Any]:
+    """Decoded traces, cut to [t_start, t_end] and LTTB-decimated to max_points when requested"""
+    traces = db_run.get_trace_arrays()
+    if (max_points is None and t_start is None and t_end is None) or "time" not in traces or "signal" not in traces:
+        return traces
+    return decimate_traces(
+        traces, max_points, t_start, t_end,
+        pyramid=db_run.get_trace_pyramid(), min_points=MIN_RUN_POINTS
+    )
+
+
+def _trace_list(traces: Dict[str, Any], field: str) -> Optional[List[float]]:
+    values = traces.get(field)
+    return values.tolist() if values is not None else None
+
+
+def _as_lists(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a mapping with NumPy arrays converted to lists, for response models"""
+    return {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in values.items()}
+
+
+def _run_payload(db_run: SandboxRunModel, traces: Dict[str, Any]) -> Dict[str, Any]:
+    """RunRecord fields with traces as decoded arrays, for binary trace responses"""
+    return {
+        "id": db_run.id,
+        "instrument_id": db_run.instrument_id,
+        "method_id": db_run.method_id,
+        "sample_name": db_run.sample_name,
+        "time": traces.get("time"),
+        "signal": traces.get("signal"),
+        "peaks": db_run.peaks or [],
+        "baseline": traces.get("baseline"),
+        "notes": "",
+        "metadata": db_run.metrics,
+        "created_date": db_run.created_date
+    }
+
 
 @router.post("/", response_model=RunRecord)
 async def create_run(run_data: RunRecordCreate, db: Session = Depends(get_db)):
@@ -65,26 +118,143 @@ async def create_run(run_data: RunRecordCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# Bulk ingestion of export directories
+@router.post("/ingest", response_model=RunIngestJob, status_code=202)
+async def start_ingest_job(request: RunIngestRequest):
+    """Queue an export directory (below the ingest root) for background ingestion"""
+    try:
+        directory = ingestion_service.resolve_directory(request.directory)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    job = ingestion_service.start_ingest_job(
+        directory,
+        recursive=request.recursive,
+        instrument_id=request.instrument_id,
+        method_id=request.method_id,
+        auto_detect_peaks=request.auto_detect_peaks,
+        batch_size=request.batch_size
+    )
+    logger.info(f"Queued ingest job {job.id} for {directory}")
+    return job
+
+
+@router.get("/ingest/jobs", response_model=List[RunIngestJob])
+async def list_ingest_jobs(
+    limit: int = Query(50, ge=1, le=100, description="Maximum number of jobs to return")
+):
+    """List ingest jobs"""
+    return ingestion_service.list_jobs(limit)
+
+
+@router.get("/ingest/jobs/{job_id}", response_model=RunIngestJob)
+async def get_ingest_job(job_id: str):
+    """Get an ingest job by ID"""
+    job = ingestion_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job
+
+
+@router.post("/ingest/jobs/{job_id}/cancel")
+async def cancel_ingest_job(job_id: str):
+    """Cancel a running ingest job; batches already committed are kept"""
+    try:
+        return {"ok": ingestion_service.cancel_job(job_id)}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/overlay", response_model=RunOverlay)
+async def overlay_runs(overlay_request: RunOverlayRequest, request: Request, db: Session = Depends(get_db)):
+    """
+    Overlay runs on a common time grid with mean/SD/min/max envelopes and
+    differences from a reference run, optionally retention-time aligned (COW).
+    Every trace is LTTB-decimated to max_points; binary traces with
+    Accept: application/vnd.intellilab.traces.
+    """
+    run_ids = list(dict.fromkeys(overlay_request.run_ids))
+    reference_id = overlay_request.reference_run_id or run_ids[0]
+    if reference_id not in run_ids:
+        raise HTTPException(status_code=400, detail="Reference run must be one of the overlaid runs")
+    if len(run_ids) < 2:
+        raise HTTPException(status_code=400, detail="At least two different runs are required")
+
+    db_runs = {
+        db_run.id: db_run
+        for db_run in db.query(SandboxRunModel).options(undefer_group("traces")).filter(
+            SandboxRunModel.id.in_(run_ids)
+        )
+    }
+    missing = [run_id for run_id in run_ids if run_id not in db_runs]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Run records not found: {missing}")
+
+    traces = [db_runs[run_id].get_trace_arrays() for run_id in run_ids]
+    if any(trace.get("time") is None or trace.get("signal") is None for trace in traces):
+        raise HTTPException(status_code=400, detail="Every overlaid run needs time and signal traces")
+
+    try:
+        overlay = await run_in_pool(
+            build_overlay,
+            [trace["time"] for trace in traces],
+            [trace["signal"] for trace in traces],
+            run_ids.index(reference_id),
+            overlay_request.t_start,
+            overlay_request.t_end,
+            overlay_request.grid_points,
+            overlay_request.align,
+            overlay_request.segment_min,
+            overlay_request.max_shift_min,
+            overlay_request.max_points
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    overlay["reference_run_id"] = reference_id
+    for run_id, run in zip(run_ids, overlay["runs"]):
+        run.update(run_id=run_id, sample_name=db_runs[run_id].sample_name)
+    logger.info(f"Overlaid {len(run_ids)} runs on a {overlay['grid_points']}-point grid")
+
+    if accepts_trace_frame(request):
+        return trace_frame_response(request, overlay)
+    overlay["runs"] = [_as_lists(run) for run in overlay["runs"]]
+    return RunOverlay(**_as_lists(overlay))
+
+
 @router.get("/{run_id}", response_model=RunRecord)
-async def get_run(run_id: int, db: Session = Depends(get_db)):
-    """Get a specific run record"""
+async def get_run(
+    run_id: int,
+    request: Request,
+    max_points: Optional[int] = Query(None, ge=MIN_RUN_POINTS, description="Decimate traces to at most this many points (LTTB)"),
+    t_start: Optional[float] = Query(None, description="Start of the returned time window (min)"),
+    t_end: Optional[float] = Query(None, description="End of the returned time window (min)"),
+    db: Session = Depends(get_db)
+):
+    """Get a specific run record (binary traces with Accept: application/vnd.intellilab.traces)"""
     try:
         logger.info(f"Retrieving run record: {run_id}")
         
-        db_run = db.query(SandboxRunModel).filter(SandboxRunModel.id == run_id).first()
+        db_run = db.query(SandboxRunModel).options(undefer_group("traces")).filter(
+            SandboxRunModel.id == run_id
+        ).first()
         if not db_run:
             raise HTTPException(status_code=404, detail="Run record not found")
         
+        traces = _run_traces(db_run, max_points, t_start, t_end)
+        if accepts_trace_frame(request):
+            return trace_frame_response(request, _run_payload(db_run, traces))
+        
         # Convert to RunRecord format
         run_record = RunRecord(
             id=db_run.id,
             instrument_id=db_run.instrument_id,
             method_id=db_run.method_id,
             sample_name=db_run.sample_name,
-            time=db_run.time,
-            signal=db_run.signal,
+            time=_trace_list(traces, "time"),
+            signal=_trace_list(traces, "signal"),
             peaks=db_run.peaks,
-            baseline=db_run.baseline,
+            baseline=_trace_list(traces, "baseline"),
             notes="",  # Notes not stored in SandboxRun model
             metadata=db_run.metrics
         )
@@ -100,16 +270,21 @@ async def get_run(run_id: int, db: Session = Depends(get_db)):
 
 @router.get("/", response_model=List[RunRecord])
 async def list_runs(
+    request: Request,
     method_id: Optional[int] = Query(None, description="Filter by method ID"),
     instrument_id: Optional[int] = Query(None, description="Filter by instrument ID"),
     limit: int = Query(50, ge=1, le=100, description="Maximum number of runs to return"),
+    max_points: Optional[int] = Query(None, ge=MIN_RUN_POINTS, description="Decimate traces to at most this many points (LTTB)"),
+    t_start: Optional[float] = Query(None, description="Start of the returned time window (min)"),
+    t_end: Optional[float] = Query(None, description="End of the returned time window (min)"),
     db: Session = Depends(get_db)
 ):
-    """List run records with optional filtering"""
+    """List run records with optional filtering (binary traces with Accept: application/vnd.intellilab.traces)"""
     try:
         logger.info(f"Listing runs with filters: method_id={method_id}, instrument_id={instrument_id}")
         
-        query = db.query(SandboxRunModel)
+        # Traces are deferred; load them with the rows instead of one query per run
+        query = db.query(SandboxRunModel).options(undefer_group("traces"))
         
         # Apply filters
         if method_id is not None:
@@ -121,18 +296,25 @@ async def list_runs(
         # Sort by created_date (newest first) and apply limit
         db_runs = query.order_by(SandboxRunModel.created_date.desc()).limit(limit).all()
         
+        if accepts_trace_frame(request):
+            logger.info(f"Returning {len(db_runs)} run records as binary traces")
+            return trace_frame_response(request, [
+                _run_payload(db_run, _run_traces(db_run, max_points, t_start, t_end)) for db_run in db_runs
+            ])
+        
         # Convert to RunRecord format
         runs = []
         for db_run in db_runs:
+            traces = _run_traces(db_run, max_points, t_start, t_end)
             run_record = RunRecord(
                 id=db_run.id,
                 instrument_id=db_run.instrument_id,
                 method_id=db_run.method_id,
                 sample_name=db_run.sample_name,
-                time=db_run.time,
-                signal=db_run.signal,
+                time=_trace_list(traces, "time"),
+                signal=_trace_list(traces, "signal"),
                 peaks=db_run.peaks,
-                baseline=db_run.baseline,
+                baseline=_trace_list(traces, "baseline"),
                 notes="",
                 metadata=db_run.metrics
             )
@@ -9,7 +9,7 @@ import logging
 
 from app.models.schemas import (
     SequenceTemplate, SequenceRun, SequenceItem, SequenceRunRequest,
-    SequenceTemplateListResponse, SequenceRunListResponse
+    SequenceTemplateListResponse, SequenceRunListResponse, SequenceJob
 )
 from app.services.sequence_service import sequence_service
 from app.services.audit_service import audit_service
@@ -144,25 +144,28 @@ async def delete_template(template_id: str, current_user: User = Depends(get_cur
 
 
 # Sequence run endpoints
+def _resolve_template(request: SequenceRunRequest) -> SequenceTemplate:
+    """Template referenced by or embedded in a run request"""
+    if request.template_id:
+        template = sequence_service.get_template(request.template_id)
+        if not template:
+            raise HTTPException(status_code=404, detail="Template not found")
+        return template
+    if request.template:
+        return request.template
+    raise HTTPException(status_code=400, detail="Must provide template_id or template")
+
+
 @router.post("/run", response_model=SequenceRun)
 async def run_sequence(request: SequenceRunRequest, current_user: User = Depends(get_current_user)):
     """Run a sequence using a template"""
     try:
         logger.info(f"Starting sequence run with instrument {request.instrument_id}")
         
-        # Get template
-        template = None
-        if request.template_id:
-            template = sequence_service.get_template(request.template_id)
-            if not template:
-                raise HTTPException(status_code=404, detail="Template not found")
-        elif request.template:
-            template = request.template
-        else:
-            raise HTTPException(status_code=400, detail="Must provide template_id or template")
-        
-        # Run the sequence
-        sequence_run = sequence_service.run_sequence(
+        template = _resolve_template(request)
+        
+        # Run the sequence (item generation runs in the worker pool)
+        sequence_run = await sequence_service.run_sequence_async(
             template=template,
             instrument_id=request.instrument_id,
             simulate=request.simulate
@@ -222,3 +225,60 @@ async def list_sequence_runs(
         logger.error(f"Failed to list sequence runs: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
+
+# Background sequence jobs
+@router.post("/jobs", response_model=SequenceJob, status_code=202)
+async def start_sequence_job(request: SequenceRunRequest, current_user: User = Depends(get_current_user)):
+    """Queue a sequence for background execution; progress is broadcast over WebSocket"""
+    try:
+        template = _resolve_template(request)
+        job = sequence_service.start_sequence_job(
+            template=template,
+            instrument_id=request.instrument_id,
+            simulate=request.simulate
+        )
+        try:
+            audit_service.log_action(
+                user=current_user.email,
+                action="sequence_job_started",
+                entity_type="sequence",
+                entity_id=job.sequence_run_id,
+                details={"job_id": job.id, "instrument_id": request.instrument_id, "simulate": request.simulate}
+            )
+        except Exception:
+            pass
+        
+        logger.info(f"Queued sequence job: {job.id}")
+        return job
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to start sequence job: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/jobs", response_model=List[SequenceJob])
+async def list_sequence_jobs(
+    limit: int = Query(50, ge=1, le=100, description="Maximum number of jobs to return")
+):
+    """List background sequence jobs"""
+    return sequence_service.list_jobs(limit)
+
+
+@router.get("/jobs/{job_id}", response_model=SequenceJob)
+async def get_sequence_job(job_id: str):
+    """Get a background sequence job by ID"""
+    job = sequence_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Sequence job not found")
+    return job
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_sequence_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Cancel a queued or running sequence job"""
+    try:
+        return {"ok": sequence_service.cancel_job(job_id)}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
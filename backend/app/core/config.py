@@ -97,6 +97,45 @@ class Settings(BaseModel):
     # Chromatogram Analysis
     PEAK_DETECTION_SENSITIVITY: float = 0.1
     BASELINE_CORRECTION: bool = True
+    BASELINE_METHOD: str = "asls"  # asls, airpls, rolling_min, polynomial
+    BASELINE_LAMBDA: float = 1e5  # Penalized baseline smoothness
+    BASELINE_ASYMMETRY: float = 0.001  # AsLS weight for points above the baseline
+    ANALYSIS_WORKERS: int = 0  # Analysis process pool size (0 = CPU count, -1 = threads only)
+    ANALYSIS_BATCH_MAX_TRACES: int = 500  # Maximum traces per batch analysis request
+
+    # Run trace storage (float32 halves blob size; time axis is always float64)
+    TRACE_STORAGE_DTYPE: str = "float64"
+
+    # GC sandbox result store (SQLite file shared by all workers)
+    SANDBOX_RESULT_STORE_PATH: Optional[str] = None  # Defaults to <data dir>/gc_sandbox_results.db
+    SANDBOX_RESULT_MEMORY_ITEMS: int = 32  # Results kept in each worker's LRU
+    SANDBOX_RESULT_TTL_SECONDS: int = 24 * 3600
+    SANDBOX_RESULT_MAX_DISK_MB: int = 1024
+
+    # Cache of deterministic (seeded or noise-free) simulation results
+    SIMULATION_CACHE_ENTRIES: int = 128
+    SIMULATION_CACHE_MAX_MB: int = 256
+
+    # Background sequence execution
+    SEQUENCE_MAX_CONCURRENT_JOBS: int = 4  # Sequences executing at once; others queue
+    SEQUENCE_ITEM_LOOKAHEAD: int = 4  # Items generated ahead of the in-order QC/quant step
+    SEQUENCE_JOB_RETENTION: int = 200  # Finished sequence jobs kept for polling
+
+    # Bulk ingestion of instrument export directories
+    INGEST_ROOT: Optional[str] = None  # Directory the ingest API may read below (defaults to UPLOAD_DIR)
+    INGEST_BATCH_SIZE: int = 500  # Runs inserted per transaction
+    INGEST_JOB_RETENTION: int = 200  # Finished ingest jobs kept for polling
+
+    # Background OCR batch jobs
+    OCR_WORKERS: int = 0  # OCR pool size (0 = CPU count, -1 = threads)
+    OCR_MAX_BATCH_SIZE: int = 500  # Images per batch upload
+    OCR_MAX_PENDING_IMAGES: int = 5000  # Unprocessed images across all jobs before new batches are refused
+    OCR_JOB_RETENTION: int = 200  # Finished jobs (with their results) kept for polling
+
+    # Content-hash cache of preprocessed images and OCR text (0 MB disables a tier)
+    OCR_CACHE_DIR: Optional[str] = None  # Defaults to <data dir>/ocr_cache
+    OCR_CACHE_IMAGE_MAX_MB: int = 2048
+    OCR_CACHE_TEXT_MAX_MB: int = 256
     
     class Config:
         env_file = ".env"
@@ -5,9 +5,9 @@ Database configuration for IntelliLab GC API
 
 import os
 from typing import Generator
-from sqlalchemy import create_engine, event, text, Column, Integer, String, Float, DateTime, Text, JSON, Boolean
+from sqlalchemy import create_engine, event, text, Column, Integer, String, Float, DateTime, Text, JSON, Boolean, LargeBinary, Index, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import sessionmaker, Session, deferred
 from sqlalchemy.pool import QueuePool
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -183,12 +183,103 @@ class SandboxRun(Base):
     sample_name = Column(String(255))
     compound_ids = Column(JSON)  # list[int]
     fault_params = Column(JSON)
-    time = Column(JSON)  # list[float]
-    signal = Column(JSON)  # list[float]
+    # Legacy JSON traces (list[float]); kept readable until migrated to trace_blob
+    time_json = deferred(Column("time", JSON(none_as_null=True)), group="traces")
+    signal_json = deferred(Column("signal", JSON(none_as_null=True)), group="traces")
+    baseline_json = deferred(Column("baseline", JSON(none_as_null=True)), group="traces")
+    trace_blob = deferred(Column(LargeBinary), group="traces")  # compressed time/signal/baseline arrays
+    trace_points = Column(Integer, default=0)
     peaks = Column(JSON)  # serialized peaks
-    baseline = Column(JSON)
     metrics = Column(JSON)
-    created_date = Column(DateTime, default=func.now())
+    # Summary fields computed on write so listings and filters stay in SQL
+    peak_count = Column(Integer, default=0, index=True)
+    max_signal = Column(Float, index=True)
+    run_time = Column(Float, index=True)
+    noise = Column(Float)
+    # Idempotency key of bulk-ingested exports; NULL for runs created any other way
+    source_key = Column(String(64), unique=True, index=True)
+    created_date = Column(DateTime, default=func.now(), index=True)
+
+    @property
+    def time(self) -> Optional[list]:
+        return self._get_trace("time")
+
+    @time.setter
+    def time(self, values):
+        self._set_trace("time", values)
+
+    @property
+    def signal(self) -> Optional[list]:
+        return self._get_trace("signal")
+
+    @signal.setter
+    def signal(self, values):
+        self._set_trace("signal", values)
+
+    @property
+    def baseline(self) -> Optional[list]:
+        return self._get_trace("baseline")
+
+    @baseline.setter
+    def baseline(self, values):
+        self._set_trace("baseline", values)
+
+    def get_trace_arrays(self) -> dict:
+        """Decoded traces as float64 NumPy arrays, keyed by field name."""
+        from app.core.trace_store import decode_traces
+
+        blob = self.trace_blob
+        if blob is None:
+            import numpy as np
+            legacy = {
+                "time": self.time_json,
+                "signal": self.signal_json,
+                "baseline": self.baseline_json,
+            }
+            return {
+                field: np.asarray(values, dtype=np.float64)
+                for field, values in legacy.items()
+                if values is not None
+            }
+
+        # Decoding is cached per blob so repeated property access stays cheap
+        cached = getattr(self, "_trace_cache", None)
+        if cached is None or cached[0] is not blob:
+            cached = (blob, decode_traces(blob))
+            self._trace_cache = cached
+        return cached[1]
+
+    def get_trace_pyramid(self) -> list:
+        """Display pyramid levels of the signal (empty for legacy JSON traces)."""
+        from app.core.trace_store import decode_pyramid
+        return decode_pyramid(self.trace_blob)
+
+    def _get_trace(self, field: str) -> Optional[list]:
+        values = self.get_trace_arrays().get(field)
+        return values.tolist() if values is not None else None
+
+    def _set_trace(self, field: str, values) -> None:
+        from app.core.trace_store import encode_traces, summarize_traces, trace_length
+
+        traces = dict(self.get_trace_arrays())
+        traces[field] = values
+        self.trace_blob = encode_traces(traces, dtype=settings.TRACE_STORAGE_DTYPE)
+        self.trace_points = trace_length(traces)
+        self.time_json = None
+        self.signal_json = None
+        self.baseline_json = None
+
+        summary = summarize_traces(traces)
+        self.max_signal = summary["max_signal"]
+        self.run_time = summary["run_time"]
+        self.noise = summary["noise"]
+
+
+@event.listens_for(SandboxRun, "before_insert")
+@event.listens_for(SandboxRun, "before_update")
+def _update_run_peak_count(mapper, connection, target):
+    """Keep the persisted peak count in step with the peaks JSON."""
+    target.peak_count = len(target.peaks) if target.peaks else 0
 
 
 class SimulationProfile(Base):
@@ -363,6 +454,97 @@ class Report(Base):
     completed_date = Column(DateTime)
 
 
+class CalibrationModelRecord(Base):
+    """Fitted calibration models (full model kept as JSON payload)"""
+    __tablename__ = "calibration_models"
+    
+    id = Column(String(64), primary_key=True)
+    version_id = Column(String(64), index=True)
+    method_id = Column(Integer, nullable=False)
+    instrument_id = Column(Integer)
+    target_name = Column(String(100), nullable=False)
+    active = Column(Boolean, default=False, index=True)
+    created_at = Column(DateTime, default=func.now(), index=True)
+    payload = Column(JSON, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_calibration_models_lookup", "method_id", "instrument_id", "target_name", "created_at"),
+    )
+
+
+class CalibrationVersionRecord(Base):
+    """Immutable calibration versions"""
+    __tablename__ = "calibration_versions"
+    
+    id = Column(String(64), primary_key=True)
+    calibration_id = Column(String(64), index=True)
+    method_id = Column(Integer, nullable=False)
+    instrument_id = Column(Integer)
+    target_name = Column(String(100), nullable=False)
+    created_at = Column(DateTime, default=func.now(), index=True)
+    payload = Column(JSON, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_calibration_versions_lookup", "method_id", "instrument_id", "target_name", "created_at"),
+    )
+
+
+class CalibrationBlankRunRecord(Base):
+    """Recent blank runs used for LOD/LOQ estimation"""
+    __tablename__ = "calibration_blank_runs"
+    
+    id = Column(String(64), primary_key=True)
+    created_at = Column(DateTime, default=func.now(), index=True)
+    payload = Column(JSON, nullable=False)
+
+
+class QCTargetRecord(Base):
+    """QC targets (assigned mean/SD per method, instrument and analyte)"""
+    __tablename__ = "qc_targets"
+    
+    id = Column(String(64), primary_key=True)
+    method_id = Column(String(64), nullable=False)
+    instrument_id = Column(String(64))
+    analyte = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_qc_targets_lookup", "method_id", "instrument_id", "analyte"),
+        Index("ix_qc_targets_analyte", "analyte", "method_id"),
+    )
+
+
+class QCRecordRecord(Base):
+    """QC evaluation records, one per QC injection"""
+    __tablename__ = "qc_records"
+    
+    id = Column(String(64), primary_key=True)
+    run_id = Column(String(64), index=True)
+    timestamp = Column(DateTime, nullable=False, index=True)
+    overall_status = Column(String(20), index=True)
+    payload = Column(JSON, nullable=False)
+
+
+class QCResultRecord(Base):
+    """Per-analyte QC values, denormalized for indexed series queries"""
+    __tablename__ = "qc_results"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    record_id = Column(String(64), ForeignKey("qc_records.id", ondelete="CASCADE"), nullable=False, index=True)
+    method_id = Column(String(64))
+    instrument_id = Column(String(64))
+    analyte = Column(String(100), nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    value = Column(Float, nullable=False)
+    zscore = Column(Float)
+    status = Column(String(20))
+    
+    __table_args__ = (
+        Index("ix_qc_results_series", "method_id", "instrument_id", "analyte", "timestamp"),
+        Index("ix_qc_results_method_analyte", "method_id", "analyte", "timestamp"),
+    )
+
+
 # Database utilities
 def init_db():
     """
@@ -371,6 +553,8 @@ def init_db():
     """
     try:
         Base.metadata.create_all(bind=engine)
+        from app.core.trace_store import ensure_trace_columns
+        ensure_trace_columns(engine)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Failed to create database tables: {e}")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Display decimation for chromatogram traces.
+
+Traces are reduced with Largest-Triangle-Three-Buckets (LTTB), which keeps
+the visual shape (peak apexes, valleys) at a fixed number of points. To
+keep that cheap for long traces, each stored trace also carries a
+multi-resolution pyramid of min/max-preselected sample indices: level k
+keeps the minimum and maximum of every 2 * 4**k samples. A request for
+`max_points` in a time window runs LTTB over the coarsest level that
+still has LTTB_PRESELECT * max_points samples inside the window
+(MinMaxLTTB), or over the raw window when no level is dense enough.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+PYRAMID_FACTOR = 4
+PYRAMID_MIN_POINTS = 512  # Coarsest level kept in the pyramid
+LTTB_PRESELECT = 4  # Samples per output point that LTTB chooses from
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], n_out: int) -> np.ndarray:
+    """
+    Indices of the n_out points LTTB keeps (always the first and last).
+    Returns every index when the input is already small enough.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    n_out = max(n_out, 3)
+
+    # Interior points split into n_out - 2 buckets; each bucket's triangle
+    # uses the previous pick and the mean of the next bucket
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    next_x = np.append(mean_x[1:], x[-1]).tolist()
+    next_y = np.append(mean_y[1:], y[-1]).tolist()
+
+    # The selection is sequential; scalar Python beats per-bucket NumPy calls here
+    xs, ys, bounds = x.tolist(), y.tolist(), edges.tolist()
+    picked = [0]
+    a = 0
+    for bucket in range(n_out - 2):
+        ax, ay = xs[a], ys[a]
+        dx, dy = next_x[bucket] - ax, next_y[bucket] - ay
+        best = -1.0
+        for j in range(bounds[bucket], bounds[bucket + 1]):
+            area = abs(dx * (ys[j] - ay) - dy * (xs[j] - ax))
+            if area > best:
+                best, a = area, j
+        picked.append(a)
+    picked.append(n - 1)
+    return np.asarray(picked, dtype=np.intp)
+
+
+def minmax_indices(y: np.ndarray, bucket_size: int) -> np.ndarray:
+    """Sorted indices of each bucket's minimum and maximum, plus both end points."""
+    n = len(y)
+    if bucket_size < 2 or n <= 2 * bucket_size:
+        return np.arange(n)
+
+    full = n // bucket_size * bucket_size
+    buckets = y[:full].reshape(-1, bucket_size)
+    offsets = np.arange(0, full, bucket_size)
+    picks = [offsets + buckets.argmin(axis=1), offsets + buckets.argmax(axis=1), [0, n - 1]]
+    if full < n:
+        tail = y[full:]
+        picks.append([full + int(tail.argmin()), full + int(tail.argmax())])
+    return np.unique(np.concatenate(picks)).astype(np.intp)
+
+
+def build_pyramid(y: Sequence[float]) -> List[np.ndarray]:
+    """Min/max index levels, finest first, each about PYRAMID_FACTOR times smaller."""
+    y = np.asarray(y, dtype=np.float64)
+    levels = []
+    bucket_size = 2 * PYRAMID_FACTOR
+    while len(y) // bucket_size * 2 >= PYRAMID_MIN_POINTS:
+        levels.append(minmax_indices(y, bucket_size).astype(np.int32))
+        bucket_size *= PYRAMID_FACTOR
+    return levels
+
+
+def window_bounds(time: np.ndarray, t_start: Optional[float] = None, t_end: Optional[float] = None,
+                  min_points: int = 0) -> Tuple[int, int]:
+    """Sample range [lo, hi) covering the time window, widened to min_points if needed."""
+    n = len(time)
+    lo = 0 if t_start is None else int(np.searchsorted(time, t_start, side="left"))
+    hi = n if t_end is None else int(np.searchsorted(time, t_end, side="right"))
+    hi = max(hi, lo)
+    if hi - lo < min_points:
+        lo = max(0, min(lo - (min_points - (hi - lo)) // 2, n - min_points))
+        hi = min(n, lo + min_points)
+    return lo, hi
+
+
+def decimate_traces(
+    traces: Dict[str, Optional[np.ndarray]],
+    max_points: Optional[int] = None,
+    t_start: Optional[float] = None,
+    t_end: Optional[float] = None,
+    pyramid: Optional[List[np.ndarray]] = None,
+    time_key: str = "time",
+    value_key: str = "signal",
+    min_points: int = 0
+) -> Dict[str, Optional[np.ndarray]]:
+    """
+    Cut traces to a time window and reduce them to at most max_points samples.
+    LTTB runs on `value_key`; every other trace of the same length is sampled
+    at the chosen indices so overlays (e.g. the baseline) stay aligned.
+    """
+    time = np.asarray(traces[time_key], dtype=np.float64)
+    lo, hi = window_bounds(time, t_start, t_end, min_points)
+
+    if max_points is None or hi - lo <= max_points:
+        indices = slice(lo, hi)
+    else:
+        candidates = None
+        for level in reversed(pyramid or []):
+            left, right = np.searchsorted(level, [lo, hi])
+            if right - left >= LTTB_PRESELECT * max_points:
+                candidates = np.unique(np.concatenate(([lo], level[left:right], [hi - 1]))).astype(np.intp)
+                break
+        if candidates is None:
+            candidates = np.arange(lo, hi)
+        values = np.asarray(traces[value_key], dtype=np.float64)
+        indices = candidates[lttb_indices(time[candidates], values[candidates], max(max_points, min_points))]
+
+    return {
+        key: np.asarray(trace)[indices] if trace is not None and len(trace) == len(time) else trace
+        for key, trace in traces.items()
+    }
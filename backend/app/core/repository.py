@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Persistent, dict-like repositories for Pydantic models.
+
+Each repository stores the full model as a JSON payload next to a few
+indexed lookup columns, so services keep their familiar mapping interface
+(`repo[id]`, `id in repo`, `repo.values()`) while lookups by method,
+instrument, analyte or time become indexed queries. Reads go through an
+in-process cache that every write through the repository invalidates; a
+short TTL bounds staleness when another worker writes to the same database.
+Callers always receive copies, so editing a returned model in place never
+changes the cache before the edit is saved.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generic, Iterator, List, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class ModelRepository(MutableMapping, Generic[ModelT]):
+    """Write-through mapping of id -> model backed by one SQLAlchemy table"""
+
+    # Extra tables written by _write/_delete overrides (created on first use)
+    child_tables: Tuple = ()
+
+    def __init__(
+        self,
+        row_cls,
+        model_cls: Type[ModelT],
+        columns: Callable[[ModelT], Dict[str, Any]],
+        session_factory: Optional[Callable[[], Session]] = None,
+        cache_ttl: float = 30.0
+    ):
+        self.row_cls = row_cls
+        self.model_cls = model_cls
+        self.columns = columns
+        self.cache_ttl = cache_ttl
+        self._session_factory = session_factory
+
+        self._lock = threading.RLock()
+        self._table_ready = False
+        self._items: Dict[str, ModelT] = {}
+        self._queries: Dict[Tuple, List[Tuple[str, ModelT]]] = {}
+        self._cache_time = time.monotonic()
+
+    # Sessions and cache
+
+    @contextmanager
+    def _session(self):
+        if self._session_factory is None:
+            from app.core.database import SessionLocal
+            self._session_factory = SessionLocal
+        db = self._session_factory()
+        try:
+            if not self._table_ready:
+                for table in (self.row_cls.__table__, *self.child_tables):
+                    table.create(bind=db.get_bind(), checkfirst=True)
+                self._table_ready = True
+            yield db
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _check_ttl(self) -> None:
+        if time.monotonic() - self._cache_time > self.cache_ttl:
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drop every cached model and query result"""
+        with self._lock:
+            self._items.clear()
+            self._queries.clear()
+            self._cache_time = time.monotonic()
+
+    def _to_model(self, row) -> ModelT:
+        return self.model_cls.model_validate(row.payload)
+
+    def _coerce(self, value: Any) -> ModelT:
+        return value if isinstance(value, self.model_cls) else self.model_cls.model_validate(value)
+
+    @staticmethod
+    def _copy(model: ModelT) -> ModelT:
+        return model.model_copy(deep=True)
+
+    # Writes (_write/_delete are hooks for tables with child rows)
+
+    def _write(self, db: Session, key: str, model: ModelT, **context: Any) -> None:
+        db.merge(self.row_cls(id=key, payload=model.model_dump(mode="json"), **self.columns(model)))
+
+    def _delete(self, db: Session, keys: Optional[List[str]]) -> int:
+        """Delete the given rows (all rows when keys is None); returns the count"""
+        query = db.query(self.row_cls)
+        if keys is not None:
+            query = query.filter(self.row_cls.id.in_(keys))
+        return query.delete(synchronize_session=False)
+
+    def save(self, key: str, value: Any, **context: Any) -> ModelT:
+        """Insert or replace a model and invalidate cached queries"""
+        model = self._coerce(value)
+        with self._session() as db:
+            self._write(db, key, model, **context)
+            db.commit()
+        with self._lock:
+            self._queries.clear()
+            self._items[key] = self._copy(model)
+        return model
+
+    def save_many(self, items: Dict[str, Any], **context: Any) -> List[ModelT]:
+        """Insert or replace several models in one transaction"""
+        models = {key: self._coerce(value) for key, value in items.items()}
+        with self._session() as db:
+            for key, model in models.items():
+                self._write(db, key, model, **context)
+            db.commit()
+        with self._lock:
+            self._queries.clear()
+            self._items.update({key: self._copy(model) for key, model in models.items()})
+        return list(models.values())
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.save(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        self.delete_many([key], missing_ok=False)
+
+    def delete_many(self, keys: List[str], missing_ok: bool = True) -> int:
+        """Delete several models in one transaction"""
+        with self._session() as db:
+            deleted = self._delete(db, list(keys))
+            if not deleted and not missing_ok:
+                raise KeyError(keys[0])
+            db.commit()
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+            self._queries.clear()
+        return deleted
+
+    def clear(self) -> None:
+        with self._session() as db:
+            self._delete(db, None)
+            db.commit()
+        self.invalidate()
+
+    # Reads
+
+    def __getitem__(self, key: str) -> ModelT:
+        with self._lock:
+            self._check_ttl()
+            if key in self._items:
+                return self._copy(self._items[key])
+        with self._session() as db:
+            row = db.get(self.row_cls, key)
+            if row is None:
+                raise KeyError(key)
+            model = self._to_model(row)
+        with self._lock:
+            self._items[key] = self._copy(model)
+        return model
+
+    def __iter__(self) -> Iterator[str]:
+        with self._session() as db:
+            keys = [key for (key,) in db.query(self.row_cls.id)]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def count(self, **filters: Any) -> int:
+        """Row count, optionally filtered on indexed columns, e.g. count(active=True)"""
+        with self._session() as db:
+            return db.query(self.row_cls).filter_by(**filters).count()
+
+    def values(self) -> List[ModelT]:
+        return self.find()
+
+    def items(self) -> List[Tuple[str, ModelT]]:
+        return self.find_items()
+
+    def find(
+        self,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        **filters: Any
+    ) -> List[ModelT]:
+        """
+        Equality lookup on indexed columns, e.g. find(method_id=1, active=True).
+        Results are cached until the next write through this repository.
+        """
+        return [model for _, model in self.find_items(order_by, descending, limit, **filters)]
+
+    def find_items(
+        self,
+        order_by: Optional[str] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        **filters: Any
+    ) -> List[Tuple[str, ModelT]]:
+        """Same as find() but returns (id, model) pairs"""
+        cache_key = (tuple(sorted(filters.items())), order_by, descending, limit)
+        with self._lock:
+            self._check_ttl()
+            if cache_key in self._queries:
+                return [(key, self._copy(model)) for key, model in self._queries[cache_key]]
+
+        with self._session() as db:
+            query = db.query(self.row_cls).filter_by(**filters)
+            if order_by:
+                column = getattr(self.row_cls, order_by)
+                query = query.order_by(column.desc() if descending else column)
+            if limit is not None:
+                query = query.limit(limit)
+            pairs = [(row.id, self._to_model(row)) for row in query]
+
+        with self._lock:
+            self._queries[cache_key] = [(key, self._copy(model)) for key, model in pairs]
+        return pairs
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Response encoding for trace-heavy endpoints.
+
+JSON responses are rendered with orjson when it is installed. Endpoints that
+return chromatogram traces also negotiate a compact binary frame: a client
+sending ``Accept: application/vnd.intellilab.traces`` receives the non-trace
+fields as JSON plus every trace as a raw little-endian array, which browsers
+can wrap in Float64Array/Float32Array views without parsing. Time axes stay
+float64; intensities are sent as float32. With ``Accept-Encoding: zstd`` and
+the optional zstandard package the frame is also zstd-compressed.
+
+Frame layout (integers little-endian):
+
+    b"GCTF" | u8 version | 3 reserved bytes | u32 header length
+    header  UTF-8 JSON {"meta": ..., "arrays": [{"dtype", "offset", "length"}]}
+    zero padding to an 8-byte boundary
+    data    arrays back to back, each starting on an 8-byte boundary;
+            offsets are relative to the start of the data section
+
+Each trace inside "meta" is replaced by {"$trace": <index into arrays>}.
+"""
+
+import json
+import struct
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TRACE_MEDIA_TYPE = "application/vnd.intellilab.traces"
+TRACE_FRAME_MAGIC = b"GCTF"
+TRACE_FRAME_VERSION = 1
+
+# Keys holding traces (including run overlay envelopes); time axes keep full precision
+TRACE_KEYS = frozenset({
+    "time", "signal", "baseline", "time_min", "intensity",
+    "mean", "sd", "lower", "upper", "difference"
+})
+TIME_KEYS = frozenset({"time", "time_min"})
+
+_PREAMBLE = struct.Struct("<4sB3xI")
+
+
+if orjson is not None:
+    class FastJSONResponse(JSONResponse):
+        """JSONResponse rendered with orjson (NumPy arrays and non-string keys allowed)"""
+
+        def render(self, content: Any) -> bytes:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+    DefaultJSONResponse = FastJSONResponse
+else:
+    DefaultJSONResponse = JSONResponse
+
+
+def accepts_trace_frame(request: Request) -> bool:
+    """Whether the client asked for the binary trace format"""
+    return TRACE_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _is_trace(value: Any) -> bool:
+    if isinstance(value, np.ndarray):
+        return value.ndim == 1
+    return isinstance(value, list) and bool(value) and isinstance(value[0], (int, float))
+
+
+def _extract_traces(content: Any, arrays: List[np.ndarray]) -> Any:
+    """Copy of content with traces moved into `arrays` and replaced by references"""
+    if isinstance(content, BaseModel):
+        content = content.model_dump()
+    if isinstance(content, dict):
+        meta = {}
+        for key, value in content.items():
+            if key in TRACE_KEYS and _is_trace(value):
+                dtype = "<f8" if key in TIME_KEYS else "<f4"
+                meta[key] = {"$trace": len(arrays)}
+                arrays.append(np.ascontiguousarray(value, dtype=dtype))
+            else:
+                meta[key] = _extract_traces(value, arrays)
+        return meta
+    if isinstance(content, (list, tuple)):
+        return [_extract_traces(item, arrays) for item in content]
+    return content
+
+
+def encode_trace_frame(content: Any) -> bytes:
+    """Encode a model, dict or list of them as a binary trace frame"""
+    arrays: List[np.ndarray] = []
+    meta = _extract_traces(content, arrays)
+
+    layout: List[Dict[str, Any]] = []
+    offset = 0
+    for array in arrays:
+        layout.append({"dtype": array.dtype.str, "offset": offset, "length": len(array)})
+        offset += -(-array.nbytes // 8) * 8
+    header = json.dumps({"meta": meta, "arrays": layout}, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+    start = -(-(_PREAMBLE.size + len(header)) // 8) * 8
+    frame = bytearray(start + offset)
+    frame[:_PREAMBLE.size] = _PREAMBLE.pack(TRACE_FRAME_MAGIC, TRACE_FRAME_VERSION, len(header))
+    frame[_PREAMBLE.size:_PREAMBLE.size + len(header)] = header
+    for array, entry in zip(arrays, layout):
+        position = start + entry["offset"]
+        frame[position:position + array.nbytes] = memoryview(array).cast("B")
+    return bytes(frame)
+
+
+def decode_trace_frame(frame: bytes) -> Any:
+    """Inverse of encode_trace_frame; traces come back as NumPy arrays"""
+    magic, version, header_length = _PREAMBLE.unpack_from(frame)
+    if magic != TRACE_FRAME_MAGIC or version != TRACE_FRAME_VERSION:
+        raise ValueError("Not a trace frame")
+    header = json.loads(frame[_PREAMBLE.size:_PREAMBLE.size + header_length])
+    start = -(-(_PREAMBLE.size + header_length) // 8) * 8
+    arrays = [
+        np.frombuffer(frame, dtype=entry["dtype"], count=entry["length"], offset=start + entry["offset"])
+        for entry in header["arrays"]
+    ]
+
+    def restore(value):
+        if isinstance(value, dict):
+            if set(value) == {"$trace"}:
+                return arrays[value["$trace"]]
+            return {key: restore(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [restore(item) for item in value]
+        return value
+
+    return restore(header["meta"])
+
+
+def trace_frame_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """Binary trace frame response, zstd-compressed when the client accepts it"""
+    body = encode_trace_frame(content)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if zstandard is not None and "zstd" in request.headers.get("accept-encoding", ""):
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+        headers["Content-Encoding"] = "zstd"
+    return Response(content=body, status_code=status_code, media_type=TRACE_MEDIA_TYPE, headers=headers)
+
+
+def negotiate_traces(request: Request, content: Any) -> Any:
+    """
+    Return a binary trace frame if the client asked for one, else `content`
+    unchanged so the route's response_model serializes it as JSON.
+    """
+    if accepts_trace_frame(request):
+        return trace_frame_response(request, content)
+    return content
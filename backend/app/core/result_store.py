@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Two-tier store for simulation results.
+
+A small LRU of live model objects sits in front of a SQLite file that holds
+zlib-compressed JSON payloads. The SQLite tier is shared by every worker
+process on the host, so a follow-up request served by a different uvicorn
+worker still finds the result. Entries expire after a TTL and the disk tier
+is trimmed to a byte budget, oldest first.
+
+The disk row is authoritative: every memory hit is checked against the row's
+created_at, so results deleted, evicted or replaced by another worker are not
+served from a stale memory copy.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Generic, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_results_expires_at ON results (expires_at);
+CREATE INDEX IF NOT EXISTS ix_results_created_at ON results (created_at);
+"""
+
+
+class ResultStore(Generic[ModelT]):
+    """LRU memory tier over a SQLite disk tier, keyed by run id"""
+
+    def __init__(
+        self,
+        model_cls: Type[ModelT],
+        path: str,
+        max_memory_items: int = 32,
+        ttl_seconds: float = 24 * 3600,
+        max_disk_bytes: Optional[int] = None
+    ):
+        self.model_cls = model_cls
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+
+        # key -> (created_at, expires_at, size_bytes, value); created_at versions the disk row
+        self._memory: "OrderedDict[str, Tuple[float, float, int, ModelT]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection and commit on success"""
+        if not self._initialized:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                self._initialized = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _remember(
+        self, key: str, created_at: float, expires_at: float, size: int, value: ModelT
+    ) -> None:
+        with self._lock:
+            self._memory[key] = (created_at, expires_at, size, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def put(self, key: str, value: ModelT) -> None:
+        """Store (or replace) a result in both tiers"""
+        payload = zlib.compress(value.model_dump_json().encode("utf-8"), 6)
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, created_at, expires_at, size_bytes, payload) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, now, expires_at, len(payload), payload)
+            )
+            self._evict(conn, now)
+            stored = conn.execute("SELECT 1 FROM results WHERE key = ?", (key,)).fetchone()
+
+        if stored is None:
+            # The entry alone exceeds the disk budget; keep no copy that other workers lack
+            self._forget(key)
+            return
+        self._remember(key, now, expires_at, len(payload), value)
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._memory.pop(key, None)
+
+    def get(self, key: str) -> Optional[ModelT]:
+        """Return a result, validating memory hits against the shared disk row"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._memory[key]
+                entry = None
+
+        with self._connect() as conn:
+            if entry is not None:
+                row = conn.execute(
+                    "SELECT created_at FROM results WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+                if row is not None and row[0] == entry[0]:
+                    with self._lock:
+                        if key in self._memory:
+                            self._memory.move_to_end(key)
+                    return entry[3]
+                if row is None:
+                    self._forget(key)
+                    return None
+
+            row = conn.execute(
+                "SELECT created_at, expires_at, size_bytes, payload FROM results "
+                "WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        if row is None:
+            self._forget(key)
+            return None
+
+        created_at, expires_at, size, payload = row
+        value = self.model_cls.model_validate_json(zlib.decompress(payload))
+        self._remember(key, created_at, expires_at, size, value)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def delete(self, key: str) -> bool:
+        """Remove a result from both tiers; returns False if it did not exist"""
+        self._forget(key)
+        with self._connect() as conn:
+            deleted = conn.execute(
+                "DELETE FROM results WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).rowcount
+        return deleted > 0
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop expired rows, then the oldest rows beyond the disk budget"""
+        conn.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+        if not self.max_disk_bytes:
+            return
+
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM results").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+
+        excess = total - self.max_disk_bytes
+        victims = []
+        for key, size in conn.execute("SELECT key, size_bytes FROM results ORDER BY created_at"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM results WHERE key = ?", victims)
+        logger.info(f"Result store evicted {len(victims)} entries over the disk budget")
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry counts and byte sizes for each tier"""
+        now = time.time()
+        with self._lock:
+            memory_entries = len(self._memory)
+            memory_bytes = sum(entry[2] for entry in self._memory.values())
+
+        with self._connect() as conn:
+            disk_entries, disk_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM results WHERE expires_at > ?",
+                (now,)
+            ).fetchone()
+
+        return {
+            "memory_entries": memory_entries,
+            "memory_capacity": self.max_memory_items,
+            "memory_compressed_bytes": memory_bytes,
+            "disk_entries": disk_entries,
+            "disk_bytes": disk_bytes,
+            "disk_budget_bytes": self.max_disk_bytes,
+            "ttl_seconds": self.ttl_seconds
+        }
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Streaming parsers for chromatogram exports (CSV and JCAMP-DX).
+
+Files are read line by line from a binary stream (an upload's spooled temp
+file, or BytesIO for base64 payloads) and parsed in blocks with NumPy's C
+parsers, so memory stays proportional to the resulting float64 arrays rather
+than to the decoded text plus Python float lists. JCAMP XYDATA in the
+compressed (X++(Y..Y)) form is decoded with full ASDF support (SQZ, DIF, DUP
+and the DIF Y-check).
+"""
+
+import io
+import itertools
+import re
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+CSV_BLOCK_LINES = 200_000
+
+JCAMP_FILE_TYPES = ("jcamp", "jdx", "dx")
+JCAMP_METADATA_LABELS = ("TITLE", "DATATYPE", "XUNITS", "YUNITS")
+
+_CSV_DELIMITERS = (",", "\t", ";")
+
+# ASDF pseudo-digits: value of the leading digit for each character class
+_SQZ = {"@": 0, **{c: i + 1 for i, c in enumerate("ABCDEFGHI")}, **{c: -(i + 1) for i, c in enumerate("abcdefghi")}}
+_DIF = {"%": 0, **{c: i + 1 for i, c in enumerate("JKLMNOPQR")}, **{c: -(i + 1) for i, c in enumerate("jklmnopqr")}}
+_DUP = {**{c: i + 1 for i, c in enumerate("STUVWXYZ")}, "s": 9}
+
+_SEPARATORS = re.compile(r"[,;]")
+_ASDF_TOKEN = re.compile(r"([@A-Ia-i%J-Rj-rS-Zs])(\d*\.?\d*)|([+-]?(?:\d+\.?\d*|\.\d+)(?:[Ee][+-]?\d+)?)")
+
+
+def text_lines(stream: BinaryIO, encoding: str = "utf-8") -> Iterator[str]:
+    """Iterate decoded lines of a binary stream without reading it whole."""
+    return io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline=None)
+
+
+def parse_trace_stream(stream: BinaryIO, file_type: str) -> Tuple[np.ndarray, np.ndarray, Dict[str, str]]:
+    """Parse a CSV or JCAMP-DX export; the header labels are empty for CSV."""
+    size_hint = _remaining_bytes(stream)
+    lines = text_lines(stream)
+    file_type = file_type.lower()
+    if file_type == "csv":
+        time_data, signal_data = parse_csv_stream(lines, size_hint=size_hint)
+        return time_data, signal_data, {}
+    if file_type in JCAMP_FILE_TYPES:
+        return parse_jcamp_stream(lines)
+    raise ValueError(f"Unsupported file type: {file_type}")
+
+
+def _is_numeric(value: str) -> bool:
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+class _GrowingBuffer:
+    """
+    float64 buffer that parsed blocks are appended to in place. Sized from a
+    capacity hint where one is known; otherwise it grows by half each time.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self.data = np.empty(max(capacity, 1))
+        self.count = 0
+
+    def reserve(self, capacity: int) -> None:
+        if capacity > len(self.data):
+            grown = np.empty(capacity)
+            grown[:self.count] = self.data[:self.count]
+            self.data = grown
+
+    def extend(self, values: np.ndarray) -> None:
+        needed = self.count + len(values)
+        if needed > len(self.data):
+            self.reserve(max(needed, len(self.data) * 3 // 2))
+        self.data[self.count:needed] = values
+        self.count = needed
+
+    def values(self) -> np.ndarray:
+        return self.data[:self.count]
+
+
+def _remaining_bytes(stream: BinaryIO) -> Optional[int]:
+    """Bytes left in a seekable stream, used to presize parse buffers"""
+    try:
+        position = stream.tell()
+        size = stream.seek(0, io.SEEK_END) - position
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def parse_csv_stream(lines: Iterable[str], block_lines: int = CSV_BLOCK_LINES,
+                     size_hint: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse two-column (time, signal) CSV into float64 arrays.
+
+    A header line, blank lines and malformed rows are skipped, as in the
+    original line-by-line parser. Comma, tab and semicolon delimiters are
+    detected from the first data row. With size_hint (the file size in bytes)
+    the output arrays are presized from the first block's line length, so
+    they are filled in place instead of being concatenated at the end.
+    """
+    lines = iter(lines)
+    delimiter = None
+    time_buffer, signal_buffer = _GrowingBuffer(), _GrowingBuffer()
+
+    while True:
+        block = list(itertools.islice(lines, block_lines))
+        if not block:
+            break
+        if delimiter is None:
+            first = next((line for line in block if line.strip()), None)
+            if first is None:
+                continue
+            delimiter = next((d for d in _CSV_DELIMITERS if d in first), ",")
+            if size_hint:
+                block_chars = max(sum(len(line) for line in block), 1)
+                estimate = int(size_hint * len(block) / block_chars * 1.05) + 1
+                time_buffer.reserve(estimate)
+                signal_buffer.reserve(estimate)
+        data = _parse_csv_block(block, delimiter)
+        time_buffer.extend(data[:, 0])
+        signal_buffer.extend(data[:, 1])
+
+    return time_buffer.values(), signal_buffer.values()
+
+
+def _parse_csv_block(block: List[str], delimiter: str) -> np.ndarray:
+    try:
+        return np.loadtxt(block, delimiter=delimiter, usecols=(0, 1), ndmin=2, dtype=np.float64)
+    except (ValueError, IndexError):
+        # Header or malformed rows: keep only lines whose first two fields are numbers
+        clean = [
+            line for line in block
+            if len(parts := line.split(delimiter)) >= 2 and _is_numeric(parts[0]) and _is_numeric(parts[1])
+        ]
+        if not clean:
+            return np.empty((0, 2))
+        return np.loadtxt(clean, delimiter=delimiter, usecols=(0, 1), ndmin=2, dtype=np.float64)
+
+
+def parse_jcamp_stream(lines: Iterable[str]) -> Tuple[np.ndarray, np.ndarray, Dict[str, str]]:
+    """
+    Parse a JCAMP-DX chromatogram into float64 arrays plus its header labels.
+
+    Supports ##XYDATA=(X++(Y..Y)) in AFFN or ASDF-compressed form and
+    ##XYDATA/##XYPOINTS=(XY..XY) pair lists.
+    """
+    header: Dict[str, str] = {}
+    lines = iter(lines)
+    data_form = None
+
+    for line in lines:
+        label, value = _jcamp_label(line)
+        if label is None:
+            continue
+        if label in ("XYDATA", "XYPOINTS", "PEAKTABLE"):
+            data_form = value.replace(" ", "").upper()
+            break
+        header[label] = value
+
+    if data_form is None:
+        return np.empty(0), np.empty(0), header
+
+    data_lines = itertools.takewhile(lambda line: not line.lstrip().startswith("##"), lines)
+    if "X++(Y..Y)" in data_form:
+        time_data, signal_data = _decode_xydata(data_lines, header)
+    else:
+        time_data, signal_data = _decode_xy_pairs(data_lines, header)
+    return time_data, signal_data, header
+
+
+def _jcamp_label(line: str) -> Tuple[str, str]:
+    line = line.strip()
+    if not line.startswith("##"):
+        return None, ""
+    label, _, value = line[2:].partition("=")
+    # Labels compare without spaces, dashes, slashes or underscores (JCAMP-DX 4.24 §4.3)
+    return re.sub(r"[\s\-/_]", "", label).upper(), value.split("$$")[0].strip()
+
+
+def _header_float(header: Dict[str, str], label: str, default: float = None) -> float:
+    try:
+        return float(header[label])
+    except (KeyError, ValueError):
+        return default
+
+
+def _decode_xy_pairs(lines: Iterable[str], header: Dict[str, str]) -> Tuple[np.ndarray, np.ndarray]:
+    buffer = _GrowingBuffer(2 * int(_header_float(header, "NPOINTS", 0) or 0) or 4096)
+    for block in iter(lambda: list(itertools.islice(lines, CSV_BLOCK_LINES)), []):
+        text = " ".join(line.split("$$")[0] for line in block)
+        buffer.extend(np.array(_SEPARATORS.sub(" ", text).split(), dtype=np.float64))
+    values = buffer.values()
+    values = values[: len(values) // 2 * 2].reshape(-1, 2)
+    x_factor = _header_float(header, "XFACTOR", 1.0)
+    y_factor = _header_float(header, "YFACTOR", 1.0)
+    return values[:, 0] * x_factor, values[:, 1] * y_factor
+
+
+def _decode_xydata(lines: Iterable[str], header: Dict[str, str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(X++(Y..Y)) decoding; Y values go straight into a growing float64 buffer."""
+    n_points = int(_header_float(header, "NPOINTS", 0) or 0)
+    buffer = _GrowingBuffer(n_points or 4096)
+    x_first = None
+    prev_was_dif = False
+
+    for line in lines:
+        line = line.split("$$")[0].strip()
+        if not line:
+            continue
+        tokens = _asdf_tokens(line)
+        if not tokens:
+            continue
+        if x_first is None:
+            x_first = tokens[0][1]
+        prev_value = buffer.data[buffer.count - 1] if buffer.count else None
+        values, ends_in_dif = _expand_asdf(tokens[1:], prev_value=prev_value)
+
+        # DIF Y-check: a line following DIF data repeats the previous line's last Y
+        if prev_was_dif and buffer.count and values:
+            values = values[1:]
+        prev_was_dif = ends_in_dif
+        buffer.extend(np.asarray(values, dtype=np.float64))
+
+    count = buffer.count
+    y = buffer.values() * _header_float(header, "YFACTOR", 1.0)
+    first_x = _header_float(header, "FIRSTX", (x_first or 0.0) * _header_float(header, "XFACTOR", 1.0))
+    last_x = _header_float(header, "LASTX")
+    if last_x is None or count < 2:
+        delta_x = _header_float(header, "DELTAX", 1.0)
+        return first_x + delta_x * np.arange(count), y
+    return np.linspace(first_x, last_x, count), y
+
+
+def _asdf_tokens(line: str) -> List[Tuple[str, float]]:
+    """Split one data line into (kind, value) tokens; kind is 'abs', 'dif' or 'dup'."""
+    tokens = []
+    for match in _ASDF_TOKEN.finditer(line):
+        pseudo, digits, plain = match.groups()
+        if plain is not None:
+            tokens.append(("abs", float(plain)))
+        elif pseudo in _SQZ:
+            tokens.append(("abs", _pseudo_value(_SQZ[pseudo], digits)))
+        elif pseudo in _DIF:
+            tokens.append(("dif", _pseudo_value(_DIF[pseudo], digits)))
+        else:
+            tokens.append(("dup", float(f"{_DUP[pseudo]}{digits}")))
+    return tokens
+
+
+def _pseudo_value(lead: int, digits: str) -> float:
+    magnitude = float(f"{abs(lead)}{digits}") if digits else float(abs(lead))
+    return -magnitude if lead < 0 else magnitude
+
+
+def _expand_asdf(tokens: List[Tuple[str, float]], prev_value: float = None) -> Tuple[List[float], bool]:
+    """Expand Y tokens to values; also reports whether the line ended in DIF form."""
+    values: List[float] = []
+    last_kind = "abs"
+    last_step = 0.0
+    for kind, value in tokens:
+        if kind == "abs":
+            values.append(value)
+            last_kind, last_step = "abs", value
+        elif kind == "dif":
+            base = values[-1] if values else (prev_value if prev_value is not None else 0.0)
+            values.append(base + value)
+            last_kind, last_step = "dif", value
+        elif values:
+            # DUP repeats the previous token (a value, or a difference) count - 1 more times
+            for _ in range(int(value) - 1):
+                values.append(values[-1] + last_step if last_kind == "dif" else values[-1])
+    return values, last_kind == "dif"
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Binary trace storage for chromatogram run records.
+
+Time, signal and baseline traces are packed into one compressed NumPy
+archive per run so that run listings never have to parse sample data.
+The archive also holds the signal's display pyramid (lod1, lod2, ...
+index arrays, see app.core.decimation) so decimated reads skip a full scan.
+"""
+
+import io
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import inspect, text
+
+from .decimation import build_pyramid
+
+logger = logging.getLogger(__name__)
+
+TRACE_FIELDS = ("time", "signal", "baseline")
+PYRAMID_PREFIX = "lod"
+
+# The time axis always keeps full precision; retention times are compared
+# against calibration windows and must not drift when round-tripped.
+TIME_DTYPE = np.float64
+SUPPORTED_DTYPES = ("float32", "float64")
+
+
+def encode_traces(
+    traces: Dict[str, Optional[Iterable[float]]],
+    dtype: str = "float64"
+) -> Optional[bytes]:
+    """
+    Pack trace arrays into a single compressed blob.
+    Fields that are None are omitted; returns None when nothing is stored.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported trace dtype: {dtype}")
+
+    arrays = {}
+    for field in TRACE_FIELDS:
+        values = traces.get(field)
+        if values is None:
+            continue
+        field_dtype = TIME_DTYPE if field == "time" else dtype
+        arrays[field] = np.ascontiguousarray(values, dtype=field_dtype)
+
+    if not arrays:
+        return None
+
+    if "signal" in arrays:
+        for level, indices in enumerate(build_pyramid(arrays["signal"]), start=1):
+            arrays[f"{PYRAMID_PREFIX}{level}"] = indices
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def decode_traces(blob: Optional[bytes]) -> Dict[str, np.ndarray]:
+    """Unpack a blob produced by encode_traces into float64 arrays."""
+    if not blob:
+        return {}
+
+    with np.load(io.BytesIO(blob), allow_pickle=False) as archive:
+        return {
+            field: archive[field].astype(np.float64, copy=False)
+            for field in TRACE_FIELDS
+            if field in archive.files
+        }
+
+
+def decode_pyramid(blob: Optional[bytes]) -> List[np.ndarray]:
+    """Display pyramid index levels stored with the traces, finest first (may be empty)."""
+    if not blob:
+        return []
+
+    with np.load(io.BytesIO(blob), allow_pickle=False) as archive:
+        names = sorted(
+            (name for name in archive.files if name.startswith(PYRAMID_PREFIX)),
+            key=lambda name: int(name[len(PYRAMID_PREFIX):])
+        )
+        return [archive[name] for name in names]
+
+
+def trace_length(traces: Dict[str, Optional[Sequence[float]]]) -> int:
+    """Number of samples in a trace set (length of the time axis)."""
+    values = traces.get("time")
+    return len(values) if values is not None else 0
+
+
+def summarize_traces(traces: Dict[str, Optional[Iterable[float]]]) -> Dict[str, Optional[float]]:
+    """
+    Summary statistics persisted alongside a run.
+    Noise is a robust SD estimate from the first difference of the
+    baseline-corrected signal (of the raw signal when no matching baseline
+    is stored): the scaled MAD ignores the few points on peak flanks.
+    """
+    time = traces.get("time")
+    signal = traces.get("signal")
+    baseline = traces.get("baseline")
+
+    summary = {"max_signal": None, "run_time": None, "noise": None}
+
+    if time is not None and len(time):
+        summary["run_time"] = float(np.max(np.asarray(time, dtype=np.float64)))
+
+    if signal is None or not len(signal):
+        return summary
+
+    signal = np.asarray(signal, dtype=np.float64)
+    summary["max_signal"] = float(np.max(signal))
+
+    residual = signal
+    if baseline is not None and len(baseline) == len(signal):
+        residual = signal - np.asarray(baseline, dtype=np.float64)
+
+    steps = np.diff(residual)
+    if steps.size:
+        # Differencing doubles the noise variance, hence the sqrt(2)
+        mad = np.median(np.abs(steps - np.median(steps)))
+        summary["noise"] = float(1.4826 * mad / np.sqrt(2))
+
+    return summary
+
+
+def ensure_trace_columns(engine) -> None:
+    """
+    Add the binary trace, run summary and ingestion key columns to an
+    existing sandbox_runs table. create_all() never alters existing tables,
+    so older databases need these columns (and their indexes) added in place.
+    """
+    inspector = inspect(engine)
+    if "sandbox_runs" not in inspector.get_table_names():
+        return
+
+    existing = {column["name"] for column in inspector.get_columns("sandbox_runs")}
+    blob_type = "BYTEA" if engine.dialect.name == "postgresql" else "BLOB"
+    float_type = "DOUBLE PRECISION" if engine.dialect.name == "postgresql" else "FLOAT"
+    missing = [
+        (name, definition)
+        for name, definition in (
+            ("trace_blob", blob_type),
+            ("trace_points", "INTEGER DEFAULT 0"),
+            ("peak_count", "INTEGER"),
+            ("max_signal", float_type),
+            ("run_time", float_type),
+            ("noise", float_type),
+            ("source_key", "VARCHAR(64)"),
+        )
+        if name not in existing
+    ]
+
+    with engine.begin() as conn:
+        for name, definition in missing:
+            conn.execute(text(f"ALTER TABLE sandbox_runs ADD COLUMN {name} {definition}"))
+            logger.info(f"Added column {name} to sandbox_runs")
+
+        for column in ("peak_count", "max_signal", "run_time", "created_date"):
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_sandbox_runs_{column} ON sandbox_runs ({column})"
+            ))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_sandbox_runs_source_key ON sandbox_runs (source_key)"
+        ))
+
+
+def migrate_json_traces(
+    engine,
+    batch_size: int = 500,
+    dtype: str = "float64",
+    keep_json: bool = False
+) -> int:
+    """
+    Convert legacy JSON trace columns into binary trace blobs.
+    Rows are processed in id order in batches; returns the number of runs converted.
+    """
+    import json
+
+    ensure_trace_columns(engine)
+
+    converted = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, time, signal, baseline FROM sandbox_runs "
+                    "WHERE trace_blob IS NULL AND time IS NOT NULL AND id > :last_id "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size}
+            ).fetchall()
+
+            if not rows:
+                break
+
+            for row in rows:
+                traces = {
+                    field: json.loads(value) if isinstance(value, str) else value
+                    for field, value in zip(TRACE_FIELDS, row[1:])
+                }
+                params = {
+                    "id": row[0],
+                    "blob": encode_traces(traces, dtype=dtype),
+                    "points": trace_length(traces),
+                    **summarize_traces(traces),
+                }
+                clear_json = "" if keep_json else ", time = NULL, signal = NULL, baseline = NULL"
+                conn.execute(
+                    text(
+                        "UPDATE sandbox_runs SET trace_blob = :blob, trace_points = :points, "
+                        "max_signal = :max_signal, run_time = :run_time, noise = :noise"
+                        f"{clear_json} WHERE id = :id"
+                    ),
+                    params
+                )
+                converted += 1
+
+            last_id = rows[-1][0]
+            logger.info(f"Converted {converted} run traces to binary storage")
+
+    return converted
+
+
+def backfill_run_summaries(engine, batch_size: int = 500) -> int:
+    """
+    Compute peak counts and trace summaries for runs stored before summary
+    columns existed. Returns the number of runs updated.
+    """
+    import json
+
+    ensure_trace_columns(engine)
+
+    updated = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, peaks, trace_blob, time, signal, baseline FROM sandbox_runs "
+                    "WHERE (peak_count IS NULL OR max_signal IS NULL) AND id > :last_id "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size}
+            ).fetchall()
+
+            if not rows:
+                break
+
+            for row in rows:
+                peaks = json.loads(row[1]) if isinstance(row[1], str) else row[1]
+                if row[2] is not None:
+                    traces = decode_traces(row[2])
+                else:
+                    traces = {
+                        field: json.loads(value) if isinstance(value, str) else value
+                        for field, value in zip(TRACE_FIELDS, row[3:])
+                    }
+                conn.execute(
+                    text(
+                        "UPDATE sandbox_runs SET peak_count = :peak_count, "
+                        "max_signal = :max_signal, run_time = :run_time, noise = :noise "
+                        "WHERE id = :id"
+                    ),
+                    {"id": row[0], "peak_count": len(peaks) if peaks else 0, **summarize_traces(traces)}
+                )
+                updated += 1
+
+            last_id = rows[-1][0]
+            logger.info(f"Backfilled summaries for {updated} runs")
+
+    return updated
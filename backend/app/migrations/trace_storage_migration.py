@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Trace Storage Migration Script
+Moves SandboxRun time/signal/baseline traces from JSON columns into
+compressed binary trace blobs and backfills the run summary columns.
+"""
+
+import sys
+from pathlib import Path
+
+# Add the backend directory to the Python path
+backend_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import Base, engine
+from app.core.trace_store import ensure_trace_columns, migrate_json_traces, backfill_run_summaries
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_trace_storage_migration(batch_size: int = 500, keep_json: bool = False) -> bool:
+    """Run the binary trace storage migration."""
+
+    logger.info("Starting trace storage migration...")
+
+    try:
+        Base.metadata.create_all(bind=engine)
+        ensure_trace_columns(engine)
+
+        converted = migrate_json_traces(
+            engine,
+            batch_size=batch_size,
+            dtype=settings.TRACE_STORAGE_DTYPE,
+            keep_json=keep_json
+        )
+
+        summarized = backfill_run_summaries(engine, batch_size=batch_size)
+
+        logger.info(
+            f"✅ Trace storage migration completed "
+            f"({converted} runs converted, {summarized} summaries backfilled)"
+        )
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Migration failed: {str(e)}")
+        return False
+
+
+def check_migration_status() -> bool:
+    """Check whether any runs still hold JSON-only traces."""
+
+    try:
+        ensure_trace_columns(engine)
+        with engine.connect() as conn:
+            pending = conn.execute(text(
+                "SELECT COUNT(*) FROM sandbox_runs "
+                "WHERE (trace_blob IS NULL AND time IS NOT NULL) OR peak_count IS NULL"
+            )).scalar()
+
+        logger.info(f"Runs pending trace migration: {pending}")
+        return pending == 0
+
+    except Exception as e:
+        logger.error(f"Error checking migration status: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Binary trace storage migration")
+    parser.add_argument("--check", action="store_true", help="Check migration status")
+    parser.add_argument("--batch-size", type=int, default=500, help="Runs converted per transaction")
+    parser.add_argument("--keep-json", action="store_true", help="Keep legacy JSON trace columns populated")
+
+    args = parser.parse_args()
+
+    if args.check:
+        status = check_migration_status()
+        if status:
+            print("✅ All run traces use binary storage")
+        else:
+            print("❌ Trace storage migration needed")
+        sys.exit(0 if status else 1)
+
+    success = run_trace_storage_migration(batch_size=args.batch_size, keep_json=args.keep_json)
+    sys.exit(0 if success else 1)
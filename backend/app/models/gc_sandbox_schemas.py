@@ -374,6 +374,7 @@ class SandboxRunRequest(BaseModel):
     simulation_seed: Optional[int] = Field(None, description="Random seed for reproducible results")
     include_noise: bool = Field(True, description="Include realistic noise in simulation")
     include_baseline_drift: bool = Field(True, description="Include baseline drift")
+    use_cache: bool = Field(True, description="Reuse cached results of identical deterministic runs")
     
     # Export options
     export_csv: bool = Field(True, description="Export chromatogram data as CSV")
@@ -284,6 +284,12 @@ class ChromatogramAnalysisRequest(BaseModel):
         return v
 
 
+class ChromatogramBatchAnalysisRequest(BaseModel):
+    """Batch chromatogram analysis request schema"""
+    traces: List[ChromatogramAnalysisRequest] = Field(..., min_length=1)
+    analysis_type: str = "comprehensive"
+
+
 class ChromatogramAnalysisResponse(BaseModel):
     """Chromatogram analysis response schema"""
     analysis_timestamp: str
@@ -1772,6 +1778,10 @@ class Peak(BaseModel):
     confidence: Optional[float] = Field(None, ge=0.0, le=1.0, description="Peak assignment confidence")
 
 
+# The peak model used by RunRecord; a different Peak is declared later in this module
+RunPeak = Peak
+
+
 class RunRecord(BaseModel):
     """Chromatogram run record schema"""
     id: Optional[int] = None
@@ -1829,7 +1839,7 @@ class PeakDetectionRequest(BaseModel):
     prominence_threshold: float = Field(3.0, ge=1.0, le=10.0, description="Peak prominence threshold")
     min_distance: float = Field(0.1, ge=0.01, le=10.0, description="Minimum distance between peaks (minutes)")
     noise_window: int = Field(50, ge=10, le=200, description="Window size for noise calculation")
-    baseline_method: str = Field("rolling_min", description="rolling_min, polynomial, or none")
+    baseline_method: str = Field("rolling_min", description="rolling_min, polynomial, asls, airpls, or none")
     @field_validator('signal')
     def validate_signal_length(cls, v, info):
         if info.data and 'time' in info.data and len(v) != len(info.data['time']):
@@ -2099,6 +2109,7 @@ class SandboxRunRequest(BaseModel):
     fault_params: Optional[FaultParams] = None
     sample_name: str = Field("Sandbox Sample", min_length=1)
     seed: Optional[int] = None
+    use_cache: bool = True
 
 
 class SandboxRunResponse(BaseModel):
@@ -2129,6 +2140,9 @@ class ChromatogramImportRequest(BaseModel):
     file_type: str = Field(..., description="csv or jcamp")
     sample_name: str = Field(..., min_length=1, max_length=255)
     auto_detect_peaks: bool = Field(True, description="Automatically detect peaks after import")
+    max_points: Optional[int] = Field(
+        None, ge=10, description="Return the trace LTTB-decimated to at most this many points"
+    )
 
 
 class ChromatogramImportResponse(BaseModel):
@@ -2290,6 +2304,18 @@ class CalibrationFitRequest(BaseModel):
     levels: List[CalibrationLevel] = Field(..., min_length=2)
 
 
+class CalibrationBatchFitRequest(BaseModel):
+    """Fit several targets (e.g. all analytes of a method) in one call"""
+    calibrations: List[CalibrationFitRequest] = Field(..., min_length=1, description="One fit request per target")
+
+
+class CalibrationBatchFitResponse(BaseModel):
+    """Batch calibration fit response schema"""
+    calibrations: List[CalibrationModel]
+    errors: Dict[str, str] = Field(default_factory=dict, description="Fit errors by target name")
+    timing: Dict[str, float] = Field(default_factory=dict, description="Stage timings in ms")
+
+
 class CalibrationActivateRequest(BaseModel):
     """Calibration activation request schema"""
     calibration_id: str = Field(..., description="Calibration ID to activate")
@@ -2302,6 +2328,14 @@ class QuantRequest(BaseModel):
     map: Optional[Dict[str, str]] = Field(None, description="Peak name to target name mapping")
 
 
+class BatchQuantRequest(BaseModel):
+    """Batch quantitation request schema (all targets across many runs)"""
+    run_ids: List[int] = Field(..., min_length=1, description="Run record IDs")
+    calibration_ids: List[str] = Field(..., min_length=1, description="Calibration model IDs, one per target")
+    map: Optional[Dict[str, str]] = Field(None, description="Peak name to target name mapping")
+    rt_window: float = Field(0.1, gt=0, description="Retention time tolerance (min) for unnamed peaks")
+
+
 class QuantResult(BaseModel):
     """Quantitation result schema"""
     run_id: int = Field(..., description="Run record ID")
@@ -2370,6 +2404,79 @@ class SequenceRunListResponse(BaseModel):
     total: int
 
 
+class SequenceJob(BaseModel):
+    """Background sequence execution job"""
+    id: str = Field(..., description="Job ID")
+    sequence_run_id: str = Field(..., description="Sequence run being executed")
+    status: str = Field("queued", description="queued, running, completed, error, cancelled")
+    total_items: int = Field(..., ge=0)
+    completed_items: int = Field(0, ge=0)
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class RunIngestRequest(BaseModel):
+    """Bulk ingestion of an instrument export directory"""
+    directory: str = Field(..., min_length=1, description="Export directory, relative to the ingest root")
+    recursive: bool = Field(True, description="Include subdirectories")
+    instrument_id: Optional[int] = Field(None, description="Instrument recorded on every ingested run")
+    method_id: Optional[int] = Field(None, description="Method recorded on every ingested run")
+    auto_detect_peaks: bool = Field(True, description="Detect peaks while parsing")
+    batch_size: Optional[int] = Field(None, ge=1, le=5000, description="Runs per transaction (default INGEST_BATCH_SIZE)")
+
+
+class RunIngestJob(BaseModel):
+    """Background export directory ingestion job"""
+    id: str = Field(..., description="Job ID")
+    directory: str = Field(..., description="Directory being ingested")
+    status: str = Field("queued", description="queued, running, completed, error, cancelled")
+    files_found: int = Field(0, ge=0)
+    runs_inserted: int = Field(0, ge=0)
+    files_skipped: int = Field(0, ge=0, description="Files already ingested (matching idempotency key)")
+    files_failed: int = Field(0, ge=0)
+    failures: List[str] = Field(default_factory=list, description="First failures as 'file: error'")
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class RunOverlayRequest(BaseModel):
+    """Overlay of several stored runs on a common time grid"""
+    run_ids: List[int] = Field(..., min_length=2, max_length=100, description="Runs to overlay")
+    reference_run_id: Optional[int] = Field(None, description="Run differences and alignment refer to (default: first run)")
+    t_start: Optional[float] = Field(None, description="Start of the overlay window (min)")
+    t_end: Optional[float] = Field(None, description="End of the overlay window (min)")
+    grid_points: Optional[int] = Field(None, ge=10, le=200000, description="Common grid size (default: reference sampling rate)")
+    align: bool = Field(False, description="Align retention times with correlation-optimized warping")
+    segment_min: float = Field(1.0, gt=0, description="COW segment length (min)")
+    max_shift_min: float = Field(0.05, gt=0, description="Largest COW boundary shift (min)")
+    max_points: int = Field(2000, ge=10, le=50000, description="Points per returned trace (LTTB)")
+
+
+class RunOverlayTrace(BaseModel):
+    """One run of an overlay, resampled onto the overlay grid"""
+    run_id: int
+    sample_name: str
+    signal: List[float]
+    difference: List[float] = Field(..., description="Signal minus the reference run")
+
+
+class RunOverlay(BaseModel):
+    """Overlay bundle: common grid, envelopes and per-run traces"""
+    reference_run_id: int
+    aligned: bool
+    grid_points: int = Field(..., description="Common grid size before decimation")
+    time: List[float]
+    mean: List[float]
+    sd: List[float]
+    lower: List[float] = Field(..., description="Minimum over runs")
+    upper: List[float] = Field(..., description="Maximum over runs")
+    runs: List[RunOverlayTrace]
+
+
 # =================== OCR INTEGRATION SCHEMAS ===================
 
 class OCRImageType(str, Enum):
@@ -2389,11 +2496,18 @@ class OCRQualityLevel(str, Enum):
     HIGH_ACCURACY = "high_accuracy"  # Slower but most accurate
 
 
+class DeskewMode(str, Enum):
+    """Skew estimation strategy for deskewing"""
+    FAST = "fast"           # Projection sweep on a downsampled copy, Hough only when unsure
+    ACCURATE = "accurate"   # Median of Hough, projection and component estimates at full resolution
+
+
 class ImagePreprocessingOptions(BaseModel):
     """Image preprocessing configuration for OCR"""
     enhance_contrast: bool = Field(True, description="Enhance image contrast")
     denoise: bool = Field(True, description="Apply noise reduction")
     deskew: bool = Field(True, description="Auto-correct image skew")
+    deskew_mode: DeskewMode = Field(DeskewMode.FAST, description="Skew estimation strategy")
     binarize: bool = Field(False, description="Convert to binary image")
     scale_factor: float = Field(2.0, ge=1.0, le=5.0, description="Image scaling factor")
     gaussian_blur: bool = Field(False, description="Apply Gaussian blur for smoothing")
@@ -2411,6 +2525,7 @@ class OCRProcessingRequest(BaseModel):
     extract_method_params: bool = Field(True, description="Extract method parameters")
     extract_sample_info: bool = Field(True, description="Extract sample information")
     custom_roi: Optional[List[Dict[str, int]]] = Field(None, description="Custom regions of interest [x,y,width,height]")
+    layout_analysis: bool = Field(True, description="OCR only detected text blocks (peak table, method text) instead of the full page")
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -2528,6 +2643,22 @@ OCRBatchRequest = OCRBatchProcessingRequest
 OCRBatchResult = OCRBatchProcessingResult
 
 
+class OCRJob(BaseModel):
+    """Background OCR batch job; results are available while it runs"""
+    id: str = Field(..., description="Job ID")
+    batch_id: str = Field(..., description="Batch identifier recorded on every result")
+    status: str = Field("queued", description="queued, running, completed, error, cancelled")
+    total_images: int = Field(..., ge=0)
+    completed_images: int = Field(0, ge=0, description="Images processed successfully")
+    failed_images: int = Field(0, ge=0, description="Images that could not be read or processed")
+    errors: List[str] = Field(default_factory=list, description="First failures as 'file: error'")
+    processing_metadata: Dict[str, Any] = Field(default_factory=dict, description="Batch settings")
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
 # =================== AI INTEGRATION SCHEMAS ===================
 # Placeholder schemas for AI troubleshooter integration
 
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Process pool for CPU-bound chromatogram analysis.
+
+Baseline fitting and peak integration hold the GIL for most of their runtime,
+so running them on the event loop (or a thread) blocks every other request.
+Jobs submitted here run in a shared ProcessPoolExecutor sized by
+settings.ANALYSIS_WORKERS. Job callables must be module-level functions so
+they can be pickled.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, Tuple
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def get_analysis_executor() -> Optional[Executor]:
+    """
+    Return the shared analysis process pool, creating it on first use.
+    Returns None (the loop's default thread pool) when ANALYSIS_WORKERS < 0
+    or the platform cannot start worker processes.
+    """
+    global _executor
+    workers = getattr(settings, "ANALYSIS_WORKERS", 0)
+    if workers < 0:
+        return None
+
+    with _executor_lock:
+        if _executor is None:
+            try:
+                _executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"Analysis process pool unavailable ({e}); using threads")
+                return None
+        return _executor
+
+
+def shutdown_analysis_executor(wait: bool = True) -> None:
+    """Shut the analysis pool down; the next job starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+async def run_in_pool(func: Callable, *args: Any) -> Any:
+    """Run a module-level function in the analysis pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_analysis_executor(), func, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); drop the pool so later jobs get a new one
+        shutdown_analysis_executor(wait=False)
+        raise
+
+
+async def map_as_completed(
+    func: Callable,
+    jobs: Iterable[Tuple[Any, ...]]
+) -> AsyncIterator[Tuple[int, Any, Optional[BaseException]]]:
+    """
+    Fan `func(*job)` out over the pool and yield (index, result, error) in
+    completion order. Pending jobs are cancelled if the consumer stops early.
+    """
+    async def _indexed(index: int, args: Tuple[Any, ...]):
+        try:
+            return index, await run_in_pool(func, *args), None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return index, None, e
+
+    tasks = [asyncio.ensure_future(_indexed(i, args)) for i, args in enumerate(jobs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
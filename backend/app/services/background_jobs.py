@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Shared bookkeeping for services that run jobs as asyncio tasks.
+
+A job is a pydantic model with id, status, created_at and finished_at
+fields. The service keeps every job in memory for polling, maps running
+jobs to their tasks for cancellation and broadcasts progress over the
+WebSocket manager. Once a new job is registered, only the newest finished
+jobs (as many as the service's retention setting allows) are kept.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Coroutine, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.websocket import websocket_manager
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("completed", "cancelled", "error")
+
+
+class BackgroundJobService:
+    """Base class for services with in-memory background jobs"""
+
+    # Subclasses set the progress message type, the job fields left out of
+    # progress messages and the settings name of their retention limit
+    progress_type = "job_progress"
+    progress_exclude: Set[str] = set()
+    retention_setting: Optional[str] = None
+
+    def __init__(self):
+        self.jobs: Dict[str, Any] = {}
+        self._job_tasks: Dict[str, asyncio.Task] = {}
+        self._jobs_lock = threading.Lock()
+
+    def _register_job(self, job: Any) -> None:
+        with self._jobs_lock:
+            self._add_job(job)
+
+    def _add_job(self, job: Any) -> None:
+        """Store a new job and prune old finished ones (caller holds _jobs_lock)"""
+        limit = getattr(settings, self.retention_setting) if self.retention_setting else None
+        if limit is not None:
+            finished = sorted(
+                (known for known in self.jobs.values() if known.status in FINISHED_STATUSES),
+                key=lambda known: known.finished_at or known.created_at
+            )
+            for known in finished[:max(len(finished) - limit, 0)]:
+                self._forget_job(known.id)
+        self.jobs[job.id] = job
+
+    def _forget_job(self, job_id: str) -> None:
+        """Drop a pruned job; subclasses also drop whatever they keep per job"""
+        del self.jobs[job_id]
+
+    def _start_task(self, job: Any, coroutine: Coroutine[Any, Any, None]) -> asyncio.Task:
+        """Run a job coroutine as a task of the running event loop"""
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._job_tasks[job.id] = task
+        task.add_done_callback(lambda _: self._job_tasks.pop(job.id, None))
+        return task
+
+    async def _publish_progress(self, job: Any, **fields: Any) -> None:
+        """Broadcast a job snapshot (plus any extra message fields) to WebSocket clients"""
+        message = {
+            "type": self.progress_type,
+            "job": job.model_dump(mode="json", exclude=self.progress_exclude),
+            **fields,
+            "timestamp": datetime.now().isoformat()
+        }
+        try:
+            await websocket_manager.broadcast(json.dumps(message))
+        except Exception as e:
+            logger.warning(f"Failed to publish {self.progress_type}: {str(e)}")
+
+    def get_job(self, job_id: str) -> Optional[Any]:
+        """Get a job by ID"""
+        return self.jobs.get(job_id)
+
+    def list_jobs(self, limit: int = 50) -> List[Any]:
+        """List jobs, newest first"""
+        jobs = sorted(self.jobs.values(), key=lambda j: j.created_at, reverse=True)
+        return jobs[:limit]
+
+    def cancel_job(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it already finished"""
+        if job_id not in self.jobs:
+            raise ValueError("Job not found")
+        task = self._job_tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
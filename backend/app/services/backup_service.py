@@ -95,7 +95,7 @@ class BackupService:
         return [scope]
 
     def _export_calibration(self) -> str:
-        # quant_service keeps in-memory calibrations and versions
+        # quant_service keeps calibrations and versions in persistent repositories
         payload: Dict[str, Any] = {
             "calibrations": {},
             "calibration_versions": {},
@@ -109,8 +109,8 @@ class BackupService:
                 for key, value in getattr(quant_service, "calibrations", {}).items()
             }
             payload["calibration_versions"] = {
-                key: [v.model_dump() if hasattr(v, "model_dump") else v for v in values]
-                for key, values in getattr(quant_service, "calibration_versions", {}).items()
+                key: value.model_dump() if hasattr(value, "model_dump") else value
+                for key, value in getattr(quant_service, "calibration_versions", {}).items()
             }
             payload["active_calibrations"] = getattr(quant_service, "active_calibrations", {})
         except Exception as e:
@@ -221,9 +221,8 @@ class BackupService:
 
     def _import_calibration(self, payload: Dict[str, Any], mode: ImportMode) -> None:
         if mode == "replace":
-            quant_service.calibrations = {}
-            quant_service.calibration_versions = {}
-            quant_service.active_calibrations = {}
+            quant_service.calibrations.clear()
+            quant_service.calibration_versions.clear()
 
         calibrations = payload.get("calibrations", {})
         calibration_versions = payload.get("calibration_versions", {})
@@ -232,12 +231,14 @@ class BackupService:
         # Basic merge by key
         quant_service.calibrations.update({k: v for k, v in calibrations.items()})
         quant_service.calibration_versions.update({k: v for k, v in calibration_versions.items()})
-        quant_service.active_calibrations.update({k: v for k, v in active_calibrations.items()})
+        for calibration_id in active_calibrations.values():
+            if calibration_id in quant_service.calibrations:
+                quant_service.activate_calibration(calibration_id)
 
     def _import_qc(self, payload: Dict[str, Any], mode: ImportMode) -> None:
         if mode == "replace":
-            qc_service.targets = {}
-            qc_service.records = {}
+            qc_service.targets.clear()
+            qc_service.records.clear()
 
         targets = payload.get("targets", {})
         records = payload.get("records", {})
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Baseline correction engine shared by all chromatogram analyzers.
+
+Implements iterative asymmetric least squares (AsLS) and adaptive iteratively
+reweighted penalized least squares (airPLS) on a banded (pentadiagonal)
+Cholesky solver, so each iteration is O(n) in time and memory. Rolling-minimum
+and polynomial estimators are available as fallbacks.
+
+This module only depends on NumPy/SciPy so it can be imported from the API
+services, the raw-data routes and the standalone processor alike.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.linalg import LinAlgError, solveh_banded
+from scipy.ndimage import gaussian_filter1d, minimum_filter1d
+
+logger = logging.getLogger(__name__)
+
+BASELINE_METHODS = ("asls", "airpls", "rolling_min", "polynomial", "none")
+
+
+@lru_cache(maxsize=32)
+def _penalty_band(n: int, lam: float) -> np.ndarray:
+    """
+    Upper banded form of lam * D'D for the second-difference operator D.
+    The band depends only on trace length and smoothness, so it is cached and
+    shared by every iteration and every trace of the same length.
+    """
+    coeffs = np.array([1.0, -2.0, 1.0])
+    rows = np.ones(n - 2)
+
+    band = np.zeros((3, n))
+    band[2] = np.convolve(rows, coeffs * coeffs)                  # main diagonal
+    band[1, 1:] = np.convolve(rows, coeffs[:-1] * coeffs[1:])     # first super-diagonal
+    band[0, 2:] = np.convolve(rows, coeffs[:-2] * coeffs[2:])     # second super-diagonal
+    band *= lam
+    band.flags.writeable = False
+    return band
+
+
+def _solve_weighted(y: np.ndarray, weights: np.ndarray, lam: float) -> np.ndarray:
+    """Solve (W + lam D'D) z = W y with a banded Cholesky factorization."""
+    system = _penalty_band(len(y), float(lam)).copy()
+    system[2] += weights
+    return solveh_banded(system, weights * y, lower=False, check_finite=False)
+
+
+def asls_baseline(
+    y: np.ndarray,
+    lam: float = 1e5,
+    p: float = 0.001,
+    max_iter: int = 10,
+    tol: float = 1e-3
+) -> np.ndarray:
+    """
+    Asymmetric least squares baseline (Eilers & Boelens).
+    Points above the current baseline get weight p, points below get 1 - p.
+    """
+    weights = np.ones_like(y)
+    baseline = y
+    for _ in range(max_iter):
+        baseline = _solve_weighted(y, weights, lam)
+        new_weights = np.where(y > baseline, p, 1.0 - p)
+        if np.mean(new_weights != weights) < tol:
+            break
+        weights = new_weights
+    return baseline
+
+
+def airpls_baseline(
+    y: np.ndarray,
+    lam: float = 1e5,
+    max_iter: int = 15,
+    tol: float = 1e-3
+) -> np.ndarray:
+    """
+    Adaptive iteratively reweighted penalized least squares baseline (Zhang et al.).
+    Points above the baseline are excluded; points below are reweighted
+    exponentially by their residual until the negative residual converges.
+    """
+    weights = np.ones_like(y)
+    baseline = y
+    scale = np.sum(np.abs(y)) or 1.0
+    for iteration in range(1, max_iter + 1):
+        baseline = _solve_weighted(y, weights, lam)
+        residual = y - baseline
+        negative = residual[residual < 0]
+        negative_sum = np.abs(negative.sum())
+        if negative.size == 0 or negative_sum < tol * scale:
+            break
+        weights = np.where(
+            residual >= 0,
+            0.0,
+            np.exp(np.clip(iteration * np.abs(residual) / negative_sum, None, 50.0))
+        )
+        # Anchor the ends so the solve stays well conditioned
+        weights[0] = weights[-1] = max(weights[0], weights[-1], 1.0)
+    return baseline
+
+
+def rolling_min_baseline(
+    y: np.ndarray,
+    window: Optional[int] = None,
+    smoothing_sigma: float = 2.0
+) -> np.ndarray:
+    """Rolling minimum baseline smoothed with a Gaussian kernel."""
+    if window is None:
+        window = min(50, len(y) // 10)
+    size = 2 * (max(window, 1) // 2) + 1
+    baseline = minimum_filter1d(y, size=size, mode="nearest")
+    return gaussian_filter1d(baseline, sigma=smoothing_sigma)
+
+
+def polynomial_baseline(
+    y: np.ndarray,
+    x: Optional[np.ndarray] = None,
+    order: int = 3,
+    max_iter: int = 10,
+    tol: float = 1e-3
+) -> np.ndarray:
+    """
+    Modified polynomial baseline: refit after clipping the signal to the
+    previous fit so peaks stop pulling the polynomial upward.
+    max_iter=1 gives a plain least-squares polynomial fit.
+    """
+    if x is None:
+        x = np.arange(len(y), dtype=np.float64)
+    order = min(order, len(y) - 1)
+
+    target = y
+    baseline = y
+    for _ in range(max(max_iter, 1)):
+        coeffs = np.polyfit(x, target, order)
+        baseline = np.polyval(coeffs, x)
+        clipped = np.minimum(target, baseline)
+        if np.linalg.norm(clipped - target) <= tol * (np.linalg.norm(target) or 1.0):
+            break
+        target = clipped
+    return baseline
+
+
+def estimate_baseline(
+    intensity,
+    method: str = "asls",
+    x=None,
+    lam: float = 1e5,
+    p: float = 0.001,
+    max_iter: int = 10,
+    window: Optional[int] = None,
+    poly_order: int = 3,
+    fallback: str = "rolling_min"
+) -> np.ndarray:
+    """
+    Estimate the baseline of a trace with the selected method.
+    If the penalized solve fails (e.g. degenerate input) the fallback
+    estimator is used instead.
+    """
+    y = np.asarray(intensity, dtype=np.float64)
+    if method not in BASELINE_METHODS:
+        raise ValueError(f"Unknown baseline method: {method}")
+
+    if method == "none" or y.size == 0:
+        return np.zeros_like(y)
+
+    if method in ("asls", "airpls") and y.size < 4:
+        method = "polynomial"
+
+    try:
+        if method == "asls":
+            return asls_baseline(y, lam=lam, p=p, max_iter=max_iter)
+        if method == "airpls":
+            return airpls_baseline(y, lam=lam, max_iter=max_iter)
+    except (LinAlgError, ValueError) as e:
+        logger.warning(f"{method} baseline failed ({e}); falling back to {fallback}")
+        method = fallback
+
+    if method == "rolling_min":
+        return rolling_min_baseline(y, window=window)
+    if method == "polynomial":
+        return polynomial_baseline(
+            y, x=None if x is None else np.asarray(x, dtype=np.float64),
+            order=poly_order, max_iter=max_iter
+        )
+    return np.zeros_like(y)
+
+
+def correct_baseline(
+    intensity,
+    method: str = "asls",
+    clip_negative: bool = False,
+    **params
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Subtract the estimated baseline from a trace.
+    Returns (corrected, baseline); negative values are clipped to zero when requested.
+    """
+    y = np.asarray(intensity, dtype=np.float64)
+    baseline = estimate_baseline(y, method=method, **params)
+    corrected = y - baseline
+    if clip_negative:
+        corrected = np.maximum(corrected, 0)
+    return corrected, baseline
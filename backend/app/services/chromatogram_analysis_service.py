@@ -8,16 +8,22 @@ import pandas as pd
 from scipy import signal
 from scipy.optimize import curve_fit
 from scipy.stats import linregress
-from typing import Dict, List, Optional, Tuple, Any
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Any
 from datetime import datetime
 import json
 from loguru import logger
 from ..core.config import settings
+from .analysis_pool import map_as_completed, run_in_pool
+from .baseline_correction import correct_baseline
+from .peak_integration import integrate_peaks, peaks_to_dicts, select_by_distance
 
 class ChromatogramAnalysisService:
     def __init__(self):
         self.peak_detection_sensitivity = getattr(settings, 'PEAK_DETECTION_SENSITIVITY', 0.1)
         self.baseline_correction = getattr(settings, 'BASELINE_CORRECTION', True)
+        self.baseline_method = getattr(settings, 'BASELINE_METHOD', 'asls')
+        self.baseline_lambda = getattr(settings, 'BASELINE_LAMBDA', 1e5)
+        self.baseline_asymmetry = getattr(settings, 'BASELINE_ASYMMETRY', 0.001)
         self.min_peak_width = 5  # Minimum peak width in data points
         self.noise_threshold = 0.05  # Noise threshold for peak detection
         
@@ -30,7 +36,53 @@ class ChromatogramAnalysisService:
         analysis_type: str = "comprehensive"
     ) -> Dict:
         """
-        Comprehensive chromatogram analysis with enhanced diagnostics
+        Comprehensive chromatogram analysis with enhanced diagnostics.
+        Runs in the analysis process pool so the event loop stays responsive.
+        """
+        return await run_in_pool(
+            analyze_chromatogram_job,
+            time_data, intensity_data, compound_names, method_parameters, analysis_type
+        )
+
+    async def analyze_batch(
+        self,
+        traces: List[Dict[str, Any]],
+        analysis_type: str = "comprehensive"
+    ) -> AsyncIterator[Tuple[int, Dict]]:
+        """
+        Analyze many chromatograms in parallel, yielding (index, result)
+        as each one finishes. Each trace dict carries the
+        ChromatogramAnalysisRequest fields.
+        """
+        jobs = [
+            (
+                trace["time_data"],
+                trace["intensity_data"],
+                trace.get("compound_names"),
+                trace.get("method_parameters"),
+                analysis_type
+            )
+            for trace in traces
+        ]
+        async for index, result, error in map_as_completed(analyze_chromatogram_job, jobs):
+            if error is not None:
+                logger.error(f"Batch chromatogram analysis failed for trace {index}: {str(error)}")
+                result = {
+                    "error": f"Chromatogram analysis error: {str(error)}",
+                    "timestamp": datetime.now().isoformat()
+                }
+            yield index, result
+
+    def analyze_chromatogram_sync(
+        self,
+        time_data: List[float],
+        intensity_data: List[float],
+        compound_names: Optional[List[str]] = None,
+        method_parameters: Optional[Dict[str, Any]] = None,
+        analysis_type: str = "comprehensive"
+    ) -> Dict:
+        """
+        Blocking implementation of analyze_chromatogram (CPU-bound)
         """
         try:
             # Validate input data
@@ -107,26 +159,15 @@ class ChromatogramAnalysisService:
             }
 
     def _correct_baseline(self, intensity_data: np.ndarray) -> np.ndarray:
-        """Enhanced baseline correction using asymmetric least squares"""
+        """Enhanced baseline correction using iterative asymmetric least squares"""
         try:
-            # Use asymmetric least squares for baseline correction
-            from scipy.sparse import diags
-            from scipy.sparse.linalg import spsolve
-            
-            # Parameters for baseline correction
-            lam = 1000  # Smoothness parameter
-            p = 0.001   # Asymmetry parameter
-            
-            # Create sparse matrix for baseline calculation
-            n = len(intensity_data)
-            D = diags([1, -2, 1], [0, -1, -2], shape=(n, n))
-            D = lam * D.dot(D.transpose())
-            
-            # Solve for baseline
-            baseline = spsolve(D + diags([1], [0], shape=(n, n)), intensity_data)
-            
-            # Return corrected data
-            return intensity_data - baseline
+            corrected, _ = correct_baseline(
+                intensity_data,
+                method=self.baseline_method,
+                lam=self.baseline_lambda,
+                p=self.baseline_asymmetry
+            )
+            return corrected
             
         except Exception as e:
             logger.warning(f"Baseline correction failed: {str(e)}")
@@ -138,78 +179,37 @@ class ChromatogramAnalysisService:
         time_data: np.ndarray
     ) -> List[Dict[str, Any]]:
         """Enhanced peak detection with multiple algorithms"""
-        peaks = []
-        
         try:
-            # Method 1: Find peaks using scipy
-            peak_indices, properties = signal.find_peaks(
-                intensity_data,
-                height=np.max(intensity_data) * self.peak_detection_sensitivity,
-                distance=self.min_peak_width,
-                prominence=np.max(intensity_data) * 0.1
-            )
+            height = np.max(intensity_data) * self.peak_detection_sensitivity
+            
+            # Single candidate pass; prominences are computed alongside
+            candidates, properties = signal.find_peaks(intensity_data, height=height, prominence=0)
+            if len(candidates) == 0:
+                return []
+            
+            # Method 1: distance + prominence criteria
+            by_prominence = select_by_distance(
+                candidates, properties["peak_heights"], self.min_peak_width
+            ) & (properties["prominences"] >= np.max(intensity_data) * 0.1)
+            
+            # Method 2: peak width criterion
+            widths = signal.peak_widths(
+                intensity_data, candidates, rel_height=0.5,
+                prominence_data=(
+                    properties["prominences"],
+                    properties["left_bases"],
+                    properties["right_bases"]
+                )
+            )[0]
+            by_width = widths >= self.min_peak_width
             
-            # Method 2: Find peaks using peak width analysis
-            width_indices, width_properties = signal.find_peaks(
-                intensity_data,
-                height=np.max(intensity_data) * self.peak_detection_sensitivity,
-                width=self.min_peak_width
+            # Width, area and asymmetry for every selected peak at once
+            peaks = integrate_peaks(
+                time_data, intensity_data, candidates[by_prominence | by_width]
             )
+            peaks.sort(order="retention_time")
             
-            # Combine and deduplicate peaks
-            all_indices = list(set(list(peak_indices) + list(width_indices)))
-            
-            for idx in all_indices:
-                if idx < len(intensity_data):
-                    # Calculate peak properties
-                    peak_height = intensity_data[idx]
-                    peak_time = time_data[idx]
-                    
-                    # Calculate peak width at half height
-                    half_height = peak_height / 2
-                    left_idx = idx
-                    right_idx = idx
-                    
-                    # Find left boundary
-                    while left_idx > 0 and intensity_data[left_idx] > half_height:
-                        left_idx -= 1
-                    
-                    # Find right boundary
-                    while right_idx < len(intensity_data) - 1 and intensity_data[right_idx] > half_height:
-                        right_idx += 1
-                    
-                    peak_width = time_data[right_idx] - time_data[left_idx]
-                    
-                    # Calculate area (trapezoidal rule)
-                    area = np.trapz(
-                        intensity_data[left_idx:right_idx + 1],
-                        time_data[left_idx:right_idx + 1]
-                    )
-                    
-                    # Calculate asymmetry
-                    left_half = intensity_data[left_idx:idx]
-                    right_half = intensity_data[idx:right_idx + 1]
-                    
-                    if len(left_half) > 0 and len(right_half) > 0:
-                        asymmetry = (len(right_half) - len(left_half)) / (len(right_half) + len(left_half))
-                    else:
-                        asymmetry = 0
-                    
-                    peaks.append({
-                        "peak_index": int(idx),
-                        "retention_time": float(peak_time),
-                        "height": float(peak_height),
-                        "width": float(peak_width),
-                        "area": float(area),
-                        "asymmetry": float(asymmetry),
-                        "left_boundary": int(left_idx),
-                        "right_boundary": int(right_idx)
-                    })
-            
-            # Sort peaks by retention time
-            peaks.sort(key=lambda x: x["retention_time"])
-            
-            return peaks
+            return peaks_to_dicts(peaks)
             
         except Exception as e:
             logger.error(f"Error in peak detection: {str(e)}")
@@ -751,4 +751,17 @@ class ChromatogramAnalysisService:
         }
 
 # Global instance
-chromatogram_analysis_service = ChromatogramAnalysisService() 
\ No newline at end of file
+chromatogram_analysis_service = ChromatogramAnalysisService()
+
+
+def analyze_chromatogram_job(
+    time_data: List[float],
+    intensity_data: List[float],
+    compound_names: Optional[List[str]] = None,
+    method_parameters: Optional[Dict[str, Any]] = None,
+    analysis_type: str = "comprehensive"
+) -> Dict:
+    """Picklable entry point for analysis pool workers"""
+    return chromatogram_analysis_service.analyze_chromatogram_sync(
+        time_data, intensity_data, compound_names, method_parameters, analysis_type
+    )
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Raster-to-trace digitization of chromatogram images.
+
+Turns a scanned or exported chromatogram plot back into (time, signal)
+arrays. The axes are found as the long horizontal and vertical ink lines
+meeting in the lower-left corner, the plot area inside them is cropped, and
+glyph-sized components (peak labels, tick marks) are dropped so only the
+trace remains. The trace row of every pixel column is then read in one
+vectorized pass (median of its dark pixels, or the topmost one for filled
+plots) and gaps are interpolated. Pixel positions are converted to axis
+units from the tick labels read by Tesseract below the x axis and left of
+the y axis, or from explicit axis ranges; without either the arrays stay in
+pixels and are flagged as uncalibrated.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    import pytesseract
+except ImportError:  # pragma: no cover - OCR is optional for digitization
+    pytesseract = None
+
+from .ocr_layout import binarize_ink
+
+logger = logging.getLogger(__name__)
+
+MIN_TRACE_COVERAGE = 0.5      # Fraction of plot columns that must hold trace ink
+MIN_TRACE_WIDTH = 0.02        # Trace components span at least this fraction of the plot width
+TICK_LABEL_CONFIG = "--psm 11 -c tessedit_char_whitelist=0123456789.-"
+_NUMBER = re.compile(r"^-?\d+(\.\d+)?$")
+
+
+@dataclass
+class PlotArea:
+    """Plot area inside the axes (image pixel coordinates, right/bottom exclusive)"""
+    left: int
+    top: int
+    right: int
+    bottom: int
+    axes_found: bool = True
+
+    @property
+    def width(self) -> int:
+        return self.right - self.left
+
+    @property
+    def height(self) -> int:
+        return self.bottom - self.top
+
+
+@dataclass
+class AxisCalibration:
+    """Linear pixel-to-value mapping of one axis"""
+    slope: float
+    intercept: float
+    calibrated: bool
+    labels: List[Tuple[float, float]] = field(default_factory=list)  # (pixel, value) ticks used
+
+    def apply(self, pixels: np.ndarray) -> np.ndarray:
+        return self.slope * np.asarray(pixels, dtype=np.float64) + self.intercept
+
+
+@dataclass
+class DigitizedTrace:
+    """Trace read from a chromatogram image"""
+    time: np.ndarray
+    signal: np.ndarray
+    plot_area: PlotArea
+    x_axis: AxisCalibration
+    y_axis: AxisCalibration
+    coverage: float  # Fraction of plot columns where trace ink was found
+
+    @property
+    def calibrated(self) -> bool:
+        return self.x_axis.calibrated and self.y_axis.calibrated
+
+
+def _line_boxes(ink: np.ndarray, kernel_size: Tuple[int, int]) -> np.ndarray:
+    """(x, y, width, height) of the straight lines at least kernel_size long"""
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, kernel_size)
+    lines = cv2.morphologyEx(ink, cv2.MORPH_OPEN, kernel)
+    return cv2.connectedComponentsWithStats(lines, connectivity=8)[2][1:, :4]
+
+
+def detect_plot_area(ink: np.ndarray) -> PlotArea:
+    """
+    Plot area bounded by the x axis (the lowest of the longest horizontal
+    lines) and the y axis (a vertical line ending on its left end). Frame
+    lines along the top and right edges are excluded as well. Falls back to
+    the whole image when no axis line is found.
+    """
+    height, width = ink.shape
+    horizontal = _line_boxes(ink, (max(width // 5, 10), 1))
+    if len(horizontal) == 0:
+        return PlotArea(0, 0, width, height, axes_found=False)
+    vertical = _line_boxes(ink, (1, max(height // 8, 10)))
+
+    # The x axis; a top frame line of the same length lies above it
+    longest = horizontal[:, 2].max()
+    candidates = horizontal[horizontal[:, 2] >= 0.9 * longest]
+    x_axis = candidates[np.argmax(candidates[:, 1])]
+    ax, ay, aw, ah = (int(v) for v in x_axis)
+    tolerance = max(int(0.02 * width), 4)
+
+    left, top, right, bottom = ax, 0, ax + aw, ay
+    meets_axis = np.abs(vertical[:, 1] + vertical[:, 3] - (ay + ah)) <= tolerance
+    y_axes = vertical[meets_axis & (np.abs(vertical[:, 0] - ax) <= tolerance)]
+    if len(y_axes):
+        y_axis = y_axes[np.argmax(y_axes[:, 3])]
+        left = int(y_axis[0] + y_axis[2])
+        top = int(y_axis[1])
+    right_frames = vertical[meets_axis & (np.abs(vertical[:, 0] + vertical[:, 2] - (ax + aw)) <= tolerance)]
+    if len(right_frames):
+        right = int(right_frames[:, 0].min())
+    top_frames = candidates[candidates[:, 1] < ay - tolerance]
+    if len(top_frames):
+        top = max(top, int((top_frames[:, 1] + top_frames[:, 3]).max()))
+
+    if right - left < 10 or bottom - top < 10:
+        return PlotArea(0, 0, width, height, axes_found=False)
+    return PlotArea(left, top, right, bottom)
+
+
+def trace_mask(ink: np.ndarray, area: PlotArea) -> np.ndarray:
+    """Trace ink inside the plot area, without glyph-sized components (labels, ticks)"""
+    roi = ink[area.top:area.bottom, area.left:area.right]
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(roi, connectivity=8)
+    keep = stats[:, cv2.CC_STAT_WIDTH] >= max(MIN_TRACE_WIDTH * area.width, 3)
+    keep[0] = False
+    return keep[labels]
+
+
+def extract_trace_rows(mask: np.ndarray, method: str = "median") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trace row of every column of a boolean mask: the median dark pixel, or
+    the topmost one with method="top" (filled plots, very narrow peaks).
+    Returns the rows (NaN where a column is empty) and the per-column ink mask.
+    """
+    counts = mask.sum(axis=0)
+    has_ink = counts > 0
+    if method == "top":
+        rows = np.argmax(mask, axis=0).astype(np.float64)
+    elif method == "median":
+        below = np.cumsum(mask, axis=0)
+        lower = np.argmax(below >= ((counts + 1) // 2)[None, :], axis=0)
+        upper = np.argmax(below >= (counts // 2 + 1)[None, :], axis=0)
+        rows = 0.5 * (lower + upper)
+        # At a maximum the column also holds the stroke down to both
+        # neighbours, which pulls the median below the apex; read the top
+        # of the stroke there, offset by half the stroke width
+        top = np.where(has_ink, np.argmax(mask, axis=0), mask.shape[0])
+        stroke = np.median(counts[has_ink]) if has_ink.any() else 1.0
+        apex = has_ink & (top <= np.roll(top, 1)) & (top <= np.roll(top, -1))
+        rows[apex] = np.minimum(rows[apex], top[apex] + (stroke - 1) / 2)
+    else:
+        raise ValueError(f"Unknown trace extraction method: {method}")
+    rows[~has_ink] = np.nan
+    return rows, has_ink
+
+
+def fit_axis(pixels, values, tolerance: float = 0.02) -> Optional[AxisCalibration]:
+    """
+    Least-squares pixel-to-value line through tick labels. Labels misread by
+    OCR are dropped one at a time while the worst residual exceeds
+    `tolerance` of the value span. None when fewer than two consistent
+    labels remain.
+    """
+    points = sorted(zip((float(p) for p in pixels), (float(v) for v in values)))
+    pixels = np.array([p for p, _ in points])
+    values = np.array([v for _, v in points])
+
+    while len(pixels) >= 2 and np.ptp(pixels) > 0:
+        slope, intercept = np.polyfit(pixels, values, 1)
+        residuals = np.abs(slope * pixels + intercept - values)
+        span = np.ptp(values)
+        if span > 0 and residuals.max() <= tolerance * span:
+            return AxisCalibration(float(slope), float(intercept), True,
+                                   [(float(p), float(v)) for p, v in zip(pixels, values)])
+        if len(pixels) <= 2:
+            break
+        keep = np.ones(len(pixels), dtype=bool)
+        keep[np.argmax(residuals)] = False
+        pixels, values = pixels[keep], values[keep]
+    return None
+
+
+def read_tick_labels(gray: np.ndarray, area: PlotArea, axis: str) -> List[Tuple[float, float]]:
+    """
+    (pixel, value) of the numeric tick labels below the x axis or left of the
+    y axis; empty when Tesseract is unavailable or reads nothing usable.
+    """
+    if pytesseract is None:
+        return []
+    height, width = gray.shape
+    band = max(int(0.08 * height), 24) if axis == "x" else max(int(0.12 * width), 32)
+    if axis == "x":
+        x0, y0 = max(area.left - band // 2, 0), min(area.bottom + 2, height)
+        crop = gray[y0:min(y0 + band, height), x0:min(area.right + band // 2, width)]
+    else:
+        x0, y0 = max(area.left - band, 0), max(area.top - band // 4, 0)
+        crop = gray[y0:min(area.bottom + band // 4, height), x0:max(area.left - 2, x0)]
+    if crop.size == 0:
+        return []
+
+    scale = 2.0
+    crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    try:
+        data = pytesseract.image_to_data(crop, config=TICK_LABEL_CONFIG, output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        logger.warning(f"Tick label OCR failed for the {axis} axis: {e}")
+        return []
+
+    labels = []
+    for text, left, top, w, h in zip(data["text"], data["left"], data["top"], data["width"], data["height"]):
+        text = text.strip()
+        if not _NUMBER.match(text):
+            continue
+        if axis == "x":
+            labels.append((x0 + (left + w / 2) / scale, float(text)))
+        else:
+            labels.append((y0 + (top + h / 2) / scale, float(text)))
+    return labels
+
+
+def _calibrate(axis: str, area: PlotArea, value_range: Optional[Tuple[float, float]],
+               gray: np.ndarray) -> AxisCalibration:
+    """Explicit range first, then tick labels, else pixels from the plot origin"""
+    start, end = (area.left, area.right - 1) if axis == "x" else (area.bottom - 1, area.top)
+    if value_range is not None:
+        slope = (value_range[1] - value_range[0]) / (end - start)
+        return AxisCalibration(slope, value_range[0] - slope * start, True)
+
+    labels = read_tick_labels(gray, area, axis)
+    calibration = fit_axis(*zip(*labels)) if len(labels) >= 2 else None
+    if calibration is not None:
+        return calibration
+    logger.info(f"No {axis} axis calibration found; reporting pixel units")
+    return AxisCalibration(1.0, -start, False) if axis == "x" else AxisCalibration(-1.0, start, False)
+
+
+def digitize_chromatogram(
+    image: np.ndarray,
+    x_range: Optional[Tuple[float, float]] = None,
+    y_range: Optional[Tuple[float, float]] = None,
+    method: str = "median"
+) -> DigitizedTrace:
+    """
+    Digitize the trace of a chromatogram image (BGR or grayscale).
+    x_range/y_range give the axis values at the plot area edges and skip
+    tick label OCR for that axis. Raises ValueError when no trace is found.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    ink = binarize_ink(gray)
+    area = detect_plot_area(ink)
+
+    rows, has_ink = extract_trace_rows(trace_mask(ink, area), method)
+    coverage = float(has_ink.mean()) if len(has_ink) else 0.0
+    if coverage < MIN_TRACE_COVERAGE:
+        raise ValueError(f"No chromatogram trace found (trace covers {coverage:.0%} of the plot width)")
+
+    columns = np.arange(len(rows), dtype=np.float64)
+    rows = np.interp(columns, columns[has_ink], rows[has_ink])
+
+    x_axis = _calibrate("x", area, x_range, gray)
+    y_axis = _calibrate("y", area, y_range, gray)
+    return DigitizedTrace(
+        time=x_axis.apply(area.left + columns),
+        signal=y_axis.apply(area.top + rows),
+        plot_area=area,
+        x_axis=x_axis,
+        y_axis=y_axis,
+        coverage=coverage
+    )
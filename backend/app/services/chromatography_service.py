@@ -6,15 +6,22 @@ Chromatography service for peak detection, simulation, and data processing
 import numpy as np
 import time
 import base64
+import binascii
 import io
 import csv
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, BinaryIO, Callable
 from datetime import datetime
 import uuid
 import json
 
+from app.core.config import settings
+from app.core.decimation import decimate_traces
+from app.core.trace_import import JCAMP_METADATA_LABELS, parse_trace_stream
+from app.core.trace_store import encode_traces, summarize_traces, trace_length
+from app.services.baseline_correction import BASELINE_METHODS, estimate_baseline
+from app.services.peak_integration import integrate_peaks
 from app.models.schemas import (
-    Peak, RunRecord, PeakDetectionRequest, PeakDetectionResponse,
+    RunPeak as Peak, RunRecord, PeakDetectionRequest, PeakDetectionResponse,
     ChromatogramSimulationRequest, ChromatogramSimulationResponse,
     ChromatogramImportRequest, ChromatogramImportResponse,
     ChromatogramExportRequest, ChromatogramExportResponse
@@ -24,7 +31,8 @@ from app.models.schemas import (
 class ChromatographyService:
     """Service for chromatogram analysis and processing"""
     
-    def __init__(self):
+    def __init__(self, session_factory: Optional[Callable[[], Any]] = None):
+        self._session_factory = session_factory
         self.compound_libraries = {
             'light_hydrocarbons': [
                 {'name': 'Methane', 'rt': 1.2, 'intensity': 50, 'width': 0.05},
@@ -57,17 +65,11 @@ class ChromatographyService:
         time_data = np.array(request.time)
         signal_data = np.array(request.signal)
         
-        # Calculate baseline
-        baseline = self._calculate_baseline(signal_data, request.baseline_method)
-        
-        # Calculate noise level
-        noise_level = self._calculate_noise_level(signal_data, baseline, request.noise_window)
-        
-        # Detect peaks
-        peaks = self._detect_peaks_algorithm(
-            time_data, signal_data, baseline, noise_level,
-            request.prominence_threshold, request.min_distance
+        peak_table, baseline, noise_level = self.detect_peak_table(
+            time_data, signal_data, request.prominence_threshold, request.min_distance,
+            request.noise_window, request.baseline_method
         )
+        peaks = self._peaks_from_table(peak_table, noise_level)
         
         # Calculate SNR
         signal_to_noise = np.max(signal_data) / noise_level if noise_level > 0 else 0
@@ -88,128 +90,104 @@ class ChromatographyService:
             processing_time=processing_time
         )
     
+    def detect_peak_table(self, time_data: np.ndarray, signal_data: np.ndarray,
+                          prominence_threshold: float = 3.0, min_distance: float = 0.1,
+                          noise_window: int = 50, baseline_method: str = "rolling_min"
+                          ) -> Tuple[np.recarray, np.ndarray, float]:
+        """
+        Detect peaks on NumPy arrays
+        
+        Returns the integrate_peaks record array (retention_time, area, height,
+        width, ...), the baseline and the noise level.
+        """
+        # Calculate baseline
+        baseline = self._calculate_baseline(signal_data, baseline_method)
+        
+        # Calculate noise level
+        noise_level = self._calculate_noise_level(signal_data, baseline, noise_window)
+        
+        # Detect peaks
+        peak_table = self._measure_peaks(
+            time_data, signal_data, baseline, noise_level,
+            prominence_threshold, min_distance
+        )
+        return peak_table, baseline, noise_level
+    
     def _calculate_baseline(self, signal: np.ndarray, method: str) -> np.ndarray:
         """Calculate baseline using specified method"""
-        if method == "rolling_min":
-            window = min(50, len(signal) // 10)
-            baseline = np.array([
-                np.min(signal[max(0, i-window//2):min(len(signal), i+window//2+1)])
-                for i in range(len(signal))
-            ])
-            # Smooth the baseline
-            from scipy.ndimage import gaussian_filter1d
-            baseline = gaussian_filter1d(baseline, sigma=2)
-        elif method == "polynomial":
-            x = np.arange(len(signal))
-            coeffs = np.polyfit(x, signal, 3)
-            baseline = np.polyval(coeffs, x)
-        else:  # none
-            baseline = np.zeros_like(signal)
-        
-        return baseline
+        if method == "polynomial":
+            # Single least-squares fit over the sample index
+            return estimate_baseline(signal, method="polynomial", poly_order=3, max_iter=1)
+        if method in BASELINE_METHODS:
+            return estimate_baseline(signal, method=method)
+        return np.zeros_like(signal)  # none
     
     def _calculate_noise_level(self, signal: np.ndarray, baseline: np.ndarray, window: int) -> float:
         """Calculate noise level using rolling standard deviation"""
         corrected_signal = signal - baseline
-        noise_levels = []
-        
-        for i in range(len(corrected_signal)):
-            start_idx = max(0, i - window // 2)
-            end_idx = min(len(corrected_signal), i + window // 2 + 1)
-            noise_levels.append(np.std(corrected_signal[start_idx:end_idx]))
-        
-        return np.median(noise_levels)
+        corrected_signal = corrected_signal - np.mean(corrected_signal)  # limit cancellation in sums
+        n = len(corrected_signal)
+        
+        # Centered windows clipped at the edges, evaluated with prefix sums
+        idx = np.arange(n)
+        start_idx = np.maximum(0, idx - window // 2)
+        end_idx = np.minimum(n, idx + window // 2 + 1)
+        sums = np.concatenate(([0.0], np.cumsum(corrected_signal)))
+        sq_sums = np.concatenate(([0.0], np.cumsum(corrected_signal ** 2)))
+        counts = end_idx - start_idx
+        means = (sums[end_idx] - sums[start_idx]) / counts
+        variances = (sq_sums[end_idx] - sq_sums[start_idx]) / counts - means ** 2
+        
+        return float(np.median(np.sqrt(np.maximum(variances, 0))))
     
-    def _detect_peaks_algorithm(self, time: np.ndarray, signal: np.ndarray, baseline: np.ndarray,
-                               noise_level: float, prominence_threshold: float, min_distance: float) -> List[Peak]:
+    def _measure_peaks(self, time: np.ndarray, signal: np.ndarray, baseline: np.ndarray,
+                       noise_level: float, prominence_threshold: float, min_distance: float) -> np.recarray:
         """Detect peaks using prominence-based algorithm"""
         corrected_signal = signal - baseline
+        if len(corrected_signal) < 3:
+            return integrate_peaks(time, corrected_signal, np.empty(0, dtype=np.intp))
         
         # Find local maxima
+        candidates = np.flatnonzero(
+            (corrected_signal[1:-1] > corrected_signal[:-2]) &
+            (corrected_signal[1:-1] > corrected_signal[2:])
+        ) + 1
+        
+        # Prominence against the lowest point within 50 samples on either side
+        padded = np.concatenate((np.full(50, np.inf), corrected_signal, np.full(50, np.inf)))
+        windows = np.lib.stride_tricks.sliding_window_view(padded, 50)
+        left_min = windows[candidates].min(axis=1)
+        right_min = windows[candidates + 50].min(axis=1)
+        prominence = corrected_signal[candidates] - np.maximum(left_min, right_min)
+        candidates = candidates[prominence > prominence_threshold * noise_level]
+        
+        # Enforce minimum distance, earliest peak wins
+        accepted = []
+        for idx in candidates:
+            if not accepted or time[idx] - time[accepted[-1]] >= min_distance:
+                accepted.append(idx)
+        
+        # Areas to the baseline crossing, widths at half height (within 100 samples)
+        return integrate_peaks(
+            time, corrected_signal, np.array(accepted, dtype=np.intp),
+            boundary_fraction=0.0, window=100
+        )
+    
+    def _peaks_from_table(self, peak_table: np.recarray, noise_level: float) -> List[Peak]:
         peaks = []
-        for i in range(1, len(corrected_signal) - 1):
-            if (corrected_signal[i] > corrected_signal[i-1] and 
-                corrected_signal[i] > corrected_signal[i+1]):
-                
-                # Calculate prominence
-                left_min = np.min(corrected_signal[max(0, i-50):i])
-                right_min = np.min(corrected_signal[i:min(len(corrected_signal), i+50)])
-                prominence = corrected_signal[i] - max(left_min, right_min)
-                
-                # Check prominence threshold
-                if prominence > (prominence_threshold * noise_level):
-                    # Check minimum distance from other peaks
-                    too_close = False
-                    for peak in peaks:
-                        if abs(time[i] - peak.rt) < min_distance:
-                            too_close = True
-                            break
-                    
-                    if not too_close:
-                        # Calculate peak properties
-                        area = self._calculate_peak_area(time, corrected_signal, i)
-                        width = self._calculate_peak_width(time, corrected_signal, i)
-                        snr = corrected_signal[i] / noise_level if noise_level > 0 else 0
-                        
-                        peak = Peak(
-                            id=str(uuid.uuid4()),
-                            rt=float(time[i]),
-                            area=float(area),
-                            height=float(corrected_signal[i]),
-                            width=float(width),
-                            snr=float(snr)
-                        )
-                        peaks.append(peak)
+        for row in peak_table:
+            snr = row.height / noise_level if noise_level > 0 else 0
+            peaks.append(Peak(
+                id=str(uuid.uuid4()),
+                rt=float(row.retention_time),
+                area=float(row.area),
+                height=float(row.height),
+                width=float(row.width),
+                snr=float(snr)
+            ))
         
         return peaks
     
-    def _calculate_peak_area(self, time: np.ndarray, signal: np.ndarray, peak_idx: int) -> float:
-        """Calculate peak area using trapezoidal integration"""
-        # Find peak boundaries (where signal crosses baseline)
-        left_bound = peak_idx
-        right_bound = peak_idx
-        
-        # Search left
-        for i in range(peak_idx, max(0, peak_idx-100), -1):
-            if signal[i] <= 0:
-                left_bound = i
-                break
-        
-        # Search right
-        for i in range(peak_idx, min(len(signal), peak_idx+100)):
-            if signal[i] <= 0:
-                right_bound = i
-                break
-        
-        # Calculate area
-        area = 0
-        for i in range(left_bound, right_bound):
-            if i < len(signal) - 1:
-                area += (signal[i] + signal[i+1]) * (time[i+1] - time[i]) / 2
-        
-        return area
-    
-    def _calculate_peak_width(self, time: np.ndarray, signal: np.ndarray, peak_idx: int) -> float:
-        """Calculate peak width at half height"""
-        peak_height = signal[peak_idx]
-        half_height = peak_height / 2
-        
-        # Find left crossing
-        left_idx = peak_idx
-        for i in range(peak_idx, max(0, peak_idx-100), -1):
-            if signal[i] <= half_height:
-                left_idx = i
-                break
-        
-        # Find right crossing
-        right_idx = peak_idx
-        for i in range(peak_idx, min(len(signal), peak_idx+100)):
-            if signal[i] <= half_height:
-                right_idx = i
-                break
-        
-        return time[right_idx] - time[left_idx]
-    
     def simulate_chromatogram(self, request: ChromatogramSimulationRequest) -> ChromatogramSimulationResponse:
         """Simulate chromatogram based on method parameters"""
         # Set random seed for reproducibility
@@ -343,58 +321,73 @@ class ChromatographyService:
         return np.mean(resolutions)
     
     def import_chromatogram(self, request: ChromatogramImportRequest) -> ChromatogramImportResponse:
-        """Import chromatogram from file"""
+        """Import chromatogram from a base64-encoded file"""
         try:
-            # Decode file content
-            file_content = base64.b64decode(request.file_content).decode('utf-8')
-            
-            if request.file_type.lower() == 'csv':
-                time_data, signal_data = self._parse_csv_data(file_content)
-            elif request.file_type.lower() == 'jcamp':
-                time_data, signal_data = self._parse_jcamp_data(file_content)
-            else:
-                raise ValueError(f"Unsupported file type: {request.file_type}")
+            stream = io.BytesIO(base64.b64decode(request.file_content))
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"Failed to import chromatogram: {str(e)}")
+        return self.import_chromatogram_stream(stream, request.file_type, request.sample_name,
+                                               request.auto_detect_peaks, request.max_points)
+    
+    def import_chromatogram_stream(self, stream: BinaryIO, file_type: str, sample_name: str,
+                                   auto_detect_peaks: bool = True,
+                                   max_points: Optional[int] = None) -> ChromatogramImportResponse:
+        """
+        Import chromatogram from a binary stream (e.g. a multipart upload)
+        
+        The file is parsed in blocks straight into NumPy arrays and stored as a
+        run with its traces in the binary trace column. Python lists are only
+        built for the returned trace, which is LTTB-decimated to max_points when
+        given; the full trace stays available through the runs endpoints.
+        """
+        try:
+            time_array, signal_array, header = parse_trace_stream(stream, file_type)
             
             # Validate data
-            if len(time_data) != len(signal_data):
+            if len(time_array) != len(signal_array):
                 raise ValueError("Time and signal data lengths do not match")
             
-            if len(time_data) < 10:
+            if len(time_array) < 10:
                 raise ValueError("Insufficient data points")
             
-            # Create run record
+            # Auto-detect peaks if requested
+            peaks: List[Peak] = []
+            baseline = None
+            if auto_detect_peaks:
+                peak_table, baseline, noise_level = self.detect_peak_table(time_array, signal_array)
+                peaks = self._peaks_from_table(peak_table, noise_level)
+            
+            metadata = {
+                'import_source': file_type,
+                'data_points': len(time_array)
+            }
+            traces = {'time': time_array, 'signal': signal_array, 'baseline': baseline}
+            run_id = self._store_imported_run(sample_name, traces, peaks, metadata)
+            
+            returned = decimate_traces(traces, max_points) if max_points else traces
             run_record = RunRecord(
-                sample_name=request.sample_name,
-                time=time_data,
-                signal=signal_data,
-                peaks=[],
-                metadata={
-                    'import_source': request.file_type,
-                    'data_points': len(time_data)
-                }
+                id=run_id,
+                sample_name=sample_name,
+                time=returned['time'].tolist(),
+                signal=returned['signal'].tolist(),
+                peaks=peaks,
+                baseline=returned['baseline'].tolist() if baseline is not None else None,
+                metadata=metadata
             )
             
-            # Auto-detect peaks if requested
-            if request.auto_detect_peaks:
-                detection_request = PeakDetectionRequest(
-                    time=time_data,
-                    signal=signal_data,
-                    prominence_threshold=3.0,
-                    min_distance=0.1,
-                    noise_window=50,
-                    baseline_method="rolling_min"
-                )
-                detection_response = self.detect_peaks(detection_request)
-                run_record.peaks = detection_response.peaks
-                run_record.baseline = detection_response.baseline
-            
             import_metadata = {
-                'file_type': request.file_type,
-                'data_points': len(time_data),
-                'time_range': [min(time_data), max(time_data)],
-                'signal_range': [min(signal_data), max(signal_data)],
-                'peaks_detected': len(run_record.peaks) if run_record.peaks else 0
+                'file_type': file_type,
+                'run_id': run_id,
+                'data_points': len(time_array),
+                'returned_points': len(run_record.time),
+                'time_range': [float(time_array.min()), float(time_array.max())],
+                'signal_range': [float(signal_array.min()), float(signal_array.max())],
+                'peaks_detected': len(peaks)
             }
+            if header:
+                import_metadata['jcamp'] = {
+                    key: header[key] for key in JCAMP_METADATA_LABELS if key in header
+                }
             
             return ChromatogramImportResponse(
                 run_record=run_record,
@@ -405,68 +398,26 @@ class ChromatographyService:
         except Exception as e:
             raise ValueError(f"Failed to import chromatogram: {str(e)}")
     
-    def _parse_csv_data(self, content: str) -> Tuple[List[float], List[float]]:
-        """Parse CSV chromatogram data"""
-        lines = content.strip().split('\n')
-        time_data = []
-        signal_data = []
-        
-        # Skip header if present
-        start_line = 0
-        if lines and not self._is_numeric(lines[0].split(',')[0]):
-            start_line = 1
-        
-        for line in lines[start_line:]:
-            if line.strip():
-                parts = line.split(',')
-                if len(parts) >= 2:
-                    try:
-                        time_val = float(parts[0].strip())
-                        signal_val = float(parts[1].strip())
-                        time_data.append(time_val)
-                        signal_data.append(signal_val)
-                    except ValueError:
-                        continue
-        
-        return time_data, signal_data
-    
-    def _parse_jcamp_data(self, content: str) -> Tuple[List[float], List[float]]:
-        """Parse JCAMP-DX chromatogram data"""
-        # Simplified JCAMP parser - looks for XY data
-        lines = content.split('\n')
-        time_data = []
-        signal_data = []
-        
-        in_xy_data = False
-        for line in lines:
-            line = line.strip()
-            if line.startswith('##XYDATA'):
-                in_xy_data = True
-                continue
-            elif line.startswith('##END'):
-                break
-            elif in_xy_data and line:
-                try:
-                    # Parse XY pairs
-                    parts = line.split()
-                    for i in range(0, len(parts), 2):
-                        if i + 1 < len(parts):
-                            time_val = float(parts[i])
-                            signal_val = float(parts[i + 1])
-                            time_data.append(time_val)
-                            signal_data.append(signal_val)
-                except ValueError:
-                    continue
-        
-        return time_data, signal_data
-    
-    def _is_numeric(self, value: str) -> bool:
-        """Check if string is numeric"""
-        try:
-            float(value)
-            return True
-        except ValueError:
-            return False
+    def _store_imported_run(self, sample_name: str, traces: Dict[str, Optional[np.ndarray]],
+                            peaks: List[Peak], metadata: Dict[str, Any]) -> int:
+        """Persist an imported trace as a run; the arrays are encoded without list conversion"""
+        from app.core.database import SandboxRun
+        if self._session_factory is None:
+            from app.core.database import SessionLocal
+            self._session_factory = SessionLocal
+        
+        with self._session_factory() as db:
+            db_run = SandboxRun(
+                sample_name=sample_name,
+                trace_blob=encode_traces(traces, dtype=settings.TRACE_STORAGE_DTYPE),
+                trace_points=trace_length(traces),
+                peaks=[peak.model_dump() for peak in peaks],
+                metrics=metadata,
+                **summarize_traces(traces)
+            )
+            db.add(db_run)
+            db.commit()
+            return db_run.id
     
     def export_chromatogram(self, request: ChromatogramExportRequest) -> ChromatogramExportResponse:
         """Export chromatogram data"""
@@ -493,3 +444,8 @@ class ChromatographyService:
 
 # Create service instance
 chromatography_service = ChromatographyService()
+
+
+def detect_peaks_job(request: PeakDetectionRequest) -> PeakDetectionResponse:
+    """Picklable entry point for analysis pool workers"""
+    return chromatography_service.detect_peaks(request)
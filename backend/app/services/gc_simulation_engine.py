@@ -11,6 +11,8 @@ import logging
 from dataclasses import dataclass, field
 from scipy import special
 
+from backend.app.core.config import settings
+from backend.app.core.simulation_cache import SimulationCache, request_key
 from backend.app.models.gc_sandbox_schemas import (
     SandboxMethodParameters, SandboxInlet, SandboxColumn, SandboxOvenProgramStep,
     SandboxDetectorConfig, SandboxDetectorFID, SandboxDetectorTCD, SandboxDetectorSCD,
@@ -73,6 +75,12 @@ class GCSimulationEngine:
         self.current_time_min = 0.0
         self.simulation_step_s = 0.05  # 50ms time steps (20 Hz default)
         
+        # Results of deterministic runs, keyed by request content
+        self.result_cache = SimulationCache(
+            max_entries=settings.SIMULATION_CACHE_ENTRIES,
+            max_bytes=settings.SIMULATION_CACHE_MAX_MB * 1024 * 1024
+        )
+        
     async def simulate_gc_run(self, request: SandboxRunRequest) -> SandboxRunResult:
         """
         Execute complete GC simulation
@@ -87,13 +95,36 @@ class GCSimulationEngine:
         start_time = datetime.now()
         self.logger.info(f"Starting GC simulation for run {request.run_id}")
         
+        # Identical seeded (or noise-free) requests always produce the same result
+        cache_key = None
+        if request.use_cache and (request.simulation_seed is not None or not request.include_noise):
+            # Method timestamps default to "now" and do not affect the simulation
+            cache_key = request_key(
+                request.model_dump(
+                    mode="json",
+                    exclude={
+                        "run_id": True, "export_csv": True, "export_png": True, "use_cache": True,
+                        "method_parameters": {"created_at", "modified_at"}
+                    }
+                )
+            )
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info(f"Simulation cache hit for run {request.run_id}")
+                # Deep copy so callers cannot mutate the cached entry
+                return cached.model_copy(
+                    update={"run_id": request.run_id, "exported_files": {}}, deep=True
+                )
+        else:
+            self.result_cache.record_bypass()
+        
         try:
             # Extract method and sample parameters
             method = request.method_parameters
             sample = request.sample_profile
             
             # Set simulation parameters
-            if request.simulation_seed:
+            if request.simulation_seed is not None:
                 np.random.seed(request.simulation_seed)
                 
             self.simulation_step_s = 1.0 / method.acquisition_rate_hz
@@ -146,6 +177,14 @@ class GCSimulationEngine:
                 }
             )
             
+            if cache_key is not None:
+                n_points = sum(len(chrom.time_min) for chrom in chromatograms)
+                self.result_cache.put(
+                    cache_key,
+                    result.model_copy(update={"exported_files": {}}, deep=True),
+                    size_bytes=n_points * 2 * 8
+                )
+            
             self.logger.info(f"Simulation completed in {simulation_time_ms:.1f} ms")
             return result
             
@@ -474,7 +513,8 @@ class GCSimulationEngine:
         time_points = np.arange(0, run_time_min, self.simulation_step_s / 60)
         signal = np.zeros_like(time_points)
         
-        # Generate peaks using EMG (Exponentially Modified Gaussian) model
+        # Collect EMG (Exponentially Modified Gaussian) parameters for every peak
+        peak_params = []
         for peak_data in retention_times:
             rt = peak_data["retention_time_min"]
             width_base = peak_data["peak_width_base_min"]
@@ -511,9 +551,12 @@ class GCSimulationEngine:
             if peak_height <= 0:
                 continue
             
-            # Generate EMG peak
-            peak_signal = self._generate_emg_peak(time_points, rt, sigma, tau, peak_height)
-            signal += peak_signal
+            peak_params.append((rt, sigma, tau, peak_height))
+        
+        # Render all peaks in one windowed pass
+        if peak_params:
+            rts, sigmas, taus, heights = (np.array(column) for column in zip(*peak_params))
+            signal += self._render_emg_peaks(time_points, rts, sigmas, taus, heights)
         
         # Add baseline
         baseline_level = 100.0  # Arbitrary baseline units
@@ -555,45 +598,80 @@ class GCSimulationEngine:
     
     def _generate_emg_peak(self, time_points: np.ndarray, rt_min: float, 
                           sigma: float, tau: float, height: float) -> np.ndarray:
-        """Generate Exponentially Modified Gaussian peak"""
+        """Generate a single Exponentially Modified Gaussian peak"""
+        
+        return self._render_emg_peaks(
+            time_points, np.array([rt_min]), np.array([sigma]),
+            np.array([tau]), np.array([height])
+        )
+    
+    def _render_emg_peaks(self, time_points: np.ndarray, rt_min: np.ndarray,
+                          sigma: np.ndarray, tau: np.ndarray, height: np.ndarray,
+                          n_sigma: float = 6.0, n_tau: float = 12.0,
+                          max_chunk_samples: int = 2_000_000) -> np.ndarray:
+        """
+        Render many EMG peaks into one signal buffer.
         
-        # EMG function
-        t = time_points
+        Each peak is evaluated only inside its support window
+        [rt - n_sigma*sigma, rt + n_sigma*sigma + n_tau*tau] (mirrored for
+        fronting peaks, tau < 0), so cost scales with the total window length
+        rather than points x analytes. `height` is the apex of the equivalent
+        Gaussian; tailing spreads the same area (height * sigma * sqrt(2*pi)).
+        """
         
-        # Handle tau = 0 case (pure Gaussian)
-        if abs(tau) < 1e-6:
-            # Pure Gaussian
-            exponent = -0.5 * ((t - rt_min) / sigma) ** 2
-            peak = height * np.exp(exponent)
-        else:
-            # EMG calculation
-            lambda_param = 1.0 / tau
-            
-            # Compute EMG components
-            z = lambda_param * (sigma**2 * lambda_param - (t - rt_min)) / (sigma * math.sqrt(2))
-            
-            # Use stable computation for large values
-            arg1 = lambda_param * (t - rt_min - sigma**2 * lambda_param)
-            arg2 = (t - rt_min) / (sigma * math.sqrt(2))
-            
-            # Avoid overflow in exponential
-            arg1 = np.clip(arg1, -50, 50)
-            arg2 = np.clip(arg2, -10, 10)
-            
-            # EMG formula
-            peak = np.zeros_like(t)
-            valid_mask = (t > 0)  # Only compute for positive times
-            
-            if np.any(valid_mask):
-                exp_term = np.exp(arg1[valid_mask])
-                # Complementary error function approximation
-                erfc_term = np.where(z[valid_mask] < -5, 2.0, 
-                                   np.where(z[valid_mask] > 5, 0.0, 
-                                          1.0 - special.erf(z[valid_mask]/math.sqrt(2))))
-                
-                peak[valid_mask] = height * (lambda_param / 2.0) * exp_term * erfc_term
+        time_points = np.asarray(time_points, dtype=np.float64)
+        signal = np.zeros_like(time_points)
+        if len(time_points) == 0 or len(rt_min) == 0:
+            return signal
+        
+        abs_tau = np.abs(tau)
+        left_extent = n_sigma * sigma + np.where(tau < 0, n_tau * abs_tau, 0.0)
+        right_extent = n_sigma * sigma + np.where(tau > 0, n_tau * abs_tau, 0.0)
+        starts = np.searchsorted(time_points, rt_min - left_extent, side="left")
+        stops = np.searchsorted(time_points, rt_min + right_extent, side="right")
+        lengths = stops - starts
+        
+        # Split peaks into chunks so the flattened windows stay bounded in memory
+        chunk_ids = np.cumsum(lengths) // max_chunk_samples
+        for chunk in np.unique(chunk_ids):
+            sel = np.nonzero((chunk_ids == chunk) & (lengths > 0))[0]
+            if len(sel) == 0:
+                continue
+            
+            # Flattened sample indices of every window in this chunk
+            counts = lengths[sel]
+            offsets = np.repeat(np.cumsum(counts) - counts, counts)
+            idx = np.repeat(starts[sel], counts) + np.arange(counts.sum()) - offsets
+            
+            mu = np.repeat(rt_min[sel], counts)
+            sig = np.repeat(sigma[sel], counts)
+            tau_s = np.repeat(tau[sel], counts)
+            amp = np.repeat(height[sel], counts)
+            np.add.at(signal, idx, self._emg(time_points[idx], mu, sig, tau_s, amp))
+        
+        return signal
+    
+    @staticmethod
+    def _emg(t: np.ndarray, mu: np.ndarray, sigma: np.ndarray,
+             tau: np.ndarray, height: np.ndarray) -> np.ndarray:
+        """
+        Element-wise EMG using the scaled complementary error function
+        (erfcx) so neither the exponential nor erfc overflow in the tail.
+        """
         
-        return peak
+        gaussian = np.abs(tau) < 1e-6
+        u = (t - mu) / sigma * np.where(tau < 0, -1.0, 1.0)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            ratio = sigma / np.where(gaussian, 1.0, np.abs(tau))
+            z = (ratio - u) / math.sqrt(2)
+            scale = height * ratio * math.sqrt(math.pi / 2)
+            # erfcx form is stable for z >= 0; exp * erfc form for the far tail
+            peak = np.where(
+                z >= 0,
+                scale * np.exp(-0.5 * u**2) * special.erfcx(np.maximum(z, 0)),
+                scale * np.exp(0.5 * ratio**2 - u * ratio) * special.erfc(np.minimum(z, 0))
+            )
+        return np.where(gaussian, height * np.exp(-0.5 * u**2), peak)
     
     def _calculate_run_kpis(self, chromatograms: List[SandboxChromatogramSeries],
                            retention_times: List[Dict[str, Any]], 
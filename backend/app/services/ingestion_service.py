@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Bulk ingestion of instrument export directories into sandbox_runs.
+
+Export files (CSV or JCAMP-DX) are found with os.scandir, parsed and
+peak-picked in the analysis pool, and written with bulk_insert_mappings in
+one transaction per batch; each batch is inserted while the next one parses.
+Every file gets an idempotency key built from its path below the ingest
+root (its absolute path when outside it), its size and its modification
+time, so a file keeps its key whichever directory is scanned. Keys already
+in the table are skipped before parsing, so an interrupted backfill can
+simply be rerun.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import logging
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SandboxRun, SessionLocal
+from app.core.trace_import import JCAMP_METADATA_LABELS, parse_trace_stream
+from app.core.trace_store import encode_traces, ensure_trace_columns, summarize_traces, trace_length
+from app.models.schemas import RunIngestJob
+from app.services.analysis_pool import map_as_completed
+from app.services.background_jobs import BackgroundJobService
+from app.services.chromatography_service import chromatography_service
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FILE_TYPES = {".csv": "csv", ".jdx": "jcamp", ".dx": "jcamp", ".jcamp": "jcamp"}
+MAX_REPORTED_FAILURES = 50
+
+
+def scan_export_directory(root: Path, recursive: bool = True) -> Iterator[Tuple[Path, os.stat_result]]:
+    """Yield (path, stat) for each export file below root, in name order"""
+    pending = [str(root)]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirectories.append(entry.path)
+            elif os.path.splitext(entry.name)[1].lower() in EXPORT_FILE_TYPES and entry.is_file():
+                yield Path(entry.path), entry.stat()
+        pending.extend(reversed(subdirectories))
+
+
+def ingest_root() -> Path:
+    """Directory that ingest paths and idempotency keys are relative to"""
+    return Path(settings.INGEST_ROOT or settings.UPLOAD_DIR).resolve()
+
+
+def key_base(directory: Path) -> str:
+    """Key path of a scanned directory: below the ingest root, or absolute"""
+    resolved = Path(directory).resolve()
+    try:
+        return resolved.relative_to(ingest_root()).as_posix()
+    except ValueError:
+        return resolved.as_posix()
+
+
+def ingest_key(base: str, relative_path: str, stat: os.stat_result) -> str:
+    """Idempotency key of one export file (64 hex characters)"""
+    location = f"{base}/{relative_path}" if base not in ("", ".") else relative_path
+    identity = f"{location}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def parse_export_job(path: str, source_file: str, file_type: str, auto_detect_peaks: bool,
+                     trace_dtype: str) -> Dict[str, Any]:
+    """
+    Pool job: parse one export file into a sandbox_runs row mapping.
+    Traces are encoded here so compression also runs in the worker.
+    """
+    with open(path, "rb") as stream:
+        time_data, signal_data, header = parse_trace_stream(stream, file_type)
+
+    if len(time_data) != len(signal_data):
+        raise ValueError("Time and signal data lengths do not match")
+    if len(time_data) < 10:
+        raise ValueError("Insufficient data points")
+
+    peaks: List[Dict[str, Any]] = []
+    baseline = None
+    if auto_detect_peaks:
+        peak_table, baseline, noise_level = chromatography_service.detect_peak_table(time_data, signal_data)
+        peaks = [
+            {
+                "id": str(uuid.uuid4()),
+                "rt": float(row.retention_time),
+                "area": float(row.area),
+                "height": float(row.height),
+                "width": float(row.width),
+                "snr": float(row.height / noise_level) if noise_level > 0 else 0.0
+            }
+            for row in peak_table
+        ]
+
+    metrics: Dict[str, Any] = {
+        "import_source": file_type,
+        "source_file": source_file,
+        "data_points": len(time_data)
+    }
+    if header:
+        metrics["jcamp"] = {key: header[key] for key in JCAMP_METADATA_LABELS if key in header}
+
+    traces = {"time": time_data, "signal": signal_data, "baseline": baseline}
+    return {
+        "sample_name": (header.get("TITLE") or Path(path).stem)[:255],
+        "trace_blob": encode_traces(traces, dtype=trace_dtype),
+        "trace_points": trace_length(traces),
+        "peaks": peaks,
+        "peak_count": len(peaks),
+        "metrics": metrics,
+        **summarize_traces(traces)
+    }
+
+
+class IngestionService(BackgroundJobService):
+    """Service for bulk ingestion of exported chromatograms"""
+
+    progress_type = "ingest_progress"
+    progress_exclude = {"failures"}
+    retention_setting = "INGEST_JOB_RETENTION"
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        super().__init__()
+        self.session_factory = session_factory or SessionLocal
+        self._schema_ready = False
+
+    def _session(self) -> Session:
+        db = self.session_factory()
+        if not self._schema_ready:
+            # Older databases need the source_key column added in place
+            bind = db.get_bind()
+            SandboxRun.__table__.create(bind=bind, checkfirst=True)
+            ensure_trace_columns(bind)
+            self._schema_ready = True
+        return db
+
+    def resolve_directory(self, directory: str) -> Path:
+        """Resolve an API-supplied directory below the ingest root"""
+        root = ingest_root()
+        target = (root / directory).resolve()
+        if target != root and root not in target.parents:
+            raise ValueError("Directory is outside the ingest root")
+        if not target.is_dir():
+            raise ValueError(f"Directory not found: {directory}")
+        return target
+
+    # Database
+
+    def existing_keys(self, keys: List[str]) -> Set[str]:
+        """Idempotency keys that are already stored"""
+        if not keys:
+            return set()
+        with self._session() as db:
+            rows = db.query(SandboxRun.source_key).filter(SandboxRun.source_key.in_(keys)).all()
+        return {key for (key,) in rows}
+
+    def insert_runs(self, rows: List[Dict[str, Any]]) -> int:
+        """Insert run mappings in one transaction; returns the number inserted"""
+        if not rows:
+            return 0
+        with self._session() as db:
+            try:
+                db.bulk_insert_mappings(SandboxRun, rows)
+                db.commit()
+                return len(rows)
+            except IntegrityError:
+                # Another ingestion committed some of these keys first
+                db.rollback()
+                stored = {
+                    key for (key,) in db.query(SandboxRun.source_key).filter(
+                        SandboxRun.source_key.in_([row["source_key"] for row in rows])
+                    )
+                }
+                fresh = [row for row in rows if row["source_key"] not in stored]
+                db.bulk_insert_mappings(SandboxRun, fresh)
+                db.commit()
+                return len(fresh)
+
+    # Pipeline
+
+    async def ingest_directory(self, directory: Path, recursive: bool = True,
+                               instrument_id: Optional[int] = None, method_id: Optional[int] = None,
+                               auto_detect_peaks: bool = True, batch_size: Optional[int] = None,
+                               job: Optional[RunIngestJob] = None) -> RunIngestJob:
+        """Ingest every export file below a directory; returns the job with its counters"""
+        root = Path(directory)
+        if not root.is_dir():
+            raise ValueError(f"Directory not found: {directory}")
+        job = job or RunIngestJob(id=str(uuid.uuid4()), directory=str(root))
+        batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        defaults = {"instrument_id": instrument_id, "method_id": method_id, "compound_ids": [], "fault_params": {}}
+
+        base = key_base(root)
+        files = scan_export_directory(root, recursive)
+        pending_insert: Optional[asyncio.Future] = None
+        try:
+            while True:
+                batch = await asyncio.to_thread(lambda: list(itertools.islice(files, batch_size)))
+                if not batch:
+                    break
+                job.files_found += len(batch)
+
+                keyed = [
+                    (ingest_key(base, path.relative_to(root).as_posix(), stat), path) for path, stat in batch
+                ]
+                stored = await asyncio.to_thread(self.existing_keys, [key for key, _ in keyed])
+                todo = [(key, path) for key, path in keyed if key not in stored]
+                job.files_skipped += len(keyed) - len(todo)
+
+                jobs = [
+                    (str(path), path.relative_to(root).as_posix(), EXPORT_FILE_TYPES[path.suffix.lower()],
+                     auto_detect_peaks, settings.TRACE_STORAGE_DTYPE)
+                    for _, path in todo
+                ]
+                parsed: Dict[int, Dict[str, Any]] = {}
+                async for index, row, error in map_as_completed(parse_export_job, jobs):
+                    if error is not None:
+                        self._record_failure(job, jobs[index][1], error)
+                    else:
+                        parsed[index] = {**defaults, **row, "source_key": todo[index][0]}
+                rows = [parsed[index] for index in sorted(parsed)]
+
+                if pending_insert is not None:
+                    await asyncio.shield(pending_insert)
+                pending_insert = self._start_insert(job, rows)
+                await self._publish_progress(job)
+
+            if pending_insert is not None:
+                await asyncio.shield(pending_insert)
+        finally:
+            if pending_insert is not None and not pending_insert.done():
+                # The insert thread cannot be interrupted; wait for its commit so
+                # a cancelled job still counts every run it stored
+                await asyncio.wait([pending_insert])
+
+        logger.info(
+            f"Ingested {root}: {job.runs_inserted} runs inserted, "
+            f"{job.files_skipped} already present, {job.files_failed} failed"
+        )
+        return job
+
+    def _start_insert(self, job: RunIngestJob, rows: List[Dict[str, Any]]) -> asyncio.Future:
+        """Insert a batch in a thread; the job is credited when the commit finishes"""
+        insert = asyncio.ensure_future(asyncio.to_thread(self.insert_runs, rows))
+
+        def credit(done: asyncio.Future) -> None:
+            if not done.cancelled() and done.exception() is None:
+                job.runs_inserted += done.result()
+
+        insert.add_done_callback(credit)
+        return insert
+
+    def _record_failure(self, job: RunIngestJob, source_file: str, error: BaseException) -> None:
+        logger.warning(f"Failed to ingest {source_file}: {str(error)}")
+        job.files_failed += 1
+        if len(job.failures) < MAX_REPORTED_FAILURES:
+            job.failures.append(f"{source_file}: {str(error)}")
+
+    # Background jobs
+
+    def start_ingest_job(self, directory: Path, recursive: bool = True, instrument_id: Optional[int] = None,
+                         method_id: Optional[int] = None, auto_detect_peaks: bool = True,
+                         batch_size: Optional[int] = None) -> RunIngestJob:
+        """Queue a directory for background ingestion and return immediately"""
+        job = RunIngestJob(id=str(uuid.uuid4()), directory=str(directory))
+        self._register_job(job)
+        self._start_task(job, self._execute_job(
+            job, directory, recursive, instrument_id, method_id, auto_detect_peaks, batch_size
+        ))
+
+        logger.info(f"Queued ingest job {job.id} for {directory}")
+        return job
+
+    async def _execute_job(self, job: RunIngestJob, directory: Path, *options: Any) -> None:
+        try:
+            job.status = "running"
+            job.started_at = datetime.now()
+            await self._publish_progress(job)
+
+            await self.ingest_directory(directory, *options, job=job)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            logger.error(f"Ingest job {job.id} failed: {str(e)}")
+            job.status = "error"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now()
+            await self._publish_progress(job)
+
+
+# Create service instance
+ingestion_service = IngestionService()
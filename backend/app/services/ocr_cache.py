@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Content-hash cache for OCR work.
+
+Two tiers, both keyed by the SHA-256 of the uploaded image bytes:
+
+- preprocessed images, keyed by (hash, ImagePreprocessingOptions, image type),
+  stored as lossless PNG;
+- OCR text regions, keyed by (hash, options, quality level and the region
+  selection fields of the request), stored as zlib-compressed JSON.
+
+Re-opening a scan that was already read skips Tesseract entirely. Callers
+that preprocess with ChromatogramImageProcessor.process_image_pipeline (the
+/process endpoint and batch jobs) also skip preprocessing when only the
+quality level changed; ChromatogramOCREngine.process_chromatogram_image
+preprocesses again on every text cache miss. Payloads live in files under
+settings.OCR_CACHE_DIR and a SQLite index tracks their size and last use, so
+every process of the OCR pool shares the cache. Each tier is trimmed to its
+own byte budget, least recently used first; a budget of 0 disables the tier.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.core.simulation_cache import request_key
+from app.models.schemas import ImagePreprocessingOptions, OCRTextRegion
+
+logger = logging.getLogger(__name__)
+
+PREPROCESSED = "preprocessed"
+TEXT = "text"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    tier TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    meta TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_tier_last_used ON entries (tier, last_used);
+"""
+
+
+def image_digest(data: bytes) -> str:
+    """SHA-256 of the raw image file bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class OCRCache:
+    """Disk LRU of preprocessed images and OCR text regions"""
+
+    def __init__(self, root: str, max_image_bytes: int, max_text_bytes: int):
+        self.root = Path(root)
+        self.budgets = {PREPROCESSED: max_image_bytes, TEXT: max_text_bytes}
+
+        self._lock = threading.Lock()
+        self._initialized = False
+        self.hits = {PREPROCESSED: 0, TEXT: 0}
+        self.misses = {PREPROCESSED: 0, TEXT: 0}
+
+    # Keys
+
+    @staticmethod
+    def preprocessed_key(image_hash: str, options: ImagePreprocessingOptions, image_type: Any) -> str:
+        return request_key({
+            "tier": PREPROCESSED,
+            "image": image_hash,
+            "options": options.model_dump(mode="json"),
+            "image_type": image_type
+        })
+
+    @staticmethod
+    def text_key(image_hash: str, pipeline: str, options: ImagePreprocessingOptions,
+                 quality_level: Any, selection: Dict[str, Any]) -> str:
+        """selection: request fields that change which regions are read (image type, ROI, layout flags)"""
+        return request_key({
+            "tier": TEXT,
+            "image": image_hash,
+            "pipeline": pipeline,
+            "options": options.model_dump(mode="json"),
+            "quality_level": quality_level,
+            "selection": selection
+        })
+
+    # Storage
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection to the index and commit on success"""
+        if not self._initialized:
+            self.root.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.root / "index.db"), timeout=30)
+        try:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                self._initialized = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _path(self, tier: str, key: str) -> Path:
+        return self.root / tier / key[:2] / f"{key}.{'png' if tier == PREPROCESSED else 'json.z'}"
+
+    def _read(self, tier: str, key: str) -> Optional[tuple]:
+        """(payload bytes, meta) of an entry, refreshing its last use"""
+        if self.budgets[tier] <= 0:
+            return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT meta FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+
+        payload = None
+        if row is not None:
+            try:
+                payload = self._path(tier, key).read_bytes()
+            except OSError:
+                # Evicted by another process between the lookup and the read
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+        with self._lock:
+            if payload is None:
+                self.misses[tier] += 1
+                return None
+            self.hits[tier] += 1
+        return payload, json.loads(row[0])
+
+    def _write(self, tier: str, key: str, payload: bytes, meta: Dict[str, Any]) -> None:
+        budget = self.budgets[tier]
+        if budget <= 0 or len(payload) > budget:
+            return
+        path = self._path(tier, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f".{uuid.uuid4().hex}.tmp")
+        partial.write_bytes(payload)
+        os.replace(partial, path)
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, tier, size_bytes, last_used, meta) VALUES (?, ?, ?, ?, ?)",
+                (key, tier, len(payload), time.time(), json.dumps(meta))
+            )
+            self._evict(conn, tier)
+
+    def _evict(self, conn: sqlite3.Connection, tier: str) -> None:
+        """Drop the least recently used entries of a tier beyond its budget"""
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM entries WHERE tier = ?", (tier,)
+        ).fetchone()[0]
+        excess = total - self.budgets[tier]
+        if excess <= 0:
+            return
+
+        victims = []
+        for key, size in conn.execute(
+            "SELECT key, size_bytes FROM entries WHERE tier = ? ORDER BY last_used", (tier,)
+        ):
+            victims.append(key)
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in victims])
+        for key in victims:
+            self._path(tier, key).unlink(missing_ok=True)
+        logger.info(f"OCR cache evicted {len(victims)} {tier} entries over the disk budget")
+
+    # Tiers
+
+    def get_preprocessed(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached process_image_pipeline result (successful runs only)"""
+        entry = self._read(PREPROCESSED, key)
+        if entry is None:
+            return None
+        payload, meta = entry
+        image = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            return None
+        return {**meta, "processed_image": image, "success": True, "error": None}
+
+    def put_preprocessed(self, key: str, result: Dict[str, Any]) -> None:
+        ok, encoded = cv2.imencode(".png", result["processed_image"])
+        if not ok:
+            return
+        meta = {name: result[name] for name in ("original_dimensions", "final_dimensions",
+                                                "processing_steps", "page_transform", "profile_used")}
+        self._write(PREPROCESSED, key, encoded.tobytes(), meta)
+
+    def get_text(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached text regions with the image dimensions and layout regions they were read from"""
+        entry = self._read(TEXT, key)
+        if entry is None:
+            return None
+        payload, meta = entry
+        regions = json.loads(zlib.decompress(payload))
+        return {**meta, "text_regions": [OCRTextRegion.model_validate(region) for region in regions]}
+
+    def put_text(self, key: str, text_regions: List[OCRTextRegion], original_dimensions: Dict[str, int],
+                 layout_regions: List[Dict[str, Any]]) -> None:
+        payload = zlib.compress(json.dumps([region.model_dump(mode="json") for region in text_regions]).encode("utf-8"), 6)
+        self._write(TEXT, key, payload, {
+            "original_dimensions": original_dimensions,
+            "layout_regions": layout_regions
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        """Entries, bytes and hit counts per tier (hits and misses are for this process)"""
+        with self._connect() as conn:
+            rows = dict(
+                (tier, (count, size)) for tier, count, size in conn.execute(
+                    "SELECT tier, COUNT(*), COALESCE(SUM(size_bytes), 0) FROM entries GROUP BY tier"
+                )
+            )
+        with self._lock:
+            return {
+                tier: {
+                    "entries": rows.get(tier, (0, 0))[0],
+                    "bytes": rows.get(tier, (0, 0))[1],
+                    "budget_bytes": self.budgets[tier],
+                    "hits": self.hits[tier],
+                    "misses": self.misses[tier]
+                }
+                for tier in (PREPROCESSED, TEXT)
+            }
+
+
+_ocr_cache_instance = None
+
+
+def get_ocr_cache() -> OCRCache:
+    """Get singleton OCR cache instance"""
+    global _ocr_cache_instance
+    if _ocr_cache_instance is None:
+        _ocr_cache_instance = OCRCache(
+            root=settings.OCR_CACHE_DIR or os.path.join(settings.get_data_dir(), "ocr_cache"),
+            max_image_bytes=settings.OCR_CACHE_IMAGE_MAX_MB * 1024 * 1024,
+            max_text_bytes=settings.OCR_CACHE_TEXT_MAX_MB * 1024 * 1024
+        )
+    return _ocr_cache_instance
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Background OCR batch jobs.
+
+Uploaded images are spooled to disk (UPLOAD_DIR/ocr_jobs/<job id>) and run
+through preprocessing and Tesseract in a dedicated OCR pool of
+settings.OCR_WORKERS processes, so large batches use every core without
+touching the event loop or the chromatogram analysis pool. With
+OCR_WORKERS = -1 a thread pool is used instead; that is usually enough
+because Tesseract itself runs as a subprocess.
+
+Each job keeps at most two images per worker in flight, so concurrent jobs
+share the pool and cancellation takes effect quickly. Results are appended
+as images finish and can be fetched while the job is still running. Once
+OCR_MAX_PENDING_IMAGES images are waiting, new batches are refused until the
+queue drains; a batch reserves its images when the job is created. Only the
+newest OCR_JOB_RETENTION finished jobs and their results are kept. Images
+already seen (by content hash) are served from the OCR cache, skipping
+Tesseract or at least preprocessing.
+"""
+
+import asyncio
+import base64
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.models.schemas import OCRJob, OCRProcessingRequest, OCRProcessingResult
+from app.services.background_jobs import BackgroundJobService
+from app.services.image_processor import get_image_processor
+from app.services.ocr_cache import image_digest
+from app.services.ocr_service import get_ocr_engine
+
+logger = logging.getLogger(__name__)
+
+MAX_REPORTED_ERRORS = 50
+IMAGES_IN_FLIGHT_PER_WORKER = 2
+
+
+class OCRQueueFull(RuntimeError):
+    """Raised by create_job when the batch would exceed OCR_MAX_PENDING_IMAGES"""
+
+
+def ocr_image_job(path: str, index: int, filename: str, request_fields: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pool job: preprocess and OCR one spooled image.
+    The result is serialized to JSON-safe types for the trip back from the worker.
+    """
+    data = Path(path).read_bytes()
+    image_hash = image_digest(data)
+    request = OCRProcessingRequest(image_base64=base64.b64encode(data).decode("ascii"), **request_fields)
+    metadata = {"batch_index": index, "original_filename": filename, "file_size_bytes": len(data)}
+
+    # A scan read before with the same settings skips decoding, preprocessing and OCR
+    result = get_ocr_engine().get_cached_result(request, image_hash)
+    if result is None:
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Failed to decode image data")
+
+        preprocessing = get_image_processor().process_image_pipeline(
+            image, request.preprocessing, request.image_type, image_hash=image_hash
+        )
+        if not preprocessing["success"]:
+            raise ValueError(f"Image preprocessing failed: {preprocessing['error']}")
+
+        result = get_ocr_engine().process_preprocessed_image(
+            preprocessing["processed_image"], request, preprocessing["original_dimensions"], image_hash,
+            preprocessing.get("page_transform")
+        )
+        metadata["preprocessing_steps"] = preprocessing["processing_steps"]
+
+    result.processing_metadata.update(metadata)
+    return result.model_dump(mode="json")
+
+
+class OCRJobService(BackgroundJobService):
+    """Queue of OCR batch jobs processed in a shared worker pool"""
+
+    progress_type = "ocr_progress"
+    progress_exclude = {"errors", "processing_metadata"}
+    retention_setting = "OCR_JOB_RETENTION"
+
+    def __init__(self, spool_root: Optional[Path] = None):
+        super().__init__()
+        self.spool_root = Path(spool_root or Path(settings.UPLOAD_DIR) / "ocr_jobs")
+        self.results: Dict[str, List[OCRProcessingResult]] = {}
+        self._executor: Optional[Executor] = None
+        self._workers = 1
+        self._executor_lock = threading.Lock()
+
+    # Worker pool
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                workers = settings.OCR_WORKERS
+                self._workers = workers if workers > 0 else os.cpu_count() or 1
+                if workers >= 0:
+                    try:
+                        self._executor = ProcessPoolExecutor(max_workers=self._workers)
+                    except (OSError, NotImplementedError) as e:
+                        logger.warning(f"OCR process pool unavailable ({e}); using threads")
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="ocr")
+            return self._executor
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut the OCR pool down; the next job starts a fresh one"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    # Submission
+
+    def pending_images(self) -> int:
+        """Images accepted but not processed yet, across all jobs"""
+        return sum(
+            job.total_images - job.completed_images - job.failed_images
+            for job in self.jobs.values()
+            if job.status in ("queued", "running")
+        )
+
+    def has_capacity(self, image_count: int) -> bool:
+        """Whether a batch of image_count images may be queued now (back-pressure)"""
+        return self.pending_images() + image_count <= settings.OCR_MAX_PENDING_IMAGES
+
+    def create_job(self, total_images: int, processing_metadata: Optional[Dict[str, Any]] = None) -> OCRJob:
+        """
+        Register a job and its spool directory; images are added with spool_image.
+        The capacity check and the reservation of total_images happen together,
+        so concurrent uploads cannot overshoot OCR_MAX_PENDING_IMAGES.
+        """
+        job_id = str(uuid.uuid4())
+        job = OCRJob(
+            id=job_id,
+            batch_id=f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job_id[:8]}",
+            total_images=total_images,
+            processing_metadata=processing_metadata or {}
+        )
+        with self._jobs_lock:
+            if not self.has_capacity(total_images):
+                raise OCRQueueFull(f"OCR queue is full ({self.pending_images()} images pending)")
+            self._add_job(job)
+            self.results[job.id] = []
+        (self.spool_root / job.id).mkdir(parents=True, exist_ok=True)
+        return job
+
+    def _forget_job(self, job_id: str) -> None:
+        super()._forget_job(job_id)
+        self.results.pop(job_id, None)
+
+    def abort_job(self, job: OCRJob, error: str) -> None:
+        """Mark a job that never started as failed and release its reservation"""
+        job.status = "error"
+        job.error = error
+        job.finished_at = datetime.now()
+        shutil.rmtree(self.spool_root / job.id, ignore_errors=True)
+
+    def spool_image(self, job: OCRJob, index: int, filename: Optional[str], source: BinaryIO) -> Path:
+        """Copy one uploaded image into the job's spool directory (blocking)"""
+        safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", Path(filename or "image").name)
+        path = self.spool_root / job.id / f"{index:06d}_{safe_name}"
+        with open(path, "wb") as target:
+            shutil.copyfileobj(source, target)
+        return path
+
+    def record_failure(self, job: OCRJob, filename: Optional[str], error: Any) -> None:
+        """Count an image as failed, keeping the first MAX_REPORTED_ERRORS messages"""
+        logger.warning(f"OCR failed for {filename}: {error}")
+        job.failed_images += 1
+        if len(job.errors) < MAX_REPORTED_ERRORS:
+            job.errors.append(f"{filename}: {error}")
+
+    def start_job(self, job: OCRJob, images: List[Tuple[int, str, Path]],
+                  request_fields: Dict[str, Any]) -> OCRJob:
+        """Start processing (index, filename, spooled path) images in the background"""
+        self._start_task(job, self._execute_job(job, images, request_fields))
+
+        logger.info(f"Queued OCR job {job.id} with {len(images)} images")
+        return job
+
+    # Execution
+
+    async def _execute_job(self, job: OCRJob, images: List[Tuple[int, str, Path]],
+                           request_fields: Dict[str, Any]) -> None:
+        loop = asyncio.get_running_loop()
+        pending: Dict[asyncio.Future, Tuple[int, str]] = {}
+        try:
+            job.status = "running"
+            job.started_at = datetime.now()
+            await self._publish_progress(job)
+
+            executor = self._get_executor()
+            window = self._workers * IMAGES_IN_FLIGHT_PER_WORKER
+            for index, filename, path in images:
+                if len(pending) >= window:
+                    await self._collect(job, pending)
+                future = loop.run_in_executor(executor, ocr_image_job, str(path), index, filename, request_fields)
+                pending[future] = (index, filename)
+            while pending:
+                await self._collect(job, pending)
+
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            logger.error(f"OCR job {job.id} failed: {str(e)}")
+            job.status = "error"
+            job.error = str(e)
+        finally:
+            for future in pending:
+                future.cancel()
+            shutil.rmtree(self.spool_root / job.id, ignore_errors=True)
+            job.finished_at = datetime.now()
+            await self._publish_progress(job)
+
+    async def _collect(self, job: OCRJob, pending: Dict[asyncio.Future, Tuple[int, str]]) -> None:
+        """Wait for at least one image and record everything that finished"""
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            index, filename = pending.pop(future)
+            try:
+                result = OCRProcessingResult(**future.result())
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM); drop the pool so later jobs get a new one
+                self.shutdown(wait=False)
+                raise
+            except Exception as e:
+                self.record_failure(job, filename, e)
+                continue
+
+            self.results[job.id].append(result)
+            if result.success:
+                job.completed_images += 1
+            else:
+                self.record_failure(job, filename, "; ".join(result.errors) or "OCR failed")
+        await self._publish_progress(job)
+
+    # Polling
+
+    def get_results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[OCRProcessingResult]:
+        """Results in completion order (batch_index in processing_metadata); partial while running"""
+        if job_id not in self.jobs:
+            raise ValueError("Job not found")
+        return self.results[job_id][offset:offset + limit]
+
+    def cancel_job(self, job_id: str) -> bool:
+        """Cancel a running job; results already produced are kept"""
+        if not super().cancel_job(job_id):
+            return False
+        job = self.jobs[job_id]
+        if job.status == "queued":
+            # Cancelled before it started, so _execute_job never runs its cleanup
+            job.status = "cancelled"
+            job.finished_at = datetime.now()
+            shutil.rmtree(self.spool_root / job.id, ignore_errors=True)
+        return True
+
+
+# Create service instance
+ocr_job_service = OCRJobService()
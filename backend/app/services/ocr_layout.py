@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Layout analysis for chromatogram report pages.
+
+Finds the text zones of a page before OCR so Tesseract only reads those
+crops instead of the whole (usually upscaled) image. The page is binarized,
+connected components that are not glyph-sized (the chromatogram trace, axes,
+table rules, specks) are dropped, the remaining glyphs are merged into words
+with a morphological closing, and nearby words are linked into blocks (table
+cells across column gaps included). Each block is classified from its row
+and column structure as a "peak_table" or as "method_parameters" text, and
+gets the matching Tesseract page segmentation mode.
+
+Custom regions of interest are given in the coordinates of the uploaded
+image; preprocessing scales and deskews the page, so they are mapped through
+the same affine transform (see scale_transform and deskew_transform) before
+cropping.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+PEAK_TABLE = "peak_table"
+METHOD_PARAMETERS = "method_parameters"
+
+# Tesseract --psm per region: uniform block for tables, variable-size column
+# for free text, single line for one-line blocks
+REGION_PSM = {PEAK_TABLE: 6, METHOD_PARAMETERS: 4}
+SINGLE_LINE_PSM = 7
+
+MAX_LAYOUT_REGIONS = 8  # More blocks than this is cheaper to OCR as one page
+MAX_LAYOUT_FRAGMENTS = 4000  # Pages with more words than this (noise, dense scans) are read whole
+DEFAULT_TEXT_HEIGHT = 12
+
+
+@dataclass
+class LayoutRegion:
+    """Text block found by layout analysis (page pixel coordinates)"""
+    x: int
+    y: int
+    width: int
+    height: int
+    region_type: str
+    lines: int
+    columns: int
+
+    @property
+    def psm(self) -> int:
+        if self.lines <= 1:
+            return SINGLE_LINE_PSM
+        return REGION_PSM[self.region_type]
+
+    @property
+    def bbox(self) -> Dict[str, int]:
+        return {"x": self.x, "y": self.y, "width": self.width, "height": self.height}
+
+
+def binarize_ink(image: np.ndarray) -> np.ndarray:
+    """Otsu binarization with ink as 255 on a 0 background"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return ink
+
+
+def _spans(profile: np.ndarray, min_gap: int) -> List[Tuple[int, int]]:
+    """Non-empty runs [start, end) of a projection profile, bridging gaps shorter than min_gap"""
+    filled = np.flatnonzero(profile)
+    if len(filled) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(filled) > min_gap)
+    starts = np.concatenate(([filled[0]], filled[breaks + 1]))
+    ends = np.concatenate((filled[breaks], [filled[-1]])) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def block_structure(block: np.ndarray, text_height: float) -> Tuple[int, int]:
+    """
+    Text lines and aligned columns of a glyph block. A column gap must be
+    blank on every line and lie inside every line's extent, so the ragged
+    word spacing of free text does not count, only gaps repeated row by row.
+    """
+    rows = _spans(block.any(axis=1), max(int(0.25 * text_height), 1))
+    if not rows:
+        return 0, 0
+    shared = np.ones(block.shape[1], dtype=bool)
+    for r0, r1 in rows:
+        ink = block[r0:r1].any(axis=0)
+        filled = np.flatnonzero(ink)
+        inside = np.zeros_like(shared)
+        inside[filled[0]:filled[-1] + 1] = True
+        shared &= inside & ~ink
+    # Gaps wider than 1.2 text heights separate columns
+    gaps = _spans(shared, 1)
+    columns = 1 + sum(1 for g0, g1 in gaps if g1 - g0 > 1.2 * text_height)
+    return len(rows), columns
+
+
+def glyph_mask(ink: np.ndarray) -> Tuple[np.ndarray, float, np.ndarray]:
+    """
+    Keep only glyph-sized connected components.
+    Returns the glyph mask, the median glyph height and the stats of the
+    long thin components (horizontal rules) that were removed.
+    """
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    widths, heights, areas = stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT], stats[1:, cv2.CC_STAT_AREA]
+
+    plausible = (heights >= 4) & (heights <= ink.shape[0] / 10) & (widths <= 5 * heights) & (areas >= 10)
+    text_height = float(np.median(heights[plausible])) if plausible.any() else DEFAULT_TEXT_HEIGHT
+
+    keep = (
+        (heights <= 3 * text_height) & (widths <= 8 * text_height)
+        & (areas >= 0.02 * text_height ** 2)
+    )
+    rules = (widths >= 8 * text_height) & (heights <= max(text_height / 3, 3))
+
+    lookup = np.zeros(count, dtype=np.uint8)
+    lookup[1:][keep] = 255
+    return lookup[labels], text_height, stats[1:][rules]
+
+
+def _link_fragments(boxes: np.ndarray, text_height: float) -> np.ndarray:
+    """
+    Block label per fragment box (x, y, width, height). Fragments on the same
+    line join across gaps of up to twelve text heights (table columns);
+    fragments that overlap horizontally join across up to 2.5 text heights
+    of line spacing (stacked lines, table rows).
+    """
+    n = len(boxes)
+    left, top = boxes[:, 0], boxes[:, 1]
+    right, bottom = left + boxes[:, 2], top + boxes[:, 3]
+
+    # Sweep in order of left edge: only boxes starting within reach of a
+    # box's right edge can link to it, so candidate pairs stay near-linear
+    order = np.argsort(left, kind="stable")
+    reach = np.searchsorted(left[order], right[order] + 12 * text_height, side="right")
+    counts = reach - np.arange(n) - 1
+    first = np.repeat(np.arange(n), counts)
+    second = first + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    i, j = order[first], order[second]
+
+    gap_x = np.maximum(left[i], left[j]) - np.minimum(right[i], right[j])
+    gap_y = np.maximum(top[i], top[j]) - np.minimum(bottom[i], bottom[j])
+    linked = ((gap_y < 0) & (gap_x <= 12 * text_height)) | ((gap_x < 0) & (gap_y <= 2.5 * text_height))
+    graph = csr_matrix((np.ones(int(linked.sum()), dtype=np.int8), (i[linked], j[linked])), shape=(n, n))
+    return connected_components(graph, directed=False)[1]
+
+
+def detect_text_blocks(image: np.ndarray, max_regions: int = MAX_LAYOUT_REGIONS) -> List[LayoutRegion]:
+    """
+    Text blocks of a page image, largest first; empty when nothing text-like
+    is found, the page holds more than MAX_LAYOUT_FRAGMENTS words or it splits
+    into more than max_regions blocks (callers then OCR the full page).
+    """
+    ink = binarize_ink(image)
+    glyphs, text_height, rules = glyph_mask(ink)
+
+    # Words and phrases: close letter and word gaps, then link them into blocks
+    kernel = cv2.getStructuringElement(
+        cv2.MORPH_RECT, (max(int(1.5 * text_height), 3), max(int(0.5 * text_height), 1))
+    )
+    fragments = cv2.connectedComponentsWithStats(cv2.morphologyEx(glyphs, cv2.MORPH_CLOSE, kernel), connectivity=8)[2][1:, :4]
+    fragments = fragments[(fragments[:, 3] >= 0.5 * text_height) & (fragments[:, 2] >= 0.5 * text_height)]
+    if len(fragments) == 0 or len(fragments) > MAX_LAYOUT_FRAGMENTS:
+        return []
+    labels = _link_fragments(fragments, text_height)
+    if labels.max() + 1 > max_regions:
+        return []
+
+    boxes = np.array([
+        [members[:, 0].min(), members[:, 1].min(),
+         (members[:, 0] + members[:, 2]).max(), (members[:, 1] + members[:, 3]).max()]
+        for members in (fragments[labels == label] for label in range(labels.max() + 1))
+    ])
+    tables = [_is_table(glyphs, box, text_height, rules) for box in boxes]
+
+    # Table headers are often set off by a rule and extra spacing; fold
+    # blocks just above or below a table into it
+    for i in np.flatnonzero(tables):
+        x0, y0, x1, y1 = boxes[i]
+        near = (
+            (boxes[:, 0] < x1) & (boxes[:, 2] > x0)
+            & (boxes[:, 1] - y1 <= 4 * text_height) & (y0 - boxes[:, 3] <= 4 * text_height)
+        )
+        boxes[i] = [boxes[near, 0].min(), boxes[near, 1].min(), boxes[near, 2].max(), boxes[near, 3].max()]
+        boxes[near & (np.arange(len(boxes)) != i)] = 0
+    boxes = boxes[boxes[:, 2] > 0]
+
+    regions = []
+    for x0, y0, x1, y1 in boxes:
+        lines, columns = block_structure(glyphs[y0:y1, x0:x1], text_height)
+        regions.append(LayoutRegion(
+            x=int(x0), y=int(y0), width=int(x1 - x0), height=int(y1 - y0),
+            region_type=PEAK_TABLE if _is_table(glyphs, (x0, y0, x1, y1), text_height, rules) else METHOD_PARAMETERS,
+            lines=lines, columns=columns
+        ))
+    return sorted(regions, key=lambda r: r.width * r.height, reverse=True)
+
+
+def _is_table(glyphs: np.ndarray, box, text_height: float, rules: np.ndarray) -> bool:
+    """Three or more rows with three or more aligned columns, or a ruled block of two or more"""
+    x0, y0, x1, y1 = box
+    lines, columns = block_structure(glyphs[y0:y1, x0:x1], text_height)
+    ruled = int(np.count_nonzero(
+        (rules[:, cv2.CC_STAT_LEFT] < x1) & (rules[:, cv2.CC_STAT_LEFT] + rules[:, cv2.CC_STAT_WIDTH] > x0)
+        & (rules[:, cv2.CC_STAT_TOP] >= y0 - text_height) & (rules[:, cv2.CC_STAT_TOP] <= y1 + text_height)
+    ))
+    return (lines >= 3 and columns >= 3) or (lines >= 2 and columns >= 2 and ruled >= 2)
+
+
+def crop_region(image: np.ndarray, region: LayoutRegion, padding: int = 8) -> Tuple[np.ndarray, int, int]:
+    """Padded crop of a region and the page coordinates of its top-left corner"""
+    y0, x0 = max(region.y - padding, 0), max(region.x - padding, 0)
+    y1 = min(region.y + region.height + padding, image.shape[0])
+    x1 = min(region.x + region.width + padding, image.shape[1])
+    return image[y0:y1, x0:x1], x0, y0
+
+
+def scale_transform(source_shape: Sequence[int], page_shape: Sequence[int]) -> np.ndarray:
+    """3x3 affine of a resize from source_shape to page_shape (numpy shapes)"""
+    return np.diag([page_shape[1] / source_shape[1], page_shape[0] / source_shape[0], 1.0])
+
+
+def deskew_transform(angle: float, source_shape: Sequence[int], page_shape: Sequence[int]) -> np.ndarray:
+    """
+    3x3 affine of a deskew rotation: by angle degrees (as for
+    cv2.getRotationMatrix2D) about the source center, which lands on the page
+    center (the page may be enlarged to hold the rotated corners).
+    """
+    center = (source_shape[1] / 2, source_shape[0] / 2)
+    matrix = np.vstack([cv2.getRotationMatrix2D(center, angle, 1.0), [0.0, 0.0, 1.0]])
+    matrix[0, 2] += page_shape[1] / 2 - center[0]
+    matrix[1, 2] += page_shape[0] / 2 - center[1]
+    return matrix
+
+
+def map_roi(roi: Dict[str, int], transform: np.ndarray,
+            page_shape: Sequence[int]) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Page box (x, y, width, height) covering a region of interest given in
+    source image coordinates, clipped to the page; None when nothing of it
+    is left on the page.
+    """
+    x, y, width, height = roi["x"], roi["y"], roi["width"], roi["height"]
+    corners = np.array([[x, y, 1], [x + width, y, 1], [x, y + height, 1], [x + width, y + height, 1]], dtype=float)
+    mapped = corners @ np.asarray(transform, dtype=float)[:2].T
+    x0, y0 = np.clip(np.floor(mapped.min(axis=0)), 0, None).astype(int)
+    x1 = int(min(np.ceil(mapped[:, 0].max()), page_shape[1]))
+    y1 = int(min(np.ceil(mapped[:, 1].max()), page_shape[0]))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return int(x0), int(y0), x1 - int(x0), y1 - int(y0)
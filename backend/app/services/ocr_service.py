@@ -24,6 +24,15 @@ from app.models.schemas import (
     OCRMethodParameters, OCRSampleInfo, ImagePreprocessingOptions,
     OCRQualityLevel, OCRImageType, OCRCalibrationData, OCRHealthStatus
 )
+from app.services.ocr_cache import get_ocr_cache, image_digest
+from app.services.ocr_layout import (
+    LayoutRegion, PEAK_TABLE, METHOD_PARAMETERS, crop_region, deskew_transform, detect_text_blocks,
+    map_roi, scale_transform
+)
+
+# Preprocessing a cached text entry went through
+ENGINE_PIPELINE = "ocr_engine"  # ChromatogramOCREngine.preprocess_image
+PROCESSOR_PIPELINE = "image_processor"  # ChromatogramImageProcessor.process_image_pipeline
 
 
 # =================== BULLETPROOF LOGGING INFRASTRUCTURE ===================
@@ -91,9 +100,14 @@ class ChromatogramOCREngine:
     
     def preprocess_image(self, image: np.ndarray, options: ImagePreprocessingOptions) -> np.ndarray:
         """Advanced image preprocessing for optimal OCR results"""
+        return self._preprocess(image, options)[0]
+    
+    def _preprocess(self, image: np.ndarray, options: ImagePreprocessingOptions) -> Tuple[np.ndarray, np.ndarray]:
+        """Preprocessed image and the 3x3 affine mapping source pixels onto it"""
         self.logger.info(f"Preprocessing image with options: {options}")
         
         processed = image.copy()
+        transform = np.eye(3)
         
         try:
             # Scale image for better OCR
@@ -102,6 +116,7 @@ class ChromatogramOCREngine:
                 new_width = int(width * options.scale_factor)
                 new_height = int(height * options.scale_factor)
                 processed = cv2.resize(processed, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+                transform = scale_transform(image.shape, processed.shape) @ transform
                 
             # Convert to grayscale if needed
             if len(processed.shape) == 3:
@@ -122,21 +137,22 @@ class ChromatogramOCREngine:
             
             # Deskewing
             if options.deskew:
-                processed = self._deskew_image(processed)
+                processed, angle = self._deskew_image(processed)
+                transform = deskew_transform(angle, processed.shape, processed.shape) @ transform
             
             # Binarization
             if options.binarize:
                 _, processed = cv2.threshold(processed, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
             
             self.logger.info("Image preprocessing completed successfully")
-            return processed
+            return processed, transform
             
         except Exception as e:
             self.logger.error(f"Image preprocessing failed: {str(e)}")
-            return image  # Return original if preprocessing fails
+            return image, np.eye(3)  # Return original if preprocessing fails
     
-    def _deskew_image(self, image: np.ndarray) -> np.ndarray:
-        """Automatically correct image skew"""
+    def _deskew_image(self, image: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Automatically correct image skew; returns the image and the rotation applied (degrees)"""
         try:
             # Find lines using HoughLinesP
             edges = cv2.Canny(image, 50, 150, apertureSize=3)
@@ -158,51 +174,111 @@ class ChromatogramOCREngine:
                         center = tuple(np.array(image.shape[1::-1]) / 2)
                         rotation_matrix = cv2.getRotationMatrix2D(center, median_angle, 1.0)
                         image = cv2.warpAffine(image, rotation_matrix, image.shape[1::-1], flags=cv2.INTER_LINEAR)
+                        return image, float(median_angle)
             
-            return image
+            return image, 0.0
             
         except Exception as e:
             self.logger.warning(f"Deskewing failed: {str(e)}")
-            return image
+            return image, 0.0
     
     def extract_text_regions(self, image: np.ndarray, quality_level: OCRQualityLevel) -> List[OCRTextRegion]:
         """Extract all text regions with bounding boxes and confidence scores"""
         self.logger.info(f"Extracting text regions with quality level: {quality_level}")
         
         try:
-            config = self.tesseract_configs[quality_level]
+            text_regions = self._read_text(image, quality_level)
+            self.logger.info(f"Extracted {len(text_regions)} text regions")
+            return text_regions
             
+        except Exception as e:
+            self.logger.error(f"Text extraction failed: {str(e)}")
+            return []
+    
+    def _read_text(self, image: np.ndarray, quality_level: OCRQualityLevel,
+                   regions: Optional[List[LayoutRegion]] = None) -> List[OCRTextRegion]:
+        """Run Tesseract on the full image or on each layout region; raises on OCR failure"""
+        config = self.tesseract_configs[quality_level]
+        if not regions:
             # Get detailed data from Tesseract
             data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+            return self._text_regions_from_data(data)
+        
+        text_regions = []
+        for region in sorted(regions, key=lambda r: (r.y, r.x)):
+            crop, offset_x, offset_y = crop_region(image, region)
+            region_config = re.sub(r'--psm \d+', f'--psm {region.psm}', config)
+            try:
+                data = pytesseract.image_to_data(crop, config=region_config, output_type=pytesseract.Output.DICT)
+            except Exception as e:
+                raise RuntimeError(f"OCR of region {region.bbox} failed: {str(e)}") from e
+            text_regions.extend(self._text_regions_from_data(data, offset_x, offset_y))
+        return text_regions
+    
+    def _text_regions_from_data(self, data: Dict[str, List], offset_x: int = 0,
+                                offset_y: int = 0) -> List[OCRTextRegion]:
+        """Confident, non-empty words of a Tesseract image_to_data result"""
+        text_regions = []
+        n_boxes = len(data['level'])
+        
+        for i in range(n_boxes):
+            confidence = int(float(data['conf'][i]))
+            text = data['text'][i].strip()
             
-            text_regions = []
-            n_boxes = len(data['level'])
-            
-            for i in range(n_boxes):
-                confidence = int(data['conf'][i])
-                text = data['text'][i].strip()
+            # Filter out low confidence and empty text
+            if confidence > 30 and text:
+                x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
                 
-                # Filter out low confidence and empty text
-                if confidence > 30 and text:
-                    x, y, w, h = data['left'][i], data['top'][i], data['width'][i], data['height'][i]
-                    
-                    # Classify region type based on content
-                    region_type = self._classify_text_region(text)
-                    
-                    region = OCRTextRegion(
-                        text=text,
-                        confidence=confidence / 100.0,
-                        bbox={"x": x, "y": y, "width": w, "height": h},
-                        region_type=region_type
-                    )
-                    text_regions.append(region)
-            
-            self.logger.info(f"Extracted {len(text_regions)} text regions")
-            return text_regions
-            
+                # Classify region type based on content
+                region_type = self._classify_text_region(text)
+                
+                region = OCRTextRegion(
+                    text=text,
+                    confidence=confidence / 100.0,
+                    bbox={"x": x + offset_x, "y": y + offset_y, "width": w, "height": h},
+                    region_type=region_type
+                )
+                text_regions.append(region)
+        
+        return text_regions
+    
+    def select_layout_regions(self, image: np.ndarray, request: OCRProcessingRequest,
+                              page_transform: Optional[np.ndarray] = None) -> List[LayoutRegion]:
+        """
+        Regions to OCR instead of the full page: the request's custom_roi, or
+        the detected text blocks holding the requested data. Empty means the
+        full page is read. custom_roi boxes are in uploaded image coordinates
+        and are mapped through page_transform (source pixels to the processed
+        page; identity when omitted), then clipped to the page.
+        """
+        if request.custom_roi:
+            transform = np.eye(3) if page_transform is None else page_transform
+            boxes = [map_roi(roi, transform, image.shape) for roi in request.custom_roi]
+            return [
+                LayoutRegion(x=x, y=y, width=width, height=height,
+                             region_type=PEAK_TABLE if request.extract_peaks else METHOD_PARAMETERS,
+                             lines=2, columns=1)
+                for x, y, width, height in filter(None, boxes)
+            ]
+        if not request.layout_analysis:
+            return []
+        
+        try:
+            blocks = detect_text_blocks(image)
         except Exception as e:
-            self.logger.error(f"Text extraction failed: {str(e)}")
+            self.logger.warning(f"Layout analysis failed: {str(e)}")
             return []
+        
+        wanted = set()
+        if request.extract_peaks:
+            wanted.add(PEAK_TABLE)
+        if request.extract_method_params or request.extract_sample_info:
+            wanted.add(METHOD_PARAMETERS)
+        selected = [block for block in blocks if block.region_type in wanted]
+        if request.extract_peaks and not any(block.region_type == PEAK_TABLE for block in blocks):
+            # No tabular block recognised; peaks may still be listed as free text
+            selected = blocks
+        return selected
     
     def _classify_text_region(self, text: str) -> str:
         """Classify text region based on content patterns"""
@@ -235,6 +311,11 @@ class ChromatogramOCREngine:
         peaks_data = []
         
         try:
+            table_peaks = self._parse_peak_table(text_regions)
+            if table_peaks:
+                self.logger.info(f"Extracted {len(table_peaks)} peaks from peak table")
+                return table_peaks
+            
             # Group text regions that might belong to the same peak
             peak_groups = self._group_peak_related_text(text_regions)
             
@@ -280,6 +361,66 @@ class ChromatogramOCREngine:
             self.logger.error(f"Peak extraction failed: {str(e)}")
             return []
     
+    def _group_text_lines(self, text_regions: List[OCRTextRegion]) -> List[List[OCRTextRegion]]:
+        """Words grouped into lines by vertical center, top to bottom, each line left to right"""
+        lines: List[List[OCRTextRegion]] = []
+        for region in sorted(text_regions, key=lambda r: r.bbox['y'] + r.bbox['height'] / 2):
+            center = region.bbox['y'] + region.bbox['height'] / 2
+            if lines:
+                last = lines[-1][-1].bbox
+                if abs(center - (last['y'] + last['height'] / 2)) <= max(last['height'], region.bbox['height']) / 2:
+                    lines[-1].append(region)
+                    continue
+            lines.append([region])
+        return [sorted(line, key=lambda r: r.bbox['x']) for line in lines]
+    
+    def _parse_peak_table(self, text_regions: List[OCRTextRegion]) -> List[OCRPeakData]:
+        """
+        Peaks from a tabular report: find the header line (RT, Area, Height,
+        Area%, ...) and read each following line's numbers into the column
+        whose header is horizontally nearest. Empty if no header is found.
+        """
+        header_keys = [
+            ('area_percent', r'^(area\s*)?%|%$|percent|conc'),
+            ('retention_time', r'^(rt|r\.t\.?|ret\.?|retention|time)'),
+            ('area', r'^area'),
+            ('height', r'^height'),
+            ('peak_number', r'^(peak|pk|#|no\.?)$'),
+        ]
+        lines = self._group_text_lines(text_regions)
+        
+        for header_index, line in enumerate(lines):
+            columns = {}
+            for region in line:
+                text = region.text.strip().lower()
+                for field, pattern in header_keys:
+                    if field not in columns and re.search(pattern, text):
+                        columns[field] = region.bbox['x'] + region.bbox['width'] / 2
+                        break
+            if len(columns) < 2 or not ({'retention_time', 'area'} & set(columns)):
+                continue
+            
+            peaks = []
+            for row in lines[header_index + 1:]:
+                peak = OCRPeakData()
+                for region in row:
+                    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*%?', region.text.replace(',', ''))
+                    if not match:
+                        continue
+                    center = region.bbox['x'] + region.bbox['width'] / 2
+                    field = min(columns, key=lambda f: abs(columns[f] - center))
+                    if getattr(peak, field) is None:
+                        value = float(match.group(1))
+                        setattr(peak, field, int(value) if field == 'peak_number' else value)
+                if not any([peak.retention_time, peak.area, peak.height]):
+                    if peaks:
+                        break  # End of the table
+                    continue
+                peaks.append(peak)
+            if peaks:
+                return peaks
+        return []
+    
     def _group_peak_related_text(self, text_regions: List[OCRTextRegion]) -> List[List[OCRTextRegion]]:
         """Group text regions that likely belong to the same peak"""
         groups = []
@@ -443,85 +584,211 @@ class ChromatogramOCREngine:
         self.logger.info(f"Processing chromatogram image of type: {request.image_type}")
         
         try:
-            # Decode base64 image
+            # Decode base64 image; a scan read before is answered from the OCR cache
             image_data = base64.b64decode(request.image_base64)
-            image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
-            
-            if image is None:
-                raise ValueError("Failed to decode image data")
+            image_hash = image_digest(image_data)
+            cached = self._cached_result(request, image_hash, ENGINE_PIPELINE, start_time)
+            if cached is not None:
+                return cached
             
+            image = self.decode_image_bytes(image_data)
             original_dimensions = {"width": image.shape[1], "height": image.shape[0]}
             
             # Preprocess image
-            processed_image = self.preprocess_image(image, request.preprocessing)
-            
-            # Extract text regions
-            text_regions = self.extract_text_regions(processed_image, request.quality_level)
-            
-            # Extract specific data types based on request
-            peaks_data = []
-            method_parameters = None
-            sample_info = None
-            
-            if request.extract_peaks:
-                peaks_data = self.extract_peaks_data(text_regions)
+            processed_image, page_transform = self._preprocess(image, request.preprocessing)
             
-            if request.extract_method_params:
-                method_parameters = self.extract_method_parameters(text_regions)
-            
-            if request.extract_sample_info:
-                sample_info = self.extract_sample_info(text_regions)
-            
-            # Calculate confidence metrics
-            overall_confidence, text_quality, peak_quality = self.calculate_confidence_metrics(
-                text_regions, peaks_data
-            )
-            
-            processing_time = int((time.time() - start_time) * 1000)
-            self.total_processing_time += processing_time
-            self.successful_extractions += 1
-            
-            result = OCRProcessingResult(
-                success=True,
-                processing_time_ms=processing_time,
-                image_dimensions=original_dimensions,
-                text_regions=text_regions,
-                peaks_data=peaks_data,
-                method_parameters=method_parameters,
-                sample_info=sample_info,
-                overall_confidence=overall_confidence,
-                text_extraction_quality=text_quality,
-                peak_detection_quality=peak_quality,
-                preprocessing_applied=request.preprocessing,
-                warnings=[],
-                errors=[]
-            )
+            return self._extract_result(processed_image, request, original_dimensions, start_time,
+                                        self.text_cache_key(request, image_hash, ENGINE_PIPELINE), page_transform)
             
-            self.logger.info(f"OCR processing completed successfully in {processing_time}ms")
-            return result
+        except Exception as e:
+            return self._failed_result(request, e, start_time)
+    
+    def process_preprocessed_image(self, image: np.ndarray, request: OCRProcessingRequest,
+                                   original_dimensions: Optional[Dict[str, int]] = None,
+                                   image_hash: Optional[str] = None,
+                                   page_transform: Optional[List[List[float]]] = None) -> OCRProcessingResult:
+        """
+        OCR an image that already went through ChromatogramImageProcessor.process_image_pipeline;
+        request.preprocessing is reported as applied but not run again. With image_hash
+        the extracted text is stored in the OCR cache (look it up first with get_cached_result).
+        page_transform is the pipeline's "page_transform"; without it custom_roi boxes
+        are only rescaled from original_dimensions.
+        """
+        start_time = time.time()
+        self.total_processed += 1
+        
+        self.logger.info(f"Processing preprocessed chromatogram image of type: {request.image_type}")
+        
+        try:
+            if original_dimensions is None:
+                original_dimensions = {"width": image.shape[1], "height": image.shape[0]}
+            cache_key = self.text_cache_key(request, image_hash, PROCESSOR_PIPELINE) if image_hash else None
+            if page_transform is None:
+                source_shape = (original_dimensions["height"], original_dimensions["width"])
+                transform = scale_transform(source_shape, image.shape)
+            else:
+                transform = np.asarray(page_transform, dtype=float)
+            return self._extract_result(image, request, original_dimensions, start_time, cache_key, transform)
+        except Exception as e:
+            return self._failed_result(request, e, start_time)
+    
+    def get_cached_result(self, request: OCRProcessingRequest, image_hash: str) -> Optional[OCRProcessingResult]:
+        """Result from cached text for an image preprocessed with ChromatogramImageProcessor, if any"""
+        start_time = time.time()
+        try:
+            result = self._cached_result(request, image_hash, PROCESSOR_PIPELINE, start_time)
+        except Exception as e:
+            self.logger.warning(f"OCR cache lookup failed: {str(e)}")
+            return None
+        if result is not None:
+            self.total_processed += 1
+        return result
+    
+    def text_cache_key(self, request: OCRProcessingRequest, image_hash: str, pipeline: str) -> str:
+        """OCR cache key: image content, preprocessing, quality level and region selection"""
+        return get_ocr_cache().text_key(
+            image_hash, pipeline, request.preprocessing, request.quality_level,
+            request.model_dump(mode="json", include={
+                "image_type", "custom_roi", "layout_analysis",
+                "extract_peaks", "extract_method_params", "extract_sample_info"
+            })
+        )
+    
+    def _cached_result(self, request: OCRProcessingRequest, image_hash: str, pipeline: str,
+                       start_time: float) -> Optional[OCRProcessingResult]:
+        cached = get_ocr_cache().get_text(self.text_cache_key(request, image_hash, pipeline))
+        if cached is None:
+            return None
+        self.logger.info(f"OCR text cache hit for {image_hash[:12]}")
+        return self._build_result(request, cached["text_regions"], cached["original_dimensions"],
+                                  cached["layout_regions"], start_time, cache_hit=True)
+    
+    @staticmethod
+    def decode_image(image_base64: str) -> np.ndarray:
+        """Decode a base64 encoded image file into a BGR array"""
+        return ChromatogramOCREngine.decode_image_bytes(base64.b64decode(image_base64))
+    
+    @staticmethod
+    def decode_image_bytes(image_data: bytes) -> np.ndarray:
+        """Decode image file bytes into a BGR array"""
+        image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+        
+        if image is None:
+            raise ValueError("Failed to decode image data")
+        return image
+    
+    def _extract_result(self, processed_image: np.ndarray, request: OCRProcessingRequest,
+                        original_dimensions: Dict[str, int], start_time: float,
+                        cache_key: Optional[str] = None,
+                        page_transform: Optional[np.ndarray] = None) -> OCRProcessingResult:
+        """Text extraction and data parsing shared by both entry points"""
+        # Extract text regions, limited to the page's text blocks where layout analysis finds them
+        layout_regions = self.select_layout_regions(processed_image, request, page_transform)
+        layout_summary = [
+            {**region.bbox, "region_type": region.region_type, "psm": region.psm}
+            for region in layout_regions
+        ]
+        self.logger.info(f"Extracting text from {len(layout_regions) or 'full page'} regions "
+                         f"with quality level: {request.quality_level}")
+        
+        try:
+            try:
+                text_regions = self._read_text(processed_image, request.quality_level, layout_regions)
+            except Exception as e:
+                if not layout_regions:
+                    raise
+                # A region Tesseract cannot read should not cost the whole page
+                self.logger.warning(f"{str(e)}; reading the full page instead")
+                layout_summary = []
+                text_regions = self._read_text(processed_image, request.quality_level)
+            self.logger.info(f"Extracted {len(text_regions)} text regions")
             
+            # Only text Tesseract actually produced is cached
+            if cache_key:
+                try:
+                    get_ocr_cache().put_text(cache_key, text_regions, original_dimensions, layout_summary)
+                except Exception as e:
+                    self.logger.warning(f"Failed to cache OCR text: {str(e)}")
         except Exception as e:
-            processing_time = int((time.time() - start_time) * 1000)
-            self.total_processing_time += processing_time
-            self.last_error = str(e)
-            
-            self.logger.error(f"OCR processing failed: {str(e)}")
-            
-            return OCRProcessingResult(
-                success=False,
-                processing_time_ms=processing_time,
-                image_dimensions={"width": 0, "height": 0},
-                text_regions=[],
-                peaks_data=[],
-                method_parameters=None,
-                sample_info=None,
-                overall_confidence=0.0,
-                text_extraction_quality="failed",
-                peak_detection_quality="failed",
-                preprocessing_applied=request.preprocessing,
-                warnings=[],
-                errors=[str(e)]
-            )
+            self.logger.error(f"Text extraction failed: {str(e)}")
+            text_regions = []
+        
+        return self._build_result(request, text_regions, original_dimensions, layout_summary, start_time)
+    
+    def _build_result(self, request: OCRProcessingRequest, text_regions: List[OCRTextRegion],
+                      original_dimensions: Dict[str, int], layout_regions: List[Dict[str, Any]],
+                      start_time: float, cache_hit: bool = False) -> OCRProcessingResult:
+        """Parse peaks, method and sample data from text regions into a result"""
+        # Extract specific data types based on request
+        peaks_data = []
+        method_parameters = None
+        sample_info = None
+        
+        if request.extract_peaks:
+            peaks_data = self.extract_peaks_data(text_regions)
+        
+        if request.extract_method_params:
+            method_parameters = self.extract_method_parameters(text_regions)
+        
+        if request.extract_sample_info:
+            sample_info = self.extract_sample_info(text_regions)
+        
+        # Calculate confidence metrics
+        overall_confidence, text_quality, peak_quality = self.calculate_confidence_metrics(
+            text_regions, peaks_data
+        )
+        
+        processing_time = int((time.time() - start_time) * 1000)
+        self.total_processing_time += processing_time
+        self.successful_extractions += 1
+        
+        result = OCRProcessingResult(
+            success=True,
+            processing_time_ms=processing_time,
+            image_dimensions=original_dimensions,
+            text_regions=text_regions,
+            peaks_data=peaks_data,
+            method_parameters=method_parameters,
+            sample_info=sample_info,
+            overall_confidence=overall_confidence,
+            text_extraction_quality=text_quality,
+            peak_detection_quality=peak_quality,
+            preprocessing_applied=request.preprocessing,
+            warnings=[],
+            errors=[],
+            image_type=request.image_type,
+            processing_metadata={
+                "layout_regions": layout_regions,
+                "cache_hit": cache_hit
+            }
+        )
+        
+        self.logger.info(f"OCR processing completed successfully in {processing_time}ms")
+        return result
+    
+    def _failed_result(self, request: OCRProcessingRequest, error: Exception, start_time: float) -> OCRProcessingResult:
+        processing_time = int((time.time() - start_time) * 1000)
+        self.total_processing_time += processing_time
+        self.last_error = str(error)
+        
+        self.logger.error(f"OCR processing failed: {str(error)}")
+        
+        return OCRProcessingResult(
+            success=False,
+            processing_time_ms=processing_time,
+            image_dimensions={"width": 0, "height": 0},
+            text_regions=[],
+            peaks_data=[],
+            method_parameters=None,
+            sample_info=None,
+            overall_confidence=0.0,
+            text_extraction_quality="failed",
+            peak_detection_quality="failed",
+            preprocessing_applied=request.preprocessing,
+            warnings=[],
+            errors=[str(error)],
+            image_type=request.image_type
+        )
     
     def get_health_status(self) -> OCRHealthStatus:
         """Get OCR service health status"""
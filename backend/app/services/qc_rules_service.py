@@ -4,18 +4,68 @@ QC Rules Evaluation Service - Westgard Rules Implementation
 """
 
 import logging
-from typing import List, Dict, Tuple, Any
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Any, Optional
 from datetime import datetime
 
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
 from app.models.schemas import QCTimeSeriesPoint, QCRuleHit, QCResult, QCPolicy
 
 logger = logging.getLogger(__name__)
 
+# Longest look-back of any rule (10-x)
+RULE_WINDOW = 10
+
+# Points each rule flags when it fires, and whether it waits for strict mode
+RULE_SPANS = {"1-2s": 1, "1-3s": 1, "2-2s": 2, "R-4s": 2, "4-1s": 4, "10-x": 10}
+STRICT_RULES = {"2-2s", "R-4s", "4-1s", "10-x"}
+
+
+@dataclass
+class AnalyteRuleState:
+    """Streaming rule state for one analyte series"""
+    window: deque = field(default_factory=lambda: deque(maxlen=RULE_WINDOW))  # (point, z)
+    count: int = 0
+    mean: float = 0.0  # Running mean of observed values (Welford)
+    m2: float = 0.0
+    run_above_1s: int = 0
+    run_below_1s: int = 0
+    run_above_mean: int = 0
+    run_below_mean: int = 0
+    
+    @property
+    def sd(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+    
+    def push(self, point: QCTimeSeriesPoint) -> float:
+        """Add a point and return its z-score"""
+        z = (point.value - point.mean) / point.sd if point.sd > 0 else 0.0
+        
+        self.count += 1
+        delta = point.value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (point.value - self.mean)
+        
+        self.run_above_1s = self.run_above_1s + 1 if z >= 1.0 else 0
+        self.run_below_1s = self.run_below_1s + 1 if z <= -1.0 else 0
+        self.run_above_mean = self.run_above_mean + 1 if z > 0 else 0
+        self.run_below_mean = self.run_below_mean + 1 if z < 0 else 0
+        
+        self.window.append((point, z))
+        return z
+
 
 class QCRulesService:
     """Service for evaluating Westgard QC rules"""
     
     def __init__(self):
+        self._states: Dict[str, AnalyteRuleState] = {}
+        self._state_lock = threading.Lock()
         self.rule_functions = {
             "1-2s": self._rule_1_2s,
             "1-3s": self._rule_1_3s,
@@ -244,6 +294,152 @@ class QCRulesService:
         
         return violations
     
+    # Streaming evaluation
+
+    def append_point(self, point: QCTimeSeriesPoint, policy: QCPolicy,
+                     key: Optional[str] = None) -> Tuple[List[QCRuleHit], QCResult]:
+        """
+        Add one QC point to its series and evaluate every rule for it in O(1).
+        
+        Equivalent to calling evaluate_rules on the full history ending at this
+        point, but only the last RULE_WINDOW z-scores and run lengths are kept.
+        Points must arrive in timestamp order per series.
+        
+        Args:
+            point: New QC point
+            policy: QC evaluation policy
+            key: Series key (defaults to the analyte; use e.g. method/instrument/analyte
+                 when one service tracks several control charts for the same analyte)
+        """
+        key = key or point.analyte
+        with self._state_lock:
+            state = self._states.setdefault(key, AnalyteRuleState())
+            z = state.push(point)
+            fired = self._fired_rules(state, z, policy)
+            window = list(state.window)
+        
+        rule_hits = []
+        for rule in fired:
+            for hit_point, hit_z in window[-RULE_SPANS[rule]:]:
+                rule_hits.append(QCRuleHit(
+                    rule=rule,
+                    analyte=point.analyte,
+                    value=hit_point.value,
+                    zscore=hit_z,
+                    runId=f"qc_{hit_point.timestamp.isoformat()}",
+                    timestamp=hit_point.timestamp
+                ))
+        
+        result = QCResult(
+            analyte=point.analyte,
+            value=point.value,
+            unit="ppm",  # Default unit, could be from target
+            zscore=z,
+            flags=fired,
+            status=self._determine_status(fired, z, policy)
+        )
+        return rule_hits, result
+    
+    def load_history(self, points: List[QCTimeSeriesPoint], key: Optional[str] = None) -> None:
+        """Rebuild streaming state from a stored series (ordered by timestamp)"""
+        state = AnalyteRuleState()
+        for point in points:
+            state.push(point)
+        with self._state_lock:
+            self._states[key or (points[0].analyte if points else "")] = state
+    
+    def reset_state(self, key: Optional[str] = None) -> None:
+        """Drop streaming state for one series, or all of them (e.g. after a target change)"""
+        with self._state_lock:
+            if key is None:
+                self._states.clear()
+            else:
+                self._states.pop(key, None)
+    
+    def get_state(self, key: str) -> Optional[AnalyteRuleState]:
+        """Current streaming state (running mean/SD, count) for a series"""
+        return self._states.get(key)
+    
+    def _fired_rules(self, state: AnalyteRuleState, z: float, policy: QCPolicy) -> List[str]:
+        strict = state.count >= policy.requireNBeforeStrict
+        previous_z = state.window[-2][1] if len(state.window) >= 2 else None
+        
+        checks = {
+            "1-2s": abs(z) >= 2.0,
+            "1-3s": abs(z) >= 3.0,
+            "2-2s": previous_z is not None and (
+                (previous_z >= 2.0 and z >= 2.0) or (previous_z <= -2.0 and z <= -2.0)),
+            "R-4s": previous_z is not None and abs(z - previous_z) >= 4.0 and previous_z * z < 0,
+            "4-1s": state.run_above_1s >= 4 or state.run_below_1s >= 4,
+            "10-x": state.run_above_mean >= 10 or state.run_below_mean >= 10
+        }
+        return [
+            rule for rule in self.rule_functions
+            if checks[rule] and (strict or rule not in STRICT_RULES)
+        ]
+    
+    # Bulk (historical) evaluation
+
+    def evaluate_series_bulk(self, points: List[QCTimeSeriesPoint],
+                             policy: QCPolicy) -> Dict[str, List[QCResult]]:
+        """
+        Re-evaluate whole histories at once, e.g. after a target mean/SD change.
+        
+        Returns, per analyte and in timestamp order, the QCResult each point
+        would have received had it been appended with append_point. All rules
+        are computed with sliding windows over the z-score array.
+        """
+        results = {}
+        for analyte, series in self._group_by_analyte(points).items():
+            series.sort(key=lambda p: p.timestamp)
+            values = np.array([p.value for p in series], dtype=float)
+            means = np.array([p.mean for p in series], dtype=float)
+            sds = np.array([p.sd for p in series], dtype=float)
+            z = np.divide(values - means, sds, out=np.zeros_like(values), where=sds > 0)
+            
+            fired = self._bulk_rule_masks(z, policy)
+            rules = list(fired)
+            flag_matrix = np.column_stack([fired[rule] for rule in rules])
+            
+            results[analyte] = []
+            for point, point_z, row in zip(series, z, flag_matrix):
+                flags = [rule for rule, hit in zip(rules, row) if hit]
+                results[analyte].append(QCResult(
+                    analyte=analyte,
+                    value=point.value,
+                    unit="ppm",
+                    zscore=float(point_z),
+                    flags=flags,
+                    status=self._determine_status(flags, float(point_z), policy)
+                ))
+        return results
+    
+    def _bulk_rule_masks(self, z: np.ndarray, policy: QCPolicy) -> Dict[str, np.ndarray]:
+        """Boolean mask per rule: does the rule fire when point i is the latest?"""
+        n = len(z)
+        strict = np.arange(1, n + 1) >= policy.requireNBeforeStrict
+        previous = np.concatenate(([np.nan], z[:-1]))
+        
+        def trailing_all(mask: np.ndarray, span: int) -> np.ndarray:
+            out = np.zeros(n, dtype=bool)
+            if n >= span:
+                out[span - 1:] = sliding_window_view(mask, span).all(axis=1)
+            return out
+        
+        with np.errstate(invalid="ignore"):
+            masks = {
+                "1-2s": np.abs(z) >= 2.0,
+                "1-3s": np.abs(z) >= 3.0,
+                "2-2s": ((previous >= 2.0) & (z >= 2.0)) | ((previous <= -2.0) & (z <= -2.0)),
+                "R-4s": (np.abs(z - previous) >= 4.0) & (previous * z < 0),
+                "4-1s": trailing_all(z >= 1.0, 4) | trailing_all(z <= -1.0, 4),
+                "10-x": trailing_all(z > 0, RULE_WINDOW) | trailing_all(z < 0, RULE_WINDOW)
+            }
+        
+        for rule in STRICT_RULES:
+            masks[rule] &= strict
+        return {rule: masks[rule] for rule in self.rule_functions}
+    
     def _determine_status(self, flags: List[str], z_score: float, policy: QCPolicy) -> str:
         """Determine QC status based on rule flags"""
         if not flags:
@@ -5,26 +5,118 @@ QC Service for managing QC targets, series data, and QC evaluation
 
 import uuid
 import logging
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Callable
 from datetime import datetime, timedelta
 
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.database import QCTargetRecord, QCRecordRecord, QCResultRecord
+from app.core.repository import ModelRepository
 from app.models.schemas import (
     QCTarget, QCRecord, QCTimeSeriesPoint, QCPolicy, QCResult, QCRuleHit,
     RunRecord, QuantResult
 )
-from app.services.qc_rules_service import qc_rules_service
+from app.services.qc_rules_service import QCRulesService
 
 logger = logging.getLogger(__name__)
 
 
+class QCRecordRepository(ModelRepository[QCRecord]):
+    """QC records plus one indexed qc_results row per analyte value"""
+    
+    child_tables = (QCResultRecord.__table__,)
+    
+    def __init__(self, targets: ModelRepository[QCTarget], **kwargs):
+        super().__init__(
+            QCRecordRecord, QCRecord,
+            lambda r: {"run_id": r.runId, "timestamp": r.timestamp, "overall_status": r.overallStatus},
+            **kwargs
+        )
+        self.targets = targets
+    
+    def _write(self, db: Session, key: str, record: QCRecord,
+               targets: Optional[List[QCTarget]] = None, **context: Any) -> None:
+        # Keep the method/instrument a result was evaluated against when the
+        # record is rewritten (e.g. a status override) without targets
+        scope = {(t.analyte, t.methodId, t.instrumentId) for t in targets or []}
+        previous = {
+            row.analyte: (row.method_id, row.instrument_id)
+            for row in db.query(QCResultRecord).filter(QCResultRecord.record_id == key)
+        }
+        
+        super()._write(db, key, record)
+        db.query(QCResultRecord).filter(QCResultRecord.record_id == key).delete(synchronize_session=False)
+        
+        for result in record.results:
+            method_id, instrument_id = self._scope_for(result.analyte, scope, previous)
+            db.add(QCResultRecord(
+                record_id=key,
+                method_id=method_id,
+                instrument_id=instrument_id,
+                analyte=result.analyte,
+                timestamp=record.timestamp,
+                value=result.value,
+                zscore=result.zscore,
+                status=result.status
+            ))
+    
+    def _scope_for(self, analyte: str, scope: set, previous: Dict[str, tuple]) -> tuple:
+        for target_analyte, method_id, instrument_id in scope:
+            if target_analyte == analyte:
+                return method_id, instrument_id
+        if analyte in previous:
+            return previous[analyte]
+        # Fall back to the target if exactly one is defined for this analyte
+        candidates = self.targets.find(analyte=analyte)
+        if len(candidates) == 1:
+            return candidates[0].methodId, candidates[0].instrumentId
+        return None, None
+    
+    def _delete(self, db: Session, keys: Optional[List[str]]) -> int:
+        # Delete child rows explicitly; SQLite does not enforce ON DELETE CASCADE by default
+        query = db.query(QCResultRecord)
+        if keys is not None:
+            query = query.filter(QCResultRecord.record_id.in_(keys))
+        query.delete(synchronize_session=False)
+        return super()._delete(db, keys)
+    
+    def series(self, analyte: str, method_id: str, instrument_id: Optional[str] = None,
+               since: Optional[datetime] = None) -> List[QCResultRecord]:
+        """
+        Per-analyte QC values, oldest first, from an indexed
+        (method, instrument, analyte, timestamp) range scan
+        """
+        with self._session() as db:
+            query = db.query(QCResultRecord).filter(
+                QCResultRecord.method_id == method_id,
+                QCResultRecord.analyte == analyte
+            )
+            if instrument_id is not None:
+                query = query.filter(or_(
+                    QCResultRecord.instrument_id == instrument_id,
+                    QCResultRecord.instrument_id.is_(None)
+                ))
+            if since is not None:
+                query = query.filter(QCResultRecord.timestamp >= since)
+            rows = query.order_by(QCResultRecord.timestamp).all()
+            db.expunge_all()
+        return rows
+
+
 class QCService:
     """Service for QC target management and QC evaluation"""
     
-    def __init__(self):
-        # In-memory storage for demo purposes
-        self.targets = {}  # id -> QCTarget
-        self.records = {}  # id -> QCRecord
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        # Persistent, indexed storage with an in-process read cache
+        self.targets = ModelRepository(
+            QCTargetRecord, QCTarget,
+            lambda t: {"method_id": t.methodId, "instrument_id": t.instrumentId, "analyte": t.analyte},
+            session_factory=session_factory
+        )  # id -> QCTarget
+        self.records = QCRecordRepository(self.targets, session_factory=session_factory)  # id -> QCRecord
         self.policy = QCPolicy()  # Default policy
+        self.rules = QCRulesService()  # Streaming Westgard state, one series per target
     
     def upsert_qc_target(self, target: QCTarget) -> QCTarget:
         """Create or update a QC target"""
@@ -35,51 +127,39 @@ class QCService:
             raise ValueError("Standard deviation must be positive")
         
         self.targets[target.id] = target
+        # z-scores of the stored series change with the target mean/SD
+        self.rules.reset_state(self._rule_key(target))
         logger.info(f"Upserted QC target {target.id} for {target.analyte}")
         return target
     
     def get_qc_targets(self, method_id: str, instrument_id: Optional[str] = None) -> List[QCTarget]:
         """Get QC targets for a method and optional instrument"""
-        targets = []
-        for target in self.targets.values():
-            if target.methodId == method_id:
-                if instrument_id is None or target.instrumentId == instrument_id or target.instrumentId is None:
-                    targets.append(target)
-        return targets
+        targets = self.targets.find(method_id=method_id)
+        if instrument_id is None:
+            return targets
+        return [t for t in targets if t.instrumentId == instrument_id or t.instrumentId is None]
     
     def get_qc_series(self, analyte: str, method_id: str, 
                      instrument_id: Optional[str] = None, 
                      days: int = 30) -> List[QCTimeSeriesPoint]:
         """Get QC time series data for an analyte"""
         # Find target for this analyte
-        target = None
-        for t in self.targets.values():
-            if (t.analyte == analyte and t.methodId == method_id):
-                target = t
-                break
-        
-        if not target:
+        targets = self.targets.find(method_id=method_id, analyte=analyte)
+        if not targets:
             return []
+        target = targets[0]
         
-        # Build time series from QC records
-        series_points = []
         cutoff = datetime.now() - timedelta(days=days)
-        
-        for record in self.records.values():
-            if record.timestamp >= cutoff:
-                for result in record.results:
-                    if result.analyte == analyte:
-                        point = QCTimeSeriesPoint(
-                            timestamp=record.timestamp,
-                            analyte=analyte,
-                            value=result.value,
-                            mean=target.mean,
-                            sd=target.sd
-                        )
-                        series_points.append(point)
-        
-        series_points.sort(key=lambda p: p.timestamp)
-        return series_points
+        return [
+            QCTimeSeriesPoint(
+                timestamp=row.timestamp,
+                analyte=analyte,
+                value=row.value,
+                mean=target.mean,
+                sd=target.sd
+            )
+            for row in self.records.series(analyte, method_id, instrument_id, since=cutoff)
+        ]
     
     def append_qc_result(self, run: RunRecord, quant: QuantResult, 
                         targets: List[QCTarget], policy: Optional[QCPolicy] = None) -> QCRecord:
@@ -87,8 +167,11 @@ class QCService:
         if policy is None:
             policy = self.policy
         
-        # Extract QC results from quantitation
+        timestamp = run.timestamp if hasattr(run, 'timestamp') else datetime.now()
+        
+        # Evaluate each quantitated analyte against its control chart
         qc_results = []
+        rule_hits = []
         
         for result_dict in quant.results:
             target_name = result_dict.get('targetName', '')
@@ -103,40 +186,54 @@ class QCService:
                     break
             
             if target:
-                # Calculate z-score
-                z_score = (concentration - target.mean) / target.sd if target.sd > 0 else 0.0
-                
-                qc_result = QCResult(
-                    analyte=target_name,
-                    value=concentration,
-                    unit=unit,
-                    zscore=z_score,
-                    flags=[],
-                    status="PASS"
+                point = QCTimeSeriesPoint(
+                    timestamp=timestamp, analyte=target_name, value=concentration,
+                    mean=target.mean, sd=target.sd
                 )
+                hits, qc_result = self.rules.append_point(point, policy, key=self._ensure_rule_state(target))
+                qc_result.unit = unit
                 qc_results.append(qc_result)
+                rule_hits.extend(hits)
+        
+        statuses = {result.status for result in qc_results}
+        overall_status = "FAIL" if "FAIL" in statuses else "WARN" if "WARN" in statuses else "PASS"
         
         # Create QC record
         qc_record = QCRecord(
             id=str(uuid.uuid4()),
             runId=str(run.id) if run.id else str(uuid.uuid4()),
-            timestamp=run.timestamp if hasattr(run, 'timestamp') else datetime.now(),
+            timestamp=timestamp,
             results=qc_results,
-            ruleHits=[],
-            overallStatus="PASS"
+            ruleHits=rule_hits,
+            overallStatus=overall_status
         )
         
-        # Store the record
-        self.records[qc_record.id] = qc_record
+        # Store the record (targets scope the indexed per-analyte rows)
+        self.records.save(qc_record.id, qc_record, targets=targets)
         
         logger.info(f"Created QC record {qc_record.id}")
         return qc_record
     
+    def _rule_key(self, target: QCTarget) -> str:
+        return f"{target.methodId}/{target.instrumentId or '*'}/{target.analyte}"
+    
+    def _ensure_rule_state(self, target: QCTarget) -> str:
+        """Series key of a target's control chart, loading its stored history on first use"""
+        key = self._rule_key(target)
+        if self.rules.get_state(key) is None:
+            history = self.records.series(target.analyte, target.methodId, target.instrumentId)
+            self.rules.load_history([
+                QCTimeSeriesPoint(
+                    timestamp=row.timestamp, analyte=target.analyte, value=row.value,
+                    mean=target.mean, sd=target.sd
+                )
+                for row in history
+            ], key=key)
+        return key
+    
     def get_qc_records(self, limit: int = 100) -> List[QCRecord]:
         """Get QC records"""
-        records = list(self.records.values())
-        records.sort(key=lambda r: r.timestamp, reverse=True)
-        return records[:limit]
+        return self.records.find(order_by="timestamp", descending=True, limit=limit)
     
     def get_qc_policy(self) -> QCPolicy:
         """Get current QC policy"""
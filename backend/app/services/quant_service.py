@@ -4,14 +4,18 @@ Enhanced quantitation service with IS support, outlier detection, and robust LOD
 """
 
 import numpy as np
+import time
 import uuid
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from datetime import datetime
 import logging
 import scipy.stats as stats
 from scipy import sparse
 from scipy.sparse.linalg import spsolve
+from sqlalchemy.orm import Session
 
+from app.core.database import CalibrationModelRecord, CalibrationVersionRecord, CalibrationBlankRunRecord
+from app.core.repository import ModelRepository
 from app.models.schemas import (
     CalibrationModel, CalibrationLevel, QuantRequest, QuantResult,
     RunRecord, Peak, CalibrationMode, OutlierPolicy, InternalStandard,
@@ -24,13 +28,43 @@ logger = logging.getLogger(__name__)
 class QuantitationService:
     """Enhanced service for calibration fitting and quantitation calculations"""
     
-    def __init__(self):
-        # In-memory storage for demo purposes
-        # In production, this would be a database
-        self.calibrations = {}
-        self.calibration_versions = {}
-        self.active_calibrations = {}  # method_id -> calibration_id
-        self.blank_runs = []  # Store blank runs for LOD/LOQ calculation
+    MAX_BLANK_RUNS = 10
+    
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        # Persistent, indexed storage with an in-process read cache
+        self.calibrations = ModelRepository(
+            CalibrationModelRecord, CalibrationModel,
+            lambda c: {
+                "version_id": c.version_id, "method_id": c.method_id, "instrument_id": c.instrument_id,
+                "target_name": c.target_name, "active": c.active, "created_at": c.created_at
+            },
+            session_factory=session_factory
+        )
+        self.calibration_versions = ModelRepository(
+            CalibrationVersionRecord, CalibrationVersion,
+            lambda v: {
+                "calibration_id": v.model.id, "method_id": v.model.method_id,
+                "instrument_id": v.model.instrument_id, "target_name": v.model.target_name,
+                "created_at": v.created_at
+            },
+            session_factory=session_factory
+        )
+        # Blank runs for LOD/LOQ calculation
+        self._blank_runs = ModelRepository(
+            CalibrationBlankRunRecord, RunRecord,
+            lambda r: {"created_at": datetime.now()},
+            session_factory=session_factory
+        )
+    
+    @property
+    def active_calibrations(self) -> Dict[int, str]:
+        """method_id -> active calibration_id"""
+        return {cal.method_id: cal.id for cal in self.calibrations.find(active=True, order_by="created_at")}
+    
+    @property
+    def blank_runs(self) -> List[RunRecord]:
+        """Most recent blank runs, oldest first"""
+        return self._blank_runs.find(order_by="created_at")
     
     def detect_outliers_grubbs(self, data: np.ndarray, alpha: float = 0.05) -> List[int]:
         """
@@ -379,6 +413,238 @@ class QuantitationService:
             logger.error(f"Enhanced calibration fitting failed: {str(e)}")
             raise ValueError(f"Enhanced calibration fitting failed: {str(e)}")
     
+    def fit_calibrations_batch(self, requests: List[CalibrationFitRequest]
+                               ) -> Tuple[List[CalibrationModel], Dict[str, str], Dict[str, float]]:
+        """
+        Fit many targets in one call (e.g. every analyte of a method)
+        
+        Curves are padded into (targets x levels) matrices and solved with
+        masked moment sums, so OLS, 1/x, 1/x² and through-zero fits, Grubbs/IQR
+        screening and refits run for all targets in a few array operations.
+        Estimators and LOD/LOQ fallbacks match fit_calibration_enhanced.
+        
+        Args:
+            requests: One calibration fit request per target
+            
+        Returns:
+            Tuple of (calibrations in request order, errors by target name, timing in ms)
+        """
+        start = time.perf_counter()
+        timing = {}
+        errors = {}
+        
+        prepared = []  # (request, valid level indices, x, y)
+        for request in requests:
+            try:
+                prepared.append((request, *self._calibration_points(request)))
+            except ValueError as e:
+                errors[request.target_name] = str(e)
+        
+        if not prepared:
+            timing["total_ms"] = (time.perf_counter() - start) * 1000
+            return [], errors, timing
+        
+        # Pad every curve to the widest one; the mask marks real points
+        width = max(len(x) for _, _, x, _ in prepared)
+        X = np.ones((len(prepared), width))
+        Y = np.zeros((len(prepared), width))
+        valid = np.zeros((len(prepared), width), dtype=bool)
+        for row, (_, _, x, y) in enumerate(prepared):
+            X[row, :len(x)] = x
+            Y[row, :len(y)] = y
+            valid[row, :len(x)] = True
+        
+        model_types = [request.model_type for request, *_ in prepared]
+        through_zero = np.array([m == "linear_through_zero" for m in model_types])
+        power = np.array([{"weighted_1/x": 1, "weighted_1/x2": 2}.get(m, 0) for m in model_types])
+        W = 1.0 / np.maximum(X ** power[:, None], 1e-10)
+        timing["prepare_ms"] = (time.perf_counter() - start) * 1000
+        
+        # Initial fit, outlier screening on residuals, refit without outliers
+        fit_start = time.perf_counter()
+        slope, intercept = self._fit_lines(X, Y, W, valid, through_zero, power > 0)
+        residuals = Y - (slope[:, None] * X + intercept[:, None])
+        
+        outliers = np.zeros_like(valid)
+        for policy, screen in ((OutlierPolicy.GRUBBS, self._grubbs_mask), (OutlierPolicy.IQR, self._iqr_mask)):
+            rows = np.array([request.outlier_policy == policy for request, *_ in prepared])
+            if rows.any():
+                outliers[rows] = screen(residuals[rows], valid[rows])
+        included = valid & ~outliers
+        
+        refit = outliers.any(axis=1) & (included.sum(axis=1) >= 2)
+        if refit.any():
+            slope[refit], intercept[refit] = self._fit_lines(
+                X[refit], Y[refit], W[refit], included[refit], through_zero[refit], power[refit] > 0
+            )
+            residuals = Y - (slope[:, None] * X + intercept[:, None])
+        
+        # R² and residual spread over included points
+        n_included = np.maximum(included.sum(axis=1), 1)
+        y_mean = np.where(included, Y, 0.0).sum(axis=1) / n_included
+        ss_res = np.where(included, residuals ** 2, 0.0).sum(axis=1)
+        ss_tot = np.where(included, (Y - y_mean[:, None]) ** 2, 0.0).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, 0.0)
+        residual_mean = np.where(included, residuals, 0.0).sum(axis=1) / n_included
+        noise_std = np.sqrt(np.where(included, (residuals - residual_mean[:, None]) ** 2, 0.0).sum(axis=1) / n_included)
+        timing["fit_ms"] = (time.perf_counter() - fit_start) * 1000
+        
+        # Build models
+        blank_runs = self.blank_runs
+        calibrations = []
+        for row, (request, valid_indices, x, _) in enumerate(prepared):
+            row_slope = float(slope[row])
+            excluded_points = [valid_indices[i] for i in np.flatnonzero(outliers[row, :len(x)])]
+            
+            levels = []
+            for i, level in enumerate(request.levels):
+                excluded = i in excluded_points
+                levels.append({
+                    **level.model_dump(),
+                    "included": not excluded,
+                    "outlier_reason": f"Excluded by {request.outlier_policy.value} test" if excluded else None
+                })
+            
+            lod, loq, lod_method = self.calculate_lod_loq_from_blanks(blank_runs, request.target_name, row_slope)
+            if lod is None:
+                lod, loq, lod_method = self.calculate_lod_loq_from_baseline([], row_slope)
+                if lod is None:
+                    lod = 3 * noise_std[row] / abs(row_slope) if row_slope != 0 else float('inf')
+                    loq = 10 * noise_std[row] / abs(row_slope) if row_slope != 0 else float('inf')
+                    lod_method = "residual_based"
+            
+            calibrations.append(CalibrationModel(
+                id=str(uuid.uuid4()),
+                version_id=str(uuid.uuid4()),
+                method_id=request.method_id,
+                instrument_id=request.instrument_id,
+                target_name=request.target_name,
+                model_type=request.model_type,
+                mode=request.mode,
+                internal_standard=request.internal_standard.model_dump() if request.internal_standard else None,
+                outlier_policy=request.outlier_policy,
+                levels=levels,
+                slope=row_slope,
+                intercept=float(intercept[row]),
+                r2=float(r2[row]),
+                residuals=residuals[row, :len(x)].tolist(),
+                excluded_points=excluded_points,
+                lod=float(lod) if lod is not None else None,
+                loq=float(loq) if loq is not None else None,
+                lod_method=lod_method,
+                active=False
+            ))
+        
+        # Store calibrations and versions in one transaction each
+        store_start = time.perf_counter()
+        created_at = datetime.now()
+        self.calibrations.save_many({c.id: c for c in calibrations})
+        self.calibration_versions.save_many({
+            c.version_id: CalibrationVersion(id=c.version_id, created_at=created_at, model=c)
+            for c in calibrations
+        })
+        timing["store_ms"] = (time.perf_counter() - store_start) * 1000
+        timing["total_ms"] = (time.perf_counter() - start) * 1000
+        
+        logger.info(f"Batch-fitted {len(calibrations)} calibrations ({len(errors)} failed) "
+                    f"in {timing['total_ms']:.1f} ms")
+        return calibrations, errors, timing
+    
+    def _calibration_points(self, request: CalibrationFitRequest) -> Tuple[List[int], np.ndarray, np.ndarray]:
+        """Valid level indices and (amount, response) arrays for a fit request"""
+        is_mode = request.mode == CalibrationMode.INTERNAL_STANDARD
+        if is_mode and not request.internal_standard:
+            raise ValueError("Internal standard configuration required for IS mode")
+        
+        indices, x, y = [], [], []
+        for i, level in enumerate(request.levels):
+            if level.amount is None or level.area is None:
+                continue
+            if is_mode:
+                if level.is_area is None or level.is_area <= 0:
+                    continue
+                y.append(level.area / level.is_area)
+            else:
+                y.append(level.area)
+            indices.append(i)
+            x.append(level.amount)
+        
+        if len(x) < 2:
+            raise ValueError("Need at least 2 valid IS calibration points" if is_mode
+                             else "Need at least 2 valid calibration points")
+        return indices, np.array(x, dtype=float), np.array(y, dtype=float)
+    
+    @staticmethod
+    def _fit_lines(X: np.ndarray, Y: np.ndarray, W: np.ndarray, mask: np.ndarray,
+                   through_zero: np.ndarray, weighted: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Row-wise slope/intercept over masked points (same estimators as the single fit)"""
+        m = mask.astype(float)
+        n = m.sum(axis=1)
+        sx, sy = (m * X).sum(axis=1), (m * Y).sum(axis=1)
+        sxx, sxy = (m * X * X).sum(axis=1), (m * X * Y).sum(axis=1)
+        
+        w = m * W
+        sw = w.sum(axis=1)
+        swx, swy = (w * X).sum(axis=1), (w * Y).sum(axis=1)
+        swxx, swxy = (w * X * X).sum(axis=1), (w * X * Y).sum(axis=1)
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            zero_slope = sxy / sxx
+            weighted_slope = swxy / swxx
+            weighted_intercept = (swy - weighted_slope * swx) / sw
+            ols_slope = (sxy - sx * sy / n) / (sxx - sx ** 2 / n)
+            ols_intercept = sy / n - ols_slope * sx / n
+        
+        slope = np.select([through_zero, weighted], [zero_slope, weighted_slope], ols_slope)
+        intercept = np.select([through_zero, weighted], [np.zeros_like(n), weighted_intercept], ols_intercept)
+        return slope, intercept
+    
+    @staticmethod
+    def _grubbs_mask(data: np.ndarray, mask: np.ndarray, alpha: float = 0.05) -> np.ndarray:
+        """Iterative two-sided Grubbs test on every row at once (see detect_outliers_grubbs)"""
+        active = mask.copy()
+        outliers = np.zeros_like(mask)
+        rows = np.arange(len(data))
+        running = np.ones(len(data), dtype=bool)
+        
+        while True:
+            n = active.sum(axis=1)
+            running &= n >= 3
+            if not running.any():
+                break
+            
+            count = np.maximum(n, 1)
+            mean = np.where(active, data, 0.0).sum(axis=1) / count
+            deviation = np.where(active, data - mean[:, None], 0.0)
+            std = np.sqrt((deviation ** 2).sum(axis=1) / np.maximum(n - 1, 1))
+            running &= std > 0
+            
+            g_stats = np.where(active, np.abs(deviation) / np.where(std > 0, std, 1.0)[:, None], -np.inf)
+            max_idx = g_stats.argmax(axis=1)
+            max_g = g_stats[rows, max_idx]
+            
+            nf = n.astype(float)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t_crit = stats.t.ppf(1 - alpha / (2 * nf), nf - 2)
+                g_crit = ((nf - 1) / np.sqrt(nf)) * np.sqrt(t_crit ** 2 / (nf - 2 + t_crit ** 2))
+            
+            hit = running & (max_g > g_crit)
+            outliers[rows[hit], max_idx[hit]] = True
+            active[rows[hit], max_idx[hit]] = False
+            running &= hit
+        
+        return outliers
+    
+    @staticmethod
+    def _iqr_mask(data: np.ndarray, mask: np.ndarray, factor: float = 1.5) -> np.ndarray:
+        """IQR screening on every row at once (see detect_outliers_iqr)"""
+        q1, q3 = np.nanpercentile(np.where(mask, data, np.nan), [25, 75], axis=1)
+        iqr = q3 - q1
+        outliers = mask & ((data < (q1 - factor * iqr)[:, None]) | (data > (q3 + factor * iqr)[:, None]))
+        outliers[mask.sum(axis=1) < 4] = False
+        return outliers
+    
     def quantitate_enhanced(self, run: RunRecord, calibration: CalibrationModel, 
                            mapping: Optional[Dict[str, str]] = None) -> QuantResult:
         """
@@ -520,6 +786,186 @@ class QuantitationService:
             logger.error(f"Enhanced quantitation failed: {str(e)}")
             raise ValueError(f"Enhanced quantitation failed: {str(e)}")
     
+    def quantitate_batch(self, runs: List[RunRecord], calibrations: List[CalibrationModel],
+                         mapping: Optional[Dict[str, str]] = None,
+                         rt_window: float = 0.1) -> List[QuantResult]:
+        """
+        Quantitate every target of a calibration set across many runs
+        
+        Peaks are matched by name first, then by the nearest retention time
+        within rt_window of the target's calibrated RT (mean RT of its
+        included levels), using binary search over a sorted RT index.
+        Concentrations and flags are computed as arrays per run.
+        
+        Args:
+            runs: Run records to quantitate
+            calibrations: One fitted calibration per target
+            mapping: Optional peak name to target name mapping
+            rt_window: Retention time tolerance (min) for unnamed peaks
+            
+        Returns:
+            One quantitation result per run, in input order
+        """
+        try:
+            table = self._build_target_table(calibrations)
+            return [self._quantitate_with_table(run, table, mapping or {}, rt_window) for run in runs]
+        except Exception as e:
+            logger.error(f"Batch quantitation failed: {str(e)}")
+            raise ValueError(f"Batch quantitation failed: {str(e)}")
+    
+    def _build_target_table(self, calibrations: List[CalibrationModel]) -> Dict[str, Any]:
+        """Per-target calibration constants as arrays (computed once per batch)"""
+        for calibration in calibrations:
+            if calibration.slope is None:
+                raise ValueError(f"Calibration not fitted for {calibration.target_name}")
+            if calibration.mode == CalibrationMode.INTERNAL_STANDARD and not calibration.internal_standard:
+                raise ValueError(f"Internal standard configuration missing for {calibration.target_name}")
+        
+        def level_rt(calibration: CalibrationModel) -> float:
+            rts = [level.rt for level in calibration.levels if level.included and level.rt is not None]
+            return float(np.mean(rts)) if rts else np.nan
+        
+        def max_amount(calibration: CalibrationModel) -> float:
+            amounts = [level.amount for level in calibration.levels if level.included]
+            return max(amounts) if amounts else np.inf
+        
+        return {
+            "names": [c.target_name for c in calibrations],
+            "keys": [c.target_name.lower() for c in calibrations],
+            "is_keys": [
+                c.internal_standard.peak_name.lower() if c.internal_standard else None
+                for c in calibrations
+            ],
+            "units": [c.levels[0].unit if c.levels else "ppm" for c in calibrations],
+            "modes": [c.mode.value for c in calibrations],
+            "is_mode": np.array([c.mode == CalibrationMode.INTERNAL_STANDARD for c in calibrations], dtype=bool),
+            "expected_rt": np.array([level_rt(c) for c in calibrations], dtype=float),
+            "slope": np.array([c.slope for c in calibrations], dtype=float),
+            "intercept": np.array([c.intercept or 0.0 for c in calibrations], dtype=float),
+            "lod": np.array([c.lod or np.nan for c in calibrations], dtype=float),
+            "loq": np.array([c.loq or np.nan for c in calibrations], dtype=float),
+            "max_calib": np.array([max_amount(c) for c in calibrations], dtype=float),
+        }
+    
+    def _quantitate_with_table(self, run: RunRecord, table: Dict[str, Any],
+                               mapping: Dict[str, str], rt_window: float) -> QuantResult:
+        """Vectorized quantitation of all targets in one run"""
+        peaks = run.peaks
+        n_targets = len(table["keys"])
+        
+        # Peak index: first peak per (mapped) name, and RTs sorted for binary search
+        name_index: Dict[str, int] = {}
+        for i, peak in enumerate(peaks):
+            name = mapping.get(peak.name, peak.name) if peak.name else None
+            if name:
+                name_index.setdefault(name.lower(), i)
+        peak_rt = np.array([self._peak_rt(peak) for peak in peaks], dtype=float)
+        peak_area = np.array([peak.area for peak in peaks], dtype=float)
+        
+        target_idx = np.array([name_index.get(key, -1) for key in table["keys"]], dtype=np.intp)
+        is_idx = np.array([
+            name_index.get(key, -1) if key else -1 for key in table["is_keys"]
+        ], dtype=np.intp)
+        
+        # RT fallback: only peaks not already claimed by name, each peak matched to at
+        # most one target, closest (target, peak) pairs first
+        by_rt = (target_idx < 0) & ~np.isnan(table["expected_rt"])
+        if len(peaks) and by_rt.any():
+            available = np.ones(len(peaks), dtype=bool)
+            available[target_idx[target_idx >= 0]] = False
+            available[is_idx[is_idx >= 0]] = False
+            
+            order = np.argsort(peak_rt, kind="stable")
+            sorted_rt = peak_rt[order]
+            targets = np.flatnonzero(by_rt)
+            expected = table["expected_rt"][targets]
+            lo = np.searchsorted(sorted_rt, expected - rt_window, side="left")
+            hi = np.searchsorted(sorted_rt, expected + rt_window, side="right")
+            counts = hi - lo
+            
+            # Every peak inside each target's window, as flat (target, peak) pairs
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            pair_target = np.repeat(targets, counts)
+            pair_peak = order[np.repeat(lo, counts) + offsets]
+            dist = np.abs(peak_rt[pair_peak] - table["expected_rt"][pair_target])
+            candidates = available[pair_peak] & (dist <= rt_window)
+            
+            for k in np.flatnonzero(candidates)[np.argsort(dist[candidates], kind="stable")]:
+                t, p = pair_target[k], pair_peak[k]
+                if target_idx[t] < 0 and available[p]:
+                    target_idx[t] = p
+                    available[p] = False
+        
+        found = target_idx >= 0
+        area = np.where(found, peak_area[target_idx] if len(peaks) else 0.0, 0.0)
+        is_area = np.where(is_idx >= 0, peak_area[is_idx] if len(peaks) else 0.0, 0.0)
+        is_ok = ~table["is_mode"] | (is_area > 0)
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            response = np.where(table["is_mode"], area / np.where(is_area > 0, is_area, 1.0), area)
+            concentration = np.where(
+                table["slope"] != 0, (response - table["intercept"]) / table["slope"], 0.0
+            )
+        below_lod = concentration < table["lod"]
+        below_loq = ~below_lod & (concentration < table["loq"])
+        out_of_range = concentration > table["max_calib"]
+        
+        results = []
+        for j in range(n_targets):
+            if not found[j]:
+                results.append({
+                    "targetName": table["names"][j],
+                    "rt": None,
+                    "area": 0.0,
+                    "concentration": 0.0,
+                    "unit": table["units"][j],
+                    "snr": None,
+                    "flags": ["NoPeak"],
+                    "mode": table["modes"][j]
+                })
+                continue
+            
+            peak = peaks[target_idx[j]]
+            flags = []
+            if below_lod[j]:
+                flags.append("<LOD")
+            elif below_loq[j]:
+                flags.append("<LOQ")
+            if out_of_range[j]:
+                flags.append("OOR")
+            
+            result = {
+                "targetName": table["names"][j],
+                "rt": self._peak_rt(peak),
+                "area": float(area[j]),
+                "concentration": float(concentration[j]),
+                "unit": table["units"][j],
+                "snr": getattr(peak, "snr", None),
+                "flags": flags,
+                "mode": "internal_standard" if table["is_mode"][j] else "external"
+            }
+            if table["is_mode"][j]:
+                result["is_area"] = float(is_area[j])
+                result["response_factor"] = float(response[j]) if is_ok[j] else 0.0
+                if not is_ok[j]:
+                    result["concentration"] = 0.0
+                    result["flags"] = ["NoISPeak"]
+            else:
+                result["response"] = float(area[j] - table["intercept"][j])
+            results.append(result)
+        
+        return QuantResult(
+            run_id=run.id,
+            sample_name=run.sample_name,
+            results=results
+        )
+    
+    @staticmethod
+    def _peak_rt(peak: Peak) -> Optional[float]:
+        """Retention time of a peak (both peak schemas are in use)"""
+        rt = getattr(peak, "rt", None)
+        return rt if rt is not None else getattr(peak, "retention_time", None)
+    
     def estimate_noise_from_run(self, run: RunRecord) -> float:
         """Estimate noise level from a run record"""
         if not run.signal or len(run.signal) < 10:
@@ -559,59 +1005,38 @@ class QuantitationService:
         calibration = self.calibrations[calibration_id]
         
         # Deactivate other calibrations for this method
-        for cal_id, cal in self.calibrations.items():
-            if (cal.method_id == calibration.method_id and 
-                cal.instrument_id == calibration.instrument_id):
-                cal.active = False
+        for cal in self.calibrations.find(method_id=calibration.method_id,
+                                          instrument_id=calibration.instrument_id, active=True):
+            if cal.id != calibration_id:
+                self.calibrations[cal.id] = cal.model_copy(update={"active": False})
         
         # Activate this calibration
-        calibration.active = True
-        self.active_calibrations[calibration.method_id] = calibration_id
+        self.calibrations[calibration_id] = calibration.model_copy(update={"active": True})
         
         logger.info(f"Activated calibration {calibration_id}")
         return True
     
     def get_active_calibration(self, method_id: int, instrument_id: Optional[int] = None) -> Optional[CalibrationModel]:
         """Get the active calibration for a method/instrument"""
-        for cal in self.calibrations.values():
-            if (cal.method_id == method_id and 
-                cal.instrument_id == instrument_id and 
-                cal.active):
-                return cal
-        return None
+        active = self.calibrations.find(method_id=method_id, instrument_id=instrument_id, active=True, limit=1)
+        return active[0] if active else None
     
     def list_calibrations(self, method_id: Optional[int] = None, 
                          instrument_id: Optional[int] = None,
                          target_name: Optional[str] = None) -> List[CalibrationModel]:
         """List calibrations with optional filtering"""
-        calibrations = list(self.calibrations.values())
-        
-        if method_id is not None:
-            calibrations = [cal for cal in calibrations if cal.method_id == method_id]
-        
-        if instrument_id is not None:
-            calibrations = [cal for cal in calibrations if cal.instrument_id == instrument_id]
-        
-        if target_name is not None:
-            calibrations = [cal for cal in calibrations if cal.target_name == target_name]
-        
-        return calibrations
+        filters = {"method_id": method_id, "instrument_id": instrument_id, "target_name": target_name}
+        return self.calibrations.find(order_by="created_at",
+                                      **{k: v for k, v in filters.items() if v is not None})
     
     def list_calibration_versions(self, method_id: Optional[int] = None,
                                  instrument_id: Optional[int] = None,
                                  target_name: Optional[str] = None) -> List[CalibrationVersion]:
         """List calibration versions with optional filtering"""
-        versions = []
-        for version in self.calibration_versions.values():
-            cal = version.model
-            if (method_id is None or cal.method_id == method_id) and \
-               (instrument_id is None or cal.instrument_id == instrument_id) and \
-               (target_name is None or cal.target_name == target_name):
-                versions.append(version)
-        
-        # Sort by creation date (newest first)
-        versions.sort(key=lambda v: v.created_at, reverse=True)
-        return versions
+        filters = {"method_id": method_id, "instrument_id": instrument_id, "target_name": target_name}
+        # Newest first
+        return self.calibration_versions.find(order_by="created_at", descending=True,
+                                              **{k: v for k, v in filters.items() if v is not None})
     
     def delete_calibration(self, calibration_id: str) -> bool:
         """Delete a calibration"""
@@ -620,13 +1045,8 @@ class QuantitationService:
         
         calibration = self.calibrations[calibration_id]
         
-        # Remove from active calibrations if active
-        if calibration.active:
-            self.active_calibrations.pop(calibration.method_id, None)
-        
-        # Remove version
-        if calibration.version_id in self.calibration_versions:
-            del self.calibration_versions[calibration.version_id]
+        # Remove version (the active flag lives on the calibration row)
+        self.calibration_versions.delete_many([calibration.version_id])
         
         del self.calibrations[calibration_id]
         
@@ -635,10 +1055,11 @@ class QuantitationService:
     
     def add_blank_run(self, run: RunRecord):
         """Add a blank run for LOD/LOQ calculation"""
-        self.blank_runs.append(run)
+        self._blank_runs[str(run.id) if run.id else str(uuid.uuid4())] = run
         # Keep only recent blank runs (last 10)
-        if len(self.blank_runs) > 10:
-            self.blank_runs = self.blank_runs[-10:]
+        stale = self._blank_runs.find_items(order_by="created_at", descending=True)[self.MAX_BLANK_RUNS:]
+        if stale:
+            self._blank_runs.delete_many([key for key, _ in stale])
 
 
 # Global service instance
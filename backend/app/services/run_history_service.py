@@ -12,6 +12,8 @@ import csv
 import io
 import base64
 
+from sqlalchemy.orm import undefer_group
+
 from app.core.database import SessionLocal, SandboxRun, Instrument, Method
 from app.models.schemas import Peak
 
@@ -65,38 +67,33 @@ class RunHistoryService:
             if sample_name_filter:
                 query = query.filter(SandboxRun.sample_name.contains(sample_name_filter))
             
+            # Peak filters use the persisted peak count
+            if has_peaks is not None:
+                if has_peaks:
+                    query = query.filter(SandboxRun.peak_count > 0)
+                else:
+                    query = query.filter(SandboxRun.peak_count == 0)
+            
+            if min_peaks is not None:
+                query = query.filter(SandboxRun.peak_count >= min_peaks)
+            
+            if max_peaks is not None:
+                query = query.filter(SandboxRun.peak_count <= max_peaks)
+            
             # Get total count before pagination
             total_count = query.count()
             
-            # Apply pagination
-            runs = query.order_by(SandboxRun.created_date.desc()).offset(offset).limit(limit).all()
+            # Apply pagination; instrument and method arrive in the same query
+            rows = self._with_related(query).order_by(
+                SandboxRun.created_date.desc()
+            ).offset(offset).limit(limit).all()
             
             # Convert to detailed format with related data
             result_runs = []
-            for run in runs:
-                # Get instrument info
-                instrument = db.query(Instrument).filter(Instrument.id == run.instrument_id).first()
-                method = db.query(Method).filter(Method.id == run.method_id).first()
-                
-                # Count peaks
-                peak_count = len(run.peaks) if run.peaks else 0
-                
-                # Apply peak filters
-                if has_peaks is not None:
-                    if has_peaks and peak_count == 0:
-                        continue
-                    elif not has_peaks and peak_count > 0:
-                        continue
-                
-                if min_peaks is not None and peak_count < min_peaks:
-                    continue
-                    
-                if max_peaks is not None and peak_count > max_peaks:
-                    continue
-                
-                # Calculate run metrics
-                max_signal = max(run.signal) if run.signal else 0
-                run_time = max(run.time) if run.time else 0
+            for run, instrument, method in rows:
+                peak_count = run.peak_count or 0
+                max_signal = run.max_signal or 0
+                run_time = run.run_time or 0
                 
                 run_data = {
                     "id": run.id,
@@ -110,6 +107,7 @@ class RunHistoryService:
                     "peak_count": peak_count,
                     "max_signal": max_signal,
                     "run_time": run_time,
+                    "noise": run.noise,
                     "created_date": run.created_date.isoformat(),
                     "fault_params": run.fault_params,
                     "metrics": run.metrics,
@@ -122,13 +120,13 @@ class RunHistoryService:
     def get_run_summary(self, run_id: int) -> Optional[Dict[str, Any]]:
         """Get detailed summary for a specific run."""
         with SessionLocal() as db:
-            run = db.query(SandboxRun).filter(SandboxRun.id == run_id).first()
-            if not run:
+            row = self._with_related(
+                db.query(SandboxRun).options(undefer_group("traces"))
+            ).filter(SandboxRun.id == run_id).first()
+            if not row:
                 return None
             
-            # Get related data
-            instrument = db.query(Instrument).filter(Instrument.id == run.instrument_id).first()
-            method = db.query(Method).filter(Method.id == run.method_id).first()
+            run, instrument, method = row
             
             # Analyze peaks
             peaks_analysis = self._analyze_peaks(run.peaks) if run.peaks else {}
@@ -144,7 +142,7 @@ class RunHistoryService:
                     "id": run.id,
                     "sample_name": run.sample_name,
                     "created_date": run.created_date.isoformat(),
-                    "run_time": max(run.time) if run.time else 0
+                    "run_time": run.run_time or 0
                 },
                 "instrument_info": {
                     "id": instrument.id if instrument else None,
@@ -182,7 +180,10 @@ class RunHistoryService:
             raise ValueError(f"Unsupported export format: {export_format}")
         
         with SessionLocal() as db:
-            runs = db.query(SandboxRun).filter(SandboxRun.id.in_(run_ids)).all()
+            query = db.query(SandboxRun).filter(SandboxRun.id.in_(run_ids))
+            if include_chromatograms:
+                query = query.options(undefer_group("traces"))
+            runs = query.all()
             
             if export_format == "csv":
                 return self._export_csv(runs)
@@ -198,7 +199,13 @@ class RunHistoryService:
     ) -> Dict[str, Any]:
         """Get run statistics for a date range."""
         with SessionLocal() as db:
-            query = db.query(SandboxRun)
+            # Only summary columns are needed; never load peaks or traces here
+            query = db.query(
+                SandboxRun.peak_count,
+                SandboxRun.instrument_id,
+                SandboxRun.method_id,
+                SandboxRun.created_date
+            )
             
             if date_from:
                 query = query.filter(SandboxRun.created_date >= date_from)
@@ -222,14 +229,14 @@ class RunHistoryService:
             
             # Calculate statistics
             total_runs = len(runs)
-            total_peaks = sum(len(run.peaks) if run.peaks else 0 for run in runs)
+            total_peaks = sum(run.peak_count or 0 for run in runs)
             avg_peaks = total_peaks / total_runs if total_runs > 0 else 0
             
             instruments_used = len(set(run.instrument_id for run in runs if run.instrument_id))
             methods_used = len(set(run.method_id for run in runs if run.method_id))
             
             # Peak distribution
-            peak_counts = [len(run.peaks) if run.peaks else 0 for run in runs]
+            peak_counts = [run.peak_count or 0 for run in runs]
             peak_distribution = {
                 "min": min(peak_counts) if peak_counts else 0,
                 "max": max(peak_counts) if peak_counts else 0,
@@ -256,6 +263,14 @@ class RunHistoryService:
                 }
             }
     
+    def _with_related(self, query):
+        """Join instrument and method onto a run query; rows become (run, instrument, method)."""
+        return query.outerjoin(
+            Instrument, Instrument.id == SandboxRun.instrument_id
+        ).outerjoin(
+            Method, Method.id == SandboxRun.method_id
+        ).add_entity(Instrument).add_entity(Method)
+    
     def _analyze_peaks(self, peaks_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Analyze peaks data for summary."""
         if not peaks_data:
@@ -330,9 +345,9 @@ class RunHistoryService:
         
         # Write data
         for run in runs:
-            peak_count = len(run.peaks) if run.peaks else 0
-            max_signal = max(run.signal) if run.signal else 0
-            run_time = max(run.time) if run.time else 0
+            peak_count = run.peak_count or 0
+            max_signal = run.max_signal or 0
+            run_time = run.run_time or 0
             
             writer.writerow([
                 run.id,
@@ -364,9 +379,9 @@ class RunHistoryService:
             # Create runs data
             runs_data = []
             for run in runs:
-                peak_count = len(run.peaks) if run.peaks else 0
-                max_signal = max(run.signal) if run.signal else 0
-                run_time = max(run.time) if run.time else 0
+                peak_count = run.peak_count or 0
+                max_signal = run.max_signal or 0
+                run_time = run.run_time or 0
                 
                 runs_data.append({
                     "Run ID": run.id,
@@ -435,7 +450,7 @@ class RunHistoryService:
             table_data = [["Run ID", "Sample Name", "Instrument", "Method", "Peaks", "Created Date"]]
             
             for run in runs:
-                peak_count = len(run.peaks) if run.peaks else 0
+                peak_count = run.peak_count or 0
                 table_data.append([
                     str(run.id),
                     run.sample_name,
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Multi-run overlay engine.
+
+Selected runs are resampled onto one common time grid, optionally aligned to
+a reference run with correlation-optimized warping (COW), and summarized as
+mean, standard deviation and min/max envelopes plus per-run differences from
+the reference. The bundle is then reduced to a display budget with LTTB, all
+traces sharing the same sample indices, so a 30-injection robustness study
+comes back as a few thousand points per trace instead of every raw sample.
+
+Everything here is NumPy only; build_overlay is a module-level function so it
+can run in the analysis pool.
+"""
+
+import math
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.decimation import lttb_indices
+
+DEFAULT_OVERLAY_POINTS = 2000
+COW_MAX_SLACK = 8  # Boundary shifts tried per side; finer grids are aligned on a binned copy
+
+
+def common_grid(
+    times: Sequence[np.ndarray],
+    reference_index: int = 0,
+    t_start: Optional[float] = None,
+    t_end: Optional[float] = None,
+    grid_points: Optional[int] = None
+) -> np.ndarray:
+    """
+    Evenly spaced grid over the time range every run covers (cut to
+    [t_start, t_end]). Spacing follows the reference run's median sampling
+    interval unless grid_points is given.
+    """
+    start = max(float(t[0]) for t in times)
+    end = min(float(t[-1]) for t in times)
+    if t_start is not None:
+        start = max(start, t_start)
+    if t_end is not None:
+        end = min(end, t_end)
+    if not end > start:
+        raise ValueError("Selected runs do not overlap in the requested time window")
+
+    if grid_points is None:
+        step = float(np.median(np.diff(times[reference_index])))
+        grid_points = int(round((end - start) / step)) + 1 if step > 0 else 2
+    return np.linspace(start, end, max(grid_points, 2))
+
+
+def resample_runs(times: Sequence[np.ndarray], signals: Sequence[np.ndarray], grid: np.ndarray) -> np.ndarray:
+    """(n_runs, len(grid)) matrix of every signal linearly interpolated onto the grid."""
+    matrix = np.empty((len(signals), len(grid)), dtype=np.float64)
+    for row, (time, signal) in enumerate(zip(times, signals)):
+        if len(time) == len(grid) and np.array_equal(time, grid):
+            matrix[row] = signal
+        else:
+            matrix[row] = np.interp(grid, time, signal)
+    return matrix
+
+
+def cow_boundaries(reference: np.ndarray, sample: np.ndarray, segment_length: int,
+                   slack: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Correlation-optimized warping of `sample` onto `reference` (same length).
+
+    Both traces are cut into segments of about segment_length samples; each
+    inner boundary of the sample may move by up to `slack` samples. Dynamic
+    programming picks the boundary shifts that maximize the summed Pearson
+    correlation of the linearly stretched segments. Returns the reference
+    boundaries and the matching sample boundaries (end points are fixed).
+    """
+    n = len(reference)
+    n_segments = max((n - 1) // segment_length, 1)
+    ref_bounds = np.linspace(0, n - 1, n_segments + 1).round().astype(np.intp)
+    shifts = np.arange(-slack, slack + 1)
+    positions = np.arange(n)
+
+    score = np.full(len(shifts), -np.inf)
+    score[slack] = 0.0  # The first boundary does not move
+    back = np.zeros((n_segments, len(shifts)), dtype=np.intp)
+
+    for segment in range(n_segments):
+        r0, r1 = ref_bounds[segment], ref_bounds[segment + 1]
+        ref = reference[r0:r1 + 1] - reference[r0:r1 + 1].mean()
+        ref_norm = np.sqrt(ref @ ref)
+
+        starts = (r0 + shifts)[:, None]
+        ends = (r1 + shifts)[None, :]
+        valid = (starts >= 0) & (ends <= n - 1) & (ends - starts >= 2)
+        if segment == n_segments - 1:
+            valid &= shifts[None, :] == 0  # Nor does the last
+        fraction = np.linspace(0.0, 1.0, r1 - r0 + 1)
+        warped = np.interp(starts[..., None] + (ends - starts)[..., None] * fraction, positions, sample)
+        warped -= warped.mean(axis=-1, keepdims=True)
+        norm = np.sqrt(np.einsum("abk,abk->ab", warped, warped)) * ref_norm
+        corr = np.divide(warped @ ref, norm, out=np.zeros(norm.shape), where=norm > 0)
+
+        total = np.where(valid, score[:, None] + corr, -np.inf)
+        back[segment] = total.argmax(axis=0)
+        score = total.max(axis=0)
+
+    path = np.empty(n_segments + 1, dtype=np.intp)
+    path[-1] = slack
+    for segment in range(n_segments - 1, -1, -1):
+        path[segment] = back[segment, path[segment + 1]]
+    return ref_bounds, ref_bounds + shifts[path]
+
+
+def apply_warp(signal: np.ndarray, ref_bounds: np.ndarray, sample_bounds: np.ndarray) -> np.ndarray:
+    """Resample `signal` along the piecewise-linear warp found by cow_boundaries."""
+    positions = np.arange(len(signal), dtype=np.float64)
+    return np.interp(np.interp(positions, ref_bounds, sample_bounds), positions, signal)
+
+
+def cow_align(reference: np.ndarray, sample: np.ndarray, segment_length: int,
+              slack: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Warp `sample` onto `reference`; returns the warped trace and the sample
+    boundary shift (in samples) at every reference boundary. Large slacks are
+    solved on a binned copy so the search stays within COW_MAX_SLACK.
+    """
+    factor = max(1, math.ceil(slack / COW_MAX_SLACK))
+    if factor > 1:
+        usable = len(reference) // factor * factor
+        coarse_ref = reference[:usable].reshape(-1, factor).mean(axis=1)
+        coarse_sample = sample[:usable].reshape(-1, factor).mean(axis=1)
+        ref_bounds, sample_bounds = cow_boundaries(
+            coarse_ref, coarse_sample, max(segment_length // factor, 4), math.ceil(slack / factor)
+        )
+        ref_bounds, sample_bounds = ref_bounds * factor, sample_bounds * factor
+        ref_bounds[-1] = sample_bounds[-1] = len(reference) - 1
+        # The rounded-up coarse slack can overshoot by up to factor - 1 samples
+        sample_bounds = ref_bounds + np.clip(sample_bounds - ref_bounds, -slack, slack)
+    else:
+        ref_bounds, sample_bounds = cow_boundaries(reference, sample, segment_length, slack)
+    return apply_warp(sample, ref_bounds, sample_bounds), sample_bounds - ref_bounds
+
+
+def build_overlay(
+    times: Sequence[Sequence[float]],
+    signals: Sequence[Sequence[float]],
+    reference_index: int = 0,
+    t_start: Optional[float] = None,
+    t_end: Optional[float] = None,
+    grid_points: Optional[int] = None,
+    align: bool = False,
+    segment_min: float = 1.0,
+    max_shift_min: float = 0.05,
+    max_points: Optional[int] = DEFAULT_OVERLAY_POINTS
+) -> Dict[str, Any]:
+    """
+    Overlay bundle for a set of runs (analysis pool job).
+
+    Returns the decimated grid ("time"), the "mean", "sd", "lower" and
+    "upper" envelopes, and per run the resampled (and aligned) "signal" and
+    its "difference" from the reference. Display
+    points are chosen by LTTB on the upper envelope, so every run's peaks
+    survive decimation.
+    """
+    times = [np.asarray(t, dtype=np.float64) for t in times]
+    signals = [np.asarray(s, dtype=np.float64) for s in signals]
+    grid = common_grid(times, reference_index, t_start, t_end, grid_points)
+    matrix = resample_runs(times, signals, grid)
+
+    if align and len(grid) > 8:
+        step = float(grid[1] - grid[0])
+        segment_length = max(int(round(segment_min / step)), 4)
+        slack = min(max(int(round(max_shift_min / step)), 1), segment_length - 2)
+        reference = matrix[reference_index].copy()
+        for row in range(len(matrix)):
+            if row != reference_index:
+                matrix[row] = cow_align(reference, matrix[row], segment_length, slack)[0]
+
+    mean = matrix.mean(axis=0)
+    sd = matrix.std(axis=0, ddof=1) if len(matrix) > 1 else np.zeros_like(mean)
+    lower, upper = matrix.min(axis=0), matrix.max(axis=0)
+    difference = matrix - matrix[reference_index]
+
+    indices = np.arange(len(grid)) if max_points is None else lttb_indices(grid, upper, max_points)
+    return {
+        "time": grid[indices],
+        "grid_points": len(grid),
+        "aligned": bool(align),
+        "mean": mean[indices],
+        "sd": sd[indices],
+        "lower": lower[indices],
+        "upper": upper[indices],
+        "runs": [
+            {"signal": matrix[row, indices], "difference": difference[row, indices]}
+            for row in range(len(matrix))
+        ]
+    }
@@ -11,11 +11,13 @@ import numpy as np
 import uuid
 
 from app.models.schemas import (
-    Peak, RunRecord, SandboxRunRequest, SandboxRunResponse, FaultParams,
+    RunPeak as Peak, RunRecord, SandboxRunRequest, SandboxRunResponse, FaultParams,
     SimulationProfile, SimulationProfileCreate, SimulationProfileUpdate,
     InletType, OvenRampConfig, FlowConfig, DetectorConfig
 )
+from app.core.config import settings
 from app.core.database import SessionLocal, SandboxRun, SimulationProfile as SimulationProfileModel
+from app.core.simulation_cache import SimulationCache, request_key
 
 
 @dataclass
@@ -30,6 +32,11 @@ class SandboxService:
     """Service to simulate injections, elution, and inject realistic faults."""
 
     def __init__(self) -> None:
+        # Deterministic (seeded or noise-free) run results, keyed by request content
+        self.result_cache = SimulationCache(
+            max_entries=settings.SIMULATION_CACHE_ENTRIES,
+            max_bytes=settings.SIMULATION_CACHE_MAX_MB * 1024 * 1024,
+        )
         self._faults: Dict[str, FaultDefinition] = {
             "noise": FaultDefinition(
                 name="noise",
@@ -202,11 +209,6 @@ class SandboxService:
         return timeline
 
     def run(self, request: SandboxRunRequest) -> SandboxRunResponse:
-        # Time axis
-        total_time = 20.0
-        time_points = np.linspace(0, total_time, 2000)
-        signal = np.zeros_like(time_points)
-
         # Build compound list
         compounds = request.compounds or []
         if not compounds and request.compound_ids:
@@ -238,13 +240,75 @@ class SandboxService:
                 {"name": "n-Butane", "rt": 3.9, "intensity": 170, "width": 0.1},
             ]
 
+        fp: FaultParams = request.fault_params or FaultParams()
+
+        # Unseeded runs with noise or ghost peaks differ every time and are never cached
+        stochastic = request.seed is None and (fp.noise_level > 0 or fp.ghost_peak_probability > 0)
+        if stochastic or not request.use_cache:
+            self.result_cache.record_bypass()
+            simulated = self._simulate(compounds, fp, np.random.default_rng(request.seed))
+        else:
+            cache_key = request_key(
+                {"compounds": compounds, "fault_params": fp.model_dump(mode="json"), "seed": request.seed}
+            )
+            simulated = self.result_cache.get(cache_key)
+            if simulated is None:
+                simulated = self._simulate(compounds, fp, np.random.default_rng(request.seed))
+                self.result_cache.put(cache_key, simulated, size_bytes=len(simulated["time"]) * 2 * 8)
+
+        # Build run record (copies, so the cached entry is never shared with callers)
+        peaks = [peak.model_copy(deep=True) for peak in simulated["peaks"]]
+        run_record = RunRecord(
+            instrument_id=request.instrument_id,
+            method_id=request.method_id,
+            sample_name=request.sample_name,
+            time=list(simulated["time"]),
+            signal=list(simulated["signal"]),
+            peaks=peaks,
+            baseline=[0.0] * len(simulated["time"]),
+        )
+        quality_metrics = dict(simulated["quality_metrics"])
+
+        # Persist sandbox run
+        sandbox_run_id: Optional[int] = None
+        with SessionLocal() as db:
+            db_run = SandboxRun(
+                instrument_id=request.instrument_id,
+                method_id=request.method_id,
+                sample_name=request.sample_name,
+                compound_ids=request.compound_ids,
+                fault_params=fp.model_dump(),
+                time=run_record.time,
+                signal=run_record.signal,
+                peaks=[p.model_dump() for p in peaks],
+                baseline=run_record.baseline,
+                metrics=quality_metrics,
+            )
+            db.add(db_run)
+            db.commit()
+            db.refresh(db_run)
+            sandbox_run_id = db_run.id
+
+        return SandboxRunResponse(
+            run_record=run_record,
+            quality_metrics=quality_metrics,
+            applied_faults=dict(simulated["applied_faults"]),
+            sandbox_run_id=sandbox_run_id,
+        )
+
+    def _simulate(self, compounds: List[Dict[str, Any]], fp: FaultParams, rng: np.random.Generator) -> Dict[str, Any]:
+        """Generate the trace, peaks and metrics for one run (no persistence)."""
+        # Time axis
+        total_time = 20.0
+        time_points = np.linspace(0, total_time, 2000)
+        signal = np.zeros_like(time_points)
+
         # Apply base faults
         applied_faults = {}
-        fp: FaultParams = request.fault_params or FaultParams()
 
         # Baseline noise & drift
         if fp.noise_level > 0:
-            signal += np.random.normal(0, fp.noise_level, len(time_points))
+            signal += rng.normal(0, fp.noise_level, len(time_points))
             applied_faults["noise_level"] = fp.noise_level
 
         if fp.drift > 0:
@@ -279,10 +343,10 @@ class SandboxService:
         if fp.ghost_peak_probability > 0:
             n_candidates = int(total_time // 2)
             for i in range(n_candidates):
-                if np.random.rand() < fp.ghost_peak_probability:
-                    rt = float(np.random.uniform(0.5, total_time - 0.5))
-                    width = float(np.random.uniform(0.05, 0.2))
-                    height = float(np.random.uniform(20, 80))
+                if rng.random() < fp.ghost_peak_probability:
+                    rt = float(rng.uniform(0.5, total_time - 0.5))
+                    width = float(rng.uniform(0.05, 0.2))
+                    height = float(rng.uniform(20, 80))
                     sigma = width / 2.355
                     signal += height * np.exp(-0.5 * ((time_points - rt) / sigma) ** 2)
                     peaks.append(
@@ -297,17 +361,6 @@ class SandboxService:
                     )
             applied_faults["ghost_peaks"] = fp.ghost_peak_probability
 
-        # Build run record
-        run_record = RunRecord(
-            instrument_id=request.instrument_id,
-            method_id=request.method_id,
-            sample_name=request.sample_name,
-            time=time_points.tolist(),
-            signal=signal.tolist(),
-            peaks=peaks,
-            baseline=[0.0] * len(time_points),
-        )
-
         # Metrics
         quality_metrics = {
             "total_peaks": len(peaks),
@@ -315,32 +368,13 @@ class SandboxService:
             "snr_estimate": float(np.max(signal) / max(fp.noise_level, 1e-6)),
         }
 
-        # Persist sandbox run
-        sandbox_run_id: Optional[int] = None
-        with SessionLocal() as db:
-            db_run = SandboxRun(
-                instrument_id=request.instrument_id,
-                method_id=request.method_id,
-                sample_name=request.sample_name,
-                compound_ids=request.compound_ids,
-                fault_params=fp.model_dump(),
-                time=run_record.time,
-                signal=run_record.signal,
-                peaks=[p.model_dump() for p in peaks],
-                baseline=run_record.baseline,
-                metrics=quality_metrics,
-            )
-            db.add(db_run)
-            db.commit()
-            db.refresh(db_run)
-            sandbox_run_id = db_run.id
-
-        return SandboxRunResponse(
-            run_record=run_record,
-            quality_metrics=quality_metrics,
-            applied_faults=applied_faults,
-            sandbox_run_id=sandbox_run_id,
-        )
+        return {
+            "time": time_points.tolist(),
+            "signal": signal.tolist(),
+            "peaks": peaks,
+            "quality_metrics": quality_metrics,
+            "applied_faults": applied_faults,
+        }
 
     def create_simulation_profile(self, profile_data: SimulationProfileCreate, user_id: int) -> SimulationProfile:
         """Create a new simulation profile."""
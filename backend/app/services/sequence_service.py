@@ -3,15 +3,19 @@
 Sequence service for managing sequence templates and running sequences
 """
 
+import asyncio
 import uuid
-import time
+from collections import deque
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import logging
 
+from app.core.config import settings
 from app.models.schemas import (
-    SequenceTemplate, SequenceRun, SequenceItem, RunRecord, QuantResult
+    SequenceTemplate, SequenceRun, SequenceItem, RunRecord, QuantResult, SequenceJob
 )
+from app.services.analysis_pool import run_in_pool
+from app.services.background_jobs import BackgroundJobService
 from app.services.chromatography_service import chromatography_service
 from app.services.quant_service import quant_service
 from app.services.qc_service import qc_service
@@ -19,14 +23,26 @@ from app.services.qc_service import qc_service
 logger = logging.getLogger(__name__)
 
 
-class SequenceService:
+def generate_sequence_item_job(item: SequenceItem, instrument_id: int, simulate: bool) -> Optional[Dict[str, Any]]:
+    """Pool job: acquire or simulate the run record for one sequence item, as a dict"""
+    run_record = sequence_service._process_sequence_item(item, instrument_id, simulate)
+    return run_record.model_dump() if run_record else None
+
+
+class SequenceService(BackgroundJobService):
     """Service for sequence template management and sequence execution"""
     
+    progress_type = "sequence_progress"
+    retention_setting = "SEQUENCE_JOB_RETENTION"
+    
     def __init__(self):
+        super().__init__()
         # In-memory storage for demo purposes
         # In production, this would be a database
         self.templates = {}
         self.runs = {}
+        self._job_slots: Optional[asyncio.Semaphore] = None
+        self._job_slots_loop = None
     
     def create_template(self, name: str, instrument_id: Optional[int], 
                        items: List[SequenceItem], notes: Optional[str] = None) -> SequenceTemplate:
@@ -110,7 +126,7 @@ class SequenceService:
     def run_sequence(self, template: SequenceTemplate, instrument_id: int, 
                     simulate: bool = True) -> SequenceRun:
         """
-        Run a sequence using a template
+        Run a sequence using a template on the calling thread
         
         Args:
             template: Sequence template to use
@@ -120,70 +136,181 @@ class SequenceService:
         Returns:
             Sequence run with results
         """
+        sequence_run = self._create_sequence_run(template, instrument_id)
+        sequence_run.status = "running"
+        logger.info(f"Started sequence run {sequence_run.id}")
+        
+        for item in template.items:
+            try:
+                logger.info(f"Processing sequence item {item.order}: {item.type} - {item.sample_name}")
+                run_record = self._process_sequence_item(item, instrument_id, simulate)
+                if self._apply_item_result(sequence_run, item, run_record, instrument_id):
+                    return sequence_run
+            except Exception as e:
+                self._fail_item(sequence_run, item, e)
+                return sequence_run
+        
+        sequence_run.status = "completed"
+        logger.info(f"Completed sequence run {sequence_run.id}")
+        return sequence_run
+    
+    async def run_sequence_async(self, template: SequenceTemplate, instrument_id: int,
+                                 simulate: bool = True, job: Optional[SequenceJob] = None) -> SequenceRun:
+        """
+        Run a sequence without blocking the event loop.
+        
+        Run records are generated in the analysis worker pool, up to
+        SEQUENCE_ITEM_LOOKAHEAD items ahead. Quantitation and QC evaluation
+        are applied strictly in item order, so a QC failure under a
+        stop-on-fail policy stops the sequence at the same item as
+        run_sequence would, and items after it are never recorded.
+        """
+        sequence_run = self.runs[job.sequence_run_id] if job else self._create_sequence_run(template, instrument_id)
+        sequence_run.status = "running"
+        logger.info(f"Started sequence run {sequence_run.id}")
+        
+        items = list(template.items)
+        lookahead = max(1, settings.SEQUENCE_ITEM_LOOKAHEAD)
+        pending = deque()
+        
+        def schedule() -> None:
+            while len(pending) < lookahead and len(pending) + completed < len(items):
+                item = items[completed + len(pending)]
+                pending.append(asyncio.ensure_future(
+                    run_in_pool(generate_sequence_item_job, item, instrument_id, simulate)
+                ))
+        
+        completed = 0
         try:
-            # Create sequence run
-            sequence_run = SequenceRun(
-                id=str(uuid.uuid4()),
-                instrument_id=instrument_id,
-                template_id=template.id,
-                items=template.items,
-                status="running"
-            )
-            
-            self.runs[sequence_run.id] = sequence_run
-            
-            logger.info(f"Started sequence run {sequence_run.id}")
-            
-            # Process each item in the sequence
-            for item in template.items:
+            for item in items:
+                schedule()
+                task = pending.popleft()
                 try:
-                    logger.info(f"Processing sequence item {item.order}: {item.type} - {item.sample_name}")
-                    
-                    # Generate run record based on item type
-                    run_record = self._process_sequence_item(item, instrument_id, simulate)
-                    
-                    if run_record:
-                        sequence_run.runs.append(run_record)
-                        
-                        # Perform quantitation if this is a sample or QC
-                        if item.type in ["Sample", "QC"]:
-                            quant_result = self._quantitate_run(run_record, item)
-                            if quant_result:
-                                sequence_run.quant.append(quant_result)
-                                
-                                # Perform QC evaluation if this is a QC item
-                                if item.type == "QC":
-                                    qc_result = self._evaluate_qc(run_record, quant_result, item, instrument_id)
-                                    if qc_result and qc_result.overallStatus == "FAIL":
-                                        # Check QC policy
-                                        policy = qc_service.get_qc_policy()
-                                        if policy.stopOnFail:
-                                            sequence_run.status = "error"
-                                            sequence_run.notes = f"QC failure at item {item.order}: {qc_result.overallStatus}. Sequence stopped per policy."
-                                            logger.warning(f"Sequence {sequence_run.id} stopped due to QC failure")
-                                            return sequence_run
-                    
-                    # Small delay to simulate processing time
-                    time.sleep(0.1)
-                    
+                    data = await task
+                    run_record = RunRecord.model_validate(data) if data else None
+                    stopped = await asyncio.to_thread(
+                        self._apply_item_result, sequence_run, item, run_record, instrument_id
+                    )
+                except asyncio.CancelledError:
+                    raise
                 except Exception as e:
-                    logger.error(f"Failed to process sequence item {item.order}: {str(e)}")
-                    sequence_run.status = "error"
-                    sequence_run.notes = f"Error at item {item.order}: {str(e)}"
+                    self._fail_item(sequence_run, item, e)
+                    stopped = True
+                
+                completed += 1
+                if job is not None:
+                    job.completed_items = completed
+                    await self._publish_progress(
+                        job, item={"order": item.order, "type": item.type, "sample_name": item.sample_name},
+                        sequence_status=sequence_run.status
+                    )
+                if stopped:
                     return sequence_run
-            
-            # Mark as completed
-            sequence_run.status = "completed"
-            
-            logger.info(f"Completed sequence run {sequence_run.id}")
-            return sequence_run
-            
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        sequence_run.status = "completed"
+        logger.info(f"Completed sequence run {sequence_run.id}")
+        return sequence_run
+    
+    def _create_sequence_run(self, template: SequenceTemplate, instrument_id: int) -> SequenceRun:
+        sequence_run = SequenceRun(
+            id=str(uuid.uuid4()),
+            instrument_id=instrument_id,
+            template_id=template.id,
+            items=template.items
+        )
+        self.runs[sequence_run.id] = sequence_run
+        return sequence_run
+    
+    def _apply_item_result(self, sequence_run: SequenceRun, item: SequenceItem,
+                           run_record: Optional[RunRecord], instrument_id: int) -> bool:
+        """Record one item's run, quantitate and QC it; returns True if the sequence must stop"""
+        if not run_record:
+            return False
+        
+        sequence_run.runs.append(run_record)
+        
+        # Perform quantitation if this is a sample or QC
+        if item.type not in ["Sample", "QC"]:
+            return False
+        quant_result = self._quantitate_run(run_record, item)
+        if not quant_result:
+            return False
+        sequence_run.quant.append(quant_result)
+        
+        # Perform QC evaluation if this is a QC item
+        if item.type == "QC":
+            qc_result = self._evaluate_qc(run_record, quant_result, item, instrument_id)
+            if qc_result and qc_result.overallStatus == "FAIL":
+                # Check QC policy
+                policy = qc_service.get_qc_policy()
+                if policy.stopOnFail:
+                    sequence_run.status = "error"
+                    sequence_run.notes = f"QC failure at item {item.order}: {qc_result.overallStatus}. Sequence stopped per policy."
+                    logger.warning(f"Sequence {sequence_run.id} stopped due to QC failure")
+                    return True
+        return False
+    
+    def _fail_item(self, sequence_run: SequenceRun, item: SequenceItem, error: Exception) -> None:
+        logger.error(f"Failed to process sequence item {item.order}: {str(error)}")
+        sequence_run.status = "error"
+        sequence_run.notes = f"Error at item {item.order}: {str(error)}"
+    
+    # Background jobs
+    
+    def start_sequence_job(self, template: SequenceTemplate, instrument_id: int,
+                           simulate: bool = True) -> SequenceJob:
+        """
+        Queue a sequence for background execution and return immediately.
+        At most SEQUENCE_MAX_CONCURRENT_JOBS sequences execute at once.
+        """
+        sequence_run = self._create_sequence_run(template, instrument_id)
+        job = SequenceJob(
+            id=str(uuid.uuid4()),
+            sequence_run_id=sequence_run.id,
+            total_items=len(template.items)
+        )
+        self._register_job(job)
+        self._start_task(job, self._execute_job(job, template, instrument_id, simulate))
+        
+        logger.info(f"Queued sequence job {job.id} for run {sequence_run.id}")
+        return job
+    
+    async def _execute_job(self, job: SequenceJob, template: SequenceTemplate,
+                           instrument_id: int, simulate: bool) -> None:
+        sequence_run = self.runs[job.sequence_run_id]
+        try:
+            async with self._job_semaphore():
+                job.status = "running"
+                job.started_at = datetime.now()
+                await self._publish_progress(job)
+                
+                await self.run_sequence_async(template, instrument_id, simulate, job=job)
+                job.status = "completed" if sequence_run.status == "completed" else "error"
+                job.error = sequence_run.notes if job.status == "error" else None
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            sequence_run.status = "error"
+            sequence_run.notes = f"Sequence cancelled after {job.completed_items} of {job.total_items} items"
         except Exception as e:
-            logger.error(f"Sequence run failed: {str(e)}")
-            if sequence_run:
-                sequence_run.status = "error"
-                sequence_run.notes = str(e)
-            raise
+            logger.error(f"Sequence job {job.id} failed: {str(e)}")
+            job.status = "error"
+            job.error = str(e)
+            sequence_run.status = "error"
+            sequence_run.notes = str(e)
+        finally:
+            job.finished_at = datetime.now()
+            await self._publish_progress(job)
+    
+    def _job_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop; recreate if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._job_slots is None or self._job_slots_loop is not loop:
+            self._job_slots = asyncio.Semaphore(max(1, settings.SEQUENCE_MAX_CONCURRENT_JOBS))
+            self._job_slots_loop = loop
+        return self._job_slots
     
     def _process_sequence_item(self, item: SequenceItem, instrument_id: int, 
                               simulate: bool) -> Optional[RunRecord]:
@@ -365,7 +492,7 @@ class SequenceService:
                 return None
             
             # Perform quantitation
-            quant_result = quant_service.quantitate(run_record, calibration)
+            quant_result = quant_service.quantitate_enhanced(run_record, calibration)
             
             logger.info(f"Quantitated run {run_record.id} for {item.sample_name}")
             return quant_result
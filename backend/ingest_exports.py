@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Bulk ingestion of instrument export directories
+Parses every CSV/JCAMP-DX export below a directory in the analysis pool and
+inserts the runs in batched transactions. Files that were already ingested
+are skipped, so interrupted backfills can be rerun; --watch keeps rescanning
+the directory for new exports.
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add the backend directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.config import settings
+from app.services.analysis_pool import shutdown_analysis_executor
+from app.services.ingestion_service import IngestionService
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def ingest(service: IngestionService, directory: Path, args) -> bool:
+    job = asyncio.run(service.ingest_directory(
+        directory,
+        recursive=not args.no_recursive,
+        instrument_id=args.instrument_id,
+        method_id=args.method_id,
+        auto_detect_peaks=not args.no_peaks,
+        batch_size=args.batch_size
+    ))
+    print(
+        f"{job.files_found} files: {job.runs_inserted} runs inserted, "
+        f"{job.files_skipped} already ingested, {job.files_failed} failed"
+    )
+    for failure in job.failures:
+        print(f"  ❌ {failure}")
+    return job.files_failed == 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest a directory of exported chromatograms")
+    parser.add_argument("directory", type=Path, help="Export directory to scan")
+    parser.add_argument("--instrument-id", type=int, help="Instrument recorded on every run")
+    parser.add_argument("--method-id", type=int, help="Method recorded on every run")
+    parser.add_argument("--batch-size", type=int, default=settings.INGEST_BATCH_SIZE, help="Runs per transaction")
+    parser.add_argument("--workers", type=int, help="Analysis pool size (default ANALYSIS_WORKERS)")
+    parser.add_argument("--no-peaks", action="store_true", help="Skip peak detection")
+    parser.add_argument("--no-recursive", action="store_true", help="Do not descend into subdirectories")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="Rescan every SECONDS until interrupted")
+
+    args = parser.parse_args()
+    if args.workers is not None:
+        settings.ANALYSIS_WORKERS = args.workers
+
+    service = IngestionService()
+    try:
+        success = ingest(service, args.directory, args)
+        while args.watch:
+            time.sleep(args.watch)
+            success = ingest(service, args.directory, args)
+    except KeyboardInterrupt:
+        success = True
+    finally:
+        shutdown_analysis_executor()
+
+    sys.exit(0 if success else 1)
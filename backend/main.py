@@ -5,6 +5,7 @@ from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict, Any
 import numpy as np
 import math
+import base64
 import logging
 import traceback
 from datetime import datetime, timedelta
@@ -17,6 +18,7 @@ from backend.api.chromatogram_routes import router as chromatogram_router
 
 # Import GC Sandbox routes
 from backend.app.api.gc_sandbox_routes import router as gc_sandbox_router
+from backend.app.core.responses import DefaultJSONResponse
 
 # Temporarily disable OCR routes due to import issues
 # from backend.app.api.ocr import router as ocr_router
@@ -31,7 +33,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="IntelliLab GC API",
     description="Production-ready GC calculations with comprehensive error handling",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=DefaultJSONResponse
 )
 
 # Include the chromatogram analysis routes
@@ -183,7 +186,12 @@ class PeakData(BaseModel):
 class ChromatogramOutput(BaseModel):
     peaks: List[PeakData]
     total_runtime: float
-    data_points: List[Dict[str, float]]  # For plotting
+    format: Optional[str] = None  # Omitted for the default "points" format
+    data_points: Optional[List[Dict[str, float]]] = None  # For plotting ("points" format)
+    time: Optional[List[float]] = None  # "columnar" format
+    signal: Optional[List[float]] = None  # "columnar" format
+    time_b64: Optional[str] = None  # "base64" format: little-endian float32
+    signal_b64: Optional[str] = None  # "base64" format: little-endian float32
 
 @app.get("/api/health")
 def health_check():
@@ -380,11 +388,44 @@ def calculate_detection_limits(input_data: DetectionLimitInput):
         logger.error(f"Detection limit calculation error: {str(e)}")
         raise HTTPException(status_code=500, detail="Statistical calculation failed - please verify input data")
 
-@app.post("/api/chromatogram/simulate", response_model=ChromatogramOutput)
-def simulate_chromatogram(input_data: ChromatogramInput):
+def _gaussian_trace(
+    time: np.ndarray,
+    centers: np.ndarray,
+    heights: np.ndarray,
+    sigmas: np.ndarray,
+    baseline: float,
+    n_sigma: float = 5.0
+) -> np.ndarray:
+    """Sum Gaussian peaks on a baseline, evaluating each peak only within ±n_sigma"""
+    trace = np.full(time.shape, baseline, dtype=np.float64)
+    lo = np.searchsorted(time, centers - n_sigma * sigmas, side="left")
+    hi = np.searchsorted(time, centers + n_sigma * sigmas, side="right")
+    for start, stop, center, height, sigma in zip(lo, hi, centers, heights, sigmas):
+        window = time[start:stop]
+        trace[start:stop] += height * np.exp(-((window - center) ** 2) / (2 * sigma ** 2))
+    return trace
+
+
+def _encode_float32(values: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(values, dtype="<f4").tobytes()).decode("ascii")
+
+
+@app.post(
+    "/api/chromatogram/simulate",
+    response_model=ChromatogramOutput,
+    response_model_exclude_none=True
+)
+def simulate_chromatogram(
+    input_data: ChromatogramInput,
+    format: str = Query("points", pattern="^(points|columnar|base64)$")
+):
     """
     Simulate C1-C6 paraffins separation
     Based on Kovats retention indices and van Deemter equation
+
+    format=points returns one {time, signal} object per sample; "columnar"
+    returns parallel time/signal arrays and "base64" returns them as
+    base64-encoded little-endian float32 buffers.
     """
     
     # Paraffin data (C1-C6)
@@ -429,33 +470,34 @@ def simulate_chromatogram(input_data: ChromatogramInput):
             peak_width=round(peak_width, 3)
         ))
     
-    # Generate data points for visualization (Gaussian peaks)
-    data_points = []
+    # Generate data points for visualization (Gaussian peaks, 100 points per minute)
     max_rt = max(p.retention_time for p in peaks) + 2
+    time = np.arange(int(max_rt * 100)) / 100
+    trace = _gaussian_trace(
+        time,
+        centers=np.array([p.retention_time for p in peaks]),
+        heights=np.array([p.peak_height for p in peaks]),
+        sigmas=np.array([p.peak_width / 4 for p in peaks]),  # Convert to standard deviation
+        baseline=50
+    )
     
-    for t in range(int(max_rt * 100)):  # 100 points per minute
-        time = t / 100
-        signal = 50  # Baseline
-        
-        for peak in peaks:
-            # Gaussian peak shape
-            amplitude = peak.peak_height
-            center = peak.retention_time
-            sigma = peak.peak_width / 4  # Convert to standard deviation
-            
-            contribution = amplitude * math.exp(-((time - center) ** 2) / (2 * sigma ** 2))
-            signal += contribution
-        
-        data_points.append({
-            "time": round(time, 2),
-            "signal": round(signal, 1)
-        })
-    
-    return ChromatogramOutput(
+    output = ChromatogramOutput(
         peaks=peaks,
         total_runtime=round(max_rt, 1),
-        data_points=data_points
+        format=None if format == "points" else format
     )
+    if format == "base64":
+        output.time_b64 = _encode_float32(time)
+        output.signal_b64 = _encode_float32(trace)
+    elif format == "columnar":
+        output.time = np.round(time, 2).tolist()
+        output.signal = np.round(trace, 1).tolist()
+    else:
+        output.data_points = [
+            {"time": t, "signal": s}
+            for t, s in zip(np.round(time, 2).tolist(), np.round(trace, 1).tolist())
+        ]
+    return output
 
 # ============ GC FLEET MANAGEMENT ENDPOINTS ============
 
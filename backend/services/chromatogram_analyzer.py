@@ -9,12 +9,20 @@ import pytesseract
 from PIL import Image
 import base64
 import io
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import matplotlib.pyplot as plt
 from dataclasses import dataclass
 from datetime import datetime
 import logging
 
+# Shared digitization and peak detection engines
+try:
+    from backend.app.services.chromatogram_digitizer import DigitizedTrace, digitize_chromatogram
+    from backend.app.services.chromatography_service import chromatography_service
+except ImportError:
+    from app.services.chromatogram_digitizer import DigitizedTrace, digitize_chromatogram
+    from app.services.chromatography_service import chromatography_service
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -37,6 +45,7 @@ class ChromatogramAnalysis:
     troubleshooting_suggestions: List[str]
     method_recommendations: List[str]
     overall_quality_score: float
+    trace: Optional[Dict[str, Any]] = None  # Digitized time/intensity arrays and calibration
 
 class ChromatogramVisionAI:
     """AI-powered chromatogram analysis from images"""
@@ -45,20 +54,28 @@ class ChromatogramVisionAI:
         self.peak_detection_threshold = 0.1
         self.noise_threshold = 0.05
         
-    async def analyze_chromatogram_image(self, image_data: str) -> ChromatogramAnalysis:
+    async def analyze_chromatogram_image(
+        self,
+        image_data: str,
+        time_range: Optional[Tuple[float, float]] = None,
+        signal_range: Optional[Tuple[float, float]] = None
+    ) -> ChromatogramAnalysis:
         """
-        Analyze a chromatogram from base64 image data
+        Analyze a chromatogram from base64 image data.
+        time_range/signal_range give the axis values at the plot edges when
+        the tick labels cannot be read.
         """
         try:
             # Decode base64 image
             image_bytes = base64.b64decode(image_data.split(',')[1])
-            image = Image.open(io.BytesIO(image_bytes))
+            image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
             
             # Convert to OpenCV format
             cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
             
             # Extract chromatogram data
-            chromatogram_data = self._extract_chromatogram_data(cv_image)
+            trace = self._extract_chromatogram_data(cv_image, time_range, signal_range)
+            chromatogram_data = np.column_stack([trace.time, trace.signal])
             
             # Detect peaks
             peaks = self._detect_peaks(chromatogram_data)
@@ -82,94 +99,62 @@ class ChromatogramVisionAI:
                 resolution_issues=self._detect_resolution_issues(peaks),
                 troubleshooting_suggestions=suggestions,
                 method_recommendations=recommendations,
-                overall_quality_score=quality_score
+                overall_quality_score=quality_score,
+                trace={
+                    "time_data": trace.time.tolist(),
+                    "intensity_data": trace.signal.tolist(),
+                    "time_calibrated": trace.x_axis.calibrated,
+                    "intensity_calibrated": trace.y_axis.calibrated,
+                    "plot_area": {
+                        "x": trace.plot_area.left, "y": trace.plot_area.top,
+                        "width": trace.plot_area.width, "height": trace.plot_area.height
+                    },
+                    "coverage": trace.coverage
+                }
             )
             
         except Exception as e:
             logger.error(f"Error analyzing chromatogram: {e}")
             raise
     
-    def _extract_chromatogram_data(self, cv_image: np.ndarray) -> np.ndarray:
-        """Extract chromatogram trace from image using computer vision"""
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply Gaussian blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        
-        # Edge detection to find the chromatogram trace
-        edges = cv2.Canny(blurred, 50, 150)
-        
-        # Find contours (chromatogram line)
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Extract the main chromatogram line
-        # This is a simplified approach - in reality, you'd use more sophisticated
-        # computer vision techniques to accurately trace the chromatogram
-        
-        # For demo purposes, create a synthetic chromatogram data
-        # In production, this would be the actual extracted trace
-        x = np.linspace(0, 30, 1000)  # 30 minutes
-        
-        # Simulate a realistic chromatogram with multiple peaks
-        y = (0.1 * np.random.normal(0, 0.02, 1000) +  # baseline noise
-             0.8 * np.exp(-0.5 * ((x - 5) / 0.3)**2) +   # peak at 5 min
-             0.6 * np.exp(-0.5 * ((x - 12) / 0.4)**2) +  # peak at 12 min  
-             0.9 * np.exp(-0.5 * ((x - 18) / 0.2)**2) +  # peak at 18 min
-             0.02 * x)  # slight baseline drift
-             
-        return np.column_stack([x, y])
+    def _extract_chromatogram_data(
+        self,
+        cv_image: np.ndarray,
+        time_range: Optional[Tuple[float, float]] = None,
+        signal_range: Optional[Tuple[float, float]] = None
+    ) -> DigitizedTrace:
+        """Extract the chromatogram trace from the plot area of an image"""
+        trace = digitize_chromatogram(cv_image, x_range=time_range, y_range=signal_range)
+        if not trace.calibrated:
+            logger.warning("Chromatogram axes could not be calibrated; peak positions are in pixels")
+        return trace
     
     def _detect_peaks(self, data: np.ndarray) -> List[PeakInfo]:
         """Detect and analyze peaks in chromatogram data"""
         
         x, y = data[:, 0], data[:, 1]
-        peaks = []
+        if len(y) < 3 or np.ptp(y) <= 0:
+            return []
         
-        # Find peak indices using scipy-like peak detection
-        # Simplified peak detection for demo
-        for i in range(1, len(y) - 1):
-            if (y[i] > y[i-1] and y[i] > y[i+1] and 
-                y[i] > self.peak_detection_threshold):
-                
-                # Calculate peak properties
-                retention_time = x[i]
-                height = y[i]
-                
-                # Estimate peak width and area (simplified)
-                width = self._estimate_peak_width(x, y, i)
-                area = height * width * 0.8  # approximation
-                
-                # Analyze peak shape
-                shape_quality = self._analyze_peak_shape(x, y, i)
-                
-                peaks.append(PeakInfo(
-                    retention_time=retention_time,
-                    height=height,
-                    area=area,
-                    width=width,
-                    shape_quality=shape_quality,
-                    confidence=0.85
-                ))
+        # Same detector as imported runs; digitized traces carry pixel
+        # quantization steps, so peaks below a fraction of the tallest are dropped
+        measured, baseline, _ = chromatography_service.detect_peak_table(x, y, baseline_method="asls")
+        corrected = y - baseline
+        if len(measured):
+            measured = measured[measured.height >= self.peak_detection_threshold * measured.height.max()]
         
-        return peaks
-    
-    def _estimate_peak_width(self, x: np.ndarray, y: np.ndarray, peak_idx: int) -> float:
-        """Estimate peak width at half height"""
-        peak_height = y[peak_idx]
-        half_height = peak_height / 2
+        peaks = []
+        for peak in measured:
+            peaks.append(PeakInfo(
+                retention_time=float(peak.retention_time),
+                height=float(peak.height),
+                area=float(peak.area),
+                width=float(peak.width),
+                shape_quality=self._analyze_peak_shape(x, corrected, int(peak.peak_index)),
+                confidence=0.85
+            ))
         
-        # Find left and right boundaries at half height
-        left_idx = peak_idx
-        while left_idx > 0 and y[left_idx] > half_height:
-            left_idx -= 1
-            
-        right_idx = peak_idx
-        while right_idx < len(y) - 1 and y[right_idx] > half_height:
-            right_idx += 1
-            
-        return x[right_idx] - x[left_idx]
+        return peaks
     
     def _analyze_peak_shape(self, x: np.ndarray, y: np.ndarray, peak_idx: int) -> str:
         """Analyze peak shape quality"""
@@ -198,9 +183,11 @@ class ChromatogramVisionAI:
         x, y = data[:, 0], data[:, 1]
         
         # Calculate noise level (standard deviation of baseline regions)
-        # Find regions without peaks for baseline analysis
-        baseline_regions = y[y < np.percentile(y, 25)]
-        noise_level = np.std(baseline_regions)
+        # Find regions without peaks for baseline analysis; relative to the
+        # signal range so digitized traces in any units share the thresholds
+        baseline_regions = y[y <= np.percentile(y, 25)]
+        signal_range = np.ptp(y)
+        noise_level = float(np.std(baseline_regions) / signal_range) if signal_range > 0 else 0.0
         
         # Assess baseline quality
         if noise_level < 0.02:
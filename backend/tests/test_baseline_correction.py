@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared baseline correction engine
+"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.baseline_correction import (
+    _penalty_band, correct_baseline, estimate_baseline, rolling_min_baseline
+)
+
+
+@pytest.fixture
+def trace():
+    x = np.linspace(0, 30, 6000)
+    baseline = 10 + 0.5 * x + 3 * np.sin(x / 8)
+    peaks = sum(200 * np.exp(-0.5 * ((x - c) / 0.04) ** 2) for c in np.linspace(2, 28, 15))
+    noise = np.random.default_rng(1).normal(0, 0.1, x.size)
+    return x, baseline, baseline + peaks + noise
+
+
+def test_penalty_band_matches_dense_operator():
+    n = 9
+    D = np.diff(np.eye(n), n=2, axis=0)
+    dense = 7.0 * D.T @ D
+    band = _penalty_band(n, 7.0)
+
+    np.testing.assert_allclose(band[2], np.diag(dense))
+    np.testing.assert_allclose(band[1, 1:], np.diag(dense, 1))
+    np.testing.assert_allclose(band[0, 2:], np.diag(dense, 2))
+
+
+@pytest.mark.parametrize("method", ["asls", "airpls"])
+def test_penalized_methods_recover_drifting_baseline(trace, method):
+    _, true_baseline, y = trace
+    baseline = estimate_baseline(y, method=method, lam=1e7)
+
+    assert np.sqrt(np.mean((baseline - true_baseline) ** 2)) < 1.0
+
+
+def test_rolling_min_matches_windowed_minimum():
+    y = np.random.default_rng(2).normal(size=500)
+    window = 50
+    expected = np.array([
+        np.min(y[max(0, i - window // 2):min(len(y), i + window // 2 + 1)])
+        for i in range(len(y))
+    ])
+    from scipy.ndimage import gaussian_filter1d
+
+    np.testing.assert_allclose(rolling_min_baseline(y, window), gaussian_filter1d(expected, sigma=2))
+
+
+def test_correct_baseline_clips_and_validates(trace):
+    _, _, y = trace
+    corrected, baseline = correct_baseline(y, method="asls", clip_negative=True)
+
+    assert corrected.min() >= 0
+    assert baseline.shape == y.shape
+    with pytest.raises(ValueError):
+        estimate_baseline(y, method="spline")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for process-pool chromatogram analysis and the streaming batch endpoint
+"""
+
+import json
+import pytest
+import numpy as np
+from pathlib import Path
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.api.v1.endpoints import chromatography
+from app.services.analysis_pool import shutdown_analysis_executor
+
+
+def _trace(n_peaks):
+    time = np.linspace(0, 10, 2000)
+    intensity = 5 + sum(
+        100 * np.exp(-0.5 * ((time - c) / 0.05) ** 2) for c in np.linspace(1, 9, n_peaks)
+    )
+    return {"time_data": time.tolist(), "intensity_data": intensity.tolist()}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_WORKERS", 2)
+    app = FastAPI()
+    app.include_router(chromatography.router, prefix="/api/v1/chromatography")
+    yield TestClient(app)
+    shutdown_analysis_executor()
+
+
+def test_batch_streams_one_line_per_trace(client):
+    traces = [_trace(n) for n in (1, 3, 5)]
+    response = client.post("/api/v1/chromatography/detect/batch", json={"traces": traces})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results = {line["index"]: line["result"] for line in lines}
+
+    assert sorted(results) == [0, 1, 2]
+    assert [results[i]["peaks_detected"] for i in range(3)] == [1, 3, 5]
+
+
+def test_batch_rejects_oversized_requests(client, monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_BATCH_MAX_TRACES", 1)
+    response = client.post(
+        "/api/v1/chromatography/detect/batch",
+        json={"traces": [_trace(1), _trace(2)]}
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk ingestion of instrument export directories
+"""
+
+import asyncio
+import json
+import os
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, undefer_group
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.core.database import SandboxRun
+from app.models.schemas import RunIngestJob, RunRecord
+from app.services import background_jobs as background_jobs_module
+from app.services.ingestion_service import IngestionService
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_WORKERS", -1)
+    engine = create_engine(f"sqlite:///{tmp_path / 'lab.db'}")
+    return IngestionService(session_factory=sessionmaker(bind=engine))
+
+
+def _write_exports(root: Path) -> None:
+    t = np.linspace(0, 10, 500)
+    for i in range(5):
+        signal = 100 * np.exp(-((t - 2 - i) / 0.05) ** 2) + np.random.default_rng(i).normal(0, 0.1, t.size)
+        folder = root / ("2023" if i < 3 else "2024")
+        folder.mkdir(exist_ok=True)
+        (folder / f"inj_{i}.csv").write_text("time,signal\n" + "\n".join(f"{x},{y}" for x, y in zip(t, signal)))
+    values = " ".join(str(v) for v in range(20))
+    (root / "2024" / "tic.jdx").write_text(
+        f"##TITLE=TIC 7\n##FIRSTX=0\n##LASTX=19\n##NPOINTS=20\n##XYDATA=(X++(Y..Y))\n0 {values}\n##END=\n"
+    )
+    (root / "2024" / "broken.csv").write_text("time,signal\n1,2\n")
+    (root / "2024" / "notes.txt").write_text("not an export")
+
+
+def _stored_runs(service):
+    with service.session_factory() as db:
+        return db.query(SandboxRun).options(undefer_group("traces")).order_by(SandboxRun.id).all()
+
+
+def test_ingest_directory_is_idempotent(service, tmp_path):
+    root = tmp_path / "archive"
+    root.mkdir()
+    _write_exports(root)
+
+    job = asyncio.run(service.ingest_directory(root, method_id=3, batch_size=2))
+    assert (job.files_found, job.runs_inserted, job.files_skipped, job.files_failed) == (7, 6, 0, 1)
+    assert job.failures[0].startswith("2024/broken.csv")
+
+    runs = _stored_runs(service)
+    assert [run.sample_name for run in runs] == ["inj_0", "inj_1", "inj_2", "inj_3", "inj_4", "TIC 7"]
+    assert all(run.method_id == 3 and run.source_key for run in runs)
+    assert runs[0].peak_count == len(runs[0].peaks) and runs[0].metrics["source_file"] == "2023/inj_0.csv"
+    record = RunRecord(
+        sample_name=runs[0].sample_name, time=runs[0].time, signal=runs[0].signal,
+        peaks=runs[0].peaks, baseline=runs[0].baseline
+    )
+    assert abs(max(record.peaks, key=lambda p: p.height).rt - 2.0) < 0.05
+
+    again = asyncio.run(service.ingest_directory(root, method_id=3))
+    assert (again.runs_inserted, again.files_skipped, again.files_failed) == (0, 6, 1)
+
+    # A re-exported file gets a new key
+    path = root / "2023" / "inj_1.csv"
+    path.write_text(path.read_text() + "\n")
+    os.utime(path, ns=(0, 1))
+    assert asyncio.run(service.ingest_directory(root)).runs_inserted == 1
+    assert len(_stored_runs(service)) == 7
+
+
+def test_resolve_directory_stays_below_ingest_root(service, tmp_path, monkeypatch):
+    (tmp_path / "exports" / "gc1").mkdir(parents=True)
+    monkeypatch.setattr(settings, "INGEST_ROOT", str(tmp_path / "exports"))
+
+    assert service.resolve_directory("gc1") == (tmp_path / "exports" / "gc1").resolve()
+    with pytest.raises(ValueError):
+        service.resolve_directory("../")
+    with pytest.raises(ValueError):
+        service.resolve_directory("gc2")
+
+
+def test_keys_do_not_depend_on_the_requested_subdirectory(service, tmp_path, monkeypatch):
+    exports = tmp_path / "exports"
+    (exports / "gc1").mkdir(parents=True)
+    _write_exports(exports / "gc1")
+    monkeypatch.setattr(settings, "INGEST_ROOT", str(exports))
+
+    first = asyncio.run(service.ingest_directory(service.resolve_directory("gc1")))
+    assert first.runs_inserted == 6
+    parent = asyncio.run(service.ingest_directory(service.resolve_directory(".")))
+    assert (parent.runs_inserted, parent.files_skipped) == (0, 6)
+    assert len(_stored_runs(service)) == 6
+
+
+def test_cancelled_job_counts_the_batch_already_committing(service, tmp_path, monkeypatch):
+    root = tmp_path / "archive"
+    root.mkdir()
+    _write_exports(root)
+    insert_runs = service.insert_runs
+    job = RunIngestJob(id="cancel", directory=str(root))
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        inserting = asyncio.Event()
+
+        def slow_insert(rows):
+            loop.call_soon_threadsafe(inserting.set)
+            time.sleep(0.2)
+            return insert_runs(rows)
+
+        monkeypatch.setattr(service, "insert_runs", slow_insert)
+        task = asyncio.ensure_future(service.ingest_directory(root, batch_size=2, job=job))
+        await inserting.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert job.runs_inserted > 0
+    assert job.runs_inserted == len(_stored_runs(service))
+
+
+def test_background_jobs_publish_progress_and_keep_the_newest_finished(service, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_JOB_RETENTION", 1)
+    messages = []
+
+    async def broadcast(message):
+        messages.append(json.loads(message))
+
+    monkeypatch.setattr(background_jobs_module.websocket_manager, "broadcast", broadcast)
+    root = tmp_path / "archive"
+    root.mkdir()
+    _write_exports(root)
+
+    async def run():
+        jobs = []
+        for _ in range(3):
+            jobs.append(service.start_ingest_job(root))
+            await service._job_tasks[jobs[-1].id]
+        return jobs
+
+    first, second, third = asyncio.run(run())
+    assert [job.status for job in (first, second, third)] == ["completed"] * 3
+    assert third.runs_inserted == 0 and third.files_skipped == second.files_skipped
+    assert service.list_jobs() == [third, second]
+    assert service.get_job(first.id) is None and not service.cancel_job(third.id)
+    assert {message["type"] for message in messages} == {"ingest_progress"}
+    assert "failures" not in messages[-1]["job"]
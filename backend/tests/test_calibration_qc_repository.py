@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent calibration and QC repositories
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.schemas import (
+    CalibrationFitRequest, CalibrationLevel, QCPolicy, QCResult, QCTarget, QCRecord, QuantResult, RunRecord
+)
+from app.services.qc_service import QCService
+from app.services.quant_service import QuantitationService
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'lab.db'}")
+    return sessionmaker(bind=engine)
+
+
+def _fit(service, method_id=1, target_name="Benzene"):
+    levels = [
+        CalibrationLevel(target_name=target_name, amount=1.0, unit="ppm", area=1000.0),
+        CalibrationLevel(target_name=target_name, amount=5.0, unit="ppm", area=5000.0)
+    ]
+    return service.fit_calibration_enhanced(CalibrationFitRequest(
+        method_id=method_id, target_name=target_name, model_type="linear", levels=levels
+    ))
+
+
+def test_calibrations_survive_a_restart(session_factory):
+    service = QuantitationService(session_factory=session_factory)
+    first = _fit(service)
+    second = _fit(service)
+    _fit(service, method_id=2, target_name="Toluene")
+    service.activate_calibration(first.id)
+    service.activate_calibration(second.id)
+
+    restarted = QuantitationService(session_factory=session_factory)
+    assert restarted.get_active_calibration(1).id == second.id
+    assert restarted.active_calibrations == {1: second.id}
+    assert not restarted.calibrations[first.id].active
+    assert [c.target_name for c in restarted.list_calibrations(method_id=2)] == ["Toluene"]
+    assert len(restarted.list_calibration_versions(method_id=1)) == 2
+
+    restarted.delete_calibration(second.id)
+    assert restarted.get_active_calibration(1) is None
+    assert len(service.list_calibration_versions(method_id=1)) == 1
+
+
+def test_cached_reads_are_invalidated_by_writes(session_factory):
+    service = QuantitationService(session_factory=session_factory)
+    calibration = _fit(service)
+    assert service.list_calibrations(method_id=1) == [calibration]
+
+    other = _fit(service)
+    assert {c.id for c in service.list_calibrations(method_id=1)} == {calibration.id, other.id}
+
+
+def test_qc_series_is_scoped_by_method_and_window(session_factory):
+    service = QCService(session_factory=session_factory)
+    target = service.upsert_qc_target(QCTarget(id="t1", methodId="m1", analyte="Benzene", mean=10.0, sd=1.0))
+    service.upsert_qc_target(QCTarget(id="t2", methodId="m2", analyte="Benzene", mean=50.0, sd=5.0))
+
+    now = datetime.now()
+    for days_ago, value in [(40, 9.0), (2, 10.5), (1, 11.0)]:
+        record = QCRecord(
+            id=f"r{days_ago}", runId=f"run{days_ago}", timestamp=now - timedelta(days=days_ago),
+            results=[QCResult(analyte="Benzene", value=value, unit="ppm", zscore=value - 10.0, status="PASS")],
+            overallStatus="PASS"
+        )
+        service.records.save(record.id, record, targets=[target])
+
+    series = service.get_qc_series("Benzene", "m1", days=30)
+    assert [p.value for p in series] == [10.5, 11.0]
+    assert service.get_qc_series("Benzene", "m2") == []
+
+    # Rewriting a record without targets keeps its method scope
+    override = service.records["r1"].model_copy(update={"overallStatus": "FAIL"})
+    service.records["r1"] = override
+    assert [p.value for p in service.get_qc_series("Benzene", "m1", days=30)] == [10.5, 11.0]
+    assert service.get_qc_records(limit=1)[0].overallStatus == "FAIL"
+
+    del service.records["r2"]
+    assert [p.value for p in service.get_qc_series("Benzene", "m1", days=30)] == [11.0]
+    assert len(QCService(session_factory=session_factory).records) == 2
+
+
+def test_qc_series_window_is_filtered_in_sql(session_factory):
+    service = QCService(session_factory=session_factory)
+    target = service.upsert_qc_target(QCTarget(id="t1", methodId="m1", analyte="Benzene", mean=10.0, sd=1.0))
+    now = datetime.now()
+    for days_ago in range(5):
+        record = QCRecord(
+            id=f"r{days_ago}", runId=f"run{days_ago}", timestamp=now - timedelta(days=days_ago),
+            results=[QCResult(analyte="Benzene", value=float(days_ago), unit="ppm", zscore=0.0, status="PASS")],
+            overallStatus="PASS"
+        )
+        service.records.save(record.id, record, targets=[target])
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = session_factory.kw["bind"]
+    event.listen(engine, "before_cursor_execute", record_statement)
+    rows = service.records.series("Benzene", "m1", since=now - timedelta(days=1, hours=1))
+    event.remove(engine, "before_cursor_execute", record_statement)
+
+    assert [row.value for row in rows] == [1.0, 0.0]
+    assert any("qc_results.timestamp >=" in statement for statement in statements)
+
+
+def test_appended_qc_results_are_evaluated_against_the_stored_series(session_factory):
+    service = QCService(session_factory=session_factory)
+    target = service.upsert_qc_target(QCTarget(id="t1", methodId="m1", analyte="Benzene", mean=10.0, sd=1.0))
+    policy = QCPolicy(requireNBeforeStrict=1)
+    start = datetime.now() - timedelta(days=1)
+
+    def append(service, i, value):
+        run = RunRecord(id=i, timestamp=start + timedelta(hours=i), sample_name=f"QC {i}",
+                        time=[0.0] * 10, signal=[0.0] * 10)
+        quant = QuantResult(run_id=i, sample_name=run.sample_name,
+                            results=[{"targetName": "Benzene", "concentration": value, "unit": "ppb"}])
+        return service.append_qc_result(run, quant, [target], policy)
+
+    assert append(service, 1, 10.5).overallStatus == "PASS"
+    warned = append(service, 2, 12.2)
+    assert warned.overallStatus == "WARN" and warned.results[0].flags == ["1-2s"]
+    assert warned.results[0].unit == "ppb"
+
+    # A fresh service rebuilds the series from storage, so 2-2s spans the restart
+    failed = append(QCService(session_factory=session_factory), 3, 12.4)
+    assert failed.overallStatus == "FAIL" and failed.results[0].flags == ["1-2s", "2-2s"]
+    assert [hit.value for hit in failed.ruleHits if hit.rule == "2-2s"] == [12.2, 12.4]
+
+
+def test_returned_models_do_not_alias_the_cache(session_factory):
+    service = QCService(session_factory=session_factory)
+    for i, status in enumerate(["PASS", "FAIL", "FAIL"]):
+        record = QCRecord(id=f"r{i}", runId=f"run{i}", timestamp=datetime.now(), results=[], overallStatus=status)
+        service.records[record.id] = record
+    assert service.records.count(overall_status="FAIL") == 2
+
+    record = service.records.get("r0")
+    record.notes = "edited but not saved"
+    service.get_qc_records()[0].notes = "edited but not saved"
+    assert service.records["r0"].notes is None
+    assert all(r.notes is None for r in service.get_qc_records())
+
+    service.records["r0"] = record
+    assert service.records["r0"].notes == "edited but not saved"
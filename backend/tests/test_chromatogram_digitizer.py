@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tests for digitizing chromatogram traces from plot images
+"""
+
+import asyncio
+import base64
+import cv2
+import numpy as np
+import pytest
+from pathlib import Path
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import sys
+
+# Add the parent directory to sys.path so we can import from app, and the
+# repository root for the backend.api routes
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.services.chromatogram_digitizer import detect_plot_area, digitize_chromatogram, fit_axis
+from app.services.ocr_layout import binarize_ink
+from services.chromatogram_analyzer import ChromatogramVisionAI
+
+LEFT, TOP, RIGHT, BOTTOM = 90, 40, 860, 520  # Axis lines of the test plot
+PEAKS = [(5.0, 800.0, 0.15), (12.0, 400.0, 0.25), (15.5, 600.0, 0.2)]  # (time, height, sigma)
+
+
+def _plot(frame: bool = False) -> np.ndarray:
+    """0-20 min, 0-1000 counts chromatogram with ticks, labels and a light grid"""
+    image = np.full((600, 900, 3), 255, dtype=np.uint8)
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    for x in range(LEFT + 77, RIGHT, 77):
+        cv2.line(image, (x, TOP), (x, BOTTOM), (220, 220, 220), 1)
+    cv2.line(image, (LEFT, BOTTOM), (RIGHT, BOTTOM), (0, 0, 0), 2)
+    cv2.line(image, (LEFT, TOP), (LEFT, BOTTOM), (0, 0, 0), 2)
+    if frame:
+        cv2.line(image, (LEFT, TOP), (RIGHT, TOP), (0, 0, 0), 2)
+        cv2.line(image, (RIGHT, TOP), (RIGHT, BOTTOM), (0, 0, 0), 2)
+    for i in range(11):
+        x = LEFT + round(i * (RIGHT - LEFT) / 10)
+        cv2.line(image, (x, BOTTOM), (x, BOTTOM + 8), (0, 0, 0), 2)
+        cv2.putText(image, str(2 * i), (x - 8, BOTTOM + 30), font, 0.6, (0, 0, 0), 1)
+    for i in range(6):
+        y = BOTTOM - round(i * (BOTTOM - TOP) / 5)
+        cv2.line(image, (LEFT - 8, y), (LEFT, y), (0, 0, 0), 2)
+        cv2.putText(image, str(200 * i), (LEFT - 60, y + 6), font, 0.6, (0, 0, 0), 1)
+
+    px = np.arange(LEFT + 3, RIGHT - 3)
+    t = (px - LEFT) / (RIGHT - LEFT) * 20
+    signal = 50 + sum(h * np.exp(-0.5 * ((t - rt) / s) ** 2) for rt, h, s in PEAKS)
+    py = BOTTOM - signal / 1000 * (BOTTOM - TOP)
+    cv2.polylines(image, [np.stack([px, py], axis=1).round().astype(np.int32)], False, (0, 0, 0), 2)
+    cv2.putText(image, "5.00", (230, 90), font, 0.5, (0, 0, 0), 1)  # Peak annotation
+    return image
+
+
+def _axis_ranges(image: np.ndarray):
+    """Axis values at the edges of the detected plot area"""
+    area = detect_plot_area(binarize_ink(image))
+    time_range = tuple((p - LEFT) / (RIGHT - LEFT) * 20 for p in (area.left, area.right - 1))
+    signal_range = tuple((BOTTOM - p) / (BOTTOM - TOP) * 1000 for p in (area.bottom - 1, area.top))
+    return time_range, signal_range
+
+
+@pytest.mark.parametrize("frame", [False, True])
+def test_digitized_trace_matches_plot(frame):
+    image = _plot(frame)
+    area = detect_plot_area(binarize_ink(image))
+    assert abs(area.left - LEFT) <= 3 and abs(area.bottom - BOTTOM) <= 3
+    assert abs(area.right - RIGHT) <= 4 and abs(area.top - TOP) <= 3
+
+    trace = digitize_chromatogram(image, *_axis_ranges(image))
+    assert trace.calibrated and trace.coverage > 0.95
+    assert len(trace.time) == area.width
+    for rt, height, _ in PEAKS:
+        window = np.abs(trace.time - rt) < 1
+        apex = np.argmax(np.where(window, trace.signal, -np.inf))
+        assert trace.time[apex] == pytest.approx(rt, abs=0.06)
+        assert trace.signal[apex] == pytest.approx(50 + height, abs=10)
+    assert np.median(trace.signal[trace.time < 3]) == pytest.approx(50, abs=3)
+
+
+def test_uncalibrated_trace_stays_in_pixels():
+    image = _plot()
+    # Tick labels are only used when Tesseract can read them
+    trace = digitize_chromatogram(image, x_range=(0, 20))
+    assert trace.x_axis.calibrated
+    if not trace.y_axis.calibrated:
+        assert trace.signal.max() == pytest.approx(850 / 1000 * (BOTTOM - TOP), abs=6)
+
+    with pytest.raises(ValueError):
+        digitize_chromatogram(np.full((300, 400, 3), 255, dtype=np.uint8))
+    blank_axes = np.full((300, 400), 255, dtype=np.uint8)
+    cv2.line(blank_axes, (40, 260), (380, 260), 0, 2)
+    cv2.line(blank_axes, (40, 20), (40, 260), 0, 2)
+    with pytest.raises(ValueError):
+        digitize_chromatogram(blank_axes)
+
+
+def test_fit_axis_drops_misread_labels():
+    pixels = [90, 167, 244, 321, 398, 475]
+    values = [0, 2, 4, 8, 8, 10]  # "6" misread as "8"
+    calibration = fit_axis(pixels, values)
+    assert calibration.calibrated and len(calibration.labels) == 5
+    assert calibration.apply(321) == pytest.approx(6, abs=0.01)
+
+    assert fit_axis([100, 100], [1, 2]) is None
+    assert fit_axis([100], [1]) is None
+
+
+def test_analyzer_reports_peaks_of_the_image():
+    image = _plot()
+    time_range, signal_range = _axis_ranges(image)
+    data_url = "data:image/png;base64," + base64.b64encode(cv2.imencode(".png", image)[1].tobytes()).decode("ascii")
+
+    analysis = asyncio.run(ChromatogramVisionAI().analyze_chromatogram_image(data_url, time_range, signal_range))
+
+    assert [round(p.retention_time, 1) for p in analysis.peaks] == [5.0, 12.0, 15.5]
+    assert [p.height for p in analysis.peaks] == pytest.approx([800, 400, 600], abs=15)
+    # Gaussian area = height * sigma * sqrt(2 pi)
+    assert [p.area for p in analysis.peaks] == pytest.approx([h * s * 2.5066 for _, h, s in PEAKS], rel=0.1)
+    assert analysis.trace["time_calibrated"] and len(analysis.trace["time_data"]) == len(analysis.trace["intensity_data"])
+    assert analysis.baseline_quality == "excellent"
+
+
+def test_routes_accept_axis_ranges():
+    from backend.api.chromatogram_routes import router
+
+    client = TestClient(FastAPI())
+    client.app.include_router(router)
+    image = _plot()
+    time_range, signal_range = _axis_ranges(image)
+    png = cv2.imencode(".png", image)[1].tobytes()
+    data_url = "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+    response = client.post("/analyze-base64", json={
+        "image": data_url, "time_range": list(time_range), "signal_range": list(signal_range)
+    })
+    assert response.status_code == 200
+    assert [round(p["retention_time"], 1) for p in response.json()["analysis"]["peaks"]] == [5.0, 12.0, 15.5]
+
+    response = client.post("/analyze", files={"image": ("plot.png", png, "image/png")},
+                           params={"time_range": time_range, "signal_range": signal_range})
+    assert response.status_code == 200 and response.json()["analysis"]["trace"]["time_calibrated"]
+
+    assert client.post("/analyze-base64", json={"image": data_url, "time_range": [20, 0]}).status_code == 400
+    assert client.post("/analyze", files={"image": ("plot.png", png, "image/png")},
+                       params={"time_range": [0]}).status_code == 400
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorized /api/chromatogram/simulate endpoint and its output formats
+"""
+
+import base64
+import math
+import numpy as np
+import pytest
+from pathlib import Path
+from fastapi.testclient import TestClient
+import sys
+
+# Add the repository root to sys.path so we can import backend.main
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from backend.main import app, _gaussian_trace
+
+URL = "/api/chromatogram/simulate"
+PARAMS = {"column_temp": 60.0, "flow_rate": 1.2, "split_ratio": 20.0}
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def _per_point_trace(time, peaks, baseline=50):
+    """The original per-point generator the endpoint used before vectorization"""
+    trace = []
+    for t in time:
+        signal = baseline
+        for peak in peaks:
+            sigma = peak["peak_width"] / 4
+            signal += peak["peak_height"] * math.exp(
+                -((t - peak["retention_time"]) ** 2) / (2 * sigma ** 2)
+            )
+        trace.append(signal)
+    return np.array(trace)
+
+
+def _decode_float32(payload):
+    return np.frombuffer(base64.b64decode(payload), dtype="<f4")
+
+
+def test_gaussian_trace_matches_per_point_loop():
+    peaks = [
+        {"retention_time": 3.2, "peak_height": 2000.0, "peak_width": 0.16},
+        {"retention_time": 3.4, "peak_height": 500.0, "peak_width": 0.17},
+        {"retention_time": 9.0, "peak_height": 1500.0, "peak_width": 0.28},
+    ]
+    time = np.arange(1100) / 100
+
+    trace = _gaussian_trace(
+        time,
+        centers=np.array([p["retention_time"] for p in peaks]),
+        heights=np.array([p["peak_height"] for p in peaks]),
+        sigmas=np.array([p["peak_width"] / 4 for p in peaks]),
+        baseline=50
+    )
+
+    # Truncating at ±5 sigma drops at most height * exp(-12.5) per peak
+    np.testing.assert_allclose(trace, _per_point_trace(time, peaks), rtol=0, atol=0.01)
+
+
+def test_default_points_payload_shape_unchanged(client):
+    response = client.post(URL, json=PARAMS)
+    assert response.status_code == 200
+    body = response.json()
+
+    assert set(body) == {"peaks", "total_runtime", "data_points"}
+    assert len(body["peaks"]) == 6
+    assert all(set(point) == {"time", "signal"} for point in body["data_points"])
+
+    time = np.array([point["time"] for point in body["data_points"]])
+    signal = np.array([point["signal"] for point in body["data_points"]])
+    np.testing.assert_array_equal(time, np.round(np.arange(len(time)) / 100, 2))
+    assert time[-1] == pytest.approx(body["total_runtime"], abs=0.1)
+    expected = _per_point_trace(time, body["peaks"])
+    assert np.max(np.abs(signal - expected)) <= 0.1
+
+
+def test_columnar_format_matches_points(client):
+    points = client.post(URL, json=PARAMS).json()
+    columnar = client.post(URL, json=PARAMS, params={"format": "columnar"}).json()
+
+    assert columnar["format"] == "columnar"
+    assert "data_points" not in columnar
+    assert columnar["peaks"] == points["peaks"]
+    assert columnar["time"] == [point["time"] for point in points["data_points"]]
+    assert columnar["signal"] == [point["signal"] for point in points["data_points"]]
+
+
+def test_base64_format_decodes_to_float32_arrays(client):
+    points = client.post(URL, json=PARAMS).json()
+    encoded = client.post(URL, json=PARAMS, params={"format": "base64"}).json()
+
+    assert encoded["format"] == "base64"
+    assert "data_points" not in encoded and "time" not in encoded
+    time = _decode_float32(encoded["time_b64"])
+    signal = _decode_float32(encoded["signal_b64"])
+
+    expected_time = np.array([point["time"] for point in points["data_points"]], dtype=np.float32)
+    expected_signal = np.array([point["signal"] for point in points["data_points"]])
+    assert time.dtype == np.float32 and signal.dtype == np.float32
+    np.testing.assert_array_equal(np.round(time, 2), expected_time)
+    np.testing.assert_allclose(signal, expected_signal, atol=0.05)
+
+
+def test_unknown_format_rejected(client):
+    response = client.post(URL, json=PARAMS, params={"format": "csv"})
+    assert response.status_code == 422
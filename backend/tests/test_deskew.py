@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for fast and accurate skew estimation in the image processor
+"""
+
+import cv2
+import numpy as np
+import pytest
+from pathlib import Path
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.schemas import DeskewMode, ImagePreprocessingOptions
+from app.services.image_processor import get_image_processor
+
+
+def _page() -> np.ndarray:
+    """Letter page at 200 dpi: method text, a chromatogram and a peak table"""
+    page = np.full((2200, 1700), 255, dtype=np.uint8)
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    for i in range(4):
+        cv2.putText(page, f"Column: DB-5 30 m  Carrier: Helium  Flow: 1.{i} mL/min  Oven 40-300 C",
+                    (80, 100 + 60 * i), font, 1.2, 0, 2)
+    cv2.line(page, (120, 1000), (1600, 1000), 0, 3)
+    x = np.arange(120, 1600)
+    y = 990 - 560 * np.exp(-((x - 600) / 16.0) ** 2) - 300 * np.exp(-((x - 1040) / 20.0) ** 2)
+    cv2.polylines(page, [np.stack([x, y], axis=1).astype(np.int32)], False, 0, 2)
+    for r in range(8):
+        cv2.putText(page, f"{r + 1}    {1.5 + r * 0.83:.2f}    {12345 - 977 * r}    {4567 - 311 * r}    {12.5 - r:.1f}",
+                    (100, 1250 + 76 * r), font, 1.2, 0, 2)
+    return page
+
+
+def _skew(image: np.ndarray, angle: float) -> np.ndarray:
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height), borderValue=255)
+
+
+@pytest.mark.parametrize("angle", [-4.37, -1.21, 0.83, 2.52, 4.6])
+def test_fast_deskew_recovers_angle(angle):
+    deskewed, correction = get_image_processor().intelligent_deskewing(_skew(_page(), angle), DeskewMode.FAST)
+    assert correction == pytest.approx(-angle, abs=0.1)
+    assert deskewed.shape[0] > 2200 and deskewed.shape[1] > 1700  # Rotated without cropping
+
+
+def test_small_skew_and_blank_pages_are_left_alone():
+    processor = get_image_processor()
+    page = _skew(_page(), 0.3)
+    deskewed, correction = processor.intelligent_deskewing(page, DeskewMode.FAST)
+    assert correction == 0.0 and deskewed is page
+
+    blank = np.full((800, 600), 255, dtype=np.uint8)
+    assert processor.intelligent_deskewing(blank, DeskewMode.FAST)[1] == 0.0
+
+
+def test_pipeline_uses_requested_mode():
+    options = ImagePreprocessingOptions(denoise=False, enhance_contrast=False, scale_factor=1.0)
+    assert options.deskew_mode == DeskewMode.FAST
+
+    result = get_image_processor().process_image_pipeline(cv2.cvtColor(_skew(_page(), 1.9), cv2.COLOR_GRAY2BGR), options)
+    assert result["success"]
+    assert any(step.startswith("deskewed_-1.9") for step in result["processing_steps"])
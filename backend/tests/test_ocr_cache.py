@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-hash OCR cache
+"""
+
+import asyncio
+import io
+import pytest
+import cv2
+import numpy as np
+import pytesseract
+from pathlib import Path
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import sys
+
+# Add the parent directory to sys.path so we can import from app, and the
+# repository root for the backend.app API modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.core.config import settings
+from app.models.schemas import ImagePreprocessingOptions, OCRTextRegion
+from app.services import background_jobs as background_jobs_module
+from app.services import ocr_cache as ocr_cache_module
+from app.services.image_processor import get_image_processor
+from app.services.ocr_cache import OCRCache, image_digest
+from app.services.ocr_job_service import OCRJobService
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = OCRCache(tmp_path / "cache", max_image_bytes=64 * 1024 * 1024, max_text_bytes=1024 * 1024)
+    monkeypatch.setattr(ocr_cache_module, "_ocr_cache_instance", cache)
+    return cache
+
+
+def _scan(text: str) -> np.ndarray:
+    image = np.full((160, 480, 3), 255, dtype=np.uint8)
+    cv2.putText(image, text, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    return image
+
+
+def _regions(count: int):
+    return [
+        OCRTextRegion(text=f"{i}.25 min", confidence=0.9, bbox={"x": 10, "y": 20 * i, "width": 60, "height": 14},
+                      region_type="retention_time")
+        for i in range(count)
+    ]
+
+
+def test_text_tier_keys_and_lru_eviction(cache):
+    options = ImagePreprocessingOptions()
+    digest = image_digest(b"scan one")
+    key = cache.text_key(digest, "image_processor", options, "fast", {"image_type": "chromatogram"})
+    assert key != cache.text_key(digest, "image_processor", options, "balanced", {"image_type": "chromatogram"})
+    assert key != cache.text_key(digest, "image_processor", options.model_copy(update={"scale_factor": 1.5}),
+                                 "fast", {"image_type": "chromatogram"})
+    assert cache.get_text(key) is None
+
+    cache.put_text(key, _regions(3), {"width": 480, "height": 160}, [{"x": 0, "y": 0, "psm": 6}])
+    entry = cache.get_text(key)
+    assert [r.text for r in entry["text_regions"]] == ["0.25 min", "1.25 min", "2.25 min"]
+    assert entry["original_dimensions"] == {"width": 480, "height": 160}
+    assert entry["layout_regions"][0]["psm"] == 6
+
+    # Budget fits about two entries: the least recently used one goes
+    cache.budgets["text"] = 2 * len(cache._path("text", key).read_bytes()) + 10
+    keys = [key] + [cache.text_key(image_digest(bytes([i])), "image_processor", options, "fast", {}) for i in range(2)]
+    cache.put_text(keys[1], _regions(3), {"width": 1, "height": 1}, [])
+    assert cache.get_text(keys[0]) is not None
+    cache.put_text(keys[2], _regions(3), {"width": 1, "height": 1}, [])
+    assert cache.get_text(keys[0]) is not None and cache.get_text(keys[1]) is None
+    assert not cache._path("text", keys[1]).exists()
+
+    stats = cache.stats()["text"]
+    assert stats["entries"] == 2 and stats["hits"] == 3 and stats["misses"] == 2
+
+    cache.budgets["text"] = 0
+    assert cache.get_text(keys[0]) is None
+
+
+def test_preprocessed_tier_serves_pipeline(cache):
+    processor = get_image_processor()
+    image = _scan("RT 4.52 min")
+    digest = image_digest(cv2.imencode(".png", image)[1].tobytes())
+    options = ImagePreprocessingOptions(denoise=False, deskew=False, scale_factor=1.5)
+
+    first = processor.process_image_pipeline(image, options, "peak_table", image_hash=digest)
+    second = processor.process_image_pipeline(image, options, "peak_table", image_hash=digest)
+    assert np.array_equal(first["processed_image"], second["processed_image"])
+    assert second["processing_steps"] == first["processing_steps"] and second["success"]
+    assert (cache.hits["preprocessed"], cache.misses["preprocessed"]) == (1, 1)
+
+    # Other options or image types are separate entries
+    processor.process_image_pipeline(image, options.model_copy(update={"binarize": True}), "peak_table", image_hash=digest)
+    processor.process_image_pipeline(image, options, "chromatogram", image_hash=digest)
+    assert cache.stats()["preprocessed"]["entries"] == 3
+
+
+def test_repeated_batch_reuses_preprocessing(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_WORKERS", -1)
+
+    async def broadcast(message):
+        pass
+
+    monkeypatch.setattr(background_jobs_module.websocket_manager, "broadcast", broadcast)
+    service = OCRJobService(spool_root=tmp_path / "spool")
+    scans = [cv2.imencode(".png", _scan(f"Peak {i}"))[1].tobytes() for i in range(3)]
+    fields = {"image_type": "chromatogram", "quality_level": "fast",
+              "preprocessing": {"denoise": False, "deskew": False}}
+
+    async def run():
+        job = service.create_job(len(scans))
+        images = [(i, f"scan{i}.png", service.spool_image(job, i, f"scan{i}.png", io.BytesIO(data)))
+                  for i, data in enumerate(scans)]
+        service.start_job(job, images, fields)
+        await service._job_tasks[job.id]
+        return job
+
+    try:
+        for _ in range(2):
+            assert asyncio.run(run()).completed_images == 3
+    finally:
+        service.shutdown()
+
+    stats = cache.stats()
+    assert stats["preprocessed"]["entries"] == 3
+    if stats["text"]["entries"]:
+        # The second batch is answered from the text tier without preprocessing
+        assert cache.hits["text"] == 3 and cache.hits["preprocessed"] == 0
+    else:
+        # Without Tesseract nothing is read, so only preprocessing is reused
+        assert cache.hits["text"] == 0 and cache.hits["preprocessed"] == 3
+
+
+def test_process_endpoint_reuses_cached_text(cache, monkeypatch):
+    from backend.app.api import ocr as ocr_api
+    from backend.app.services.auth_service import get_current_user
+
+    reads = []
+
+    def image_to_data(image, config, output_type):
+        reads.append(image.shape)
+        return {"level": [5], "conf": ["88"], "text": ["4.52"], "left": [10], "top": [40], "width": [60], "height": [20]}
+
+    monkeypatch.setattr(pytesseract, "image_to_data", image_to_data)
+    app = FastAPI()
+    app.include_router(ocr_api.router)
+    app.dependency_overrides[get_current_user] = lambda: {"username": "analyst", "user_id": 7}
+    client = TestClient(app)
+    upload = {"file": ("scan.png", cv2.imencode(".png", _scan("RT 4.52 min"))[1].tobytes(), "image/png")}
+    params = {"image_type": "peak_table", "denoise": False}
+
+    first = client.post("/api/ocr/process", files=upload, params=params)
+    assert first.status_code == 200, first.text
+    assert not first.json()["processing_metadata"]["cache_hit"] and reads
+    assert "processed_image_base64" in first.json()["processing_metadata"]
+
+    reads.clear()
+    second = client.post("/api/ocr/process", files=upload, params=params)
+    assert second.status_code == 200 and second.json()["processing_metadata"]["cache_hit"]
+    assert reads == [] and second.json()["text_regions"] == first.json()["text_regions"]
+
+    # Another quality level reads the text again from the cached preprocessed page
+    client.post("/api/ocr/process", files=upload, params={**params, "quality_level": "fast"})
+    assert reads and cache.hits["preprocessed"] == 1
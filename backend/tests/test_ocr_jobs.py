@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for background OCR batch jobs
+"""
+
+import asyncio
+import io
+import pytest
+import cv2
+import numpy as np
+from pathlib import Path
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services import background_jobs as background_jobs_module
+from app.services import ocr_cache as ocr_cache_module
+from app.services.ocr_job_service import OCRJobService, OCRQueueFull
+
+REQUEST_FIELDS = {
+    "image_type": "peak_table",
+    "quality_level": "fast",
+    "preprocessing": {"denoise": False, "deskew": False, "scale_factor": 1.0},
+    "extract_peaks": True,
+    "extract_method_params": False,
+    "extract_sample_info": False
+}
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_WORKERS", -1)
+    monkeypatch.setattr(settings, "OCR_MAX_PENDING_IMAGES", 10)
+
+    async def broadcast(message):
+        pass
+
+    monkeypatch.setattr(background_jobs_module.websocket_manager, "broadcast", broadcast)
+    monkeypatch.setattr(ocr_cache_module, "_ocr_cache_instance",
+                        ocr_cache_module.OCRCache(tmp_path / "cache", 64 * 1024 * 1024, 1024 * 1024))
+    service = OCRJobService(spool_root=tmp_path / "spool")
+    yield service
+    service.shutdown()
+
+
+def _png(text: str) -> bytes:
+    image = np.full((120, 400, 3), 255, dtype=np.uint8)
+    cv2.putText(image, text, (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def test_batch_job_keeps_partial_results_and_cleans_spool(service):
+    files = [(f"scan {i}.png", _png(f"Peak {i} 1.2{i} min")) for i in range(5)] + [("broken.png", b"not an image")]
+
+    async def run():
+        job = service.create_job(len(files) + 1)
+        service.record_failure(job, "notes.txt", "Unsupported file type text/plain")
+        images = [
+            (index, name, service.spool_image(job, index, name, io.BytesIO(data)))
+            for index, (name, data) in enumerate(files)
+        ]
+        assert images[0][2].name == "000000_scan_0.png"
+        assert service.pending_images() == 6 and not service.has_capacity(5)
+
+        service.start_job(job, images, REQUEST_FIELDS)
+        await service._job_tasks[job.id]
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == "completed"
+    assert (job.total_images, job.completed_images, job.failed_images) == (7, 5, 2)
+    assert job.errors[1].startswith("broken.png")
+    assert not (service.spool_root / job.id).exists()
+
+    results = service.get_results(job.id, offset=0, limit=100)
+    assert sorted(r.processing_metadata["batch_index"] for r in results) == [0, 1, 2, 3, 4]
+    assert all(r.success and r.image_type == "peak_table" for r in results)
+    assert [r.processing_metadata["batch_index"] for r in service.get_results(job.id, 3, 10)] == \
+        [r.processing_metadata["batch_index"] for r in results[3:]]
+    assert service.pending_images() == 0 and service.has_capacity(10)
+
+
+def test_cancel_and_unknown_jobs(service):
+    async def run():
+        job = service.create_job(1)
+        images = [(0, "scan.png", service.spool_image(job, 0, "scan.png", io.BytesIO(_png("Peak 1"))))]
+        service.start_job(job, images, REQUEST_FIELDS)
+        task = service._job_tasks[job.id]
+        assert service.cancel_job(job.id)
+        await asyncio.gather(task, return_exceptions=True)
+        return job
+
+    job = asyncio.run(run())
+    assert job.status == "cancelled" and job.finished_at is not None
+    assert not service.cancel_job(job.id)
+    with pytest.raises(ValueError):
+        service.get_results("missing")
+
+
+def test_jobs_reserve_capacity_and_old_jobs_are_pruned(service, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_JOB_RETENTION", 2)
+    first = service.create_job(6)
+    with pytest.raises(OCRQueueFull):
+        service.create_job(5)
+    assert list(service.jobs) == [first.id]
+
+    service.abort_job(first, "Failed to store uploads")
+    assert first.status == "error" and not (service.spool_root / first.id).exists()
+    later = []
+    for _ in range(3):
+        later.append(service.create_job(10))
+        service.abort_job(later[-1], "Failed to store uploads")
+
+    service.create_job(1)
+    assert first.id not in service.jobs and first.id not in service.results
+    assert later[0].id not in service.jobs
+    assert {later[1].id, later[2].id} <= set(service.jobs)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Tests for OCR layout analysis and table-aware peak parsing
+"""
+
+import base64
+import cv2
+import numpy as np
+from pathlib import Path
+from scipy.sparse.csgraph import connected_components
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.schemas import ImagePreprocessingOptions, OCRProcessingRequest, OCRTextRegion
+from app.services import ocr_cache as ocr_cache_module
+from app.services import ocr_service as ocr_service_module
+from app.services.image_processor import get_image_processor
+from app.services.ocr_layout import (
+    METHOD_PARAMETERS, PEAK_TABLE, _link_fragments, crop_region, detect_text_blocks, map_roi
+)
+from app.services.ocr_service import get_ocr_engine
+
+TABLE = [
+    ["Peak", "RT", "Area", "Height", "Area%"],
+    ["1", "2.35", "12345", "4567", "45.2"],
+    ["2", "4.80", "9876", "3210", "36.1"],
+    ["3", "6.12", "5120", "1500", "18.7"],
+]
+
+
+def _report_page() -> np.ndarray:
+    """Method header, chromatogram with axes and a ruled peak table"""
+    page = np.full((1100, 850, 3), 255, dtype=np.uint8)
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    header = ["Sample: Diesel QC 7   Operator: JS",
+              "Column: DB-5 30 m  Carrier: Helium  Flow: 1.2 mL/min",
+              "Inlet 250 C  Injection 1.0 uL"]
+    for i, line in enumerate(header):
+        cv2.putText(page, line, (40, 50 + 30 * i), font, 0.6, (0, 0, 0), 1)
+
+    cv2.line(page, (60, 500), (800, 500), (0, 0, 0), 2)
+    cv2.line(page, (60, 180), (60, 500), (0, 0, 0), 2)
+    x = np.arange(60, 800)
+    y = 495 - 280 * np.exp(-((x - 300) / 8.0) ** 2) - 150 * np.exp(-((x - 520) / 10.0) ** 2)
+    cv2.polylines(page, [np.stack([x, y], axis=1).astype(np.int32)], False, (0, 0, 0), 1)
+
+    for rule_y in (600, 640, 760):
+        cv2.line(page, (40, rule_y), (700, rule_y), (0, 0, 0), 1)
+    for r, row in enumerate(TABLE):
+        for c, cell in enumerate(row):
+            cv2.putText(page, cell, (50 + 130 * c, 628 + 38 * r + (12 if r else 0)), font, 0.6, (0, 0, 0), 1)
+    return page
+
+
+def _word(text: str, x: int, y: int) -> OCRTextRegion:
+    return OCRTextRegion(text=text, confidence=0.9, bbox={"x": x, "y": y, "width": 8 * len(text), "height": 14},
+                         region_type="label")
+
+
+def test_layout_finds_header_and_table_blocks():
+    page = _report_page()
+    regions = detect_text_blocks(page)
+
+    assert [r.region_type for r in regions] == [PEAK_TABLE, METHOD_PARAMETERS]
+    table, header = regions
+    assert (table.lines, table.columns, table.psm) == (4, 5, 6)
+    assert (header.lines, header.psm) == (3, 4)
+    # The table region holds its header row and stays clear of the plot
+    assert table.y < 620 and table.y + table.height < 800 and header.y + header.height < 180
+
+    crop, x0, y0 = crop_region(page, table)
+    assert (x0, y0) == (table.x - 8, table.y - 8)
+    assert crop.shape[:2] == (table.height + 16, table.width + 16)
+
+    # A page of scattered words is read as a whole instead
+    assert detect_text_blocks(page, max_regions=1) == []
+    assert detect_text_blocks(np.full((200, 200, 3), 255, dtype=np.uint8)) == []
+
+
+def test_peak_table_parsed_by_header_columns():
+    words = [_word("Sample: QC7", 40, 20)]
+    for r, row in enumerate(TABLE):
+        words.extend(_word(cell, 50 + 130 * c, 100 + 38 * r + (r % 2)) for c, cell in enumerate(row))
+    words.append(_word("Total", 50, 300))
+
+    peaks = get_ocr_engine().extract_peaks_data(words)
+
+    assert [p.peak_number for p in peaks] == [1, 2, 3]
+    assert [p.retention_time for p in peaks] == [2.35, 4.80, 6.12]
+    assert [p.area for p in peaks] == [12345, 9876, 5120]
+    assert [p.height for p in peaks] == [4567, 3210, 1500]
+    assert [p.area_percent for p in peaks] == [45.2, 36.1, 18.7]
+
+
+def test_engine_selects_layout_regions(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_cache_module, "_ocr_cache_instance", ocr_cache_module.OCRCache(tmp_path, 1 << 20, 1 << 20))
+    engine = get_ocr_engine()
+    page = _report_page()
+    image_base64 = base64.b64encode(cv2.imencode(".png", page)[1].tobytes()).decode("ascii")
+
+    peaks_only = OCRProcessingRequest(image_base64=image_base64, image_type="peak_table",
+                                      extract_method_params=False, extract_sample_info=False)
+    assert [r.region_type for r in engine.select_layout_regions(page, peaks_only)] == [PEAK_TABLE]
+
+    full = OCRProcessingRequest(image_base64=image_base64, image_type="chromatogram")
+    assert len(engine.select_layout_regions(page, full)) == 2
+    assert engine.select_layout_regions(page, full.model_copy(update={"layout_analysis": False})) == []
+
+    roi = full.model_copy(update={"custom_roi": [{"x": 10, "y": 20, "width": 300, "height": 100}]})
+    assert [r.bbox for r in engine.select_layout_regions(page, roi)] == [{"x": 10, "y": 20, "width": 300, "height": 100}]
+
+    # Only the table crop is read, as a uniform block
+    configs = []
+
+    def image_to_data(image, config, output_type):
+        configs.append(config)
+        return {"level": [], "conf": [], "text": [], "left": [], "top": [], "width": [], "height": []}
+
+    monkeypatch.setattr(ocr_service_module.pytesseract, "image_to_data", image_to_data)
+    result = engine.process_chromatogram_image(peaks_only)
+    assert result.success
+    assert [r["region_type"] for r in result.processing_metadata["layout_regions"]] == [PEAK_TABLE]
+    assert len(configs) == 1 and "--psm 6" in configs[0]
+
+
+def test_fragment_sweep_matches_pairwise_linking():
+    rng = np.random.default_rng(3)
+    boxes = np.column_stack([
+        rng.integers(0, 2000, 600), rng.integers(0, 3000, 600), rng.integers(5, 120, 600), rng.integers(8, 20, 600)
+    ])
+    left, top = boxes[:, 0], boxes[:, 1]
+    right, bottom = left + boxes[:, 2], top + boxes[:, 3]
+    gap_x = np.maximum(left[:, None], left[None, :]) - np.minimum(right[:, None], right[None, :])
+    gap_y = np.maximum(top[:, None], top[None, :]) - np.minimum(bottom[:, None], bottom[None, :])
+    dense = ((gap_y < 0) & (gap_x <= 144)) | ((gap_x < 0) & (gap_y <= 30))
+
+    np.testing.assert_array_equal(_link_fragments(boxes, 12.0), connected_components(dense, directed=False)[1])
+
+
+def test_custom_roi_follows_scaling_and_deskew(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_cache_module, "_ocr_cache_instance", ocr_cache_module.OCRCache(tmp_path, 1 << 20, 1 << 20))
+    page = _report_page()
+    cv2.rectangle(page, (500, 840), (600, 900), (0, 0, 0), -1)
+    height, width = page.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), 3.0, 1.0)
+    skewed = cv2.warpAffine(page, matrix, (width, height), borderValue=(255, 255, 255))
+
+    options = ImagePreprocessingOptions(denoise=False, enhance_contrast=False)
+    processed = get_image_processor().process_image_pipeline(skewed, options)
+    transform = np.asarray(processed["page_transform"])
+    assert processed["success"] and transform[0, 1] != 0
+
+    # The dark block, located on the skewed upload, lands on the upscaled, straightened page
+    corners = np.array([[500, 840, 1], [600, 840, 1], [500, 900, 1], [600, 900, 1]]) @ matrix.T
+    (x0, y0), (x1, y1) = corners.min(axis=0).astype(int), corners.max(axis=0).astype(int)
+    off_page = {"x": 5000, "y": 0, "width": 10, "height": 10}
+    request = OCRProcessingRequest(image_base64="", image_type="chromatogram", custom_roi=[
+        {"x": int(x0), "y": int(y0), "width": int(x1 - x0), "height": int(y1 - y0)}, off_page
+    ])
+    regions = get_ocr_engine().select_layout_regions(processed["processed_image"], request, transform)
+
+    assert len(regions) == 1
+    crop, _, _ = crop_region(processed["processed_image"], regions[0], padding=0)
+    assert crop.shape[0] > 2 * 60 and crop.shape[1] > 2 * 100
+    assert (crop < 128).mean() > 0.6
+
+
+def test_map_roi_clips_to_the_page():
+    transform = np.diag([2.0, 2.0, 1.0])
+    assert map_roi({"x": -10, "y": 50, "width": 100, "height": 1000}, transform, (400, 300)) == (0, 100, 180, 300)
+    assert map_roi({"x": 200, "y": 0, "width": 10, "height": 10}, transform, (400, 300)) is None
+
+
+def test_failed_region_falls_back_to_full_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_cache_module, "_ocr_cache_instance", ocr_cache_module.OCRCache(tmp_path, 1 << 20, 1 << 20))
+    page = _report_page()
+    calls = []
+
+    def image_to_data(image, config, output_type):
+        calls.append(image.shape[:2])
+        if image.shape[:2] != page.shape[:2]:
+            raise RuntimeError("tesseract crashed")
+        return {"level": [5], "conf": ["91"], "text": ["Helium"],
+                "left": [40], "top": [60], "width": [80], "height": [14]}
+
+    monkeypatch.setattr(ocr_service_module.pytesseract, "image_to_data", image_to_data)
+    request = OCRProcessingRequest(image_base64="", image_type="method_parameters",
+                                   custom_roi=[{"x": 40, "y": 30, "width": 500, "height": 100}])
+    result = get_ocr_engine().process_preprocessed_image(page, request)
+
+    assert result.success and [r.text for r in result.text_regions] == ["Helium"]
+    assert result.processing_metadata["layout_regions"] == []
+    assert calls == [(116, 516), page.shape[:2]]
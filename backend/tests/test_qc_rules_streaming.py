@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming and bulk Westgard rule evaluation
+"""
+
+import numpy as np
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.schemas import QCPolicy, QCTimeSeriesPoint
+from app.services.qc_rules_service import QCRulesService
+
+
+def _series(n=120, analyte="Benzene", seed=3):
+    rng = np.random.default_rng(seed)
+    # Drift and spikes so every rule fires somewhere
+    values = 10.0 + rng.normal(0, 1.0, n) + np.where(np.arange(n) % 40 > 25, 1.6, 0.0)
+    values[[30, 31, 45]] = [13.5, 6.0, 13.2]
+    start = datetime(2024, 1, 1)
+    return [
+        QCTimeSeriesPoint(timestamp=start + timedelta(hours=i), analyte=analyte, value=v, mean=10.0, sd=1.0)
+        for i, v in enumerate(values)
+    ]
+
+
+def test_streaming_matches_full_reevaluation():
+    policy = QCPolicy(requireNBeforeStrict=5)
+    points = _series()
+    streaming = QCRulesService()
+    full = QCRulesService()
+
+    for i, point in enumerate(points):
+        hits, result = streaming.append_point(point, policy)
+        expected_hits, expected_results = full.evaluate_rules(points[:i + 1], policy)
+        assert [(h.rule, h.timestamp) for h in hits] == [(h.rule, h.timestamp) for h in expected_hits]
+        assert result.flags == expected_results["Benzene"].flags
+        assert result.status == expected_results["Benzene"].status
+
+    state = streaming.get_state("Benzene")
+    assert state.count == len(points)
+    assert np.isclose(state.sd, np.std([p.value for p in points], ddof=1))
+
+
+def test_bulk_matches_streaming():
+    policy = QCPolicy(requireNBeforeStrict=20)
+    points = _series(n=300) + _series(n=50, analyte="Toluene", seed=9)
+    service = QCRulesService()
+
+    bulk = service.evaluate_series_bulk(points, policy)
+    fired = set()
+    for analyte in ("Benzene", "Toluene"):
+        series = [p for p in points if p.analyte == analyte]
+        streamed = [service.append_point(p, policy)[1] for p in series]
+        assert [(r.flags, r.status) for r in bulk[analyte]] == [(r.flags, r.status) for r in streamed]
+        fired.update(flag for r in streamed for flag in r.flags)
+
+    assert fired == {"1-2s", "1-3s", "2-2s", "R-4s", "4-1s", "10-x"}
+
+
+def test_load_history_resumes_series():
+    policy = QCPolicy(requireNBeforeStrict=1)
+    points = _series(n=60)
+    fresh = QCRulesService()
+    fresh.load_history(points[:-1])
+
+    reference = QCRulesService()
+    for point in points[:-1]:
+        reference.append_point(point, policy)
+
+    assert fresh.append_point(points[-1], policy)[1] == reference.append_point(points[-1], policy)[1]
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for the quantitation endpoints
+"""
+
+import numpy as np
+import pytest
+from pathlib import Path
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.api.v1.endpoints import quant
+from app.core.database import SandboxRun, get_db
+from app.models.schemas import CalibrationLevel, CalibrationModel
+from app.services.quant_service import QuantitationService
+
+
+def _calibration(name, rt, slope):
+    return CalibrationModel(
+        id=f"cal-{name}", version_id=f"v-{name}", method_id=1, target_name=name, model_type="linear",
+        levels=[
+            CalibrationLevel(target_name=name, amount=1.0, unit="ppm", rt=rt),
+            CalibrationLevel(target_name=name, amount=10.0, unit="ppm", rt=rt)
+        ],
+        slope=slope, intercept=0.0, lod=0.5, loq=1.5
+    )
+
+
+@pytest.fixture
+def client(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SandboxRun.__table__.create(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    service = QuantitationService(session_factory=Session)
+    for calibration in (_calibration("Benzene", 2.0, 100.0), _calibration("Toluene", 3.5, 50.0)):
+        service.calibrations[calibration.id] = calibration
+    monkeypatch.setattr(quant, "quant_service", service)
+
+    t = np.linspace(0, 10, 100)
+    with Session() as db:
+        for areas in ([300.0, 250.0], [600.0, 500.0]):
+            db.add(SandboxRun(
+                instrument_id=1, method_id=1, sample_name="Injection", compound_ids=[], fault_params={},
+                time=t, signal=np.zeros_like(t), metrics={},
+                peaks=[
+                    {"rt": 2.01, "area": areas[0], "height": 1.0, "width": 0.05, "name": "Benzene"},
+                    {"rt": 3.52, "area": areas[1], "height": 1.0, "width": 0.05}
+                ]
+            ))
+        db.commit()
+
+    def override_db():
+        with Session() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(quant.router, prefix="/api/v1/quant")
+    app.dependency_overrides[get_db] = override_db
+    return TestClient(app)
+
+
+def test_batch_quantitation_endpoint(client):
+    calibration_ids = ["cal-Benzene", "cal-Toluene"]
+
+    response = client.post("/api/v1/quant/batch", json={"run_ids": [2, 1], "calibration_ids": calibration_ids})
+    assert response.status_code == 200
+    results = response.json()
+
+    assert [result["run_id"] for result in results] == [2, 1]
+    concentrations = [{r["targetName"]: r["concentration"] for r in result["results"]} for result in results]
+    assert concentrations[0] == pytest.approx({"Benzene": 6.0, "Toluene": 10.0})
+    assert concentrations[1] == pytest.approx({"Benzene": 3.0, "Toluene": 5.0})
+
+    missing = client.post("/api/v1/quant/batch", json={"run_ids": [1, 99], "calibration_ids": calibration_ids})
+    assert missing.status_code == 404 and "99" in missing.json()["detail"]
+    assert client.post("/api/v1/quant/batch", json={"run_ids": [1], "calibration_ids": ["nope"]}).status_code == 404
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the two-tier simulation result store
+"""
+
+import pytest
+from pathlib import Path
+from typing import List
+from pydantic import BaseModel
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.result_store import ResultStore
+
+
+class Result(BaseModel):
+    run_id: str
+    intensity: List[float]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "results.db")
+
+
+def test_results_are_shared_between_workers(path):
+    worker_a = ResultStore(Result, path)
+    worker_b = ResultStore(Result, path)
+    worker_a.put("run-1", Result(run_id="run-1", intensity=[1.0, 2.0]))
+
+    assert worker_b.get("run-1") == Result(run_id="run-1", intensity=[1.0, 2.0])
+    assert worker_b.delete("run-1")
+    assert worker_b.get("run-1") is None
+    assert not worker_b.delete("run-1")
+
+
+def test_memory_hits_follow_the_shared_disk_row(path):
+    worker_a = ResultStore(Result, path)
+    worker_b = ResultStore(Result, path)
+    worker_a.put("run-1", Result(run_id="run-1", intensity=[1.0]))
+    assert worker_b.get("run-1").intensity == [1.0]
+
+    worker_a.put("run-1", Result(run_id="run-1", intensity=[2.0]))
+    assert worker_b.get("run-1").intensity == [2.0]
+
+    worker_a.delete("run-1")
+    assert worker_b.get("run-1") is None
+    assert worker_b.stats()["memory_entries"] == 0
+
+
+def test_memory_tier_is_lru_bounded(path):
+    store = ResultStore(Result, path, max_memory_items=2)
+    for i in range(3):
+        store.put(f"run-{i}", Result(run_id=f"run-{i}", intensity=[float(i)]))
+    store.get("run-1")
+    store.put("run-3", Result(run_id="run-3", intensity=[]))
+
+    stats = store.stats()
+    assert stats["memory_entries"] == 2
+    assert stats["disk_entries"] == 4
+    assert store.get("run-0").run_id == "run-0"
+
+
+def test_expired_results_are_evicted(path):
+    store = ResultStore(Result, path, ttl_seconds=-1)
+    store.put("stale", Result(run_id="stale", intensity=[1.0]))
+
+    assert store.get("stale") is None
+    assert store.stats()["disk_entries"] == 0
+
+
+def test_disk_budget_drops_oldest_results(path):
+    store = ResultStore(Result, path, max_disk_bytes=1)
+    store.put("old", Result(run_id="old", intensity=[1.0] * 100))
+    store.put("new", Result(run_id="new", intensity=[2.0] * 100))
+
+    reader = ResultStore(Result, path)
+    assert reader.get("old") is None
+    assert reader.stats()["disk_entries"] <= 1
+
+
+def test_disk_evictions_invalidate_memory_copies(path):
+    store = ResultStore(Result, path, max_disk_bytes=1)
+    store.put("old", Result(run_id="old", intensity=[1.0] * 100))
+
+    assert store.get("old") is None
+    assert store.stats()["memory_entries"] == 0
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for run history search and reporting queries
+"""
+
+import pytest
+from pathlib import Path
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import Base, SandboxRun, Instrument, Method
+from app.services import run_history_service as module
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def test_search_runs_uses_constant_query_count(engine, monkeypatch):
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(module, "SessionLocal", Session)
+
+    with Session() as db:
+        db.add(Instrument(name="GC-1", model="7890B", serial_number="SN-1"))
+        db.add(Method(name="BTEX", method_type="oven", parameters={}))
+        db.flush()
+        for i in range(20):
+            db.add(SandboxRun(
+                instrument_id=1 if i % 2 else 99,
+                method_id=1,
+                sample_name=f"Run {i}",
+                time=[0.0, 1.0],
+                signal=[0.0, 1.0],
+            ))
+        db.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    runs, total = module.run_history_service.search_runs(limit=20)
+
+    assert total == 20
+    assert len(statements) == 2  # count + joined page
+    names = {run["instrument_name"] for run in runs}
+    assert names == {"GC-1", "Unknown"}
+    assert all(run["method_name"] == "BTEX" for run in runs)
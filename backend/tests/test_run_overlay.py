@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the multi-run overlay engine and endpoint
+"""
+
+import numpy as np
+import pytest
+from pathlib import Path
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.api.v1.endpoints import runs
+from app.core.config import settings
+from app.core.database import SandboxRun, get_db
+from app.core.responses import TRACE_MEDIA_TYPE, decode_trace_frame
+from app.services.run_overlay import build_overlay, common_grid, cow_align, resample_runs
+
+
+def _injection(t, shift=0.0, seed=0, scale=1.0):
+    signal = sum(h * np.exp(-((t - rt - shift) / 0.03) ** 2) for rt, h in [(5.0, 800), (12.3, 150), (21.7, 40)])
+    return scale * signal + np.random.default_rng(seed).normal(0, 0.5, t.size)
+
+
+def test_common_grid_covers_overlap_at_reference_rate():
+    times = [np.linspace(0, 30, 3001), np.linspace(0.5, 29, 1000)]
+    grid = common_grid(times)
+    assert grid[0] == 0.5 and grid[-1] == 29.0
+    assert np.allclose(np.diff(grid), 0.01)
+    assert len(common_grid(times, t_start=10, t_end=12, grid_points=50)) == 50
+    with pytest.raises(ValueError):
+        common_grid(times, t_start=29.5)
+
+    signals = [2 * times[0], 2 * times[1]]
+    assert np.allclose(resample_runs(times, signals, grid), 2 * grid)
+
+
+def test_cow_recovers_retention_shift():
+    t = np.linspace(0, 30, 6000)
+    reference, shifted = _injection(t), _injection(t, shift=0.04, seed=1)
+    warped, boundary_shifts = cow_align(reference, shifted, segment_length=200, slack=12)
+
+    assert len(warped) == len(t) and boundary_shifts[0] == boundary_shifts[-1] == 0
+    for rt in (5.0, 12.3):
+        window = (t > rt - 0.3) & (t < rt + 0.3)
+        assert abs(t[window][warped[window].argmax()] - rt) < 0.015
+    assert np.abs(warped - reference).max() < np.abs(shifted - reference).max() / 2
+
+
+def test_binned_cow_keeps_shifts_within_slack():
+    t = np.linspace(0, 30, 6000)
+    reference, shifted = _injection(t), _injection(t, shift=0.08, seed=1)
+    _, boundary_shifts = cow_align(reference, shifted, segment_length=200, slack=12)
+
+    # 16 samples of drift, but the binned search may only move 12
+    assert np.abs(boundary_shifts).max() <= 12
+
+    # A slack the bin factor does not divide (13 -> 7 coarse samples of 2) still caps at 13
+    _, boundary_shifts = cow_align(reference, shifted, segment_length=200, slack=13)
+    assert np.abs(boundary_shifts).max() == 13
+
+
+def test_overlay_envelopes_and_alignment():
+    t = np.linspace(0, 30, 12000)
+    signals = [_injection(t, shift=0.03 * np.sin(i), seed=i) for i in range(10)]
+
+    plain = build_overlay([t] * 10, signals, max_points=None)
+    matrix = np.array(signals)
+    assert plain["grid_points"] == 12000
+    assert np.allclose(plain["mean"], matrix.mean(axis=0))
+    assert np.allclose(plain["sd"], matrix.std(axis=0, ddof=1))
+    assert np.allclose(plain["upper"], matrix.max(axis=0))
+    assert np.allclose(plain["runs"][3]["difference"], signals[3] - signals[0])
+
+    aligned = build_overlay([t] * 10, signals, align=True, max_points=1500)
+    assert len(aligned["time"]) == len(aligned["runs"][9]["signal"]) == 1500
+    assert aligned["sd"].max() < plain["sd"].max() / 3
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_WORKERS", -1)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SandboxRun.__table__.create(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    t = np.linspace(0, 30, 6000)
+    with Session() as db:
+        for i in range(4):
+            db.add(SandboxRun(
+                instrument_id=1, method_id=7, sample_name=f"Injection {i + 1}", compound_ids=[], fault_params={},
+                time=t, signal=_injection(t, seed=i, scale=1 + 0.01 * i), peaks=[], metrics={}
+            ))
+        db.commit()
+
+    def override_db():
+        with Session() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(runs.router, prefix="/api/v1/runs")
+    app.dependency_overrides[get_db] = override_db
+    return TestClient(app)
+
+
+def test_overlay_endpoint(client):
+    body = {"run_ids": [1, 2, 3, 4], "reference_run_id": 2, "max_points": 500, "t_start": 2, "t_end": 20}
+    response = client.post("/api/v1/runs/overlay", json=body)
+    assert response.status_code == 200
+    overlay = response.json()
+
+    assert overlay["reference_run_id"] == 2 and not overlay["aligned"]
+    assert len(overlay["time"]) == len(overlay["sd"]) == 500
+    assert 2 <= overlay["time"][0] and overlay["time"][-1] <= 20
+    assert [run["sample_name"] for run in overlay["runs"]] == [f"Injection {i}" for i in range(1, 5)]
+    assert not any(overlay["runs"][1]["difference"])
+
+    binary = client.post("/api/v1/runs/overlay", json={**body, "align": True}, headers={"Accept": TRACE_MEDIA_TYPE})
+    decoded = decode_trace_frame(binary.content)
+    assert decoded["aligned"] and decoded["upper"].dtype == np.float32
+    assert len(decoded["runs"][3]["difference"]) == 500
+
+    assert client.post("/api/v1/runs/overlay", json={"run_ids": [1, 99]}).status_code == 404
+    assert client.post("/api/v1/runs/overlay", json={"run_ids": [1, 2], "reference_run_id": 3}).status_code == 400
+    assert client.post("/api/v1/runs/overlay", json={"run_ids": [1, 2], "t_start": 40}).status_code == 400
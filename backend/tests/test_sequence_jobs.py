@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for background, non-blocking sequence execution
+"""
+
+import asyncio
+import pytest
+from pathlib import Path
+from types import SimpleNamespace
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.models.schemas import QuantResult, SequenceItem, SequenceTemplate
+from app.services import background_jobs as background_jobs_module
+from app.services import sequence_service as sequence_module
+from app.services.sequence_service import SequenceService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    # Threads are enough here and keep the patched methods visible to jobs
+    monkeypatch.setattr(settings, "ANALYSIS_WORKERS", -1)
+    monkeypatch.setattr(settings, "SEQUENCE_ITEM_LOOKAHEAD", 3)
+    messages = []
+
+    async def broadcast(message):
+        messages.append(message)
+
+    monkeypatch.setattr(background_jobs_module.websocket_manager, "broadcast", broadcast)
+
+    service = SequenceService()
+    monkeypatch.setattr(sequence_module, "sequence_service", service)
+    monkeypatch.setattr(service, "_quantitate_run", lambda run, item: QuantResult(
+        run_id=1, sample_name=item.sample_name, results=[]
+    ))
+    # The second QC injection fails
+    monkeypatch.setattr(service, "_evaluate_qc", lambda run, quant, item, instrument_id: SimpleNamespace(
+        overallStatus="FAIL" if item.sample_name == "QC-2" else "PASS"
+    ))
+    service.messages = messages
+    return service
+
+
+def _template():
+    names = ["Blank", "QC-1", "S-1", "S-2", "QC-2", "S-3", "S-4"]
+    items = [
+        SequenceItem(order=i + 1, type="QC" if n.startswith("QC") else "Blank" if n == "Blank" else "Sample",
+                     sample_name=n, method_id=1)
+        for i, n in enumerate(names)
+    ]
+    return SequenceTemplate(name="Overnight", items=items)
+
+
+def test_async_run_stops_on_qc_failure_like_sync_run(service):
+    template = _template()
+    sync_run = service.run_sequence(template, instrument_id=1, simulate=False)
+    async_run = asyncio.run(service.run_sequence_async(template, instrument_id=1, simulate=False))
+
+    for run in (sync_run, async_run):
+        assert run.status == "error"
+        assert "item 5" in run.notes
+        assert [r.sample_name for r in run.runs] == ["Blank", "QC-1", "S-1", "S-2", "QC-2"]
+        assert len(run.quant) == 4
+
+
+def test_background_jobs_report_progress(service):
+    async def scenario():
+        jobs = [service.start_sequence_job(_template(), instrument_id=1, simulate=False) for _ in range(3)]
+        assert all(job.status == "queued" for job in jobs)
+        await asyncio.gather(*list(service._job_tasks.values()))
+        return jobs
+
+    jobs = asyncio.run(scenario())
+    for job in jobs:
+        assert job.status == "error"
+        assert job.completed_items == 5
+        assert service.get_sequence_run(job.sequence_run_id).status == "error"
+    assert sum('"sequence_progress"' in m for m in service.messages) == 3 * (5 + 2)
+    assert '"sequence_status": "error"' in service.messages[-2]
+
+
+def test_finished_jobs_are_pruned(service, monkeypatch):
+    monkeypatch.setattr(settings, "SEQUENCE_JOB_RETENTION", 2)
+
+    async def scenario():
+        jobs = []
+        for _ in range(4):
+            jobs.append(service.start_sequence_job(_template(), instrument_id=1, simulate=False))
+            await service._job_tasks[jobs[-1].id]
+        return jobs
+
+    jobs = asyncio.run(scenario())
+    assert service.list_jobs() == jobs[:0:-1]
+    assert service.get_job(jobs[0].id) is None
+
+
+def test_cancel_job(service, monkeypatch):
+    async def slow_job(item, instrument_id, simulate):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        monkeypatch.setattr(sequence_module, "run_in_pool", lambda func, *args: slow_job(*args))
+        job = service.start_sequence_job(_template(), instrument_id=1, simulate=False)
+        await asyncio.sleep(0.05)
+        assert service.cancel_job(job.id)
+        await asyncio.gather(*list(service._job_tasks.values()), return_exceptions=True)
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == "cancelled"
+    assert not service.cancel_job(job.id)
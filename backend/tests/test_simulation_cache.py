@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Tests for the deterministic simulation result cache
+"""
+
+import asyncio
+import numpy as np
+import pytest
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import sys
+
+# Add the parent directory to sys.path so we can import from app, and the
+# repository root for the backend.app imports used by the simulation engine
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.core.database import SandboxRun
+from app.core.simulation_cache import SimulationCache, request_key
+from app.models.schemas import FaultParams, SandboxRunRequest
+from app.services import sandbox_service as sandbox_module
+from app.services.sandbox_service import SandboxService
+from backend.app.models.gc_sandbox_schemas import (
+    SandboxRunRequest as GCSimulationRequest, SandboxMethodParameters, SandboxSampleProfile,
+    SandboxInlet, SandboxColumn, SandboxDetectorFID, SandboxOvenProgramStep, SandboxAnalyte,
+    InletMode, CarrierGasType, FlowMode, DetectorType
+)
+from backend.app.services.gc_simulation_engine import GCSimulationEngine
+
+
+def test_request_key_ignores_key_order():
+    assert request_key({"a": 1, "b": [1, 2]}) == request_key({"b": [1, 2], "a": 1})
+    assert request_key({"seed": 1}) != request_key({"seed": 2})
+
+
+def test_cache_tracks_hits_and_misses():
+    cache = SimulationCache(max_entries=2)
+    assert cache.get("x") is None
+    cache.put("x", "result")
+    assert cache.get("x") == "result"
+    cache.record_bypass()
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bypassed"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cache_evicts_by_count_and_bytes():
+    cache = SimulationCache(max_entries=2, max_bytes=100)
+    cache.put("a", 1, size_bytes=40)
+    cache.put("b", 2, size_bytes=40)
+    cache.get("a")
+    cache.put("c", 3, size_bytes=40)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["bytes"] == 80
+
+    cache.put("huge", 4, size_bytes=500)
+    assert cache.get("huge") is None
+
+
+def test_seeded_sandbox_simulation_is_reproducible():
+    service = SandboxService()
+    compounds = [{"name": "Ethane", "rt": 1.8, "intensity": 100, "width": 0.06}]
+    fp = FaultParams(noise_level=1.0, ghost_peak_probability=0.5)
+
+    first = service._simulate(compounds, fp, np.random.default_rng(7))
+    second = service._simulate(compounds, fp, np.random.default_rng(7))
+
+    assert first["signal"] == second["signal"]
+    assert len(first["peaks"]) == len(second["peaks"])
+
+
+@pytest.fixture
+def sandbox_service(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sandbox.db'}")
+    SandboxRun.__table__.create(bind=engine)
+    monkeypatch.setattr(sandbox_module, "SessionLocal", sessionmaker(bind=engine))
+    yield SandboxService()
+    engine.dispose()
+
+
+def test_sandbox_run_hits_cache_and_returns_copies(sandbox_service):
+    request = SandboxRunRequest(instrument_id=1, method_id=1, seed=3, fault_params=FaultParams(noise_level=1.0))
+
+    first = sandbox_service.run(request)
+    first.run_record.signal[0] = -1.0e9
+    first.run_record.peaks[0].area = -1.0
+    second = sandbox_service.run(request)
+
+    assert sandbox_service.result_cache.stats()["hits"] == 1
+    assert second.run_record.signal[0] != -1.0e9
+    assert second.run_record.peaks[0].area != -1.0
+    assert second.sandbox_run_id != first.sandbox_run_id
+
+
+def test_sandbox_run_use_cache_false_bypasses(sandbox_service):
+    request = SandboxRunRequest(instrument_id=1, method_id=1, seed=3, use_cache=False)
+
+    first = sandbox_service.run(request)
+    second = sandbox_service.run(request)
+
+    stats = sandbox_service.result_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bypassed"], stats["entries"]) == (0, 0, 2, 0)
+    assert first.run_record.signal == second.run_record.signal
+
+
+def _engine_request(run_id, **options):
+    method = SandboxMethodParameters(
+        method_name="CACHE_TEST",
+        expected_run_time_min=5.0,
+        inlets=[SandboxInlet(
+            inlet_id="INL1", mode=InletMode.SPLIT, temperature_celsius=250.0,
+            inlet_pressure_kpa=100.0, split_ratio=10.0, total_flow_ml_min=50.0,
+            carrier_gas=CarrierGasType.HELIUM
+        )],
+        columns=[SandboxColumn(
+            column_id="COL1", length_meters=30.0, inner_diameter_mm=0.25, film_thickness_um=0.25,
+            stationary_phase="DB-1", max_temperature_celsius=350.0,
+            flow_mode=FlowMode.CONSTANT_FLOW, target_flow_ml_min=1.0
+        )],
+        detectors=[SandboxDetectorFID(
+            detector_id="FID1", detector_type=DetectorType.FID, temperature_celsius=300.0,
+            hydrogen_flow_ml_min=30.0, air_flow_ml_min=300.0, makeup_flow_ml_min=25.0
+        )],
+        oven_program=[SandboxOvenProgramStep(
+            step_number=1, target_temperature_celsius=50.0, hold_time_minutes=5.0
+        )]
+    )
+    sample = SandboxSampleProfile(
+        sample_id="CACHE_SAMPLE", injection_volume_ul=1.0, solvent="none", matrix="gas",
+        analytes=[SandboxAnalyte(
+            name="n-Hexane", concentration_ppm=1000.0, retention_factor=2.0,
+            diffusion_coefficient=0.05, response_factor=1.0
+        )]
+    )
+    return GCSimulationRequest(
+        run_id=run_id, method_parameters=method, sample_profile=sample,
+        simulation_seed=11, export_csv=False, export_png=False, **options
+    )
+
+
+def test_simulate_gc_run_hits_cache_with_deep_copies():
+    engine = GCSimulationEngine()
+
+    first = asyncio.run(engine.simulate_gc_run(_engine_request("run-a")))
+    first.chromatograms[0].intensity[0] = -1.0e9
+    second = asyncio.run(engine.simulate_gc_run(_engine_request("run-b")))
+
+    assert engine.result_cache.stats()["hits"] == 1
+    assert second.run_id == "run-b"
+    assert second.chromatograms[0].intensity[0] != -1.0e9
+
+
+def test_simulate_gc_run_use_cache_false_bypasses():
+    engine = GCSimulationEngine()
+
+    asyncio.run(engine.simulate_gc_run(_engine_request("run-a", use_cache=False)))
+    asyncio.run(engine.simulate_gc_run(_engine_request("run-b", use_cache=False)))
+
+    stats = engine.result_cache.stats()
+    assert (stats["hits"], stats["bypassed"], stats["entries"]) == (0, 2, 0)
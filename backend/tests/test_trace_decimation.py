@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for LTTB trace decimation and the stored display pyramid
+"""
+
+import numpy as np
+import pytest
+from pathlib import Path
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.api.v1.endpoints import runs
+from app.core.database import SandboxRun, get_db
+from app.core.decimation import build_pyramid, decimate_traces, lttb_indices, window_bounds
+from app.core.responses import TRACE_MEDIA_TYPE, decode_trace_frame
+from app.core.trace_store import decode_pyramid, decode_traces, encode_traces
+
+
+def _chromatogram(n=12000):
+    t = np.linspace(0, 30, n)
+    signal = sum(h * np.exp(-((t - rt) / 0.02) ** 2) for rt, h in [(5.0, 800), (12.3, 150), (21.7, 40)])
+    signal += np.random.default_rng(0).normal(0, 0.5, n)
+    return t, signal
+
+
+def test_lttb_keeps_endpoints_and_peak_apexes():
+    t, signal = _chromatogram()
+    indices = lttb_indices(t, signal, 500)
+
+    assert len(indices) == 500 and indices[0] == 0 and indices[-1] == len(t) - 1
+    assert np.all(np.diff(indices) > 0)
+    for rt in (5.0, 12.3, 21.7):
+        window = (t > rt - 0.1) & (t < rt + 0.1)
+        kept = indices[window[indices]]
+        assert len(kept) and signal[kept].max() > 0.95 * signal[window].max()
+    assert np.array_equal(lttb_indices(t[:50], signal[:50], 100), np.arange(50))
+
+
+def test_pyramid_levels_shrink_and_are_stored_with_traces():
+    t, signal = _chromatogram()
+    levels = build_pyramid(signal)
+
+    assert len(levels) >= 2
+    assert all(len(coarse) < len(fine) for fine, coarse in zip(levels, levels[1:]))
+    assert all(np.all(np.diff(level) > 0) for level in levels)
+    assert int(signal.argmax()) in levels[-1]
+
+    blob = encode_traces({"time": t, "signal": signal})
+    assert set(decode_traces(blob)) == {"time", "signal"}
+    assert [len(level) for level in decode_pyramid(blob)] == [len(level) for level in levels]
+
+
+def test_window_and_minimum_points():
+    t, signal = _chromatogram()
+    traces = {"time": t, "signal": signal, "baseline": np.zeros_like(t), "peaks": None}
+
+    window = decimate_traces(traces, 200, 10.0, 15.0, pyramid=build_pyramid(signal))
+    assert len(window["time"]) == len(window["baseline"]) == 200
+    assert 10.0 <= window["time"][0] and window["time"][-1] <= 15.0
+    assert abs(window["time"][window["signal"].argmax()] - 12.3) < 0.01
+
+    # A window narrower than min_points is widened around its centre
+    lo, hi = window_bounds(t, 12.3, 12.3, min_points=10)
+    assert hi - lo == 10 and t[lo] < 12.3 < t[hi - 1]
+    assert len(decimate_traces(traces, None, 12.3, 12.3, min_points=10)["signal"]) == 10
+
+
+@pytest.fixture
+def client():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SandboxRun.__table__.create(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    t, signal = _chromatogram()
+    with Session() as db:
+        db.add(SandboxRun(
+            instrument_id=1, method_id=7, sample_name="Long run", compound_ids=[], fault_params={},
+            time=t, signal=signal, baseline=np.zeros_like(t), peaks=[], metrics={}
+        ))
+        db.commit()
+
+    def override_db():
+        with Session() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(runs.router, prefix="/api/v1/runs")
+    app.dependency_overrides[get_db] = override_db
+    return TestClient(app)
+
+
+def test_run_endpoints_decimate_on_request(client):
+    full = client.get("/api/v1/runs/").json()[0]
+    assert len(full["time"]) == 12000
+
+    listed = client.get("/api/v1/runs/", params={"max_points": 1000}).json()[0]
+    assert len(listed["time"]) == len(listed["signal"]) == len(listed["baseline"]) == 1000
+    assert max(listed["signal"]) > 0.95 * max(full["signal"])
+
+    zoomed = client.get(f"/api/v1/runs/{full['id']}", params={"max_points": 100, "t_start": 20, "t_end": 25})
+    assert zoomed.status_code == 200
+    assert len(zoomed.json()["time"]) == 100 and 20 <= zoomed.json()["time"][0]
+
+    binary = client.get(
+        f"/api/v1/runs/{full['id']}", params={"max_points": 300}, headers={"Accept": TRACE_MEDIA_TYPE}
+    )
+    assert len(decode_trace_frame(binary.content)["time"]) == 300
+    assert client.get("/api/v1/runs/", params={"max_points": 2}).status_code == 422
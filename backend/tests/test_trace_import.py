@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming CSV and JCAMP-DX chromatogram import
+"""
+
+import base64
+import io
+import numpy as np
+import pytest
+from pathlib import Path
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import SandboxRun
+from app.core.trace_import import parse_csv_stream, parse_jcamp_stream, parse_trace_stream, text_lines
+from app.models.schemas import ChromatogramImportRequest
+from app.services.chromatography_service import ChromatographyService
+
+
+def _lines(text):
+    return text_lines(io.BytesIO(text.encode("utf-8")))
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    SandboxRun.__table__.create(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_csv_skips_header_and_bad_rows_across_blocks():
+    rows = "\n".join(f"{i * 0.01:.2f},{i * 2.0}" for i in range(25))
+    text = "time,signal\n" + rows.replace("0.10,20.0", "0.10,n/a") + "\n\n"
+
+    time_data, signal_data = parse_csv_stream(_lines(text), block_lines=7)
+
+    assert len(time_data) == 24
+    assert 0.10 not in time_data
+    np.testing.assert_allclose(signal_data, time_data * 200.0)
+
+
+def test_csv_detects_tab_delimiter():
+    time_data, signal_data = parse_csv_stream(_lines("1\t10\n2\t20\n3\t30\n"))
+    assert time_data.tolist() == [1.0, 2.0, 3.0]
+    assert signal_data.tolist() == [10.0, 20.0, 30.0]
+
+
+def test_jcamp_xy_pairs():
+    text = "##TITLE=Run 1\n##XYDATA=(XY..XY)\n0.0, 1.0; 0.5, 2.0\n1.0 3.0 1.5 4.0\n##END=\n"
+    time_data, signal_data, header = parse_jcamp_stream(_lines(text))
+
+    assert header["TITLE"] == "Run 1"
+    assert time_data.tolist() == [0.0, 0.5, 1.0, 1.5]
+    assert signal_data.tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_jcamp_asdf_compressed_xydata():
+    # SQZ 1000, DIF +100 +100 0, DUP x2, DIF -50; next line starts with the Y-check
+    text = (
+        "##TITLE=TIC\n##FIRSTX=0\n##LASTX=6\n##XFACTOR=1\n##YFACTOR=0.5\n##NPOINTS=7\n"
+        "##XYDATA=(X++(Y..Y))\n"
+        "0 A000J00J00%Tn0\n"
+        "5 A150K\n"
+        "##END=\n"
+    )
+    time_data, signal_data, _ = parse_jcamp_stream(_lines(text))
+
+    assert time_data.tolist() == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    assert (signal_data * 2).tolist() == [1000, 1100, 1200, 1200, 1200, 1150, 1152]
+
+
+def test_jcamp_affn_xydata():
+    text = "##FIRSTX=1\n##LASTX=2.5\n##XYDATA=(X++(Y..Y))\n1 10 -20 30\n2 +40 50 6E1\n##END=\n"
+    time_data, signal_data, _ = parse_jcamp_stream(_lines(text))
+
+    assert signal_data.tolist() == [10.0, -20.0, 30.0, 40.0, 50.0, 60.0]
+    np.testing.assert_allclose(time_data, np.linspace(1, 2.5, 6))
+
+
+def test_csv_size_hint_presizes_output():
+    text = "time,signal\n" + "\n".join(f"{i * 0.01:.2f},{i * 2.0}" for i in range(5000))
+
+    time_data, signal_data, _ = parse_trace_stream(io.BytesIO(text.encode()), "csv")
+
+    assert len(time_data) == 5000
+    assert signal_data[-1] == 9998.0
+    # Filled in place: no growth step, so capacity stays close to the row count
+    assert len(time_data.base) < 5000 * 1.2
+
+
+def test_jcamp_xy_pairs_across_blocks(monkeypatch):
+    monkeypatch.setattr("app.core.trace_import.CSV_BLOCK_LINES", 2)
+    text = "##NPOINTS=3\n##XYPOINTS=(XY..XY)\n1, 10; 2, 20\n3, 30\n##END=\n"
+
+    time_data, signal_data, _ = parse_jcamp_stream(_lines(text))
+
+    assert time_data.tolist() == [1.0, 2.0, 3.0]
+    assert signal_data.tolist() == [10.0, 20.0, 30.0]
+
+
+def test_service_import_from_base64_csv(session_factory):
+    text = "time,signal\n" + "\n".join(f"{i * 0.1},{np.sin(i / 5)}" for i in range(50))
+    request = ChromatogramImportRequest(
+        file_content=base64.b64encode(text.encode()).decode(),
+        file_type="csv",
+        sample_name="Upload",
+        auto_detect_peaks=False
+    )
+
+    response = ChromatographyService(session_factory=session_factory).import_chromatogram(request)
+
+    assert response.import_metadata["data_points"] == 50
+    assert len(response.run_record.signal) == 50
+
+
+def test_service_import_stores_full_trace_and_returns_decimated(session_factory):
+    t = np.linspace(0, 10, 20000)
+    signal = 100 * np.exp(-0.5 * ((t - 5) / 0.05) ** 2) + np.random.default_rng(0).normal(1.0, 0.2, len(t))
+    text = "\n".join(f"{x},{y}" for x, y in zip(t, signal))
+
+    response = ChromatographyService(session_factory=session_factory).import_chromatogram_stream(
+        io.BytesIO(text.encode()), "csv", "Large", auto_detect_peaks=True, max_points=500
+    )
+
+    record = response.run_record
+    assert len(record.time) == len(record.baseline) == 500
+    assert response.import_metadata["returned_points"] == 500
+    assert response.import_metadata["data_points"] == 20000
+    assert record.peaks and all(0.0 <= peak.rt <= 10.0 for peak in record.peaks)
+
+    with session_factory() as db:
+        stored = db.get(SandboxRun, record.id)
+        traces = stored.get_trace_arrays()
+        assert stored.trace_points == 20000
+        np.testing.assert_array_equal(traces["signal"], signal)
+        assert len(traces["baseline"]) == 20000
+        assert stored.peak_count == len(record.peaks)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the binary trace response format and orjson default responses
+"""
+
+import numpy as np
+import pytest
+from pathlib import Path
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.api.v1.endpoints import runs
+from app.core.database import SandboxRun, get_db
+from app.core.responses import (
+    TRACE_MEDIA_TYPE, DefaultJSONResponse, decode_trace_frame, encode_trace_frame
+)
+
+BINARY = {"Accept": TRACE_MEDIA_TYPE}
+
+
+@pytest.fixture
+def client():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SandboxRun.__table__.create(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    t = np.linspace(0, 10, 1001)
+    with Session() as db:
+        for i in range(3):
+            db.add(SandboxRun(
+                instrument_id=1, method_id=7, sample_name=f"Run {i}", compound_ids=[], fault_params={},
+                time=t, signal=np.sin(t + i) * 100, baseline=np.cos(t) / 3, peaks=[], metrics={"i": i}
+            ))
+        db.commit()
+
+    def override_db():
+        with Session() as db:
+            yield db
+
+    app = FastAPI(default_response_class=DefaultJSONResponse)
+    app.include_router(runs.router, prefix="/api/v1/runs")
+    app.dependency_overrides[get_db] = override_db
+    return TestClient(app)
+
+
+def test_frame_round_trip_keeps_time_precision():
+    time = np.linspace(0, 30, 12345) + 1e-9
+    content = {
+        "runs": [{"sample_name": "A", "time": time, "signal": [1.5, 2.5, 3.5], "peaks": [{"rt": 1.0}]}],
+        "empty": {"time": []}
+    }
+    frame = encode_trace_frame(content)
+    decoded = decode_trace_frame(frame)
+
+    run = decoded["runs"][0]
+    assert run["time"].dtype == np.float64 and np.array_equal(run["time"], time)
+    assert run["signal"].dtype == np.float32 and run["signal"].tolist() == [1.5, 2.5, 3.5]
+    assert run["peaks"] == [{"rt": 1.0}] and decoded["empty"] == {"time": []}
+    # Every array starts on an 8-byte boundary so clients can view it in place
+    header_end = 12 + int.from_bytes(frame[8:12], "little")
+    assert len(frame) == -(-header_end // 8) * 8 + 12345 * 8 + 16
+
+
+def test_run_listing_negotiates_binary_traces(client):
+    as_json = client.get("/api/v1/runs/", params={"method_id": 7})
+    as_frame = client.get("/api/v1/runs/", params={"method_id": 7}, headers=BINARY)
+
+    assert as_frame.headers["content-type"] == TRACE_MEDIA_TYPE
+    decoded = decode_trace_frame(as_frame.content)
+    assert [run["sample_name"] for run in decoded] == [run["sample_name"] for run in as_json.json()]
+    for binary_run, json_run in zip(decoded, as_json.json()):
+        assert np.array_equal(binary_run["time"], json_run["time"])
+        np.testing.assert_allclose(binary_run["signal"], json_run["signal"], rtol=1e-6, atol=1e-4)
+    assert len(as_frame.content) < len(as_json.content) / 2
+
+    single = decode_trace_frame(client.get(f"/api/v1/runs/{decoded[0]['id']}", headers=BINARY).content)
+    assert single["metadata"] == decoded[0]["metadata"]
+
+
+def test_zstd_frames_when_accepted(client):
+    zstandard = pytest.importorskip("zstandard")
+    response = client.get(
+        "/api/v1/runs/", headers={**BINARY, "Accept-Encoding": "zstd"}, params={"method_id": 7}
+    )
+    assert response.headers["content-encoding"] == "zstd"
+    raw = response.content
+    if raw[:4] != b"GCTF":
+        raw = zstandard.ZstdDecompressor().decompress(raw, max_output_size=10 ** 7)
+    assert len(decode_trace_frame(raw)) == 3
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tests for binary trace storage of sandbox run traces
+"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+import sys
+
+# Add the parent directory to sys.path so we can import from app
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import Base, SandboxRun
+from app.core.trace_store import encode_traces, decode_traces, migrate_json_traces, summarize_traces
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'traces.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def test_encode_decode_roundtrip():
+    time = np.linspace(0, 10, 1000)
+    signal = np.sin(time) * 100
+    blob = encode_traces({"time": time, "signal": signal, "baseline": None})
+
+    decoded = decode_traces(blob)
+    assert set(decoded) == {"time", "signal"}
+    np.testing.assert_array_equal(decoded["time"], time)
+    np.testing.assert_array_equal(decoded["signal"], signal)
+
+
+def test_float32_storage_keeps_time_precision():
+    time = np.linspace(0, 30, 5000)
+    signal = np.random.default_rng(0).normal(size=5000)
+    decoded = decode_traces(encode_traces({"time": time, "signal": signal}, dtype="float32"))
+
+    np.testing.assert_array_equal(decoded["time"], time)
+    np.testing.assert_allclose(decoded["signal"], signal, rtol=1e-6)
+
+
+def test_sandbox_run_traces_are_deferred(engine):
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(SandboxRun(
+            sample_name="Trace",
+            time=[0.0, 0.5, 1.0],
+            signal=[1.0, 5.0, 2.0],
+            baseline=[0.1, 0.1, 0.1],
+        ))
+        db.commit()
+
+    with Session() as db:
+        run = db.query(SandboxRun).first()
+        assert "trace_blob" not in run.__dict__
+        assert run.trace_points == 3
+        assert run.signal == [1.0, 5.0, 2.0]
+        assert run.baseline == [0.1, 0.1, 0.1]
+
+
+def test_migrate_json_traces(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO sandbox_runs (sample_name, time, signal, baseline) "
+            "VALUES ('Legacy', '[0.0, 1.0, 2.0]', '[3.0, 4.0, 5.0]', NULL)"
+        ))
+
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        assert db.query(SandboxRun).first().signal == [3.0, 4.0, 5.0]
+
+    assert migrate_json_traces(engine) == 1
+    assert migrate_json_traces(engine) == 0
+
+    with Session() as db:
+        run = db.query(SandboxRun).first()
+        assert run.trace_blob is not None
+        assert run.time_json is None
+        assert run.time == [0.0, 1.0, 2.0]
+        assert run.baseline is None
+
+
+def test_summary_columns_computed_on_insert(engine):
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(SandboxRun(
+            sample_name="Summary",
+            time=[0.0, 1.0, 2.0, 3.0],
+            signal=[1.0, 9.0, 3.0, 1.0],
+            baseline=[1.0, 1.0, 1.0, 1.0],
+            peaks=[{"rt": 1.0}],
+        ))
+        db.commit()
+
+    with Session() as db:
+        run = db.query(SandboxRun).first()
+        assert run.peak_count == 1
+        assert run.max_signal == 9.0
+        assert run.run_time == 3.0
+        # Steps of the corrected signal are 8, -6, -2: MAD 4 about the median
+        assert run.noise == pytest.approx(1.4826 * 4 / np.sqrt(2))
+
+
+def test_summary_noise_ignores_peaks_and_baseline_drift():
+    t = np.linspace(0, 30, 6000)
+    rng = np.random.default_rng(0)
+    drift = 5 + 2 * t
+    peaks = sum(h * np.exp(-((t - rt) / 0.05) ** 2) for rt, h in [(4.0, 2000), (11.0, 900), (19.0, 3000)])
+    signal = drift + peaks + rng.normal(0, 0.5, t.size)
+
+    assert summarize_traces({"time": t, "signal": signal, "baseline": drift})["noise"] == pytest.approx(0.5, rel=0.05)
+    assert summarize_traces({"time": t, "signal": signal})["noise"] == pytest.approx(0.5, rel=0.05)
+
+
+def test_search_runs_filters_peaks_in_sql(engine, monkeypatch):
+    from app.services import run_history_service as module
+
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(module, "SessionLocal", Session)
+
+    with Session() as db:
+        for i in range(6):
+            db.add(SandboxRun(
+                sample_name=f"Run {i}",
+                time=[0.0, 1.0],
+                signal=[0.0, float(i)],
+                peaks=[{"rt": 0.5}] * (i % 3),
+            ))
+        db.commit()
+
+    runs, total = module.run_history_service.search_runs(has_peaks=True, limit=2)
+    assert total == 4
+    assert len(runs) == 2
+    assert all(run["peak_count"] > 0 for run in runs)
+
+    runs, total = module.run_history_service.search_runs(min_peaks=2)
+    assert total == 2
+    assert sorted(run["max_signal"] for run in runs) == [2.0, 5.0]
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Unit tests for windowed EMG peak synthesis in the GC simulation engine
+"""
+
+import math
+import unittest
+import numpy as np
+from scipy.integrate import trapezoid
+from scipy.stats import exponnorm
+
+from backend.app.services.gc_simulation_engine import GCSimulationEngine
+
+
+class TestEMGSynthesis(unittest.TestCase):
+    """Test cases for EMG peak rendering"""
+
+    def setUp(self):
+        """Set up a 60 min axis sampled at 50 Hz"""
+        self.engine = GCSimulationEngine()
+        self.time = np.arange(0, 60, 1 / 50 / 60)
+
+    def _reference(self, rt, sigma, tau, height):
+        return exponnorm.pdf(self.time, tau / sigma, loc=rt, scale=sigma) * height * sigma * math.sqrt(2 * math.pi)
+
+    def test_single_peak_matches_exponnorm(self):
+        """Windowed peak matches the full-axis analytic EMG"""
+        peak = self.engine._generate_emg_peak(self.time, 5.0, 0.025, 0.005, 100.0)
+        np.testing.assert_allclose(peak, self._reference(5.0, 0.025, 0.005, 100.0), atol=1e-4)
+
+    def test_zero_tau_is_gaussian(self):
+        """tau = 0 renders a pure Gaussian of the requested height"""
+        peak = self.engine._generate_emg_peak(self.time, 10.0, 0.05, 0.0, 250.0)
+        self.assertAlmostEqual(peak.max(), 250.0, places=6)
+
+    def test_batched_render_matches_sum_of_peaks(self):
+        """Rendering many analytes at once equals summing them one by one"""
+        rng = np.random.default_rng(0)
+        rts = rng.uniform(1, 59, 200)
+        sigmas = rng.uniform(0.01, 0.05, 200)
+        taus = sigmas * rng.uniform(0.0, 0.5, 200)
+        heights = rng.uniform(10, 1000, 200)
+
+        batched = self.engine._render_emg_peaks(self.time, rts, sigmas, taus, heights, max_chunk_samples=5000)
+        expected = sum(self._reference(*params) for params in zip(rts, sigmas, taus, heights))
+        np.testing.assert_allclose(batched, expected, atol=1e-3 * heights.max())
+
+    def test_long_tail_does_not_overflow(self):
+        """Strong tailing stays finite and keeps the Gaussian-equivalent area"""
+        peak = self.engine._generate_emg_peak(self.time, 2.0, 0.001, 0.5, 1.0)
+        self.assertTrue(np.all(np.isfinite(peak)))
+        self.assertAlmostEqual(trapezoid(peak, self.time), 0.001 * math.sqrt(2 * math.pi), places=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,12 +5,14 @@ Comprehensive unit tests for the enhanced quantification service
 
 import unittest
 import numpy as np
-from datetime import datetime
 from typing import List
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from backend.app.services.quant_service import QuantitationService
 from backend.app.models.schemas import (
-    CalibrationLevel, CalibrationFitRequest, CalibrationMode, OutlierPolicy,
+    CalibrationLevel, CalibrationFitRequest, CalibrationMode, CalibrationModel, OutlierPolicy,
     InternalStandard, RunRecord, Peak
 )
 
@@ -19,8 +21,9 @@ class TestQuantitationService(unittest.TestCase):
     """Test cases for enhanced quantification service"""
     
     def setUp(self):
-        """Set up test fixtures"""
-        self.service = QuantitationService()
+        """Set up test fixtures backed by a throwaway in-memory database"""
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        self.service = QuantitationService(session_factory=sessionmaker(bind=engine))
     
     def test_external_linear_calibration(self):
         """Test external standard linear calibration"""
@@ -431,5 +434,145 @@ class TestQuantitationService(unittest.TestCase):
         self.assertEqual(len([l for l in calibration.levels if l.area is not None]), 2)
 
 
+    def _batch_calibration(self, name, rt, slope=100.0, mode=CalibrationMode.EXTERNAL, internal_standard=None):
+        """Fitted calibration with level retention times for batch tests"""
+        return CalibrationModel(
+            version_id=f"v-{name}", method_id=1, target_name=name, model_type="linear",
+            mode=mode, internal_standard=internal_standard,
+            levels=[
+                CalibrationLevel(target_name=name, amount=1.0, unit="ppm", rt=rt),
+                CalibrationLevel(target_name=name, amount=10.0, unit="ppm", rt=rt)
+            ],
+            slope=slope, intercept=0.0, lod=0.5, loq=1.5
+        )
+    
+    def _batch_run(self, run_id, peaks):
+        return RunRecord(
+            id=run_id, sample_name=f"Sample {run_id}",
+            time=list(np.linspace(0, 10, 10)), signal=[0.0] * 10,
+            peaks=[dict(height=1.0, width=0.05, **peak) for peak in peaks]
+        )
+    
+    def test_batch_quantitation_matches_by_name_and_rt(self):
+        """Batch quantitation resolves targets by name, then RT window"""
+        calibrations = [
+            self._batch_calibration("Benzene", 2.0),
+            self._batch_calibration("Toluene", 3.5),
+            self._batch_calibration("Xylene", 6.0),
+            self._batch_calibration(
+                "Ethylbenzene", 5.0, slope=0.5, mode=CalibrationMode.INTERNAL_STANDARD,
+                internal_standard=InternalStandard(peak_name="Fluorobenzene", amount=1.0, unit="ppm")
+            )
+        ]
+        run = self._batch_run(7, [
+            {"rt": 3.52, "area": 120.0},
+            {"rt": 2.1, "area": 50000.0, "name": "benzene"},
+            {"rt": 4.0, "area": 400.0, "name": "Fluorobenzene"},
+            {"rt": 5.01, "area": 1000.0},
+        ])
+        
+        [result] = self.service.quantitate_batch([run], calibrations)
+        by_name = {r["targetName"]: r for r in result.results}
+        
+        self.assertEqual(result.run_id, 7)
+        self.assertAlmostEqual(by_name["Benzene"]["concentration"], 500.0)
+        self.assertEqual(by_name["Benzene"]["flags"], ["OOR"])
+        self.assertAlmostEqual(by_name["Toluene"]["rt"], 3.52)
+        self.assertEqual(by_name["Toluene"]["flags"], ["<LOQ"])
+        self.assertEqual(by_name["Xylene"]["flags"], ["NoPeak"])
+        self.assertAlmostEqual(by_name["Ethylbenzene"]["response_factor"], 2.5)
+        self.assertAlmostEqual(by_name["Ethylbenzene"]["concentration"], 5.0)
+    
+    def test_batch_quantitation_rt_fallback_does_not_share_peaks(self):
+        """RT matching skips name-claimed peaks and gives each peak to the closest target"""
+        calibrations = [
+            self._batch_calibration("Benzene", 2.02),
+            self._batch_calibration("Toluene", 2.06),
+            self._batch_calibration("Xylene", 2.5),
+            self._batch_calibration("Octane", 4.0)
+        ]
+        run = self._batch_run(3, [
+            {"rt": 1.95, "area": 300.0},
+            {"rt": 2.05, "area": 400.0},
+            {"rt": 4.0, "area": 500.0, "name": "Xylene"}
+        ])
+        
+        [result] = self.service.quantitate_batch([run], calibrations)
+        by_name = {r["targetName"]: r for r in result.results}
+        
+        self.assertAlmostEqual(by_name["Benzene"]["rt"], 1.95)
+        self.assertAlmostEqual(by_name["Toluene"]["rt"], 2.05)
+        self.assertAlmostEqual(by_name["Xylene"]["rt"], 4.0)
+        self.assertEqual(by_name["Octane"]["flags"], ["NoPeak"])
+    
+    def test_batch_quantitation_sequence_scale(self):
+        """60 targets across 150 injections all resolve in one batch call"""
+        rng = np.random.default_rng(0)
+        target_rts = np.linspace(1, 30, 60)
+        calibrations = [self._batch_calibration(f"Target {i}", rt) for i, rt in enumerate(target_rts)]
+        runs = [
+            self._batch_run(i, [
+                {"rt": float(rt + rng.normal(0, 0.01)), "area": float(rng.uniform(100, 900))}
+                for rt in target_rts
+            ])
+            for i in range(150)
+        ]
+        
+        results = self.service.quantitate_batch(runs, calibrations)
+        
+        self.assertEqual(len(results), 150)
+        self.assertTrue(all(len(r.results) == 60 for r in results))
+        self.assertFalse(any("NoPeak" in q["flags"] for r in results for q in r.results))
+    
+    def test_batch_fit_matches_single_fits(self):
+        """Batch fitting reproduces fit_calibration_enhanced for every model and outlier policy"""
+        amounts = [0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0]
+        rng = np.random.default_rng(1)
+        requests = []
+        for model_type in ["linear", "linear_through_zero", "weighted_1/x", "weighted_1/x2"]:
+            for policy in [OutlierPolicy.NONE, OutlierPolicy.GRUBBS, OutlierPolicy.IQR]:
+                areas = 100.0 * np.array(amounts) * rng.normal(1.0, 0.02, len(amounts)) + 15.0
+                areas[4] *= 1.6  # One suspicious level
+                name = f"{model_type} {policy.value}"
+                requests.append(CalibrationFitRequest(
+                    method_id=7, target_name=name, model_type=model_type, outlier_policy=policy,
+                    levels=[CalibrationLevel(target_name=name, amount=a, unit="ppm", area=float(y))
+                            for a, y in zip(amounts, areas)]
+                ))
+        
+        batch, errors, timing = self.service.fit_calibrations_batch(requests)
+        self.assertEqual(errors, {})
+        self.assertIn("total_ms", timing)
+        
+        for request, fitted in zip(requests, batch):
+            single = self.service.fit_calibration_enhanced(request.model_copy(deep=True))
+            self.assertAlmostEqual(fitted.slope, single.slope, places=8)
+            self.assertAlmostEqual(fitted.intercept, single.intercept, places=8)
+            self.assertAlmostEqual(fitted.r2, single.r2, places=8)
+            self.assertAlmostEqual(fitted.lod, single.lod, places=8)
+            self.assertEqual(sorted(fitted.excluded_points), sorted(single.excluded_points))
+            np.testing.assert_allclose(fitted.residuals, single.residuals, atol=1e-8)
+        
+        self.assertTrue(any(c.excluded_points for c in batch))
+        self.assertEqual(len(self.service.list_calibrations(method_id=7)), 2 * len(requests))
+    
+    def test_batch_fit_reports_invalid_targets(self):
+        """Targets that cannot be fitted are reported without failing the batch"""
+        good = CalibrationFitRequest(
+            method_id=8, target_name="Benzene", model_type="linear",
+            levels=[CalibrationLevel(target_name="Benzene", amount=a, unit="ppm", area=100.0 * a) for a in (1, 2, 5)]
+        )
+        bad = CalibrationFitRequest(
+            method_id=8, target_name="Toluene", model_type="linear",
+            levels=[CalibrationLevel(target_name="Toluene", amount=a, unit="ppm") for a in (1, 2)]
+        )
+        
+        calibrations, errors, _ = self.service.fit_calibrations_batch([good, bad])
+        
+        self.assertEqual([c.target_name for c in calibrations], ["Benzene"])
+        self.assertAlmostEqual(calibrations[0].slope, 100.0)
+        self.assertIn("Toluene", errors)
+
+
 if __name__ == '__main__':
     unittest.main()